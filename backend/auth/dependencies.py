@@ -1,11 +1,11 @@
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from models.sql_db import get_db
+from models.sql_db import open_db, run_db
 from jose import JWTError, jwt
-from models.user import User
+from models.user import User, get_user_by_username
 from config import Config
-import logging
+from cache import auth_token_cache, auth_user_cache
+import time, hashlib, logging
 
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
@@ -13,13 +13,29 @@ logger = logging.getLogger("Multimodal_rag_bot")
 # OAuth2 Password Bearer token scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def _token_cache_ttl(exp) -> float:
+    """
+    Returns how long decoded token claims may be cached: never past the token expiry.
+
+    Args:
+        exp (int, optional): Expiry timestamp of the token.
+
+    Returns:
+        float: Time to live in seconds.
+    """
+    if exp is None:
+        return Config.AUTH_CACHE_TTL_SECONDS
+    return max(0, min(Config.AUTH_CACHE_TTL_SECONDS, exp - time.time()))
+
+async def verify_token(token: str = Depends(oauth2_scheme)) -> User:
     """
     Verifies and decodes a JWT token, then fetches the corresponding user from the database.
+    Decoded tokens (until they expire) and users are cached, so a warm request neither decodes
+    nor opens a database session. A cached user is only served to tokens issued for its id, so
+    a user deleted and re-created under the same name never gets the old user's id or role.
 
     Args:
         token (str): The JWT token obtained from the authorization header.
-        db (Session): Database session dependency.
 
     Returns:
         User: The authenticated user object.
@@ -28,18 +44,35 @@ def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_
         HTTPException: If the token is invalid, missing username, or the user is not found.
     """
     try:
-        # Decode the JWT token using the secret key and algorithm
-        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=[Config.ALGORITHM])
-        username: str = payload.get("sub") # Extract username (subject) from token
+        # Reuse the decoded claims of a token seen before, skipping the signature check
+        token_key = hashlib.sha256(token.encode()).hexdigest() # Keep raw tokens out of the cache
+        claims = auth_token_cache.get(token_key)
+        if claims is None:
+            # Decode the JWT token using the secret key and algorithm
+            payload = jwt.decode(token, Config.SECRET_KEY, algorithms=[Config.ALGORITHM])
+            claims = {"username": payload.get("sub"), "uid": payload.get("uid"), "exp": payload.get("exp")} # Extract username (subject) from token
+            if claims["username"] is not None:
+                auth_token_cache.set(token_key, claims, ttl=_token_cache_ttl(claims["exp"]))
+        username: str = claims["username"]
         if username is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid token: Missing username",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        if claims["exp"] is not None and claims["exp"] <= time.time():
+            auth_token_cache.delete(token_key)
+            raise JWTError("Signature has expired.")
+        
+        # Serve the user from the cache, querying the database only on a miss
+        cached_user = auth_user_cache.get(username)
+        if cached_user is not None and claims.get("uid") is not None and cached_user["id"] == claims["uid"]:
+            logger.debug(f"User '{username}' authenticated from cache")
+            return User(**cached_user)
             
-        # Query the database for the user
-        user = db.query(User).filter(User.username == username).first()
+        # Query the database for the user, opening a session only now
+        async with open_db() as db:
+            user = await run_db(db, get_user_by_username, username)
         
         if user is None:
             raise HTTPException(
@@ -47,8 +80,9 @@ def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_
                 detail="Invalid token: User not found",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        auth_user_cache.set(username, {"id": user.id, "username": user.username, "is_admin": user.is_admin})
         
-        logger.info(f"User '{username}' successfully authenticated")
+        logger.debug(f"User '{username}' successfully authenticated")
         return user
     except JWTError as e:
         logger.error(f"Invalid token: {str(e)}")
@@ -77,5 +111,5 @@ def admin_only(current_user: User = Depends(verify_token)):
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied: Admins only",
         )
-    logger.info(f"Admin only verification success for user '{current_user.username}'")
+    logger.debug(f"Admin only verification success for user '{current_user.username}'")
     return current_user
\ No newline at end of file
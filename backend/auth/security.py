@@ -1,7 +1,12 @@
 from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
+from threading import BoundedSemaphore
 from jose import jwt
 from config import Config
+from metrics import Counter, Histogram
+import asyncio, time
 import logging
 
 # Configure logger
@@ -12,8 +17,21 @@ SECRET_KEY = Config.SECRET_KEY
 ALGORITHM = Config.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = Config.ACCESS_TOKEN_EXPIRE_MINUTES
 
+BCRYPT_ROUNDS = Config.BCRYPT_ROUNDS
+
 # Password hashing context using bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Dedicated executor for bcrypt work, so hashing never runs on the event loop or the request threadpool
+password_executor = ThreadPoolExecutor(max_workers=Config.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+# Bounds the number of hashing jobs running or waiting; beyond it requests are rejected
+password_slots = BoundedSemaphore(Config.PASSWORD_HASH_MAX_PENDING)
+
+# Password hashing metrics
+password_hash_seconds = Histogram("password_hash_seconds", "Time spent hashing or verifying a password", labels=("operation",))
+password_queue_seconds = Histogram("password_hash_queue_seconds", "Time a password job waited for an executor thread", labels=("operation",))
+password_rejections = Counter("password_hash_rejected_total", "Password jobs rejected because the executor was saturated", labels=("operation",))
 
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """
@@ -41,6 +59,33 @@ def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     logger.info(f"Access token created for user: {data.get('sub', 'unknown')} with expiration: {expire}")
     return encoded_jwt
 
+def _bcrypt_rounds(hashed_password: str) -> int:
+    """
+    Extracts the cost factor of a bcrypt hash ('$2b$<rounds>$...').
+
+    Args:
+        hashed_password (str): The stored hashed password.
+
+    Returns:
+        int: The cost factor, or None if the hash is not a bcrypt hash.
+    """
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError, AttributeError):
+        return None
+
+def needs_rehash(hashed_password: str) -> bool:
+    """
+    Checks whether a stored hash uses a deprecated scheme or a cost other than BCRYPT_ROUNDS.
+
+    Args:
+        hashed_password (str): The stored hashed password.
+
+    Returns:
+        bool: True if the password should be hashed again.
+    """
+    return pwd_context.needs_update(hashed_password) or _bcrypt_rounds(hashed_password) != BCRYPT_ROUNDS
+
 def hash_password(password: str) -> str:
     """
     Hashes a password using bcrypt.
@@ -71,4 +116,84 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         logger.info("Password verification successful.")
     else:
         logger.warning("Password verification failed.")
-    return is_valid
\ No newline at end of file
+    return is_valid
+
+def verify_and_rehash(plain_password: str, hashed_password: str):
+    """
+    Verifies a password and, if it matches a hash using an outdated cost, hashes it again.
+
+    Args:
+        plain_password (str): The plain text password entered by the user.
+        hashed_password (str): The stored hashed password.
+
+    Returns:
+        tuple: Whether the password matches, and the new hash to store (None if unchanged).
+    """
+    is_valid = verify_password(plain_password, hashed_password)
+    if is_valid and needs_rehash(hashed_password):
+        logger.info(f"Rehashing password with {BCRYPT_ROUNDS} bcrypt rounds.")
+        return is_valid, hash_password(plain_password)
+    return is_valid, None
+
+async def run_password_job(operation: str, func, *args):
+    """
+    Runs a password hashing function on the dedicated executor.
+
+    Args:
+        operation (str): Name of the operation, used in metrics.
+        func (callable): The blocking function to run.
+        *args: Arguments of the function.
+
+    Returns:
+        The result of the function.
+
+    Raises:
+        HTTPException: If too many password jobs are already running or waiting.
+    """
+    if not password_slots.acquire(blocking=False):
+        password_rejections.inc(operation)
+        logger.warning(f"Password executor saturated, rejecting '{operation}' request.")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        password_queue_seconds.observe(started - submitted, operation)
+        try:
+            return func(*args)
+        finally:
+            password_hash_seconds.observe(time.perf_counter() - started, operation)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, job)
+    finally:
+        password_slots.release()
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hashes a password on the dedicated password executor.
+
+    Args:
+        password (str): The plain text password to hash.
+
+    Returns:
+        str: The hashed password.
+    """
+    return await run_password_job("hash", hash_password, password)
+
+async def verify_and_rehash_async(plain_password: str, hashed_password: str):
+    """
+    Verifies (and if needed rehashes) a password on the dedicated password executor.
+
+    Args:
+        plain_password (str): The plain text password entered by the user.
+        hashed_password (str): The stored hashed password.
+
+    Returns:
+        tuple: Whether the password matches, and the new hash to store (None if unchanged).
+    """
+    return await run_password_job("verify", verify_and_rehash, plain_password, hashed_password)
@@ -0,0 +1,106 @@
+"""
+Compares the character chunking previously used at ingestion with the token-aware chunker of
+EmbedData, on a folder of .txt/.md documents:
+
+    python -m benchmarks.chunking --corpus path/to/docs --queries-per-doc 20 --top-k 5
+
+For each strategy it reports the number of chunks, embedding throughput and the retrieval hit
+rate: sentences sampled from the documents are used as queries, and a query is a hit if one of
+the top-k chunks (exact dot-product search) contains its sentence. Sentences far into a long
+chunk are beyond the model's window, so character chunking misses them.
+"""
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from rag_modules.embed_data import EmbedData
+from rag_modules.token_chunker import SENTENCE_BOUNDARY
+from rag_modules.document_extract import CHUNKING_PARAMS
+import argparse, json, random, time
+import numpy as np
+
+def load_corpus(directory: str) -> dict:
+    """
+    Reads the .txt and .md documents of a folder, by file name.
+    """
+    corpus = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith((".txt", ".md")):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                corpus[name] = f.read()
+    return corpus
+
+def character_chunks(text: str, max_characters: int = CHUNKING_PARAMS["new_after_n_chars"]) -> list:
+    """
+    Packs the paragraphs of a text into chunks of about max_characters characters, like the
+    by_title character limits used before token-aware chunking.
+    """
+    chunks, current = [], ""
+    for paragraph in text.split("\n\n"):
+        if current and len(current) + len(paragraph) > max_characters:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+def sample_queries(corpus: dict, per_doc: int, seed: int = 0) -> list:
+    """
+    Samples sentences of every document as queries.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for text in corpus.values():
+        sentences = [s.strip() for s in SENTENCE_BOUNDARY.split(text) if len(s.split()) >= 8]
+        queries.extend(rng.sample(sentences, min(per_doc, len(sentences))))
+    return queries
+
+def run_strategy(embed_data: EmbedData, chunks: list, queries: list, top_k: int) -> dict:
+    """
+    Embeds the chunks and queries of a strategy and measures throughput and hit rate.
+    """
+    started = time.perf_counter()
+    chunk_vectors = np.array([vector for batch in embed_data.batch_iterate(chunks, embed_data.batch_size) for vector in embed_data.generate_embedding(batch)])
+    embed_seconds = time.perf_counter() - started
+
+    query_vectors = np.array([embed_data.embed_model.get_query_embedding(query) for query in queries])
+    top = np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :top_k]
+    hits = sum(any(query in chunks[i] for i in row) for query, row in zip(queries, top))
+    characters = sum(len(chunk) for chunk in chunks)
+    return {
+        "chunks": len(chunks),
+        "mean_chunk_tokens": round(float(np.mean([embed_data.chunker.count_tokens(chunk) for chunk in chunks])), 1),
+        "embed_seconds": round(embed_seconds, 3),
+        "chunks_per_second": round(len(chunks) / embed_seconds, 2),
+        "characters_per_second": round(characters / embed_seconds, 1),
+        f"hit_rate@{top_k}": round(hits / len(queries), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark character vs token-aware chunking.")
+    parser.add_argument("--corpus", required=True, help="Folder of .txt/.md documents")
+    parser.add_argument("--queries-per-doc", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    queries = sample_queries(corpus, args.queries_per_doc)
+    embed_data = EmbedData()
+    strategies = {
+        "characters": [chunk for text in corpus.values() for chunk in character_chunks(text)],
+        "tokens": list(embed_data.split_contexts(chunk for text in corpus.values() for chunk in character_chunks(text))),
+    }
+    results = {
+        "documents": len(corpus),
+        "queries": len(queries),
+        "max_tokens": embed_data.chunker.max_tokens,
+        "overlap_tokens": embed_data.chunker.overlap_tokens,
+        "strategies": {name: run_strategy(embed_data, chunks, queries, args.top_k) for name, chunks in strategies.items()},
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
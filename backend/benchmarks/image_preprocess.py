@@ -0,0 +1,104 @@
+"""
+Measures what image preprocessing saves on vision-model calls:
+
+    python -m benchmarks.image_preprocess --images path/to/photos_and_figures
+    python -m benchmarks.image_preprocess --ollama-host http://localhost:11434
+
+Each image (a folder of images, or synthetic phone photos, page scans and icons) is summarized
+with Conversational_Bot.summarize_image as given and after preprocess_image, and the bytes sent
+and the call latency are compared. By default the calls go to the stub Ollama server, which
+measures the client-side cost of a large prompt (base64 and JSON encoding, transfer, parsing);
+point --ollama-host at a real server to include the vision encoder itself.
+"""
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch
+from benchmarks.stubs import StubOllamaServer
+from rag_modules.conversational_bot import Conversational_Bot
+from rag_modules.image_preprocess import preprocess_image
+import argparse, io, json, time
+import ollama
+
+def synthetic_images() -> dict:
+    """
+    Generates a phone photo, a page scan, a screenshot and an icon.
+    """
+    from PIL import Image, ImageDraw
+    def encode(image, image_format, **params):
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, **params)
+        return buffer.getvalue()
+
+    scan = Image.new("L", (2480, 3508), 255)
+    draw = ImageDraw.Draw(scan)
+    for line in range(120):
+        draw.text((150, 150 + line * 27), "Attention mechanisms weigh every token of the input sequence. " * 3, fill=0)
+    screenshot = Image.new("RGB", (2560, 1440), (250, 250, 250))
+    ImageDraw.Draw(screenshot).rectangle((200, 200, 1800, 1000), outline=(30, 90, 200), width=6)
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker"
+    return {
+        "phone_photo.jpg": encode(Image.effect_noise((4032, 3024), 48).convert("RGB"), "JPEG", quality=92, exif=exif),
+        "page_scan.png": encode(scan, "PNG"),
+        "screenshot.png": encode(screenshot, "PNG"),
+        "icon.png": encode(Image.effect_noise((48, 48), 64).convert("RGB"), "PNG"),
+    }
+
+def load_images(directory: str) -> dict:
+    images = {}
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".tif", ".tiff")):
+            with open(os.path.join(directory, name), "rb") as f:
+                images[name] = f.read()
+    return images
+
+def timed_summary(bot: Conversational_Bot, image: bytes) -> float:
+    started = time.perf_counter()
+    bot.summarize_image(image)
+    return time.perf_counter() - started
+
+def run(images: dict, host: str, repeats: int) -> dict:
+    """
+    Summarizes every image as given and preprocessed, keeping the fastest of repeats calls.
+    """
+    bot = Conversational_Bot()
+    results, totals = {}, {"original_bytes": 0, "sent_bytes": 0, "skipped": 0, "latency_saved_s": 0.0}
+    with patch.object(ollama, "chat", ollama.Client(host=host, trust_env=False).chat):
+        for name, image in images.items():
+            prepared = preprocess_image(image)
+            entry = {"original_bytes": len(image), "preprocess_s": round(prepared.seconds, 4), "skipped": prepared.skipped}
+            original_s = min(timed_summary(bot, image) for _ in range(repeats))
+            entry["original_call_s"] = round(original_s, 4)
+            if prepared.skipped:
+                # The vision-model call is not made at all
+                entry.update(sent_bytes=0, latency_saved_s=round(original_s - prepared.seconds, 4))
+                totals["skipped"] += 1
+            else:
+                prepared_s = min(timed_summary(bot, prepared.data) for _ in range(repeats))
+                entry.update(sent_bytes=len(prepared.data), size=f"{prepared.width}x{prepared.height}", preprocessed_call_s=round(prepared_s, 4),
+                             latency_saved_s=round(original_s - prepared_s - prepared.seconds, 4))
+            results[name] = entry
+            totals["original_bytes"] += entry["original_bytes"]
+            totals["sent_bytes"] += entry["sent_bytes"]
+            totals["latency_saved_s"] += entry["latency_saved_s"]
+    totals["bytes_saved"] = totals["original_bytes"] - totals["sent_bytes"]
+    totals["latency_saved_s"] = round(totals["latency_saved_s"], 4)
+    return {"images": results, "total": totals}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the bytes and latency saved by image preprocessing.")
+    parser.add_argument("--images", help="Folder of images (synthetic images by default)")
+    parser.add_argument("--ollama-host", help="Ollama server with the vision model (stub server by default)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    images = load_images(args.images) if args.images else synthetic_images()
+    server = None if args.ollama_host else StubOllamaServer(response_tokens=16).start()
+    try:
+        print(json.dumps(run(images, args.ollama_host or server.url, args.repeats), indent=2))
+    finally:
+        if server:
+            server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Cold-start import profile of the backend:
+
+    python -m benchmarks.import_time --budget 2.0 --top 15
+
+Imports main in a fresh interpreter with -X importtime, prints the slowest modules and exits
+with status 1 if the import takes longer than the budget, or if it pulls in a heavy
+dependency that should only be imported by the subsystem using it, on first use.
+"""
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import argparse, json, subprocess
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Packages that must not be imported by 'import main' (the bare unstructured package is light, its partitioners are not)
+HEAVY_MODULES = ("torch", "transformers", "sentence_transformers", "llama_index", "unstructured.partition.pdf", "unstructured.partition.text", "unstructured.chunking", "qdrant_client")
+
+# Default budget of 'import main', in seconds
+DEFAULT_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", 2.0))
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parses the output of python -X importtime.
+
+    Args:
+        stderr (str): The standard error of the interpreter.
+
+    Returns:
+        list: (module, depth, self_seconds, cumulative_seconds) of every imported module, in import completion order.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((name.strip(), depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return entries
+
+def profile_import(module: str = "main", top: int = 15) -> dict:
+    """
+    Imports a module in a fresh interpreter and profiles the import.
+
+    Args:
+        module (str): The module to import.
+        top (int): Number of slowest modules to report.
+
+    Returns:
+        dict: Import time in seconds, the slowest modules (cumulative) and the heavy packages imported.
+    """
+    code = f"import {module}, sys, json; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    entries = parse_importtime(result.stderr)
+    seconds = next(cumulative for name, depth, _, cumulative in entries if name == module and depth == 0)
+    modules = json.loads(result.stdout.strip().splitlines()[-1])
+    heavy = sorted({prefix for prefix in HEAVY_MODULES for name in modules if name == prefix or name.startswith(prefix + ".")})
+    slowest = sorted((entry for entry in entries if entry[0] != module), key=lambda entry: entry[3], reverse=True)[:top]
+    return {
+        "module": module,
+        "seconds": round(seconds, 3),
+        "heavy_modules": heavy,
+        "slowest": [{"module": name, "cumulative_s": round(cumulative, 3), "self_s": round(self_s, 3)} for name, _, self_s, cumulative in slowest],
+    }
+
+def check(profile: dict, budget: float) -> list:
+    """
+    Returns the budget violations of an import profile.
+    """
+    failures = []
+    if profile["seconds"] > budget:
+        failures.append(f"import {profile['module']} took {profile['seconds']:.2f}s, over the {budget:.2f}s budget")
+    if profile["heavy_modules"]:
+        failures.append(f"import {profile['module']} imported {', '.join(profile['heavy_modules'])}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the cold-start import of the backend and check it against a budget.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="Maximum import time in seconds")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to print")
+    args = parser.parse_args()
+
+    profile = profile_import(args.module, args.top)
+    print(json.dumps(profile, indent=2))
+    failures = check(profile, args.budget)
+    for failure in failures:
+        print(f"FAILED: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Measures what a log call costs the thread that makes it:
+
+    python -m benchmarks.logging_overhead --calls 20000
+
+Compares the synchronous file and console handlers used before with the queue-based JSON
+logging of structured_logging, for an INFO record, a DEBUG record filtered out by its level,
+an INFO record of a sampled module and a record carrying a large payload. Reports the mean and
+p99 nanoseconds per call as JSON.
+"""
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import structured_logging
+from structured_logging import setup_logging, shutdown_logging
+from config import logFormat
+import argparse, json, logging, tempfile, time
+
+logger = logging.getLogger("Multimodal_rag_bot")
+
+PAYLOAD = "History: " + str([{"role": "user", "content": "Question", "images": ["iVBORw0KGgo" * 5000]}] * 4)
+
+def time_calls(log, calls: int) -> dict:
+    """
+    Times each of calls log calls.
+    """
+    durations = []
+    for i in range(calls):
+        started = time.perf_counter_ns()
+        log(i)
+        durations.append(time.perf_counter_ns() - started)
+    durations.sort()
+    return {"mean_ns": round(sum(durations) / len(durations)), "p99_ns": durations[int(len(durations) * 0.99)]}
+
+def run_cases(calls: int) -> dict:
+    return {
+        "info": time_calls(lambda i: logger.info(f"User user{i} sent a message in session {i}."), calls),
+        "debug_filtered": time_calls(lambda i: logger.debug(f"Fetching 'users' collection {i}."), calls),
+        "info_sampled": time_calls(lambda i: sampled(i), calls),
+        "large_payload": time_calls(lambda i: logger.info(PAYLOAD), max(1, calls // 20)),
+    }
+
+def sampled(i):
+    logger.info(f"Sampled event {i}.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-call overhead of logging.")
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    root = logging.getLogger()
+    level = root.level
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as devnull:
+        # Synchronous handlers, as configured before
+        handlers = [logging.FileHandler(os.path.join(directory, "sync.log")), logging.StreamHandler(devnull)]
+        for handler in handlers:
+            handler.setFormatter(logging.Formatter(logFormat))
+            root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        results["synchronous_text"] = run_cases(args.calls)
+        for handler in handlers:
+            root.removeHandler(handler)
+            handler.close()
+
+        # Queue-based JSON logging, this module's events sampled at 10%
+        structured_logging.LOG_DIR = directory
+        setup_logging(level="INFO", log_format="json", module_levels="", sampling="logging_overhead.sampled=0.1", stream=devnull)
+        results["queued_json"] = run_cases(args.calls)
+        shutdown_logging()
+    root.setLevel(level)
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
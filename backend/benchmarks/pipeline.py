@@ -0,0 +1,229 @@
+"""
+Offline end-to-end benchmark of the RAG pipeline, runnable without network or GPU:
+
+    python -m benchmarks.pipeline --sizes 500,2000,10000 --queries 50 --output results.json
+
+Synthetic corpora of increasing size go through EmbedData.embed, VectorStore.ingest_data
+(embedded Qdrant, or the NumPy store with --vector-store numpy), Retriever.search, RAG.rerank and chat_bot, against a deterministic stub
+Ollama server. Each stage reports its throughput and p50/p95/p99 latency as JSON, together with
+the commit, so runs can be compared across commits. --real-models uses the Hugging Face
+embedding and reranker models instead of the stubs (they must be in the local cache).
+"""
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch
+from functools import partial
+from qdrant_client import QdrantClient
+from benchmarks.stubs import StubOllamaServer, StubEmbedData, StubReranker, StubRerankerTokenizer, MemoryCollection
+from rag_modules.embed_data import EmbedData
+from rag_modules.vector_db import QdrantVDB, NumpyVectorStore
+from rag_modules.rag_retriever import Retriever
+from rag_modules.rag import RAG
+from services import chat_service
+from services.admin import ADMIN_COLLECTION_NAME
+from models.user import User
+import argparse, asyncio, json, logging, platform, random, subprocess, tempfile, time
+import numpy as np
+import ollama
+
+# Topic words shared by documents and queries, filler words make up the rest of a sentence
+TOPICS = [f"topic{i}" for i in range(200)]
+FILLER = [f"word{i}" for i in range(5000)]
+
+def make_corpus(size: int, sentences: int = 12, seed: int = 0) -> list:
+    """
+    Generates a synthetic corpus of documents, each about a few topics.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        topics = rng.sample(TOPICS, 3)
+        text = " ".join(
+            " ".join(rng.choice(topics) if rng.random() < 0.2 else rng.choice(FILLER) for _ in range(rng.randint(12, 24))) + "."
+            for _ in range(sentences)
+        )
+        corpus.append(text)
+    return corpus
+
+def make_queries(count: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    return [f"What is known about {rng.choice(TOPICS)} and {rng.choice(TOPICS)}?" for _ in range(count)]
+
+def stage_stats(latencies: list, items: int, seconds: float) -> dict:
+    """
+    Summarizes the latencies (seconds) of a stage.
+
+    Args:
+        latencies (list): Latency of every call.
+        items (int): Items processed by the stage (texts, points, queries).
+        seconds (float): Wall time of the stage.
+
+    Returns:
+        dict: Calls, items, throughput and latency percentiles in milliseconds.
+    """
+    ms = np.array(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "items": items,
+        "seconds": round(seconds, 4),
+        "throughput_per_s": round(items / seconds, 2) if seconds else None,
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+def timed(func, latencies: list):
+    """
+    Wraps a function to record the latency of every call.
+    """
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+    return wrapper
+
+def create_store(vector_store: str, vector_dim: int, directory: str):
+    """
+    Creates an empty vector store of the given backend ('qdrant_local' or 'numpy').
+    """
+    if vector_store == "numpy":
+        return NumpyVectorStore(vector_dim=vector_dim, directory=directory)
+    return QdrantVDB(vector_dim=vector_dim, client=QdrantClient(":memory:"))
+
+def bench_size(size: int, queries: list, embed_data: EmbedData, rag_factory, top_k: int, vector_store: str = "qdrant_local",
+               store_dir: str = None) -> dict:
+    """
+    Runs every stage over a corpus of the given size.
+    """
+    results = {}
+    corpus = make_corpus(size)
+
+    # EmbedData.embed, latency per batch
+    latencies = []
+    with patch.object(embed_data, "generate_embedding", timed(embed_data.generate_embedding, latencies)):
+        started = time.perf_counter()
+        embed_data.embed(corpus)
+        results["embed"] = stage_stats(latencies, len(embed_data.contexts), time.perf_counter() - started)
+
+    # VectorStore.ingest_data, latency per upload batch
+    vector_db = create_store(vector_store, len(embed_data.embeddings[0]), os.path.join(store_dir or tempfile.gettempdir(), f"store_{size}"))
+    vector_db.create_or_set_collection(ADMIN_COLLECTION_NAME)
+    latencies = []
+    with patch.object(vector_db, "add", timed(vector_db.add, latencies)):
+        started = time.perf_counter()
+        vector_db.ingest_data(embed_data, source="benchmark")
+        results["ingest_data"] = stage_stats(latencies, len(embed_data.contexts), time.perf_counter() - started)
+
+    # Retriever.search
+    retriever = Retriever(vector_db=vector_db, embeddata=embed_data)
+    search = timed(retriever.search, latencies := [])
+    started = time.perf_counter()
+    retrieved = [[dict(point) for point in search(query, top_k).model_dump()["points"]] for query in queries]
+    results["search"] = stage_stats(latencies, len(queries), time.perf_counter() - started)
+
+    # RAG.rerank of the retrieved documents
+    rag = rag_factory(retriever=retriever, bot=chat_service.bot)
+    rerank = timed(rag.rerank, latencies := [])
+    started = time.perf_counter()
+    for query, docs in zip(queries, retrieved):
+        rerank(query, docs)
+    results["rerank"] = stage_stats(latencies, len(queries) * top_k, time.perf_counter() - started)
+
+    # chat_bot in 'all' RAG mode: retrieval, reranking, generation and session persistence
+    sessions, messages = MemoryCollection(), MemoryCollection()
+    user = User(id=1, username="benchmark")
+
+    async def chat(query):
+        return await chat_service.chat_bot(session_id=None, message=query, rag_mode="all", user={"username": user.username},
+                                           sessions_collection=sessions, messages_collection=messages, current_user=user,
+                                           embed_data=embed_data, vector_db=vector_db)
+
+    async def run_chats():
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            await chat(query)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    with patch.object(chat_service, "RAG", rag_factory):
+        started = time.perf_counter()
+        latencies = asyncio.run(run_chats())
+        results["chat_bot"] = stage_stats(latencies, len(queries), time.perf_counter() - started)
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def run_suite(sizes: list, query_count: int = 50, top_k: int = 10, real_models: bool = False,
+              response_tokens: int = 64, ms_per_token: float = 0.0, rerank_threshold: float = float("-inf"),
+              vector_store: str = "qdrant_local") -> dict:
+    """
+    Runs the benchmark over corpora of the given sizes.
+
+    Args:
+        sizes (list): Number of documents of every corpus.
+        query_count (int): Queries per stage.
+        top_k (int): Documents retrieved per query.
+        real_models (bool): Use the Hugging Face models instead of the stubs.
+        response_tokens (int): Words of every stub LLM response.
+        ms_per_token (float): Simulated LLM generation time per word.
+        rerank_threshold (float): Reranker threshold, by default every retrieved document reaches the prompt.
+        vector_store (str): Vector store backend, 'qdrant_local' or 'numpy'.
+
+    Returns:
+        dict: The environment and the stage results of every corpus size.
+    """
+    server = StubOllamaServer(response_tokens=response_tokens, ms_per_token=ms_per_token).start()
+    embed_data = EmbedData() if real_models else StubEmbedData()
+    if real_models:
+        reranker = chat_service.get_reranker()
+    else:
+        reranker = (StubReranker().eval(), StubRerankerTokenizer())
+    rag_factory = partial(RAG, rerank_threshold=rerank_threshold, reranker_model=reranker[0], reranker_tokenizer=reranker[1])
+    queries = make_queries(query_count)
+    try:
+        with patch.object(ollama, "chat", ollama.Client(host=server.url, trust_env=False).chat), patch.object(chat_service, "get_reranker", lambda: reranker), \
+             tempfile.TemporaryDirectory() as store_dir:
+            results = {str(size): bench_size(size, queries, embed_data, rag_factory, top_k, vector_store, store_dir) for size in sizes}
+    finally:
+        server.stop()
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "models": "huggingface" if real_models else "stub",
+        "vector_store": vector_store,
+        "queries": query_count,
+        "top_k": top_k,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the RAG pipeline.")
+    parser.add_argument("--sizes", default="500,2000,10000", help="Comma separated corpus sizes (documents)")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--real-models", action="store_true", help="Use the cached Hugging Face models instead of the stubs")
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="Simulated LLM generation time per token")
+    parser.add_argument("--vector-store", choices=("qdrant_local", "numpy"), default="qdrant_local")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    logging.getLogger("Multimodal_rag_bot").setLevel(logging.WARNING)
+    results = run_suite([int(size) for size in args.sizes.split(",")], args.queries, args.top_k, args.real_models,
+                        args.response_tokens, args.ms_per_token, vector_store=args.vector_store)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Deterministic offline stand-ins for the external services of the RAG pipeline: an Ollama HTTP
+server, a hashing embedding model, a small torch reranker and in-memory MongoDB collections.
+They keep the real code paths (HTTP client, tokenization, tensor math, Qdrant) while removing
+network, GPU and model downloads.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from rag_modules.embed_data import EmbedData
+from datetime import datetime, timezone
+from threading import Thread
+import hashlib, json, time
+import numpy as np
+import torch
+
+def stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+class StubOllamaServer:
+    """
+    A local HTTP server answering the Ollama chat API with deterministic responses.
+
+    Attributes:
+        response_tokens (int): Words in every response.
+        ms_per_token (float): Simulated generation time per response word.
+        url (str): Base URL of the server, set once started.
+    """
+    def __init__(self, response_tokens: int = 64, ms_per_token: float = 0.0):
+        self.response_tokens = response_tokens
+        self.ms_per_token = ms_per_token
+        self.url = None
+        self._server = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._send({"models": []} if self.path == "/api/tags" else {"version": "stub"})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                prompt = " ".join(str(message.get("content", "")) for message in request.get("messages", []))
+                seed = stable_hash(prompt)
+                words = [f"w{(seed >> (i % 48)) & 0xfff:x}" for i in range(stub.response_tokens)]
+                if stub.ms_per_token:
+                    time.sleep(stub.ms_per_token * stub.response_tokens / 1000)
+                self._send({
+                    "model": request.get("model", "stub"),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "done": True,
+                    "done_reason": "stop",
+                    "prompt_eval_count": len(prompt.split()),
+                    "eval_count": stub.response_tokens,
+                })
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+class HashingEmbedding:
+    """
+    A deterministic bag-of-words embedding: every word is hashed to a signed dimension, so
+    texts sharing words get similar vectors.
+    """
+    def __init__(self, dim: int = 768, max_length: int = 512):
+        self.dim = dim
+        self.max_length = max_length
+
+    def _embed(self, text: str) -> list:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split()[:self.max_length]:
+            h = stable_hash(word)
+            vector[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def get_text_embedding_batch(self, texts, **kwargs):
+        return [self._embed(text) for text in texts]
+
+    def get_query_embedding(self, query):
+        return self._embed(query)
+
+class StubEmbedData(EmbedData):
+    """
+    EmbedData backed by HashingEmbedding instead of a Hugging Face model.
+    """
+    def _load_embed_model(self):
+        return HashingEmbedding()
+
+class StubRerankerTokenizer:
+    """
+    Hashes words to ids, with the padding and truncation behaviour of a Hugging Face tokenizer.
+    """
+    def __init__(self, vocab_size: int = 30522, max_length: int = 512):
+        self.vocab_size = vocab_size
+        self.max_length = max_length
+
+    def __call__(self, texts, padding=True, truncation=True, return_tensors="pt"):
+        ids = [[stable_hash(word) % self.vocab_size for word in text.lower().split()] for text in texts]
+        if truncation:
+            ids = [row[:self.max_length] for row in ids]
+        length = max(len(row) for row in ids)
+        input_ids = torch.tensor([row + [0] * (length - len(row)) for row in ids])
+        return {"input_ids": input_ids, "attention_mask": (input_ids != 0).long()}
+
+class StubReranker(torch.nn.Module):
+    """
+    A small seeded cross-encoder: mean word embedding through a two-layer head.
+    """
+    def __init__(self, vocab_size: int = 30522, dim: int = 128):
+        super().__init__()
+        torch.manual_seed(0)
+        self.embeddings = torch.nn.Embedding(vocab_size, dim)
+        self.head = torch.nn.Sequential(torch.nn.Linear(dim, dim), torch.nn.Tanh(), torch.nn.Linear(dim, 1))
+
+    def forward(self, input_ids, attention_mask):
+        mask = attention_mask.unsqueeze(-1).float()
+        pooled = (self.embeddings(input_ids) * mask).sum(1) / mask.sum(1).clamp(min=1)
+        return SimpleNamespace(logits=self.head(pooled))
+
+def matches(document: dict, query: dict) -> bool:
+    return all(document.get(key) == value for key, value in query.items())
+
+class MemoryCollection:
+    """
+    The subset of an async MongoDB collection used by the chat session functions.
+    """
+    def __init__(self):
+        self.documents = []
+
+    async def find_one(self, query, projection=None):
+        return next((dict(document) for document in self.documents if matches(document, query)), None)
+
+    async def insert_one(self, document):
+        self.documents.append(dict(document))
+        return SimpleNamespace(inserted_id=len(self.documents))
+
+    async def insert_many(self, documents):
+        self.documents.extend(dict(document) for document in documents)
+
+    async def update_one(self, query, update):
+        for document in self.documents:
+            if matches(document, query):
+                document.update(update.get("$set", {}))
+                return
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        for document in self.documents:
+            if matches(document, query):
+                for key, amount in update.get("$inc", {}).items():
+                    document[key] = document.get(key, 0) + amount
+                document.update(update.get("$set", {}))
+                return dict(document)
+        return None
@@ -1 +1,260 @@
-user_sessions_cache = {}  # Cache of sessions for faster access of session data
\ No newline at end of file
+from collections import OrderedDict
+from threading import Lock
+from config import Config
+from bson import json_util
+import time
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Sentinel distinguishing a missing entry from a cached None
+_MISSING = object()
+
+class CacheStats:
+    """
+    Hit, miss and eviction counters of a cache.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self, size=None):
+        """
+        Returns the counters together with the current size and hit ratio.
+
+        Args:
+            size (int, optional): Number of entries currently held by the cache, left out if unknown.
+
+        Returns:
+            dict: Cache statistics.
+        """
+        lookups = self.hits + self.misses
+        stats = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+        if size is not None:
+            stats["size"] = size
+        return stats
+
+class TTLCache:
+    """
+    An in-process cache bounded in size (least recently used entries are evicted first)
+    whose entries expire after a fixed time to live.
+
+    Attributes:
+        name (str): Name of the cache, used in logs and metrics.
+        maxsize (int): Maximum number of entries.
+        ttl (float): Time to live of an entry in seconds.
+    """
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300):
+        """
+        Initializes an empty cache.
+
+        Args:
+            name (str): Name of the cache.
+            maxsize (int): Maximum number of entries.
+            ttl (float): Time to live of an entry in seconds.
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._data = OrderedDict() # key -> (expires_at, value), least recently used first
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for a key, or the default if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.stats.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Stores a value, evicting the least recently used entries beyond maxsize.
+
+        Args:
+            key: The cache key.
+            value: The value to cache.
+            ttl (float, optional): Time to live overriding the cache default.
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key):
+        """
+        Removes a key from the cache if present.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self):
+        """
+        Returns the cache statistics.
+
+        Returns:
+            dict: Hits, misses, evictions, size and hit ratio.
+        """
+        with self._lock:
+            return self.stats.as_dict(len(self._data))
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+class RedisCache:
+    """
+    A cache shared between worker processes, backed by Redis. Entries expire after a fixed
+    time to live; the size bound is enforced by the Redis 'maxmemory' eviction policy.
+    Values are stored as (MongoDB extended) JSON, never pickled: reading an entry written
+    by anyone with access to the Redis server must not run code in the API process.
+
+    Attributes:
+        name (str): Name of the cache, used as the key prefix.
+        ttl (float): Time to live of an entry in seconds.
+    """
+    def __init__(self, name: str, url: str, ttl: float = 300):
+        """
+        Connects to the Redis server.
+
+        Args:
+            name (str): Name of the cache.
+            url (str): Redis connection URL.
+            ttl (float): Time to live of an entry in seconds.
+        """
+        try:
+            import redis
+        except ImportError as e:
+            logger.error("The 'redis' package is required for CACHE_BACKEND=redis")
+            raise ImportError("The 'redis' package is required for CACHE_BACKEND=redis") from e
+        self.name = name
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.client = redis.Redis.from_url(url)
+        logger.info(f"Cache '{name}' using Redis backend at {url}")
+
+    def _key(self, key):
+        return f"{self.name}:{key}"
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for a key, or the default if it is missing or expired.
+        """
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        return json_util.loads(raw)
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Stores a value with a time to live.
+        """
+        self.client.set(self._key(key), json_util.dumps(value), ex=max(1, int(self.ttl if ttl is None else ttl)))
+
+    def delete(self, key):
+        """
+        Removes a key from the cache if present.
+        """
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        """
+        Removes all entries of this cache.
+        """
+        for key in self.client.scan_iter(match=self._key("*")):
+            self.client.delete(key)
+
+    def get_stats(self):
+        """
+        Returns the statistics of this worker's lookups. The size is left out: counting the
+        entries would scan the Redis keyspace on every metrics scrape.
+
+        Returns:
+            dict: Hits, misses, evictions and hit ratio.
+        """
+        return self.stats.as_dict()
+
+    def __contains__(self, key):
+        return bool(self.client.exists(self._key(key)))
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+# Registry of the created caches, by name
+caches = {}
+
+def make_cache(name: str, maxsize: int, ttl: float):
+    """
+    Creates a cache using the backend selected by Config.CACHE_BACKEND and registers it.
+
+    Args:
+        name (str): Name of the cache.
+        maxsize (int): Maximum number of entries (in-process backend only).
+        ttl (float): Time to live of an entry in seconds.
+
+    Returns:
+        TTLCache | RedisCache: The cache instance.
+    """
+    if Config.CACHE_BACKEND == "redis":
+        cache = RedisCache(name, Config.REDIS_URL, ttl=ttl)
+    else:
+        cache = TTLCache(name, maxsize=maxsize, ttl=ttl)
+    caches[name] = cache
+    return cache
+
+# Cache of user documents for faster access of session data
+user_sessions_cache = make_cache("user_sessions", maxsize=Config.USER_CACHE_MAXSIZE, ttl=Config.USER_CACHE_TTL_SECONDS)
+
+# Caches of decoded JWT claims (by token) and authenticated users (by username). A user deleted
+# on one worker stays cached on the others: per worker, users are only kept for a short time
+auth_token_cache = make_cache("auth_tokens", maxsize=Config.AUTH_CACHE_MAXSIZE, ttl=Config.AUTH_CACHE_TTL_SECONDS)
+auth_user_cache = make_cache("auth_users", maxsize=Config.AUTH_CACHE_MAXSIZE,
+                             ttl=Config.AUTH_CACHE_TTL_SECONDS if Config.CACHE_BACKEND == "redis" else Config.AUTH_USER_LOCAL_TTL_SECONDS)
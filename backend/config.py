@@ -1,39 +1,108 @@
 from dotenv import load_dotenv
 import os, logging
-from datetime import datetime
 
 # Load environment variables from a .env file
 load_dotenv()
 
-# Ensure logs directory exists
+# Directory of the log files
 LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-LOG_FILE = os.path.join(LOG_DIR, f"Multimodal_rag_bot_{datetime.now().strftime('%y_%m_%d_%H_%M_%S_%f')}.log")
 
-# Configure logging with a detailed format and log file
+# Detailed log format
 logFormat = '%(asctime)s | %(name)s | %(module)s %(filename)s:%(lineno)d %(funcName)s | %(levelname)s | [PID: %(process)d] [Thread: %(threadName)s] | %(message)s'
-logging.basicConfig(
-    level=logging.INFO,
-    format=logFormat,
-    handlers=[
-        logging.FileHandler(LOG_FILE),  # Log to a file in logs directory
-        logging.StreamHandler()  # Log to console
-    ]
-)
 logger = logging.getLogger("Multimodal_rag_bot")
 
+def parse_keep_alive(value: str):
+    """
+    Parses an Ollama keep_alive setting: a number of seconds (negative keeps the model loaded
+    indefinitely) or a duration such as '30m'.
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
 class Config:
     """
     Configuration class to manage environment variables and directory setup.
     """
     DATABASE_URL = os.getenv("SQL_DATABASE_URL")
+    ASYNC_DATABASE_URL = os.getenv("SQL_ASYNC_DATABASE_URL") # Derived from SQL_DATABASE_URL when unset
+    SQL_ASYNC = os.getenv("SQL_ASYNC", "false").lower() == "true" # Serve routes from the async engine
+    SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", 5)) # Connections kept open per engine
+    SQL_MAX_OVERFLOW = int(os.getenv("SQL_MAX_OVERFLOW", 10)) # Extra connections opened under load
+    SQL_POOL_TIMEOUT = int(os.getenv("SQL_POOL_TIMEOUT", 30)) # Seconds to wait for a free connection
+    SQL_POOL_RECYCLE = int(os.getenv("SQL_POOL_RECYCLE", 1800)) # Seconds before a connection is replaced
+    SQL_POOL_PRE_PING = os.getenv("SQL_POOL_PRE_PING", "true").lower() == "true" # Check connections before use
     MONGO_URI = os.getenv('MONGO_URI')
     SECRET_KEY = os.getenv('SECRET_KEY')
     ACCESS_TOKEN_EXPIRE_MINUTES = 1800 # 1800 minutes expiration for access tokens
     ALGORITHM = "HS256" # Algorithm used for encoding JWT tokens
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12)) # bcrypt cost, hashes with another cost are upgraded at login
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))) # Threads dedicated to bcrypt
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64)) # Running + queued bcrypt jobs before rejecting
     ADMIN_UPLOAD_FILE_LOCATION = "uploads/admin"
     USER_UPLOAD_FILE_LOCATION = "uploads/users"
     TEMP_DIR = "temp"
+    IMAGE_STORE_DIR = os.getenv("IMAGE_STORE_DIR", "image_store") # Chat images by content hash, with their cached captions
+    PARTITION_CACHE_ENABLED = os.getenv("PARTITION_CACHE_ENABLED", "true").lower() == "true" # Reuse partitioned PDFs across runs
+    PARTITION_CACHE_DIR = os.getenv("PARTITION_CACHE_DIR", "cache/partitions")
+    PARTITION_CACHE_MAX_BYTES = int(os.getenv("PARTITION_CACHE_MAX_BYTES", 2 * 1024 ** 3)) # Least recently used entries removed beyond this
+    PDF_PARALLEL_ENABLED = os.getenv("PDF_PARALLEL_ENABLED", "true").lower() == "true" # Partition large PDFs across processes
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 40)) # Smaller PDFs are partitioned in-process
+    PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 16)) # Pages partitioned by a worker at a time
+    PDF_PARTITION_WORKERS = int(os.getenv("PDF_PARTITION_WORKERS", os.cpu_count() or 1))
+    PDF_ADAPTIVE_STRATEGY = os.getenv("PDF_ADAPTIVE_STRATEGY", "true").lower() == "true" # Use hi_res only on pages that need it
+    PDF_MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", 100)) # Pages with less text are treated as scans
+    PDF_MIN_IMAGE_PIXELS = int(os.getenv("PDF_MIN_IMAGE_PIXELS", 128 * 128)) # Smaller images (logos, icons) are ignored
+    PDF_TABLE_NUMERIC_LINES = int(os.getenv("PDF_TABLE_NUMERIC_LINES", 4)) # Mostly numeric lines suggesting a table
+    EMBED_MAX_TOKENS = int(os.getenv("EMBED_MAX_TOKENS", 448)) # Chunk size in tokens, leaves room for the query in the reranker's 512 tokens
+    EMBED_CHUNK_OVERLAP = int(os.getenv("EMBED_CHUNK_OVERLAP", 64)) # Tokens shared by consecutive chunks
+    EMBED_TOKEN_RESERVE = int(os.getenv("EMBED_TOKEN_RESERVE", 16)) # Tokens kept for special tokens and the document prefix
+    VISION_PREPROCESS = os.getenv("VISION_PREPROCESS", "true").lower() == "true" # Downscale and re-encode images before vision-model calls
+    VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", 1120)) # llama3.2-vision reads up to 2x2 tiles of 560px
+    VISION_MIN_SIDE = int(os.getenv("VISION_MIN_SIDE", 32)) # Thinner extracted images (rules, borders) are skipped, like those under PDF_MIN_IMAGE_PIXELS
+    VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", 85))
+    IMAGE_INGEST_MODE = os.getenv("IMAGE_INGEST_MODE", "caption") # "caption" (summarize figures at ingest) or "embed" (embed them with IMAGE_EMBED_MODEL)
+    IMAGE_EMBED_MODEL = os.getenv("IMAGE_EMBED_MODEL", "openai/clip-vit-base-patch32") # CLIP-style encoder of figures and queries
+    IMAGE_EMBED_BATCH_SIZE = int(os.getenv("IMAGE_EMBED_BATCH_SIZE", 16)) # Figures embedded at a time
+    IMAGE_SEARCH_TOP_K = int(os.getenv("IMAGE_SEARCH_TOP_K", 3)) # Figures retrieved per query, captioned on first retrieval
+    IMAGE_SEARCH_MIN_SCORE = float(os.getenv("IMAGE_SEARCH_MIN_SCORE", 0.2)) # Minimum text/image cosine similarity of a retrieved figure
+    SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", 2)) # Concurrent image/table summaries while ingesting a file
+    FILE_SNIFF_BYTES = int(os.getenv("FILE_SNIFF_BYTES", 8192)) # Header bytes read to detect a file type
+    MAGIC_POOL_SIZE = int(os.getenv("MAGIC_POOL_SIZE", 4)) # Idle libmagic handles kept for reuse
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory") # "memory" (per worker) or "redis" (shared by workers)
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", 10000)) # Maximum cached user documents per worker
+    USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", 300))
+    AUTH_CACHE_MAXSIZE = int(os.getenv("AUTH_CACHE_MAXSIZE", 10000)) # Maximum cached tokens / users per worker
+    AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 300)) # Upper bound, tokens are never cached past expiry
+    AUTH_USER_LOCAL_TTL_SECONDS = int(os.getenv("AUTH_USER_LOCAL_TTL_SECONDS", 10)) # Users cached per worker, a deletion on another worker is seen after this
+    HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", 10)) # Most recent user turns sent to the LLM
+    HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 6000)) # Estimated prompt tokens sent to the LLM
+    HISTORY_SUMMARIZE = os.getenv("HISTORY_SUMMARIZE", "false").lower() == "true" # Summarize turns leaving the window
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true" # Per-stage spans, X-Request-ID and Server-Timing headers
+    TRACE_EXPORTERS = os.getenv("TRACE_EXPORTERS", "") # Comma separated: "file", "otlp"
+    TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(LOG_DIR, "traces.jsonl")) # JSON lines written by the file exporter
+    TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", 1000)) # Traces waiting for the file exporter, more are dropped
+    OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "paperlens-backend")
+    VECTOR_STORE = os.getenv("VECTOR_STORE", "qdrant") # "qdrant" (server), "qdrant_local" (embedded) or "numpy" (exact search)
+    USER_VECTOR_STORE = os.getenv("USER_VECTOR_STORE", VECTOR_STORE) # Backend of the per-user collections
+    QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+    QDRANT_LOCAL_PATH = os.getenv("QDRANT_LOCAL_PATH", "vector_store/qdrant") # ":memory:" keeps the embedded collections in memory
+    NUMPY_STORE_DIR = os.getenv("NUMPY_STORE_DIR", "vector_store/numpy") # One directory of memory-mapped vectors per collection
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true" # Preload and warm the models at startup
+    WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", 30)) # Delay before retrying a model that failed to warm up
+    OLLAMA_MODELS = os.getenv("OLLAMA_MODELS", "llama3.2-vision,llama3.2:1b") # Ollama models warmed up at startup
+    OLLAMA_KEEP_ALIVE = parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "-1")) # How long Ollama keeps a model loaded, -1 pins it
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true" # Per-route request metrics and the /metrics endpoint
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json") # "json" (one object per line) or "text"
+    LOG_MODULE_LEVELS = os.getenv("LOG_MODULE_LEVELS", "") # Per-module levels, e.g. "mongo_db=WARNING,rag=DEBUG"
+    LOG_SAMPLING = os.getenv("LOG_SAMPLING", "") # Fraction of the INFO/DEBUG records kept per module or module.function, e.g. "chat_service=0.1"
+    LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", 2000)) # Longer messages are truncated
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000)) # Records waiting for the logging thread, more are dropped
+    LOG_TO_FILE = os.getenv("LOG_TO_FILE", "true").lower() == "true" # Also write a log file per process in LOG_DIR
     
     @staticmethod
     def ensure_directories():
@@ -53,6 +122,3 @@ class Config:
                 logger.info(f"Ensured directory exists: {directory}")
             except Exception as e:
                 logger.error(f"Error creating directory {directory}: {e}")
-
-# Ensure necessary directories exist during initialization
-Config.ensure_directories()
\ No newline at end of file
@@ -0,0 +1,140 @@
+from dataclasses import dataclass
+from queue import Queue, Empty
+from config import Config
+import os, magic
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+@dataclass(frozen=True)
+class FileType:
+    """
+    Result of sniffing a file.
+
+    Attributes:
+        kind (str): Extractor family of the file ('pdf', 'text', 'image', 'docx', 'html', 'markdown').
+        mime (str): MIME type reported by libmagic.
+        extension (str): Lower-cased extension of the file name (may be empty).
+    """
+    kind: str
+    mime: str
+    extension: str = ""
+
+@dataclass(frozen=True)
+class FileTypeSpec:
+    """
+    How a kind of file is recognized.
+
+    Attributes:
+        kind (str): Extractor family of the file.
+        mimes (tuple): Exact MIME types of the kind.
+        mime_prefixes (tuple): MIME type prefixes of the kind (e.g. 'image/').
+        extensions (tuple): Extensions of the kind.
+        generic_mimes (tuple): Generic MIME types an extension of the kind refines (e.g. 'text/plain' for '.md').
+    """
+    kind: str
+    mimes: tuple = ()
+    mime_prefixes: tuple = ()
+    extensions: tuple = ()
+    generic_mimes: tuple = ()
+
+    def matches(self, mime: str, extension: str) -> bool:
+        """
+        Checks whether a sniffed MIME type and extension belong to this kind.
+        """
+        if mime in self.generic_mimes and extension in self.extensions:
+            return True
+        return mime in self.mimes or any(mime.startswith(prefix) for prefix in self.mime_prefixes)
+
+# Registered file kinds, first match wins (refinements of 'text/plain' come before plain text)
+FILE_TYPES = [
+    FileTypeSpec("pdf", mimes=("application/pdf",), extensions=(".pdf",)),
+    FileTypeSpec("docx", mimes=("application/vnd.openxmlformats-officedocument.wordprocessingml.document",), extensions=(".docx",),
+                 generic_mimes=("application/zip", "application/octet-stream")),
+    FileTypeSpec("html", mimes=("text/html", "application/xhtml+xml"), extensions=(".html", ".htm"), generic_mimes=("text/plain",)),
+    FileTypeSpec("markdown", mimes=("text/markdown", "text/x-markdown"), extensions=(".md", ".markdown"), generic_mimes=("text/plain",)),
+    FileTypeSpec("image", mime_prefixes=("image/",), extensions=(".png", ".jpg", ".jpeg", ".gif", ".webp")),
+    FileTypeSpec("text", mimes=("text/plain",), extensions=(".txt",)),
+]
+
+def register_file_type(spec: FileTypeSpec):
+    """
+    Registers a new kind of file, taking precedence over the built-in ones.
+
+    Args:
+        spec (FileTypeSpec): How the kind is recognized.
+    """
+    FILE_TYPES.insert(0, spec)
+    logger.info(f"Registered file type '{spec.kind}'")
+
+class MagicPool:
+    """
+    A pool of reusable libmagic handles. Loading the magic database is the expensive part of
+    sniffing and a handle must not be shared between threads, so handles are created on demand
+    and returned to the pool after each use.
+
+    Attributes:
+        size (int): Maximum number of idle handles kept.
+    """
+    def __init__(self, size: int = 4):
+        self.size = size
+        self._handles = Queue(maxsize=size)
+
+    def from_buffer(self, data: bytes) -> str:
+        """
+        Returns the MIME type of a buffer.
+
+        Args:
+            data (bytes): The bytes to sniff.
+
+        Returns:
+            str: The MIME type.
+        """
+        try:
+            handle = self._handles.get_nowait()
+        except Empty:
+            handle = magic.Magic(mime=True)
+        try:
+            return handle.from_buffer(data)
+        finally:
+            if not self._handles.full():
+                self._handles.put_nowait(handle)
+
+# Shared pool of libmagic handles
+magic_pool = MagicPool(size=Config.MAGIC_POOL_SIZE)
+
+def sniff_mime(file_bytes: bytes) -> str:
+    """
+    Returns the MIME type of a file from its first FILE_SNIFF_BYTES bytes.
+
+    Args:
+        file_bytes (bytes): The file content (only its header is read).
+
+    Returns:
+        str: The MIME type.
+    """
+    return magic_pool.from_buffer(file_bytes[:Config.FILE_SNIFF_BYTES])
+
+def detect_file_type(file_bytes: bytes, filename: str = "") -> FileType:
+    """
+    Detects the kind of a file with a single sniff of its header. A generic MIME type
+    (plain text, zip) is refined by the file extension, e.g. a '.md' text file is Markdown,
+    but an extension never overrides a specific MIME type.
+
+    Args:
+        file_bytes (bytes): The file content.
+        filename (str, optional): The original file name.
+
+    Returns:
+        FileType: The detected type, None if the kind is not supported.
+    """
+    mime = sniff_mime(file_bytes)
+    extension = os.path.splitext(filename or "")[1].lower()
+
+    for spec in FILE_TYPES:
+        if spec.matches(mime, extension):
+            return FileType(spec.kind, mime, extension)
+
+    logger.warning(f"Unsupported file type '{mime}' for file: {filename}")
+    return None
@@ -1,20 +1,61 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from models.sql_db import Base, engine
-from routes import auth, chat, admin, user
+from models.mongo_db import connect_mongo, close_mongo, get_files_collection
+from models.mongo_indexes import ensure_indexes
+from models.files import backfill_tag_lists
+from routes import auth, chat, admin, user, health
+from services.warmup import readiness, warm_up
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict
+from tracing import TracingMiddleware
+from metrics import MetricsMiddleware, render_prometheus
+from rag_modules.pdf_parallel import reset_executor
+from structured_logging import setup_logging, shutdown_logging
+from config import Config
+import asyncio
 import logging
 
 # Configure logger for the FastAPI application
 logger = logging.getLogger("Multimodal_rag_bot")
 
-# Initialize FastAPI app
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts and stops the application. Logging, directories, database tables, the MongoDB
+    client and indexes and the model warm-up are set up here rather than on import, so
+    importing the modules (tests, scripts, workers) has no side effects.
+    """
+    setup_logging()
+    Config.ensure_directories()
+
+    # Create database tables if they don't exist
+    Base.metadata.create_all(bind=engine)
+    logger.info("Database tables created (if not already present).")
+
+    # Create and verify the MongoDB indexes, then backfill the normalized file tags
+    await ensure_indexes(connect_mongo())
+    await backfill_tag_lists(get_files_collection())
+
+    # Preload and warm the models in the background, /ready reports when they are warm
+    warm_up_task = None
+    if Config.WARMUP_ENABLED:
+        warm_up_task = asyncio.create_task(warm_up())
+    else:
+        readiness.start()
+
+    yield
 
-# Create database tables if they don't exist
-Base.metadata.create_all(bind=engine)
-logger.info("Database tables created (if not already present).")
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    reset_executor()
+    close_mongo()
+    logger.info("Application shut down.")
+    shutdown_logging()
+
+# Initialize FastAPI app
+app = FastAPI(lifespan=lifespan)
 
 # Allowed origins for CORS (Cross-Origin Resource Sharing)
 origins = [
@@ -28,16 +69,37 @@ app.add_middleware(
     allow_credentials=True, # Allow credentials (cookies, headers)
     allow_methods=["*"], # Allow all HTTP methods (GET, POST, etc.)
     allow_headers=["*"], # Allow all headers
+    expose_headers=["X-Request-ID", "Server-Timing"], # Let the frontend read the request ID and stage timings
 )
 
+# Count and time every request per route
+if Config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Trace the stages of every request (added last, so it wraps CORS and sees the whole request)
+if Config.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
 # Include route modules with respective prefixes and tags
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
 app.include_router(user.router, prefix="/user", tags=["user"])
+app.include_router(health.router, tags=["health"])
 
 # Log the successful inclusion of routers
-logger.info("Routers for auth, chat, admin, and user have been registered.")
+logger.info("Routers for auth, chat, admin, user and health have been registered.")
+
+if Config.METRICS_ENABLED:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    def metrics():
+        """
+        Exposes the application metrics in the Prometheus text format.
+
+        Returns:
+            PlainTextResponse: The metrics.
+        """
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 class ChatRequest(BaseModel):
     """
@@ -54,10 +116,8 @@ class MongoUser(BaseModel):
 
     Attributes:
         username (str): The user's name.
-        chat_sessions (List[Dict]): List of chat session data.
     """
     username: str
-    chat_sessions: List[Dict] = []
 
 @app.get("/")
 def home():
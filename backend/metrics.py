@@ -0,0 +1,217 @@
+from threading import Lock
+import bisect, math, time
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Registry of all created metrics, in creation order
+REGISTRY = []
+
+class Counter:
+    """
+    A monotonically increasing counter, optionally split by label values.
+
+    Attributes:
+        name (str): Metric name.
+        description (str): Help text of the metric.
+        labels (tuple): Names of the labels.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.values = {} # label values -> count
+        self._lock = Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        """
+        Increments the counter for the given label values.
+        """
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def get(self, *label_values):
+        """
+        Returns the current value for the given label values.
+        """
+        return self.values.get(label_values, 0)
+
+class Gauge(Counter):
+    """
+    A value that can go up and down, optionally split by label values.
+    """
+    kind = "gauge"
+
+    def dec(self, *label_values, amount: float = 1):
+        """
+        Decrements the gauge for the given label values.
+        """
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value: float, *label_values):
+        """
+        Sets the gauge for the given label values.
+        """
+        with self._lock:
+            self.values[label_values] = value
+
+class Histogram:
+    """
+    Counts observations into buckets and tracks their sum, optionally split by label values.
+
+    Attributes:
+        name (str): Metric name.
+        description (str): Help text of the metric.
+        labels (tuple): Names of the labels.
+        buckets (tuple): Upper bounds of the buckets.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {} # label values -> {"buckets": [...], "sum": float, "count": int}
+        self._lock = Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *label_values):
+        """
+        Records an observation for the given label values.
+        """
+        with self._lock:
+            series = self.values.setdefault(label_values, {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def get(self, *label_values):
+        """
+        Returns the count and sum of the observations for the given label values.
+        """
+        series = self.values.get(label_values, {"sum": 0.0, "count": 0})
+        return {"count": series["count"], "sum": series["sum"]}
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_set(names: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _cache_metrics() -> list:
+    """
+    Reads the statistics of the registered caches (cache.caches) at scrape time.
+    """
+    from cache import caches # Imported here, so metrics stays importable without the application config
+    samples = {"hits": [], "misses": [], "evictions": [], "size": [], "hit_ratio": []}
+    for name, cache in list(caches.items()):
+        try:
+            stats = cache.get_stats()
+        except Exception as e:
+            logger.warning(f"Failed to read the statistics of cache {name}: {e}")
+            continue
+        for key in samples:
+            if key in stats: # The Redis caches do not report their size
+                samples[key].append((name, stats[key]))
+    lines = []
+    for key, kind, description in (
+        ("hits", "counter", "Cache lookups that found an entry"),
+        ("misses", "counter", "Cache lookups that found no entry"),
+        ("evictions", "counter", "Entries evicted from the cache"),
+        ("size", "gauge", "Entries in the cache"),
+        ("hit_ratio", "gauge", "Share of cache lookups that found an entry"),
+    ):
+        name = f"cache_{key}_total" if kind == "counter" else f"cache_{key}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for cache_name, value in samples[key]:
+            lines.append(f'{name}{_label_set(("cache",), (cache_name,))} {_format_value(value)}')
+    return lines
+
+def render_prometheus(registry: list = None, include_caches: bool = True) -> str:
+    """
+    Renders the metrics in the Prometheus text exposition format (version 0.0.4).
+
+    Args:
+        registry (list, optional): Metrics to render. Defaults to every created metric.
+        include_caches (bool): Also render the statistics of the registered caches.
+
+    Returns:
+        str: The exposition, one sample per line.
+    """
+    lines = []
+    for metric in REGISTRY if registry is None else registry:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        with metric._lock:
+            values = {labels: dict(value, buckets=list(value["buckets"])) if metric.kind == "histogram" else value
+                      for labels, value in metric.values.items()}
+        for label_values, value in values.items():
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_label_set(metric.labels, label_values)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), value["buckets"] + [value["count"] - sum(value["buckets"])]):
+                cumulative += count
+                lines.append(f"{metric.name}_bucket{_label_set(metric.labels, label_values, {'le': _format_value(float(bound))})} {cumulative}")
+            lines.append(f"{metric.name}_sum{_label_set(metric.labels, label_values)} {_format_value(value['sum'])}")
+            lines.append(f"{metric.name}_count{_label_set(metric.labels, label_values)} {value['count']}")
+    if include_caches:
+        lines.extend(_cache_metrics())
+    return "\n".join(lines) + "\n"
+
+# Request rate and latency per route template, e.g. '/chat/sessions/{session_id}'
+http_requests = Counter("http_requests_total", "HTTP requests by route and status", labels=("method", "route", "status"))
+http_request_seconds = Histogram("http_request_duration_seconds", "Time taken to serve an HTTP request", labels=("method", "route"))
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting every HTTP request and timing it, labelled by the template of
+    the matched route rather than the raw path, so the number of series stays bounded.
+    Requests matching no route are labelled 'unmatched'.
+
+    Attributes:
+        exclude (tuple): Paths that are not recorded (the scrape endpoint itself).
+    """
+    def __init__(self, app, exclude: tuple = ("/metrics",)):
+        self.app = app
+        self.exclude = tuple(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "unmatched" # Set by the router once a route matches
+            http_requests.inc(scope["method"], route, str(status))
+            http_request_seconds.observe(time.perf_counter() - started, scope["method"], route)
@@ -0,0 +1,126 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import DESCENDING
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from utils import encode_cursor, decode_cursor
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Fields returned by the file listings, nothing else is read from MongoDB
+FILE_LISTING_PROJECTION = {"filename": 1, "uploader": 1, "uploader_role": 1, "upload_time": 1, "collection_name": 1, "tags": 1}
+
+# Sort order of the file listings, newest first (_id breaks ties between equal upload times)
+FILE_LISTING_SORT = [("upload_time", DESCENDING), ("_id", DESCENDING)]
+
+async def backfill_tag_lists(files_collection: AsyncIOMotorCollection):
+    """
+    Derives the normalized 'tag_list' of file metadata stored before tags were normalized.
+
+    Args:
+        files_collection (AsyncIOMotorCollection): MongoDB collection for file metadata.
+    """
+    result = await files_collection.update_many({"tag_list": {"$exists": False}}, [{"$set": {"tag_list": {"$filter": {
+        "input": {"$map": {"input": {"$split": [{"$toLower": {"$ifNull": ["$tags", ""]}}, ","]}, "as": "tag", "in": {"$trim": {"input": "$$tag"}}}},
+        "as": "tag",
+        "cond": {"$ne": ["$$tag", ""]}
+    }}}}])
+    if result.modified_count:
+        logger.info(f"Backfilled tag_list of {result.modified_count} files.")
+
+def parse_tags(tags: str) -> list:
+    """
+    Normalizes the comma separated tags of an upload for filtering.
+
+    Args:
+        tags (str): Tags as submitted with the upload.
+
+    Returns:
+        list: Lower-cased, stripped, non-empty tags.
+    """
+    return [tag.strip().lower() for tag in (tags or "").split(",") if tag.strip()]
+
+def build_file_query(uploader: str = None, tag: str = None, collection_name: str = None, uploaded_after: datetime = None, uploaded_before: datetime = None) -> dict:
+    """
+    Builds the MongoDB filter of a file listing.
+
+    Args:
+        uploader (str, optional): Only files uploaded by this user.
+        tag (str, optional): Only files carrying this tag.
+        collection_name (str, optional): Only files ingested into this vector collection.
+        uploaded_after (datetime, optional): Only files uploaded at or after this time.
+        uploaded_before (datetime, optional): Only files uploaded before this time.
+
+    Returns:
+        dict: The MongoDB filter.
+    """
+    query = {}
+    if uploader:
+        query["uploader"] = uploader
+    if tag:
+        query["tag_list"] = tag.strip().lower()
+    if collection_name:
+        query["collection_name"] = collection_name
+    if uploaded_after or uploaded_before:
+        query["upload_time"] = {}
+        if uploaded_after:
+            query["upload_time"]["$gte"] = uploaded_after
+        if uploaded_before:
+            query["upload_time"]["$lt"] = uploaded_before
+    return query
+
+def format_file(file: dict) -> dict:
+    """
+    Formats a file metadata document for the listings.
+
+    Args:
+        file (dict): File metadata projected with FILE_LISTING_PROJECTION.
+
+    Returns:
+        dict: The file as returned by the API.
+    """
+    return {"id": str(file['_id']),
+            "filename": file['filename'],
+            "uploader": file['uploader'],
+            "role": file['uploader_role'],
+            "upload_time": file['upload_time'].strftime("%Y-%m-%d %H:%M:%S"),
+            "collection_name": file['collection_name'],
+            "tags": file['tags']}
+
+async def list_files_page(files_collection: AsyncIOMotorCollection, query: dict, limit: int = 50, cursor: str = None):
+    """
+    Lists a page of file metadata matching a filter, newest first.
+
+    Args:
+        files_collection (AsyncIOMotorCollection): MongoDB collection for file metadata.
+        query (dict): Filter built by build_file_query.
+        limit (int, optional): Maximum number of files to return. Defaults to 50.
+        cursor (str, optional): Cursor returned by the previous page.
+
+    Returns:
+        dict: The files and the cursor of the next page (None on the last page).
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    query = dict(query)
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+            upload_time, file_id = datetime.fromisoformat(position["upload_time"]), ObjectId(position["id"])
+        except (KeyError, TypeError, InvalidId) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+        query["$or"] = [
+            {"upload_time": {"$lt": upload_time}},
+            {"upload_time": upload_time, "_id": {"$lt": file_id}}
+        ]
+
+    files = await files_collection.find(query, FILE_LISTING_PROJECTION).sort(FILE_LISTING_SORT).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(files) > limit:
+        files = files[:limit]
+        next_cursor = encode_cursor({"upload_time": files[-1]["upload_time"].isoformat(), "id": str(files[-1]["_id"])})
+    return {"files": [format_file(file) for file in files], "next_cursor": next_cursor}
@@ -0,0 +1,35 @@
+import sys, os, asyncio
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config import logger
+from structured_logging import setup_logging, shutdown_logging
+from motor.motor_asyncio import AsyncIOMotorCollection
+from models.mongo_db import get_users_collection, get_sessions_collection, get_messages_collection
+from models.session import ensure_session_indexes, migrate_legacy_sessions
+
+async def migrate_all_users(users_collection: AsyncIOMotorCollection, sessions_collection: AsyncIOMotorCollection, messages_collection: AsyncIOMotorCollection):
+    """
+    Migrates the chat sessions embedded in every user document into the sessions and messages collections.
+
+    Args:
+        users_collection (AsyncIOMotorCollection): MongoDB collection for user data.
+        sessions_collection (AsyncIOMotorCollection): MongoDB collection for chat session headers.
+        messages_collection (AsyncIOMotorCollection): MongoDB collection for chat messages.
+
+    Returns:
+        int: Total number of sessions migrated.
+    """
+    await ensure_session_indexes(sessions_collection, messages_collection)
+
+    total = 0
+    async for user in users_collection.find({"chat_sessions": {"$exists": True}}):
+        try:
+            total += await migrate_legacy_sessions(user, users_collection, sessions_collection, messages_collection)
+        except Exception as e:
+            logger.error(f"Error migrating sessions for user {user.get('username', 'Unknown')}: {e}")
+    logger.info(f"Chat session migration finished, {total} sessions migrated")
+    return total
+
+if __name__ == '__main__':
+    setup_logging()
+    asyncio.run(migrate_all_users(get_users_collection(), get_sessions_collection(), get_messages_collection()))
+    shutdown_logging()
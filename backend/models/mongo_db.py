@@ -8,11 +8,34 @@ logger = logging.getLogger("Multimodal_rag_bot")
 # MongoDB connection URI from the configuration
 MONGO_URI = Config.MONGO_URI
 
-# Initialize an asynchronous MongoDB client
-client = AsyncIOMotorClient(MONGO_URI)
-mongo_db_client = client["chat_app"]
+# Asynchronous MongoDB client and database, opened by connect_mongo (app lifespan or first use)
+client = None
+mongo_db_client = None
 
-logger.info("Connected to MongoDB database: chat_app")
+def connect_mongo():
+    """
+    Opens the MongoDB client if needed and returns the 'chat_app' database.
+
+    Returns:
+        motor.motor_asyncio.AsyncIOMotorDatabase: The database.
+    """
+    global client, mongo_db_client
+    if mongo_db_client is None:
+        client = AsyncIOMotorClient(MONGO_URI)
+        mongo_db_client = client["chat_app"]
+        logger.info("Connected to MongoDB database: chat_app")
+    return mongo_db_client
+
+def close_mongo():
+    """
+    Closes the MongoDB client, the next connect_mongo opens a new one.
+    """
+    global client, mongo_db_client
+    if client is not None:
+        client.close()
+        logger.info("Closed the MongoDB client.")
+    client = None
+    mongo_db_client = None
 
 def get_users_collection():
     """
@@ -21,8 +44,8 @@ def get_users_collection():
     Returns:
         motor.motor_asyncio.AsyncIOMotorCollection: The users collection.
     """
-    logger.info("Fetching 'users' collection from MongoDB.")
-    return mongo_db_client["users"]
+    logger.debug("Fetching 'users' collection from MongoDB.")
+    return connect_mongo()["users"]
 
 def get_files_collection():
     """
@@ -31,5 +54,25 @@ def get_files_collection():
     Returns:
         motor.motor_asyncio.AsyncIOMotorCollection: The files collection.
     """
-    logger.info("Fetching 'files' collection from MongoDB.")
-    return mongo_db_client["files"]
+    logger.debug("Fetching 'files' collection from MongoDB.")
+    return connect_mongo()["files"]
+
+def get_sessions_collection():
+    """
+    Retrieves the 'chat_sessions' collection from the MongoDB database.
+
+    Returns:
+        motor.motor_asyncio.AsyncIOMotorCollection: The chat sessions collection.
+    """
+    logger.debug("Fetching 'chat_sessions' collection from MongoDB.")
+    return connect_mongo()["chat_sessions"]
+
+def get_messages_collection():
+    """
+    Retrieves the 'chat_messages' collection from the MongoDB database.
+
+    Returns:
+        motor.motor_asyncio.AsyncIOMotorCollection: The chat messages collection.
+    """
+    logger.debug("Fetching 'chat_messages' collection from MongoDB.")
+    return connect_mongo()["chat_messages"]
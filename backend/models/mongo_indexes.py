@@ -0,0 +1,129 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from models.files import FILE_LISTING_SORT
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Indexes every collection must have, by collection name: (keys, options).
+# Names are left to MongoDB's default ('field_direction_...') so existing indexes are recognized.
+INDEXES = {
+    "users": [
+        ([("username", ASCENDING)], {"unique": True}), # get_user_sessions lookups
+    ],
+    "files": [
+        ([("collection_name", ASCENDING), ("file_hash", ASCENDING)], {"unique": True}), # Duplicate upload check, scoped per collection
+        (FILE_LISTING_SORT, {}), # Unfiltered file listing
+        ([("uploader", ASCENDING)] + FILE_LISTING_SORT, {}), # Per-uploader listing, also serves plain uploader lookups
+        ([("tag_list", ASCENDING)] + FILE_LISTING_SORT, {}),
+        ([("collection_name", ASCENDING)] + FILE_LISTING_SORT, {}),
+    ],
+    "chat_sessions": [
+        ([("username", ASCENDING), ("session_id", ASCENDING)], {"unique": True}),
+        ([("username", ASCENDING), ("created_at", DESCENDING), ("session_id", DESCENDING)], {}),
+    ],
+    "chat_messages": [
+        ([("username", ASCENDING), ("session_id", ASCENDING), ("seq", ASCENDING)], {"unique": True}),
+    ],
+}
+
+def index_name(keys) -> str:
+    """
+    Returns the default MongoDB name of an index.
+
+    Args:
+        keys (list): (field, direction) pairs of the index.
+
+    Returns:
+        str: The index name, e.g. 'uploader_1_upload_time_-1'.
+    """
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+async def ensure_collection_indexes(collection: AsyncIOMotorCollection, specs) -> list:
+    """
+    Creates the given indexes on a collection (no-op for those that already exist).
+    An index that cannot be built, e.g. a unique index over duplicated data, is logged and skipped.
+
+    Args:
+        collection (AsyncIOMotorCollection): The MongoDB collection.
+        specs (list): (keys, options) of the indexes.
+
+    Returns:
+        list: Names of the indexes that could not be created.
+    """
+    failed = []
+    for keys, options in specs:
+        try:
+            await collection.create_index(keys, **options)
+        except OperationFailure as e:
+            logger.error(f"Could not create index {index_name(keys)} on '{collection.name}': {e}")
+            failed.append(index_name(keys))
+    return failed
+
+async def collection_index_report(collection: AsyncIOMotorCollection, specs) -> dict:
+    """
+    Compares the indexes of a collection with the required ones.
+
+    Args:
+        collection (AsyncIOMotorCollection): The MongoDB collection.
+        specs (list): (keys, options) of the required indexes.
+
+    Returns:
+        dict: 'missing' required indexes, 'unused' indexes never used since the server started
+        and 'unmanaged' indexes that are not required (candidates for removal).
+    """
+    required = {index_name(keys) for keys, _ in specs}
+    existing = set(await collection.index_information())
+
+    unused = []
+    try:
+        async for stats in collection.aggregate([{"$indexStats": {}}]):
+            if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                unused.append(stats["name"])
+    except OperationFailure as e:
+        logger.warning(f"Index usage statistics unavailable for '{collection.name}': {e}")
+
+    return {
+        "missing": sorted(required - existing),
+        "unused": sorted(unused),
+        "unmanaged": sorted(existing - required - {"_id_"})
+    }
+
+async def ensure_indexes(database) -> dict:
+    """
+    Creates the required indexes of every collection, then verifies them and logs any missing,
+    unused or unmanaged index.
+
+    Args:
+        database: The MongoDB database.
+
+    Returns:
+        dict: The index report of every collection, by collection name.
+    """
+    for collection_name, specs in INDEXES.items():
+        await ensure_collection_indexes(database[collection_name], specs)
+    report = await index_report(database)
+    for collection_name, collection_report in report.items():
+        if collection_report["missing"]:
+            logger.warning(f"Missing indexes on '{collection_name}': {', '.join(collection_report['missing'])}")
+        if collection_report["unmanaged"]:
+            logger.warning(f"Unmanaged indexes on '{collection_name}': {', '.join(collection_report['unmanaged'])}")
+        if collection_report["unused"]:
+            # Usage counters restart with the server, so this is only meaningful on a long running one
+            logger.info(f"Unused indexes on '{collection_name}': {', '.join(collection_report['unused'])}")
+    logger.info("MongoDB indexes ensured.")
+    return report
+
+async def index_report(database) -> dict:
+    """
+    Reports the missing, unused and unmanaged indexes of every collection.
+
+    Args:
+        database: The MongoDB database.
+
+    Returns:
+        dict: The index report of every collection, by collection name.
+    """
+    return {collection_name: await collection_index_report(database[collection_name], specs) for collection_name, specs in INDEXES.items()}
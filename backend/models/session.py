@@ -1,62 +1,275 @@
 from fastapi import HTTPException
+from pymongo import ASCENDING, ReturnDocument
+from motor.motor_asyncio import AsyncIOMotorCollection
+from datetime import datetime, timedelta
 from uuid import uuid4
 from services.rag_service import bot
+from rag_modules.image_store import image_store
+from models.mongo_indexes import INDEXES, ensure_collection_indexes
+from typing import List
 import logging
 
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
 
-def find_session(user, session_id, set_history=True):
+# System instruction every new chat session starts with
+SYSTEM_INSTRUCTION = "You are an expert in the field of AI Research and current AI Trends."
+
+# Maximum length of a session title derived from its first message
+SESSION_TITLE_LENGTH = 60
+
+async def ensure_session_indexes(sessions_collection: AsyncIOMotorCollection, messages_collection: AsyncIOMotorCollection):
+    """
+    Creates the indexes used by the session and message lookups (no-op if they already exist).
+
+    Args:
+        sessions_collection (AsyncIOMotorCollection): MongoDB collection for chat session headers.
+        messages_collection (AsyncIOMotorCollection): MongoDB collection for chat messages.
+    """
+    await ensure_collection_indexes(sessions_collection, INDEXES["chat_sessions"])
+    await ensure_collection_indexes(messages_collection, INDEXES["chat_messages"])
+    logger.info("Chat session and message indexes ensured.")
+
+def make_session_title(text: str) -> str:
+    """
+    Derives a session title from the first user message.
+
+    Args:
+        text (str): The first user message of the session.
+
+    Returns:
+        str: The message collapsed to a single line and truncated to SESSION_TITLE_LENGTH characters.
+    """
+    title = " ".join(text.split())
+    return title if len(title) <= SESSION_TITLE_LENGTH else title[:SESSION_TITLE_LENGTH - 3].rstrip() + "..."
+
+def build_bot_history(session, messages):
+    """
+    Rebuilds the conversational bot history from a session header and its stored messages.
+    Images are referenced by their image store hash; raw images stored by earlier versions
+    are moved to the image store on the way.
+
+    Args:
+        session (dict): The session header containing the system instruction.
+        messages (list): The session messages ordered by sequence number.
+
+    Returns:
+        list: Chat history in the format expected by the conversational bot.
+    """
+    history = [{"role": "system", "content": session.get("system", SYSTEM_INSTRUCTION)}]
+    for msg in messages:
+        # The displayed text leaves out the retrieved context a RAG turn was prompted with
+        entry = {"role": "user" if msg["role"] == "user" else "assistant", "content": msg["text"]}
+        refs = list(msg.get("image_refs", [])) + [image_store.put(image) for image in msg.get("images", [])]
+        if refs:
+            entry["image_refs"] = refs
+        history.append(entry)
+    return history
+
+async def get_session_messages(messages_collection: AsyncIOMotorCollection, username: str, session_id: str, from_seq: int = 0) -> List[dict]:
+    """
+    Loads the messages of a chat session ordered by sequence number.
+
+    Args:
+        messages_collection (AsyncIOMotorCollection): MongoDB collection for chat messages.
+        username (str): The owner of the session.
+        session_id (str): The ID of the chat session.
+        from_seq (int, optional): Sequence number of the first message to load. Defaults to 0.
+
+    Returns:
+        list: The session messages.
+    """
+    query = {"username": username, "session_id": session_id}
+    if from_seq:
+        query["seq"] = {"$gte": from_seq}
+    cursor = messages_collection.find(query, {"_id": 0}).sort("seq", ASCENDING)
+    return await cursor.to_list(length=None)
+
+async def find_session(sessions_collection: AsyncIOMotorCollection, messages_collection: AsyncIOMotorCollection, username: str, session_id: str, set_history=True):
     """
     Finds an existing chat session for a user.
 
     Args:
-        user (dict): The user data containing chat sessions.
+        sessions_collection (AsyncIOMotorCollection): MongoDB collection for chat session headers.
+        messages_collection (AsyncIOMotorCollection): MongoDB collection for chat messages.
+        username (str): The owner of the session.
         session_id (str): The ID of the chat session to find.
         set_history (bool, optional): Whether to set the bot's history to the session's chat history. Defaults to True.
 
     Returns:
-        dict: The found chat session.
+        dict: The found chat session with its messages. With set_history, only the messages the bot's
+        context window can still use are loaded (after the summarized ones, or the last max_turns turns).
 
     Raises:
         HTTPException: If the session ID is invalid.
     """
-    logger.info(f"Searching for session {session_id} for user {user.get('username', 'Unknown')}")
-    
-    session = next((s for s in user["chat_sessions"] if s["session_id"] == session_id), None)
+    logger.info(f"Searching for session {session_id} for user {username}")
+
+    session = await sessions_collection.find_one({"username": username, "session_id": session_id}, {"_id": 0})
     if not session:
-        logger.error(f"Session ID {session_id} not found for user {user.get('username', 'Unknown')}")
+        logger.error(f"Session ID {session_id} not found for user {username}")
         raise HTTPException(status_code=404, detail="Invalid session ID")
-    if set_history: 
-        logger.info(f"Setting bot history for session {session_id}")
-        bot.set_history(session['bot_chat_history'].copy())
-    
+    summary_count = session.get("summary_count", 0)
+    from_seq = bot.context_manager.history_start(session.get("message_count", 0), summary_count) if set_history else 0
+    session["messages"] = await get_session_messages(messages_collection, username, session_id, from_seq)
+    if set_history:
+        logger.info(f"Setting bot history for session {session_id} from message {from_seq}")
+        bot.set_history(build_bot_history(session, session["messages"]))
+        bot.set_summary(session.get("summary", ""), summary_count, from_seq)
+
     logger.info(f"Session {session_id} retrieved successfully")
     return session
 
-def create_new_session(user):
+async def create_new_session(sessions_collection: AsyncIOMotorCollection, username: str, set_history=True):
     """
     Creates a new chat session for a user.
 
     Args:
-        user (dict): The user data to append the new session to.
+        sessions_collection (AsyncIOMotorCollection): MongoDB collection for chat session headers.
+        username (str): The owner of the new session.
+        set_history (bool, optional): Whether to reset the bot's history for the new session. Defaults to True.
 
     Returns:
         dict: The newly created chat session.
     """
-    logger.info(f"Creating a new chat session for user {user.get('username', 'Unknown')}")
+    logger.info(f"Creating a new chat session for user {username}")
 
-    sys_inst = {
-        "role": "system", 
-        "content": "You are an expert in the field of AI Research and current AI Trends."
-        }
+    now = datetime.now()
     session = {
         "session_id": str(uuid4()), # Generate a unique session ID
-        "messages": [], # Initialize an empty message list
-        "bot_chat_history": [sys_inst] # Store system instructions as the first message
+        "username": username,
+        "system": SYSTEM_INSTRUCTION, # Store system instructions once per session
+        "title": None, # Set from the first user message
+        "message_count": 0,
+        "created_at": now,
+        "updated_at": now
         }
-    user["chat_sessions"].append(session) # Append the new session to the user's chat history
-    bot.set_history([]) # Reset bot history for the new session
-    
-    logger.info(f"New session created with ID {session['session_id']} for user {user.get('username', 'Unknown')}")
-    return session
\ No newline at end of file
+    await sessions_collection.insert_one(session)
+    session.pop("_id", None)
+    session["messages"] = [] # Initialize an empty message list
+    if set_history:
+        bot.set_history(build_bot_history(session, [])) # Reset bot history for the new session
+        bot.set_summary()
+
+    logger.info(f"New session created with ID {session['session_id']} for user {username}")
+    return session
+
+async def append_messages(sessions_collection: AsyncIOMotorCollection, messages_collection: AsyncIOMotorCollection, username: str, session_id: str, messages: List[dict], session_updates: dict = None) -> List[dict]:
+    """
+    Appends messages to a chat session without rewriting the existing ones.
+
+    Sequence numbers are reserved atomically on the session header, then the messages
+    are inserted as individual documents.
+
+    Args:
+        sessions_collection (AsyncIOMotorCollection): MongoDB collection for chat session headers.
+        messages_collection (AsyncIOMotorCollection): MongoDB collection for chat messages.
+        username (str): The owner of the session.
+        session_id (str): The ID of the chat session.
+        messages (list): Messages to append, each with at least 'role' and 'text'.
+        session_updates (dict, optional): Extra fields to set on the session header.
+
+    Returns:
+        list: The stored message documents.
+    """
+    now = datetime.now()
+    session = await sessions_collection.find_one_and_update(
+        {"username": username, "session_id": session_id},
+        {"$inc": {"message_count": len(messages)}, "$set": {**(session_updates or {}), "updated_at": now}},
+        projection={"message_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not session:
+        logger.error(f"Session ID {session_id} not found for user {username}")
+        raise HTTPException(status_code=404, detail="Invalid session ID")
+
+    first_seq = session["message_count"] - len(messages)
+    docs = [{**msg, "username": username, "session_id": session_id, "seq": first_seq + i, "created_at": now} for i, msg in enumerate(messages)]
+    await messages_collection.insert_many(docs)
+    for doc in docs:
+        doc.pop("_id", None)
+
+    # The first user message names the session
+    first_user_msg = next((doc for doc in docs if doc["role"] == "user"), None)
+    if first_seq == 0 and first_user_msg:
+        await sessions_collection.update_one(
+            {"username": username, "session_id": session_id},
+            {"$set": {"title": make_session_title(first_user_msg["text"])}}
+        )
+
+    logger.info(f"Appended {len(docs)} messages to session {session_id}")
+    return docs
+
+async def delete_session(sessions_collection: AsyncIOMotorCollection, messages_collection: AsyncIOMotorCollection, username: str, session_id: str):
+    """
+    Deletes a chat session and all of its messages.
+
+    Args:
+        sessions_collection (AsyncIOMotorCollection): MongoDB collection for chat session headers.
+        messages_collection (AsyncIOMotorCollection): MongoDB collection for chat messages.
+        username (str): The owner of the session.
+        session_id (str): The ID of the chat session.
+    """
+    await sessions_collection.delete_one({"username": username, "session_id": session_id})
+    await messages_collection.delete_many({"username": username, "session_id": session_id})
+    logger.info(f"Session {session_id} and its messages deleted for user {username}")
+
+async def migrate_legacy_sessions(user: dict, users_collection: AsyncIOMotorCollection, sessions_collection: AsyncIOMotorCollection, messages_collection: AsyncIOMotorCollection) -> int:
+    """
+    Moves the sessions embedded in a legacy user document ('chat_sessions') into the
+    sessions and messages collections, then removes them from the user document.
+
+    Sessions that were already migrated are skipped, so the migration can be safely re-run.
+
+    Args:
+        user (dict): The user document, possibly containing legacy 'chat_sessions'.
+        users_collection (AsyncIOMotorCollection): MongoDB collection for user data.
+        sessions_collection (AsyncIOMotorCollection): MongoDB collection for chat session headers.
+        messages_collection (AsyncIOMotorCollection): MongoDB collection for chat messages.
+
+    Returns:
+        int: Number of sessions migrated.
+    """
+    username = user["username"]
+    migrated = 0
+    legacy_sessions = user.get("chat_sessions", [])
+    now = datetime.now()
+    for index, legacy in enumerate(legacy_sessions):
+        if await sessions_collection.find_one({"username": username, "session_id": legacy["session_id"]}, {"_id": 1}):
+            continue
+
+        # Bot history holds the system instruction followed by one entry per message
+        history = legacy.get("bot_chat_history", [])
+        system = history[0]["content"] if history and isinstance(history[0], dict) and history[0].get("role") == "system" else SYSTEM_INSTRUCTION
+        turns = history[1:] if history and isinstance(history[0], dict) and history[0].get("role") == "system" else history
+
+        # Sessions are listed by creation time: keep the order of the legacy array (oldest first), before the newer sessions
+        created_at = now - timedelta(microseconds=len(legacy_sessions) - index)
+        docs = []
+        for seq, msg in enumerate(legacy.get("messages", [])):
+            doc = {"username": username, "session_id": legacy["session_id"], "seq": seq, "role": msg["role"], "text": msg["text"], "created_at": now}
+            turn = turns[seq] if seq < len(turns) and isinstance(turns[seq], dict) else {}
+            if turn.get("images"):
+                doc["image_refs"] = [image_store.put(image) for image in turn["images"]]
+            docs.append(doc)
+
+        # Clear leftovers of an interrupted run before inserting
+        await messages_collection.delete_many({"username": username, "session_id": legacy["session_id"]})
+        if docs:
+            await messages_collection.insert_many(docs)
+        first_user_msg = next((doc for doc in docs if doc["role"] == "user"), None)
+        await sessions_collection.insert_one({
+            "session_id": legacy["session_id"],
+            "username": username,
+            "system": system,
+            "title": make_session_title(first_user_msg["text"]) if first_user_msg else None,
+            "message_count": len(docs),
+            "created_at": created_at,
+            "updated_at": now
+            })
+        migrated += 1
+
+    await users_collection.update_one({"_id": user["_id"]}, {"$unset": {"chat_sessions": ""}})
+    user.pop("chat_sessions", None)
+    logger.info(f"Migrated {migrated} legacy sessions for user {username}")
+    return migrated
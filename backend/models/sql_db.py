@@ -1,6 +1,14 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from metrics import Counter, Gauge, Histogram
 from config import Config
+import time
 import logging
 
 # Configure logger
@@ -9,16 +17,111 @@ logger = logging.getLogger("Multimodal_rag_bot")
 # SQL connection URI from the configuration
 SQL_URI = Config.DATABASE_URL
 
-# Create an SQLite database engine
-engine = create_engine(SQL_URI)
+# Async drivers used when deriving the async URI from the sync one
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+# Connection pool metrics
+pool_checkout_seconds = Histogram("sql_pool_checkout_wait_seconds", "Time spent waiting for a pooled SQL connection", labels=("engine",))
+pool_timeouts = Counter("sql_pool_timeouts_total", "SQL connection checkouts that timed out", labels=("engine",))
+pool_checked_out = Gauge("sql_pool_checked_out", "SQL connections currently checked out of the pool", labels=("engine",))
+
+class _TimedCheckout:
+    """
+    Pool mixin recording how long each checkout waited for a connection.
+    """
+    engine_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_timeouts.inc(self.engine_label)
+            logger.warning(f"Timed out waiting for a {self.engine_label} SQL connection.")
+            raise
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - started, self.engine_label)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    engine_label = "sync"
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+def get_async_uri(uri: str) -> str:
+    """
+    Returns the async driver URI: SQL_ASYNC_DATABASE_URL if set, otherwise the sync URI with its async driver.
+
+    Args:
+        uri (str): The sync database URI.
+
+    Returns:
+        str: The async database URI.
+    """
+    if Config.ASYNC_DATABASE_URL:
+        return Config.ASYNC_DATABASE_URL
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for '{backend}', set SQL_ASYNC_DATABASE_URL")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def pool_options(uri: str, poolclass) -> dict:
+    """
+    Builds the connection pool arguments of an engine from the configuration.
+
+    Args:
+        uri (str): The database URI.
+        poolclass: The pool class to use.
+
+    Returns:
+        dict: Keyword arguments for create_engine / create_async_engine.
+    """
+    options = {"pool_pre_ping": Config.SQL_POOL_PRE_PING}
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options # In-memory SQLite keeps a single connection, there is nothing to size
+    options.update(
+        poolclass=poolclass,
+        pool_size=Config.SQL_POOL_SIZE,
+        max_overflow=Config.SQL_MAX_OVERFLOW,
+        pool_timeout=Config.SQL_POOL_TIMEOUT,
+        pool_recycle=Config.SQL_POOL_RECYCLE
+    )
+    return options
+
+def track_checkouts(engine, label: str):
+    """
+    Keeps the checked out connections gauge of an engine up to date.
+
+    Args:
+        engine: The sync engine (or the sync_engine of an async engine).
+        label (str): Engine label used in metrics.
+    """
+    event.listen(engine, "checkout", lambda *args: pool_checked_out.inc(label))
+    event.listen(engine, "checkin", lambda *args: pool_checked_out.dec(label))
+
+# Create the database engine
+engine = create_engine(SQL_URI, **pool_options(SQL_URI, TimedQueuePool))
+track_checkouts(engine, "sync")
 
 # Create a session factory bound to the engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional async engine, so async routes query the database without a threadpool thread
+async_engine = None
+AsyncSessionLocal = None
+if Config.SQL_ASYNC:
+    ASYNC_SQL_URI = get_async_uri(SQL_URI)
+    async_engine = create_async_engine(ASYNC_SQL_URI, **pool_options(ASYNC_SQL_URI, TimedAsyncQueuePool))
+    track_checkouts(async_engine.sync_engine, "async")
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    logger.info(f"Async SQL engine enabled ({async_engine.url.drivername}).")
+
 # Define the base class for ORM models
 Base = declarative_base()
 
-def get_db():
+def get_sync_db():
     """
     Dependency function to get a database session.
 
@@ -29,10 +132,67 @@ def get_db():
     """
     db = SessionLocal()
     try:
-        logger.info("Database session created")
         yield db
-    except Exception as e:
+    except SQLAlchemyError as e:
         logger.error(f"Database session error: {e}")
+        db.rollback()
+        raise
     finally:
         db.close()
-        logger.info("Database session closed")
\ No newline at end of file
+
+async def get_async_db():
+    """
+    Dependency function to get an async database session.
+
+    Yields:
+        AsyncSession: A SQLAlchemy async database session.
+
+    Ensures that the session is properly closed after use.
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            logger.error(f"Database session error: {e}")
+            await db.rollback()
+            raise
+
+# Database dependency used by the routes, async when SQL_ASYNC is enabled
+get_db = get_async_db if Config.SQL_ASYNC else get_sync_db
+
+@asynccontextmanager
+async def open_db():
+    """
+    Opens a database session outside of the route dependencies, for code that only needs one
+    on some requests (e.g. on a cache miss).
+
+    Yields:
+        Session | AsyncSession: A database session, async when SQL_ASYNC is enabled.
+    """
+    if Config.SQL_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+async def run_db(db, func, *args):
+    """
+    Runs a function written against a sync Session from async code. On an AsyncSession the
+    function runs through run_sync on the event loop (the async driver does the I/O); on a
+    sync Session it runs on the threadpool so the event loop is not blocked.
+
+    Args:
+        db (Session | AsyncSession): The database session.
+        func (callable): Function taking the sync session as first argument.
+        *args: Further arguments of the function.
+
+    Returns:
+        The result of the function.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(func, *args)
+    return await run_in_threadpool(func, db, *args)
@@ -36,4 +36,82 @@ class User(Base):
             "is_admin": self.is_admin
         }
         logger.debug(f"Converting User object to dictionary: {user_dict}")
-        return user_dict
\ No newline at end of file
+        return user_dict
+
+def get_user_by_username(db, username: str):
+    """
+    Fetches a user by username.
+
+    Args:
+        db (Session): The database session.
+        username (str): The username to look up.
+
+    Returns:
+        User: The user, or None if not found.
+    """
+    return db.query(User).filter(User.username == username).first()
+
+def get_user_by_id(db, user_id: int):
+    """
+    Fetches a user by ID.
+
+    Args:
+        db (Session): The database session.
+        user_id (int): The ID to look up.
+
+    Returns:
+        User: The user, or None if not found.
+    """
+    return db.query(User).filter(User.id == user_id).first()
+
+def get_users_page(db, after_id: int = 0, limit: int = 50, is_admin: bool = None):
+    """
+    Fetches a page of users ordered by ID (served by the primary key index).
+
+    Args:
+        db (Session): The database session.
+        after_id (int, optional): Only users with an ID greater than this.
+        limit (int, optional): Maximum number of users to fetch.
+        is_admin (bool, optional): Only admins (True) or only regular users (False).
+
+    Returns:
+        list: The users of the page.
+    """
+    query = db.query(User).filter(User.id > after_id)
+    if is_admin is not None:
+        query = query.filter(User.is_admin == is_admin)
+    return query.order_by(User.id).limit(limit).all()
+
+def add_user(db, user: User):
+    """
+    Adds a user and commits the transaction.
+
+    Args:
+        db (Session): The database session.
+        user (User): The user to add.
+    """
+    db.add(user)
+    db.commit()
+
+def delete_user(db, user: User):
+    """
+    Deletes a user and commits the transaction.
+
+    Args:
+        db (Session): The database session.
+        user (User): The user to delete.
+    """
+    db.delete(user)
+    db.commit()
+
+def update_password_hash(db, user: User, hashed_password: str):
+    """
+    Stores a new password hash for a user and commits the transaction.
+
+    Args:
+        db (Session): The database session.
+        user (User): The user to update.
+        hashed_password (str): The new hashed password.
+    """
+    user.hashed_password = hashed_password
+    db.commit()
\ No newline at end of file
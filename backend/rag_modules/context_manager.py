@@ -0,0 +1,215 @@
+from config import Config
+import ollama
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Estimated tokens of an image caption, counted for the image references of a message while windowing
+IMAGE_CAPTION_TOKENS = 100
+
+class ContextManager:
+    """
+    Assembles the messages sent to the language model from the chat history: the system
+    prompt plus the most recent turns that fit within a token budget, optionally preceded
+    by a rolling summary of the turns that fell out of the window.
+
+    Attributes:
+        max_turns (int): Maximum number of user turns kept in the window.
+        token_budget (int): Maximum estimated prompt tokens.
+        summarize (bool): Whether turns leaving the window are summarized.
+        summary_model (str): Model used to write the rolling summary.
+        summary (str): Summary of the turns that left the window.
+        summarized_count (int): Number of history messages covered by the summary.
+        history_offset (int): Number of stored history messages before the loaded history.
+    """
+    def __init__(self, max_turns=10, token_budget=6000, summarize=False, summary_model='llama3.2:1b'):
+        """
+        Initializes the context manager.
+
+        Args:
+            max_turns (int): Maximum number of user turns kept in the window.
+            token_budget (int): Maximum estimated prompt tokens.
+            summarize (bool): Whether turns leaving the window are summarized.
+            summary_model (str): Model used to write the rolling summary.
+        """
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.summary_model = summary_model
+        self.summary = ""
+        self.summarized_count = 0
+        self.history_offset = 0
+
+    @staticmethod
+    def estimate_tokens(message):
+        """
+        Estimates the number of tokens of a chat message (about 4 characters per token). Image
+        references count as a caption of IMAGE_CAPTION_TOKENS, as their captions are not read yet.
+
+        Args:
+            message (dict): A chat message with 'content'.
+
+        Returns:
+            int: Estimated token count.
+        """
+        images = len(message.get("image_refs") or ()) * IMAGE_CAPTION_TOKENS
+        return len(message.get("content") or "") // 4 + 4 + images # Per-message formatting overhead
+
+    def set_summary(self, summary="", summarized_count=0, history_offset=0):
+        """
+        Restores the rolling summary of a session.
+
+        Args:
+            summary (str): Summary of the turns that left the window.
+            summarized_count (int): Number of history messages covered by the summary.
+            history_offset (int): Number of stored history messages before the loaded history (see history_start).
+        """
+        self.summary = summary or ""
+        self.summarized_count = summarized_count or 0
+        self.history_offset = history_offset or 0
+
+    def history_start(self, message_count, summarized_count=0):
+        """
+        Returns the index of the first stored history message a window can still need: the
+        earlier ones are already summarized, or more than max_turns turns old.
+
+        Args:
+            message_count (int): Number of stored history messages.
+            summarized_count (int): Number of history messages covered by the summary.
+
+        Returns:
+            int: Index of the first message to load.
+        """
+        if self.summarize:
+            return min(summarized_count or 0, message_count)
+        return max(0, message_count - 2 * self.max_turns) # A user message and its answer per turn
+
+    def _summary_message(self):
+        return {"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}
+
+    def _update_summary(self, dropped):
+        """
+        Folds the messages that left the window and are not yet summarized into the rolling summary.
+
+        Args:
+            dropped (list): History messages (system prompt excluded) outside the window.
+        """
+        new_messages = dropped[max(0, self.summarized_count - self.history_offset):]
+        if not new_messages:
+            return
+        logger.info(f"Summarizing {len(new_messages)} messages leaving the context window.")
+        transcript = "\n".join(f"{m['role']}: {m.get('content', '')}" for m in new_messages)
+        response = ollama.chat(
+        model=self.summary_model,
+        messages=[{
+            'role': 'user',
+            'content': f'Update this summary of a conversation with the new messages, keeping the facts needed to continue it.\n'
+                       f'Summary: {self.summary or "(empty)"}\nNew messages:\n{transcript}'
+            }],
+        keep_alive=Config.OLLAMA_KEEP_ALIVE
+        )
+        self.summary = response.message.content
+        self.summarized_count = self.history_offset + len(dropped)
+
+    def build(self, messages, last_content=None):
+        """
+        Selects the messages to send to the language model.
+
+        The system messages are always kept, then turns are added from the newest backwards
+        while they fit within max_turns and token_budget. The latest message is always kept.
+
+        Args:
+            messages (list): The full chat history.
+            last_content (str, optional): Content sent for the latest message instead of its stored
+                content (e.g. the query with its retrieved context), counted against the budget.
+
+        Returns:
+            list: The messages to send.
+        """
+        system = [m for m in messages if m.get("role") == "system"]
+        turns = [m for m in messages if m.get("role") != "system"]
+        if last_content is not None and turns:
+            turns[-1] = {**turns[-1], "content": last_content}
+
+        budget = self.token_budget - sum(self.estimate_tokens(m) for m in system)
+        if self.summary:
+            budget -= self.estimate_tokens(self._summary_message())
+
+        start, used, user_turns = len(turns), 0, 0
+        for i in range(len(turns) - 1, -1, -1):
+            cost = self.estimate_tokens(turns[i])
+            is_user = turns[i].get("role") == "user"
+            if start < len(turns) and (used + cost > budget or (is_user and user_turns >= self.max_turns)):
+                break
+            start, used = i, used + cost
+            user_turns += is_user
+
+        # Never start the window in the middle of a turn
+        while start < len(turns) - 1 and turns[start].get("role") != "user":
+            start += 1
+
+        dropped = turns[:start]
+        if self.summarize and self.history_offset + len(dropped) > self.summarized_count:
+            try:
+                self._update_summary(dropped)
+            except Exception as e:
+                logger.error(f"Error summarizing conversation history: {e}")
+            # The window was sized without the new (or longer) summary: drop turns until it fits again
+            budget = self.token_budget - sum(self.estimate_tokens(m) for m in system)
+            if self.summary:
+                budget -= self.estimate_tokens(self._summary_message())
+            start = self._fit(turns, budget, start)
+
+        context = system + ([self._summary_message()] if self.summary else []) + turns[start:]
+        logger.info(f"Context window: {len(turns) - start} of {len(turns)} messages, ~{self.count_tokens(context)} tokens.")
+        return context
+
+    def _fit(self, turns, budget, start=0):
+        """
+        Moves the start of a window forward, a turn at a time, until it fits within a budget.
+        The latest message is always kept.
+
+        Args:
+            turns (list): The messages of the window and before it, system messages excluded.
+            budget (int): Estimated tokens available for the window.
+            start (int, optional): Current start of the window.
+
+        Returns:
+            int: The new start of the window.
+        """
+        while start < len(turns) - 1 and self.count_tokens(turns[start:]) > budget:
+            start += 1
+            while start < len(turns) - 1 and turns[start].get("role") != "user":
+                start += 1
+        return start
+
+    def trim(self, context):
+        """
+        Drops the oldest turns of a built context until it fits the token budget again, e.g. once
+        the captions of its images, estimated while windowing, are known.
+
+        Args:
+            context (list): Messages returned by build.
+
+        Returns:
+            list: The messages to send.
+        """
+        system = [m for m in context if m.get("role") == "system"]
+        turns = [m for m in context if m.get("role") != "system"]
+        start = self._fit(turns, self.token_budget - self.count_tokens(system))
+        if start:
+            logger.info(f"Context trimmed by {start} messages to fit the token budget.")
+        return system + turns[start:]
+
+    def count_tokens(self, messages):
+        """
+        Estimates the total number of tokens of a list of messages.
+
+        Args:
+            messages (list): Chat messages.
+
+        Returns:
+            int: Estimated token count.
+        """
+        return sum(self.estimate_tokens(m) for m in messages)
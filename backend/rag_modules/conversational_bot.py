@@ -1,59 +1,257 @@
+from rag_modules.context_manager import ContextManager
+from rag_modules.image_store import ImageStore, image_store as shared_image_store
+from rag_modules.image_preprocess import prepare_vision_image
+from tracing import span
+from metrics import Counter, Gauge, Histogram
+from config import Config
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 import ollama
+import time
 import logging
 
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
 
+ollama_in_flight = Gauge("ollama_in_flight_requests", "Ollama chat calls currently in progress", labels=("operation",))
+llm_seconds = Histogram("llm_generation_seconds", "Time taken by an Ollama chat call", labels=("model", "operation"))
+llm_tokens = Counter("llm_tokens_total", "Tokens processed by the LLM", labels=("model", "kind"))
+llm_tokens_per_second = Histogram("llm_tokens_per_second", "Completion tokens generated per second of an Ollama chat call", labels=("model",),
+                                  buckets=(1, 2.5, 5, 10, 20, 40, 80, 160, 320))
+
+# Sent for an earlier image whose caption is not written yet
+PENDING_CAPTION = "not described yet"
+
+# Thread writing the captions of the chat images, created on first use
+_caption_executor = None
+_caption_executor_lock = Lock()
+
+def get_caption_executor() -> ThreadPoolExecutor:
+    """
+    Returns the executor captioning the chat images in the background, creating it on first use.
+    """
+    global _caption_executor
+    with _caption_executor_lock:
+        if _caption_executor is None:
+            _caption_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image-caption")
+        return _caption_executor
+
 class Conversational_Bot:
     """
     A conversational AI chatbot that interacts with users using a language model.
     
     Attributes:
-        messages (list): Stores the chat history.
+        messages (list): Stores the chat history. Images are kept as references to the image store ('image_refs').
+        context_manager (ContextManager): Selects the part of the history sent to the language model.
+        image_store (ImageStore): Store of the images shared in the chat and of their captions.
+        last_usage (dict): Token counts of the last generated response.
     """
-    def __init__(self, system=""):
+    def __init__(self, system="", context_manager: ContextManager = None, image_store: ImageStore = None):
         """
         Initializes the chatbot with an optional system instruction.
 
         Args:
             system (str, optional): System-level instruction for the chatbot.
+            context_manager (ContextManager, optional): History windowing policy. Defaults to a ContextManager with default limits.
+            image_store (ImageStore, optional): Image store. Defaults to the shared store in Config.IMAGE_STORE_DIR.
         """
         self.messages = [] # define history list
+        self.context_manager = context_manager or ContextManager()
+        self.image_store = image_store or shared_image_store
+        self.last_usage = {}
+        self._pending_captions = {} # Image reference -> future of its background caption
+        self._pending_lock = Lock()
         
         if system:
             logger.info("Initializing bot with system instructions.")
             self.messages.append({"role": "system", "content": system})
             
-    def generate(self, user_question, image=None):
+    def generate(self, user_question, image=None, prompt=None):
         """
         Generates a response from the language model based on user input.
 
         Args:
             user_question (str): The user's query.
-            image (str, optional): Image input for multimodal processing.
+            image (bytes | str, optional): Image input for multimodal processing (bytes, file path or base64).
+                It is downscaled for the vision model, and only this turn's image is sent, earlier images
+                are sent as their captions, written in the background once the turn is answered.
+            prompt (str, optional): Prompt sent for this turn instead of the query (e.g. with retrieved context).
+                Only the query is kept in the history.
 
         Returns:
             dict: Response generated by the language model.
         """
-        logger.info("Generating response for user query.")
+        logger.debug("Generating response for user query.")
     
         # Append user query to history under the "user" role
         if image:
-            self.messages.append({"role": "user", "content":user_question, "images": [image]})
-            logger.info("User query includes an image.")
+            self.messages.append({"role": "user", "content":user_question, "image_refs": [self.image_store.put(prepare_vision_image(image, skip_small=False))]})
+            logger.debug("User query includes an image.")
         else:
             self.messages.append({"role": "user", "content":user_question})
+        
+        # Send the system prompt and the recent turns that fit the token budget, earlier images sent as their
+        # captions: only the images of the kept turns are resolved, then the window is trimmed to the actual captions
+        with span("context_build"):
+            context = self.context_manager.build(self.messages, last_content=prompt or None)
+            context = self.context_manager.trim(self.resolve_images(context))
+            estimated_tokens = self.context_manager.count_tokens(context)
                 
         # Generate response from the language model
-        response = ollama.chat(model='llama3.2-vision', messages=self.messages)
+        with span("llm_generate", model='llama3.2-vision', estimated_prompt_tokens=estimated_tokens) as stage:
+            response = self._chat("generate", model='llama3.2-vision', messages=context)
+            if stage:
+                stage.attributes.update(prompt_tokens=getattr(response, "prompt_eval_count", None), completion_tokens=getattr(response, "eval_count", None))
         
         # Add LLM's response to the history under "assistant" role
         self.messages.append({"role":"assistant", "content":response.message.content})
         
-        print(f'History: {self.messages}')
+        # Caption this turn's image now, so later turns read it from the store
+        if image:
+            self.caption_in_background(self.messages[-2]["image_refs"])
+        
+        self.last_usage = {
+            "estimated_prompt_tokens": estimated_tokens,
+            "prompt_tokens": getattr(response, "prompt_eval_count", None),
+            "completion_tokens": getattr(response, "eval_count", None),
+            "context_messages": len(context),
+            "history_messages": len(self.messages) - 1
+        }
+        logger.info(f"Turn token usage: {self.last_usage}")
         
         return response
     
+    def resolve_images(self, context):
+        """
+        Replaces the image references of the messages: the images of the current (last) turn
+        are loaded from the store, those of earlier turns are replaced by their cached captions,
+        so each image is sent to the vision model once. No caption is written here: an image
+        whose caption is not ready yet is sent as PENDING_CAPTION, and captioned in the background.
+
+        Args:
+            context (list): The messages to send.
+
+        Returns:
+            list: The messages, with 'images' on the current turn only.
+        """
+        resolved = []
+        for i, message in enumerate(context):
+            refs = message.get("image_refs")
+            if not refs:
+                resolved.append(message)
+                continue
+            message = {key: value for key, value in message.items() if key != "image_refs"}
+            if i == len(context) - 1:
+                message["images"] = [self.image_store.get(ref) for ref in refs]
+            else:
+                captions = "\n".join(f"[Image: {self.cached_caption(ref)}]" for ref in refs)
+                message["content"] = f"{captions}\n{message.get('content') or ''}"
+            resolved.append(message)
+        return resolved
+
+    def cached_caption(self, ref):
+        """
+        Returns the cached caption of a stored image, scheduling its captioning if it has none yet.
+
+        Args:
+            ref (str): The image reference.
+
+        Returns:
+            str: The caption, PENDING_CAPTION until it is written.
+        """
+        caption = self.image_store.get_caption(ref)
+        if caption is None:
+            self.caption_in_background([ref])
+            return PENDING_CAPTION
+        return caption
+
+    def caption_in_background(self, refs):
+        """
+        Captions stored images on the caption thread, each once however often it is requested.
+
+        Args:
+            refs (list): The image references.
+        """
+        with self._pending_lock:
+            for ref in refs:
+                if ref not in self._pending_captions:
+                    self._pending_captions[ref] = get_caption_executor().submit(self._caption_pending, ref)
+
+    def _caption_pending(self, ref):
+        try:
+            self.caption_image(ref)
+        except Exception as e:
+            logger.error(f"Error captioning image {ref[:12]}: {e}") # Retried the next time the caption is needed
+        finally:
+            with self._pending_lock:
+                self._pending_captions.pop(ref, None)
+
+    def wait_for_captions(self, timeout=None):
+        """
+        Waits until the scheduled captions are written.
+
+        Args:
+            timeout (float, optional): Maximum time to wait for each caption, in seconds.
+        """
+        with self._pending_lock:
+            futures = list(self._pending_captions.values())
+        for future in futures:
+            future.result(timeout)
+
+    def caption_image(self, ref):
+        """
+        Returns the caption of a stored image, captioning it on first use.
+
+        Args:
+            ref (str): The image reference.
+
+        Returns:
+            str: The caption.
+        """
+        caption = self.image_store.get_caption(ref)
+        if caption is None:
+            try:
+                caption = self.summarize_image(self.image_store.get(ref))
+            except FileNotFoundError:
+                logger.warning(f"Image {ref[:12]} is missing from the image store.")
+                return "image no longer available"
+            self.image_store.set_caption(ref, caption)
+        return caption
+
+    def _chat(self, operation, model, messages):
+        """
+        Calls the Ollama chat API and records the in-flight calls, the call latency and the token throughput.
+
+        Args:
+            operation (str): What the call is for ('generate', 'summarize_image', 'summarize_table').
+            model (str): The Ollama model.
+            messages (list): The chat messages.
+
+        Returns:
+            ChatResponse: The Ollama response.
+        """
+        ollama_in_flight.inc(operation)
+        started = time.perf_counter()
+        try:
+            response = ollama.chat(model=model, messages=messages, keep_alive=Config.OLLAMA_KEEP_ALIVE)
+        finally:
+            ollama_in_flight.dec(operation)
+        elapsed = time.perf_counter() - started
+        llm_seconds.observe(elapsed, model, operation)
+
+        prompt_tokens = getattr(response, "prompt_eval_count", None)
+        completion_tokens = getattr(response, "eval_count", None)
+        if isinstance(prompt_tokens, int):
+            llm_tokens.inc(model, "prompt", amount=prompt_tokens)
+        if isinstance(completion_tokens, int) and completion_tokens > 0:
+            llm_tokens.inc(model, "completion", amount=completion_tokens)
+            # Ollama reports the generation time alone (nanoseconds), the call latency also covers the prompt evaluation
+            eval_duration = getattr(response, "eval_duration", None)
+            seconds = eval_duration / 1e9 if isinstance(eval_duration, int) and eval_duration > 0 else elapsed
+            if seconds > 0:
+                llm_tokens_per_second.observe(completion_tokens / seconds, model)
+        return response
+
     def get_history(self):
         """
         Retrieves the chat history.
@@ -61,7 +259,7 @@ class Conversational_Bot:
         Returns:
             list: Chat history.
         """
-        logger.info("Fetching chat history.")
+        logger.debug("Fetching chat history.")
         return self.messages
     
     def set_history(self, history):
@@ -71,9 +269,29 @@ class Conversational_Bot:
         Args:
             history (list): The chat history to set.
         """
-        logger.info("Setting new chat history.")
+        logger.debug("Setting new chat history.")
         self.messages = history
         
+    def get_summary(self):
+        """
+        Retrieves the rolling summary of the turns outside the context window.
+
+        Returns:
+            tuple: The summary and the number of history messages it covers.
+        """
+        return self.context_manager.summary, self.context_manager.summarized_count
+    
+    def set_summary(self, summary="", summarized_count=0, history_offset=0):
+        """
+        Restores the rolling summary of the turns outside the context window.
+
+        Args:
+            summary (str): The summary.
+            summarized_count (int): Number of history messages it covers.
+            history_offset (int): Number of stored history messages left out of the history set with set_history.
+        """
+        self.context_manager.set_summary(summary, summarized_count, history_offset)
+        
     def summarize_image(self, image):
         """
         Generates a textual summary of an image.
@@ -86,7 +304,8 @@ class Conversational_Bot:
         """
         logger.info("Generating image summary.")
         
-        response = ollama.chat(
+        response = self._chat(
+        "summarize_image",
         model='llama3.2-vision',
         messages=[{
             'role': 'user',
@@ -108,7 +327,8 @@ class Conversational_Bot:
         """
         logger.info("Generating table summary.")
         
-        response = ollama.chat(
+        response = self._chat(
+        "summarize_table",
         model='llama3.2:1b',
         messages=[{
             'role': 'user',
@@ -1,13 +1,40 @@
-from unstructured.partition.pdf import partition_pdf
-from unstructured.partition.text import partition_text
+from rag_modules.partition_cache import partition_cache
+from rag_modules.image_preprocess import prepare_vision_image
+from rag_modules.image_store import image_store
+from rag_modules.pdf_parallel import partition_page_ranges, partition_pdf_parallel, should_partition_in_parallel
+from rag_modules.pdf_planner import PLANNER_VERSION, plan_partition_tasks
 from rag_modules.conversational_bot import Conversational_Bot
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 from tqdm import tqdm
+from utils import get_file_hash
+from config import Config
+from metrics import Gauge
 import unstructured, os
 import logging
 
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
 
+# The unstructured partitioners load their layout, OCR and NLP dependencies: imported on first use by load_unstructured
+partition_pdf = partition_text = chunk_by_title = None
+
+def load_unstructured():
+    """
+    Imports the unstructured partitioners and document elements used by this module.
+    """
+    global partition_pdf, partition_text, chunk_by_title
+    if partition_pdf is None:
+        from unstructured.partition.pdf import partition_pdf
+    if partition_text is None:
+        from unstructured.partition.text import partition_text
+    if chunk_by_title is None:
+        from unstructured.chunking.title import chunk_by_title
+    import unstructured.documents.elements
+
+# Uploaded files waiting for or going through extraction and ingestion
+ingest_queue_depth = Gauge("ingest_queue_depth", "Uploaded files not yet ingested", labels=("uploader_role",))
+
 def data_extracter(data, file_type, bot: Conversational_Bot = None):
     """
     Extracts text, images, and tables from structured and unstructured data.
@@ -20,6 +47,7 @@ def data_extracter(data, file_type, bot: Conversational_Bot = None):
     Returns:
         tuple: Extracted texts, image summaries, and table summaries.
     """
+    load_unstructured()
     try:
         if file_type == 'pdf':
             if bot is None: ValueError("No bot provided.") 
@@ -38,7 +66,7 @@ def data_extracter(data, file_type, bot: Conversational_Bot = None):
             logger.info(f"Extracted: {len(texts)} texts, {len(images)} images, {len(tables)} tables")
             
             logger.info("Processing Images...")
-            image_summaries = [bot.summarize_image(images[i]) for i in tqdm(range(len(images)))]
+            image_summaries = [summary for summary in (summarize_figure(bot, image) for image in tqdm(images)) if summary is not None]
             
             logger.info("Processing Tables...")
             table_summaries = [bot.summarize_table(tables[i].metadata.text_as_html) for i in tqdm(range(len(tables)))]
@@ -49,13 +77,94 @@ def data_extracter(data, file_type, bot: Conversational_Bot = None):
             logger.info(f"Extracted: {len(texts)} texts")
             return texts
         elif file_type == 'image':
-            image_summary = bot.summarize_image(data)
+            image_summary = bot.summarize_image(prepare_vision_image(data, skip_small=False))
             logger.info(f"Extracted: {len(image_summary)} texts")
             return image_summary
     except Exception as e:
         logger.error(f"Error extracting data: {e}", exc_info=True)
         return None
     
+# Layout detection parameters of PDFs, part of the partition cache key
+PDF_PARTITION_PARAMS = {
+    "strategy": "hi_res",
+    "infer_table_structure": True,
+    "extract_image_block_types": ["Image"],
+    "extract_image_block_to_payload": True
+}
+
+# Chunking applied to the partitioned elements
+CHUNKING_PARAMS = {
+    "max_characters": 10000,
+    "combine_text_under_n_chars": 2000,
+    "new_after_n_chars": 6000
+}
+
+def partition_params() -> dict:
+    """
+    Returns the parameters PDFs on disk are partitioned with, which key the partition cache.
+    """
+    if Config.PDF_ADAPTIVE_STRATEGY:
+        return {**PDF_PARTITION_PARAMS, "planner": PLANNER_VERSION}
+    return PDF_PARTITION_PARAMS
+
+def partition_pdf_file(file_path: str) -> list:
+    """
+    Partitions a PDF on disk. With the adaptive strategy, pages with a text layer and no images
+    or tables use the fast strategy and only the others hi_res layout detection. Large PDFs are
+    split into page ranges partitioned across a process pool.
+
+    Args:
+        file_path (str): Path to the PDF file.
+
+    Returns:
+        list: The partitioned elements (not chunked).
+    """
+    load_unstructured()
+    parallel = should_partition_in_parallel(file_path)
+    tasks = plan_partition_tasks(file_path, PDF_PARTITION_PARAMS, Config.PDF_PAGES_PER_TASK) if Config.PDF_ADAPTIVE_STRATEGY else None
+    try:
+        if tasks:
+            return partition_page_ranges(file_path, tasks, parallel=parallel)
+        if parallel:
+            return partition_pdf_parallel(file_path, PDF_PARTITION_PARAMS)
+    except BrokenProcessPool as e:
+        logger.error(f"PDF partitioning pool failed, partitioning {file_path} sequentially: {e}")
+        if tasks:
+            return partition_page_ranges(file_path, tasks, parallel=False)
+    return partition_pdf(filename=file_path, **PDF_PARTITION_PARAMS)
+
+def partition_pdf_elements(file_path=None, file=None):
+    """
+    Partitions a PDF into elements (see partition_pdf_file). Elements of a file on disk are
+    cached by file hash and partition parameters, so reprocessing it skips layout detection.
+    A file object is partitioned at once with hi_res.
+
+    Args:
+        file_path (str, optional): Path to the PDF file.
+        file (file object, optional): File object of the PDF.
+
+    Returns:
+        list: The partitioned elements (not chunked).
+    """
+    load_unstructured()
+    if file_path:
+        if not os.path.exists(file_path): raise FileNotFoundError(f"File does not exist: {file_path}")
+        file_hash = None
+        params = partition_params()
+        if Config.PARTITION_CACHE_ENABLED:
+            with open(file_path, "rb") as f:
+                file_hash = get_file_hash(f.read())
+            elements = partition_cache.get(file_hash, params)
+            if elements is not None:
+                return elements
+        elements = partition_pdf_file(file_path)
+        if file_hash:
+            partition_cache.set(file_hash, params, elements)
+        return elements
+    elif file:
+        return partition_pdf(file=file, **PDF_PARTITION_PARAMS)
+    raise ValueError("No file path / file provided.")
+
 def extract_pdf_data(file_path=None, file=None, bot: Conversational_Bot = None):
     """
     Extracts data from a PDF file.
@@ -68,37 +177,15 @@ def extract_pdf_data(file_path=None, file=None, bot: Conversational_Bot = None):
     Returns:
         tuple: Extracted texts, image summaries, and table summaries.
     """
+    load_unstructured()
     try:
         if bot is None: ValueError("No bot provided.") 
         if file_path:
             logger.info(f"Processing PDF from file path: {file_path}")
-            if not os.path.exists(file_path): raise FileNotFoundError("File does not exist: {file_path}")
-            chunks = partition_pdf(
-                filename=file_path,
-                infer_table_structure=True,
-                strategy="hi_res",
-                extract_image_block_types=["Image"],
-                extract_image_block_to_payload=True,
-                chunking_strategy="by_title",
-                max_characters=10000,
-                combine_text_under_n_chars=2000,
-                new_after_n_chars=6000
-                )
         elif file:
             logger.info("Processing PDF from file object.")
-            chunks = partition_pdf(
-                file=file,
-                infer_table_structure=True,
-                strategy="hi_res",
-                extract_image_block_types=["Image"],
-                extract_image_block_to_payload=True,
-                chunking_strategy="by_title",
-                max_characters=10000,
-                combine_text_under_n_chars=2000,
-                new_after_n_chars=6000
-                )
-        else:
-            raise ValueError("No file path / file provided.")
+        elements = partition_pdf_elements(file_path=file_path, file=file)
+        chunks = chunk_by_title(elements, **CHUNKING_PARAMS)
         
         return data_extracter(data=chunks, file_type='pdf', bot=bot)
     except Exception as e:
@@ -116,6 +203,7 @@ def extract_txt_data(file_path=None, file=None):
     Returns:
         tuple: Extracted texts summaries.
     """
+    load_unstructured()
     try:
         if file_path:
             logger.info(f"Processing TXT file: {file_path}")
@@ -168,4 +256,224 @@ def extract_image_data(file_path=None, file=None, bot: Conversational_Bot = None
             raise ValueError("No file path / file provided.")
     except Exception as e:
         logger.error(f"Error extracting image data: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def extract_document_data(partition, file_path=None, file=None):
+    """
+    Extracts text from a document format supported by an unstructured partitioner (DOCX, HTML, Markdown).
+
+    Args:
+        partition (callable): The unstructured partition function of the format.
+        file_path (str, optional): Path to the document.
+        file (file object, optional): File object of the document.
+
+    Returns:
+        list: Extracted texts.
+    """
+    try:
+        if file_path:
+            logger.info(f"Processing document from file path: {file_path}")
+            if not os.path.exists(file_path): raise FileNotFoundError(f"File does not exist: {file_path}")
+        elif not file:
+            raise ValueError("No file path / file provided.")
+        chunks = partition(
+            filename=file_path,
+            file=None if file_path else file,
+            chunking_strategy="by_title",
+            max_characters=10000,
+            combine_text_under_n_chars=2000,
+            new_after_n_chars=6000
+            )
+        return data_extracter(data=chunks, file_type='text')
+    except Exception as e:
+        logger.error(f"Error extracting document data: {e}")
+        return None
+
+def extract_docx_data(file_path=None, file=None):
+    """
+    Extracts text from a DOCX file (requires the 'python-docx' package).
+    """
+    from unstructured.partition.docx import partition_docx
+    return extract_document_data(partition_docx, file_path=file_path, file=file)
+
+def extract_html_data(file_path=None, file=None):
+    """
+    Extracts text from an HTML file.
+    """
+    from unstructured.partition.html import partition_html
+    return extract_document_data(partition_html, file_path=file_path, file=file)
+
+def extract_md_data(file_path=None, file=None):
+    """
+    Extracts text from a Markdown file (requires the 'markdown' package).
+    """
+    from unstructured.partition.md import partition_md
+    return extract_document_data(partition_md, file_path=file_path, file=file)
+
+def _extract_pdf_texts(file_path, bot):
+    extracted_data = extract_pdf_data(file_path=file_path, bot=bot)
+    if not extracted_data:
+        return None
+    texts, image_summaries, table_summaries = extracted_data
+    return texts + image_summaries + table_summaries
+
+def _extract_image_texts(file_path, bot):
+    image_summary = extract_image_data(file_path=file_path, bot=bot)
+    return [image_summary] if isinstance(image_summary, str) else image_summary
+
+# Extractor of each file kind detected by file_types, returning the texts to embed
+EXTRACTORS = {
+    "pdf": _extract_pdf_texts,
+    "text": lambda file_path, bot: extract_txt_data(file_path=file_path),
+    "image": _extract_image_texts,
+    "docx": lambda file_path, bot: extract_docx_data(file_path=file_path),
+    "html": lambda file_path, bot: extract_html_data(file_path=file_path),
+    "markdown": lambda file_path, bot: extract_md_data(file_path=file_path),
+}
+
+def summarize_figure(bot: Conversational_Bot, image):
+    """
+    Summarizes a figure extracted from a document, downscaled for the vision model first.
+
+    Args:
+        bot (Conversational_Bot): Conversational bot instance for summarization.
+        image (str): The base64 image.
+
+    Returns:
+        str: Summary of the figure, None for an image too small to be worth summarizing (logo, icon, rule).
+    """
+    image = prepare_vision_image(image)
+    return None if image is None else bot.summarize_image(image)
+
+def store_figure(figures: list, image, skip_small: bool = True):
+    """
+    Keeps a figure extracted from a document for the image encoder instead of summarizing it:
+    the figure is downscaled, stored in the image store and its reference appended to figures.
+
+    Args:
+        figures (list): References of the figures of the file.
+        image (str | bytes): The image.
+        skip_small (bool): Ignore images too small to be worth keeping (logo, icon, rule).
+
+    Returns:
+        None: Nothing to embed as text.
+    """
+    image = prepare_vision_image(image, skip_small=skip_small)
+    if image is not None:
+        figures.append(image_store.put(image))
+
+def _completed(pending: set, block: bool = False):
+    """
+    Yields the results of the finished futures of a set, removing them from it. Empty
+    results (skipped figures) are not yielded.
+    """
+    if not pending:
+        return
+    done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+    for future in done:
+        pending.discard(future)
+        result = future.result()
+        if result is not None:
+            yield result
+
+def stream_pdf_data(file_path, bot: Conversational_Bot = None, figures: list = None):
+    """
+    Streams the texts to embed from a PDF file. Text chunks are yielded as soon as the PDF is
+    chunked, while image and table summaries run on a thread pool and are yielded as they complete.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        bot (Conversational_Bot): Conversational bot instance for summarization.
+        figures (list, optional): If given, the figures are stored and their references appended to it instead of being summarized.
+
+    Yields:
+        str: Text chunks and summaries.
+    """
+    load_unstructured()
+    if bot is None: raise ValueError("No bot provided.")
+    logger.info(f"Streaming PDF from file path: {file_path}")
+    chunks = chunk_by_title(partition_pdf_elements(file_path=file_path), **CHUNKING_PARAMS)
+
+    executor = ThreadPoolExecutor(max_workers=Config.SUMMARY_WORKERS, thread_name_prefix="summarize")
+    pending = set()
+    texts = images = tables = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, unstructured.documents.elements.Table):
+                pending.add(executor.submit(bot.summarize_table, chunk.metadata.text_as_html))
+                tables += 1
+            if isinstance(chunk, unstructured.documents.elements.CompositeElement):
+                for element in chunk.metadata.orig_elements or []:
+                    if isinstance(element, unstructured.documents.elements.Image):
+                        if figures is None:
+                            pending.add(executor.submit(summarize_figure, bot, element.metadata.image_base64))
+                        else:
+                            pending.add(executor.submit(store_figure, figures, element.metadata.image_base64))
+                        images += 1
+                texts += 1
+                yield str(chunk)
+            yield from _completed(pending)
+        while pending:
+            yield from _completed(pending, block=True)
+        logger.info(f"Streamed: {texts} texts, {images} {'images' if figures is not None else 'image summaries'}, {tables} table summaries")
+    finally:
+        # Stop summarizing if the consumer gives up early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# Extractors streaming their texts (and storing their figures when given a list), the other kinds are extracted at once by EXTRACTORS
+STREAM_EXTRACTORS = {
+    "pdf": stream_pdf_data,
+}
+
+def stream_file_data(file_type, file_path, bot: Conversational_Bot = None, figures: list = None):
+    """
+    Streams the texts to embed from a file, so embedding and ingestion start before the
+    whole file is extracted.
+
+    Args:
+        file_type (FileType): Type detected by file_types.detect_file_type.
+        file_path (str): Path to the file.
+        bot (Conversational_Bot, optional): Conversational bot instance for summarization.
+        figures (list, optional): If given, the figures of PDFs and image files are stored and their
+            references appended to it instead of being summarized (Config.IMAGE_INGEST_MODE "embed").
+
+    Yields:
+        str: Extracted texts and summaries.
+
+    Raises:
+        ValueError: If no extractor handles the file type or the extraction failed.
+    """
+    if figures is not None and file_type.kind == "image":
+        logger.info(f"Storing image ({file_type.mime}) for the image encoder: {file_path}")
+        store_figure(figures, file_path, skip_small=False)
+        return
+    extractor = STREAM_EXTRACTORS.get(file_type.kind)
+    if extractor is not None:
+        logger.info(f"Streaming {file_type.kind} data ({file_type.mime}) from: {file_path}")
+        yield from extractor(file_path, bot, figures=figures)
+        return
+    texts = extract_file_data(file_type, file_path, bot=bot)
+    if not texts:
+        raise ValueError(f"Failed to extract data from {file_type.kind} file.")
+    yield from texts
+
+def extract_file_data(file_type, file_path, bot: Conversational_Bot = None):
+    """
+    Extracts the texts to embed from a file, using the extractor of its detected type.
+
+    Args:
+        file_type (FileType): Type detected by file_types.detect_file_type.
+        file_path (str): Path to the file.
+        bot (Conversational_Bot, optional): Conversational bot instance for summarization.
+
+    Returns:
+        list: Extracted texts and summaries, None if the extraction failed.
+
+    Raises:
+        ValueError: If no extractor handles the file type.
+    """
+    extractor = EXTRACTORS.get(file_type.kind)
+    if extractor is None:
+        raise ValueError(f"No extractor for file type: {file_type.kind}")
+    logger.info(f"Extracting {file_type.kind} data ({file_type.mime}) from: {file_path}")
+    return extractor(file_path, bot)
\ No newline at end of file
@@ -1,11 +1,41 @@
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from rag_modules.token_chunker import TokenChunker
+from config import Config
+from metrics import Counter, Histogram
 from tqdm import tqdm
-from typing import List
+from typing import Iterable, List
+import time
 import logging
 
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
 
+# Imported on first use by load_embed_model: llama_index loads torch, transformers and sentence_transformers
+HuggingFaceEmbedding = None
+
+# Embedding model used when none is given
+DEFAULT_EMBED_MODEL = "nomic-ai/nomic-embed-text-v1.5"
+
+embed_batch_seconds = Histogram("embed_batch_seconds", "Time taken to embed a batch of texts")
+embed_texts = Counter("embed_texts_total", "Texts embedded")
+
+def load_embed_model(embed_model_name: str = DEFAULT_EMBED_MODEL):
+    """
+    Loads a Hugging Face embedding model.
+
+    Args:
+        embed_model_name (str): Name of the Hugging Face embedding model.
+
+    Returns:
+        HuggingFaceEmbedding: An instance of the embedding model.
+    """
+    global HuggingFaceEmbedding
+    if HuggingFaceEmbedding is None:
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+    logger.info(f"Loading embedding model: {embed_model_name}")
+    embed_model = HuggingFaceEmbedding(model_name=embed_model_name, trust_remote_code=True)
+    logger.info("Model loaded successfully.")
+    return embed_model
+
 class EmbedData:
     """
     A class for generating text embeddings using a Hugging Face model.
@@ -14,23 +44,26 @@ class EmbedData:
         embed_model_name (str): Name of the Hugging Face embedding model.
         batch_size (int): Number of contexts to process per batch.
         embed_model (HuggingFaceEmbedding): Loaded embedding model instance.
+        chunker (TokenChunker): Splits contexts to fit the model's context window.
         embeddings (list): List of generated embeddings.
     """
-    def __init__(self, embed_model_name: str = "nomic-ai/nomic-embed-text-v1.5", batch_size: int = 32):
+    def __init__(self, embed_model_name: str = DEFAULT_EMBED_MODEL, batch_size: int = 32, embed_model=None):
         """
         Initializes the EmbedData class with the given model name and batch size.
         
         Args:
             embed_model_name (str): Name of the Hugging Face embedding model.
             batch_size (int): Number of contexts to process in a single batch.
+            embed_model (optional): An already loaded embedding model (e.g. shared by the requests), used instead of loading embed_model_name.
         """
         self.embed_model_name = embed_model_name
         try:
-            self.embed_model = self._load_embed_model()
+            self.embed_model = embed_model if embed_model is not None else self._load_embed_model()
         except Exception as e:
             logger.error(f"Error loading embedding model: {str(e)}")
             raise
         self.batch_size = batch_size
+        self.chunker = self._load_chunker()
         self.embeddings = []
         
     def _load_embed_model(self):
@@ -40,11 +73,37 @@ class EmbedData:
         Returns:
             HuggingFaceEmbedding: An instance of the embedding model.
         """
-        logger.info(f"Loading embedding model: {self.embed_model_name}")
-        embed_model = HuggingFaceEmbedding(model_name=self.embed_model_name, trust_remote_code=True)
-        logger.info("Model loaded successfully.")
-        return embed_model
+        return load_embed_model(self.embed_model_name)
     
+    def _load_chunker(self):
+        """
+        Creates the chunker of the model's tokenizer. Chunks are limited to EMBED_MAX_TOKENS, or the
+        model's max_length if smaller, minus EMBED_TOKEN_RESERVE for special tokens and the prefix.
+
+        Returns:
+            TokenChunker: The chunker.
+        """
+        max_length = getattr(self.embed_model, "max_length", None)
+        max_tokens = min(max_length, Config.EMBED_MAX_TOKENS) if isinstance(max_length, int) else Config.EMBED_MAX_TOKENS
+        tokenizer = getattr(getattr(self.embed_model, "_model", None), "tokenizer", None)
+        if tokenizer is None:
+            logger.warning("Embedding model tokenizer unavailable, estimating token counts.")
+        max_tokens -= Config.EMBED_TOKEN_RESERVE
+        logger.info(f"Chunking contexts to {max_tokens} tokens with {Config.EMBED_CHUNK_OVERLAP} tokens of overlap.")
+        return TokenChunker(tokenizer, max_tokens=max_tokens, overlap_tokens=min(Config.EMBED_CHUNK_OVERLAP, max_tokens - 1))
+
+    def split_contexts(self, contexts: Iterable[str]):
+        """
+        Splits contexts longer than the model's context window into overlapping chunks.
+
+        Args:
+            contexts (Iterable[str]): Text inputs.
+
+        Yields:
+            str: Contexts that fit the context window.
+        """
+        return self.chunker.split_all(contexts)
+
     def generate_embedding(self, context: List[str]):
         """
         Generates embeddings for a given list of text contexts.
@@ -56,7 +115,11 @@ class EmbedData:
             list: A list of generated embeddings.
         """
         logger.info(f"Generating embeddings for {len(context)} texts.")
-        return self.embed_model.get_text_embedding_batch(context)
+        started = time.perf_counter()
+        embeddings = self.embed_model.get_text_embedding_batch(context)
+        embed_batch_seconds.observe(time.perf_counter() - started)
+        embed_texts.inc(amount=len(context))
+        return embeddings
     
     def batch_iterate(self, lst: List, batch_size: int):
         """
@@ -74,13 +137,15 @@ class EmbedData:
         
     def embed(self, contexts: List[str]):
         """
-        Processes a list of text contexts in batches and generates embeddings.
+        Processes a list of text contexts in batches and generates embeddings. Contexts longer
+        than the model's context window are split first, so self.contexts may hold more items.
         
         Args:
             contexts (list of str): A list of text inputs to be embedded.
         """
         try:
-            self.contexts = contexts
+            self.contexts = contexts = list(self.split_contexts(contexts))
+            self.embeddings = []
             logger.info(f"Starting embedding process for {len(contexts)} texts.")
             
             for batch_context in tqdm(self.batch_iterate(contexts, self.batch_size), total=len(contexts)//self.batch_size, desc="Embedding data in batches"):
@@ -90,4 +155,24 @@ class EmbedData:
             logger.info("Embedding process completed.")
         except Exception as e:
             logger.error("Error during embedding: %s", str(e))
-            raise
\ No newline at end of file
+            raise
+
+    def embed_stream(self, contexts: Iterable[str]):
+        """
+        Embeds a stream of text contexts batch by batch, as soon as each batch is filled,
+        without keeping the contexts or embeddings. Long contexts are split to fit the model.
+
+        Args:
+            contexts (Iterable[str]): Text inputs to embed, e.g. a stream_file_data generator.
+
+        Yields:
+            tuple: A batch of contexts and their embeddings.
+        """
+        batch = []
+        for context in self.split_contexts(contexts):
+            batch.append(context)
+            if len(batch) == self.batch_size:
+                yield batch, self.generate_embedding(batch)
+                batch = []
+        if batch:
+            yield batch, self.generate_embedding(batch)
@@ -0,0 +1,172 @@
+from rag_modules.vector_db import VectorStore
+from rag_modules.image_store import ImageStore, image_store as shared_image_store
+from metrics import Histogram
+from tracing import span
+from typing import List
+from config import Config
+import io, time
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Figures of a collection are stored in a sibling collection, their vectors live in the image encoder's space
+IMAGE_COLLECTION_SUFFIX = "_images"
+
+image_embed_batch_seconds = Histogram("image_embed_batch_seconds", "Time taken to embed a batch of figures with the image encoder")
+
+def load_image_embed_model(model_name: str = None):
+    """
+    Loads a CLIP-style model embedding images and texts into a shared space.
+
+    Args:
+        model_name (str, optional): Hugging Face model name. Defaults to Config.IMAGE_EMBED_MODEL.
+
+    Returns:
+        tuple: The model, in evaluation mode, and its processor.
+    """
+    from transformers import CLIPModel, CLIPProcessor
+    model_name = model_name or Config.IMAGE_EMBED_MODEL
+    logger.info(f"Loading image embedding model: {model_name}")
+    model = CLIPModel.from_pretrained(model_name)
+    model.eval()
+    return model, CLIPProcessor.from_pretrained(model_name)
+
+class ImageEmbedder:
+    """
+    Embeds figures and text queries with a CLIP-style model, so a text query retrieves the
+    figures it describes without the figures being captioned first. The embeddings are
+    L2-normalized: their dot product is the cosine similarity.
+
+    Attributes:
+        model: The CLIP model.
+        processor: Its image processor and tokenizer.
+        vector_dim (int): Dimensionality of the shared space.
+    """
+    def __init__(self, model, processor):
+        self.model = model
+        self.processor = processor
+        self.vector_dim = model.config.projection_dim
+
+    @staticmethod
+    def _normalize(features) -> List[List[float]]:
+        # transformers 5 returns the model output, with the projected embeddings as its pooler output
+        features = getattr(features, "pooler_output", features)
+        return (features / features.norm(dim=-1, keepdim=True).clamp(min=1e-12)).tolist()
+
+    def embed_images(self, images) -> List[List[float]]:
+        """
+        Embeds a batch of images.
+
+        Args:
+            images (list): The images, as bytes, file paths or base64 strings.
+
+        Returns:
+            list: One normalized embedding per image.
+        """
+        import torch
+        from PIL import Image
+        pictures = [Image.open(io.BytesIO(ImageStore.to_bytes(image))).convert("RGB") for image in images]
+        started = time.perf_counter()
+        with torch.no_grad():
+            features = self.model.get_image_features(**self.processor(images=pictures, return_tensors="pt"))
+        image_embed_batch_seconds.observe(time.perf_counter() - started)
+        return self._normalize(features)
+
+    def embed_text(self, text: str) -> List[float]:
+        """
+        Embeds a text query into the space of the images.
+
+        Args:
+            text (str): The query.
+
+        Returns:
+            list: The normalized embedding.
+        """
+        import torch
+        with torch.no_grad():
+            features = self.model.get_text_features(**self.processor(text=[text], padding=True, truncation=True, return_tensors="pt"))
+        return self._normalize(features)[0]
+
+class ImageIndex:
+    """
+    The figures of a collection, embedded with an ImageEmbedder into a sibling collection
+    (named after it with IMAGE_COLLECTION_SUFFIX). Points hold the image store reference of
+    the figure and its source; the figure is captioned only if a query retrieves it.
+
+    Attributes:
+        vector_db (VectorStore): The store of the image collections, created with the embedder's vector_dim.
+        embedder (ImageEmbedder): The image encoder.
+        image_store (ImageStore): The store holding the figures.
+    """
+    def __init__(self, vector_db: VectorStore, embedder: ImageEmbedder, image_store: ImageStore = None):
+        """
+        Initializes the index.
+
+        Args:
+            vector_db (VectorStore): The store of the image collections.
+            embedder (ImageEmbedder): The image encoder.
+            image_store (ImageStore, optional): The store holding the figures. Defaults to the shared image store.
+        """
+        self.vector_db = vector_db
+        self.embedder = embedder
+        self.image_store = image_store or shared_image_store
+
+    def set_collection(self, collection_name: str):
+        """
+        Sets the image collection of a text collection, creating it if needed.
+
+        Args:
+            collection_name (str): Name of the text collection.
+        """
+        self.vector_db.create_or_set_collection(collection_name + IMAGE_COLLECTION_SUFFIX)
+
+    def ingest(self, refs: List[str], source: str) -> int:
+        """
+        Embeds stored figures in batches and adds them to the current image collection. If a
+        batch fails, the figures already added for the source are deleted.
+
+        Args:
+            refs (list): Image store references of the figures.
+            source (str): Source identifier of the figures.
+
+        Returns:
+            int: Number of ingested figures.
+        """
+        batches = ((batch, self.embedder.embed_images([self.image_store.get(ref) for ref in batch]))
+                   for batch in self.vector_db.batch_iterate(refs, Config.IMAGE_EMBED_BATCH_SIZE))
+        count = 0
+        try:
+            for batch_refs, embeddings in batches:
+                self.vector_db.add_images(batch_refs, embeddings, source)
+                count += len(batch_refs)
+        except Exception as e:
+            logger.error(f"Error during figure ingestion: {e}", exc_info=True)
+            if count:
+                self.vector_db.delete_source(source)
+            raise
+        if count:
+            self.vector_db.optimize()
+        logger.info(f"Ingested {count} figures from {source} into collection {self.vector_db.collection_name}")
+        return count
+
+    def search(self, query: str, limit: int = None, min_score: float = None) -> List[tuple]:
+        """
+        Searches the current image collection for the figures a text query describes.
+
+        Args:
+            query (str): The query text.
+            limit (int, optional): Number of figures to return. Defaults to Config.IMAGE_SEARCH_TOP_K.
+            min_score (float, optional): Minimum cosine similarity. Defaults to Config.IMAGE_SEARCH_MIN_SCORE.
+
+        Returns:
+            list: (image reference, score) of the figures, best first.
+        """
+        limit = Config.IMAGE_SEARCH_TOP_K if limit is None else limit
+        min_score = Config.IMAGE_SEARCH_MIN_SCORE if min_score is None else min_score
+        with span("embed_image_query"):
+            query_embedding = self.embedder.embed_text(query)
+        with span("image_search", collection=self.vector_db.collection_name, limit=limit):
+            result = self.vector_db.search(query_embedding, limit=limit)
+        return [(point.payload["image_ref"], point.score) for point in result.points
+                if point.score >= min_score and point.payload.get("image_ref")]
@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+from rag_modules.image_store import ImageStore
+from metrics import Counter, Histogram
+from config import Config
+import io, time
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+vision_image_bytes = Counter("vision_image_bytes_total", "Bytes of the images given to the vision model, before and after preprocessing", labels=("kind",))
+vision_images_skipped = Counter("vision_images_skipped_total", "Extracted images too small to be worth a vision-model call")
+vision_preprocess_seconds = Histogram("vision_image_preprocess_seconds", "Time taken to downscale and re-encode an image",
+                                      buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+# Formats re-encoded losslessly when that is smaller than JPEG (screenshots, diagrams)
+LOSSLESS_FORMATS = ("PNG", "GIF", "BMP")
+
+@dataclass
+class PreprocessedImage:
+    """
+    The result of preprocessing an image for the vision model.
+
+    Attributes:
+        data (bytes): The image to send, None if it was skipped (the image as given if it could not be read).
+        original_bytes (int): Size of the original image.
+        width (int): Width after resizing (0 if the image could not be decoded).
+        height (int): Height after resizing.
+        seconds (float): Time taken to preprocess the image.
+        skipped (bool): Whether the image is too small to be worth a vision-model call.
+    """
+    data: bytes
+    original_bytes: int
+    width: int = 0
+    height: int = 0
+    seconds: float = 0.0
+    skipped: bool = False
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - len(self.data) if isinstance(self.data, bytes) else 0
+
+def _encode(image, image_format: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **params)
+    return buffer.getvalue()
+
+def preprocess_image(image, skip_small: bool = True, max_side: int = None, quality: int = None) -> PreprocessedImage:
+    """
+    Prepares an image for llama3.2-vision: applies its EXIF orientation, downscales it to fit
+    the model's input resolution and re-encodes it without metadata (JPEG, or optimized PNG when
+    smaller for lossless sources). Images that cannot be decoded are passed through unchanged.
+
+    Args:
+        image (bytes | file | str): The image, as bytes, a file object, a file path or a base64 string.
+        skip_small (bool): Skip images under Config.PDF_MIN_IMAGE_PIXELS or Config.VISION_MIN_SIDE (logos, icons, rules).
+        max_side (int, optional): Maximum width and height. Defaults to Config.VISION_MAX_SIDE.
+        quality (int, optional): JPEG quality. Defaults to Config.VISION_JPEG_QUALITY.
+
+    Returns:
+        PreprocessedImage: The image to send and what preprocessing saved.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    started = time.perf_counter()
+    try:
+        original = ImageStore.to_bytes(image)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Sending an image as is, it could not be read: {e}")
+        return PreprocessedImage(image, 0, seconds=time.perf_counter() - started)
+    max_side = max_side or Config.VISION_MAX_SIDE
+    try:
+        with Image.open(io.BytesIO(original)) as source:
+            source_format = source.format
+            # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding, much faster than decoding the full image
+            if source_format == "JPEG":
+                source.draft("RGB", (max_side, max_side))
+            picture = ImageOps.exif_transpose(source)
+            width, height = picture.size
+            if skip_small and (width * height < Config.PDF_MIN_IMAGE_PIXELS or min(width, height) < Config.VISION_MIN_SIDE):
+                vision_images_skipped.inc()
+                return PreprocessedImage(None, len(original), width, height, time.perf_counter() - started, skipped=True)
+            picture.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+            # Flatten transparency on white, JPEG has no alpha channel
+            if picture.mode in ("RGBA", "LA") or (picture.mode == "P" and "transparency" in picture.info):
+                rgba = picture.convert("RGBA")
+                picture = Image.new("RGB", rgba.size, (255, 255, 255))
+                picture.paste(rgba, mask=rgba.getchannel("A"))
+            elif picture.mode != "RGB":
+                picture = picture.convert("RGB")
+
+            data = _encode(picture, "JPEG", quality=quality or Config.VISION_JPEG_QUALITY, optimize=True)
+            if source_format in LOSSLESS_FORMATS:
+                data = min(data, _encode(picture, "PNG"), key=len)
+            width, height = picture.size
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        logger.warning(f"Sending an image as is, it could not be preprocessed: {e}")
+        data, width, height = original, 0, 0
+
+    result = PreprocessedImage(data, len(original), width, height, time.perf_counter() - started)
+    vision_preprocess_seconds.observe(result.seconds)
+    vision_image_bytes.inc("original", amount=len(original))
+    vision_image_bytes.inc("sent", amount=len(data))
+    logger.debug(f"Preprocessed image: {len(original)} -> {len(data)} bytes, {width}x{height}, in {result.seconds * 1000:.1f}ms.")
+    return result
+
+def prepare_vision_image(image, skip_small: bool = True):
+    """
+    Returns the image to send to the vision model, preprocessed unless Config.VISION_PREPROCESS
+    is off.
+
+    Args:
+        image (bytes | file | str): The image.
+        skip_small (bool): Return None for images too small to be worth a vision-model call.
+
+    Returns:
+        bytes | str: The image to send, None if it was skipped.
+    """
+    if not Config.VISION_PREPROCESS:
+        return image
+    return preprocess_image(image, skip_small=skip_small).data
@@ -0,0 +1,114 @@
+from config import Config
+import os, re, base64, hashlib, tempfile
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# An image reference: the SHA256 hash of the image bytes
+IMAGE_REF = re.compile(r"[0-9a-f]{64}")
+
+class ImageStore:
+    """
+    Content-addressed store of the images shared in chat sessions. The chat history and the
+    stored messages hold the SHA256 reference of an image instead of its bytes, so the same
+    image is stored once however many turns or sessions share it, and its caption, written
+    the first time the image leaves the current turn, is cached next to it.
+
+    Attributes:
+        directory (str): Directory holding the images, fanned out by the first two characters of the reference.
+    """
+    def __init__(self, directory: str):
+        """
+        Initializes the store (the directory is created on the first write).
+
+        Args:
+            directory (str): Directory holding the images.
+        """
+        self.directory = directory
+
+    @staticmethod
+    def to_bytes(image) -> bytes:
+        """
+        Reads an image given as bytes, a file object, a file path or a base64 string.
+
+        Args:
+            image (bytes | file | str): The image.
+
+        Returns:
+            bytes: The image bytes.
+        """
+        if isinstance(image, (bytes, bytearray)):
+            return bytes(image)
+        if hasattr(image, "read"):
+            return image.read()
+        if os.path.isfile(image):
+            with open(image, "rb") as f:
+                return f.read()
+        return base64.b64decode(image)
+
+    @staticmethod
+    def is_ref(value) -> bool:
+        return isinstance(value, str) and IMAGE_REF.fullmatch(value) is not None
+
+    def _path(self, ref: str, suffix: str = "") -> str:
+        return os.path.join(self.directory, ref[:2], ref + suffix)
+
+    def _write(self, path: str, data: bytes):
+        # Write to a temporary file first so readers never see a partial image or caption
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def put(self, image) -> str:
+        """
+        Stores an image, unless it is already stored.
+
+        Args:
+            image (bytes | str): The image, as bytes, a file path or a base64 string.
+
+        Returns:
+            str: The reference of the image.
+        """
+        data = self.to_bytes(image)
+        ref = hashlib.sha256(data).hexdigest()
+        path = self._path(ref)
+        if not os.path.exists(path):
+            self._write(path, data)
+            logger.debug(f"Stored image {ref[:12]} ({len(data)} bytes).")
+        return ref
+
+    def get(self, ref: str) -> bytes:
+        """
+        Returns the bytes of a stored image.
+
+        Raises:
+            FileNotFoundError: If the image is not stored.
+        """
+        with open(self._path(ref), "rb") as f:
+            return f.read()
+
+    def get_caption(self, ref: str):
+        """
+        Returns the cached caption of an image, None if it has not been captioned yet.
+        """
+        try:
+            with open(self._path(ref, ".caption.txt"), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set_caption(self, ref: str, caption: str):
+        """
+        Caches the caption of an image.
+        """
+        self._write(self._path(ref, ".caption.txt"), caption.encode("utf-8"))
+
+# Images shared in the chat sessions
+image_store = ImageStore(Config.IMAGE_STORE_DIR)
@@ -0,0 +1,160 @@
+from cache import CacheStats, caches
+from config import Config
+from threading import Lock
+import os, gzip, json, hashlib, tempfile
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+class PartitionCache:
+    """
+    On-disk cache of partitioned document elements, so a file processed again (after a failed
+    embed, a retry or for another collection) skips layout detection. Entries are gzipped JSON
+    keyed by the file hash, the partition parameters and the unstructured version; the least
+    recently used entries are removed once the cache grows beyond max_bytes.
+
+    Attributes:
+        name (str): Name of the cache, used in logs and metrics.
+        directory (str): Directory holding the entries.
+        max_bytes (int): Maximum total size of the entries.
+    """
+    def __init__(self, name: str, directory: str, max_bytes: int):
+        """
+        Initializes the cache (the directory is created on the first write).
+
+        Args:
+            name (str): Name of the cache.
+            directory (str): Directory holding the entries.
+            max_bytes (int): Maximum total size of the entries.
+        """
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = Lock()
+
+    @staticmethod
+    def make_key(file_hash: str, params: dict) -> str:
+        """
+        Builds the key of an entry.
+
+        Args:
+            file_hash (str): SHA256 hash of the file content.
+            params (dict): Parameters the file was partitioned with.
+
+        Returns:
+            str: The entry key.
+        """
+        import unstructured.__version__ as unstructured_version
+        fingerprint = json.dumps({"params": params, "unstructured": unstructured_version.__version__}, sort_keys=True)
+        return f"{file_hash}_{hashlib.sha256(fingerprint.encode()).hexdigest()[:16]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def get(self, file_hash: str, params: dict):
+        """
+        Returns the cached elements of a file partitioned with the given parameters.
+
+        Args:
+            file_hash (str): SHA256 hash of the file content.
+            params (dict): Partition parameters.
+
+        Returns:
+            list: The elements, or None if they are not cached.
+        """
+        from unstructured.staging.base import elements_from_dicts
+        path = self._path(self.make_key(file_hash, params))
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                elements = elements_from_dicts(json.load(f))
+            os.utime(path) # Mark as recently used
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding unreadable partition cache entry {path}: {e}")
+            self.stats.misses += 1
+            self._remove(path)
+            return None
+        self.stats.hits += 1
+        logger.info(f"Partition cache hit for file {file_hash[:12]}: {len(elements)} elements")
+        return elements
+
+    def set(self, file_hash: str, params: dict, elements: list):
+        """
+        Stores the elements of a partitioned file.
+
+        Args:
+            file_hash (str): SHA256 hash of the file content.
+            params (dict): Partition parameters.
+            elements (list): The partitioned elements.
+        """
+        path = self._path(self.make_key(file_hash, params))
+        from unstructured.staging.base import elements_to_dicts
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                json.dump(elements_to_dicts(elements), f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Failed to write partition cache entry {path}: {e}")
+            if tmp_path:
+                self._remove(tmp_path)
+            return
+        self._prune()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json.gz"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _prune(self):
+        """
+        Removes the least recently used entries beyond max_bytes.
+        """
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                self.stats.evictions += 1
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    def get_stats(self):
+        """
+        Returns the cache statistics.
+
+        Returns:
+            dict: Hits, misses, evictions, size and hit ratio.
+        """
+        return self.stats.as_dict(len(self._entries()))
+
+# Cache of hi_res partition output, registered with the other caches for metrics
+partition_cache = PartitionCache("pdf_partitions", Config.PARTITION_CACHE_DIR, Config.PARTITION_CACHE_MAX_BYTES)
+caches[partition_cache.name] = partition_cache
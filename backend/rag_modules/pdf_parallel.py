@@ -0,0 +1,177 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from pypdf import PdfReader, PdfWriter
+from threading import Lock
+from config import Config
+import os, tempfile, time
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Process pool partitioning page ranges, created on first use
+_executor = None
+_executor_lock = Lock()
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Returns the shared partitioning process pool. Workers are spawned (not forked) so they do not
+    inherit the server's threads and models, and each keeps its layout model loaded across tasks.
+
+    Returns:
+        ProcessPoolExecutor: The process pool.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=Config.PDF_PARTITION_WORKERS, mp_context=get_context("spawn"))
+            logger.info(f"Started PDF partitioning pool with {Config.PDF_PARTITION_WORKERS} workers")
+        return _executor
+
+def reset_executor():
+    """
+    Shuts down the partitioning process pool; a new one is created on next use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+def count_pages(file_path: str) -> int:
+    """
+    Returns the number of pages of a PDF.
+
+    Args:
+        file_path (str): Path to the PDF file.
+
+    Returns:
+        int: The page count.
+    """
+    return len(PdfReader(file_path).pages)
+
+def page_ranges(num_pages: int, pages_per_task: int) -> list:
+    """
+    Splits the pages of a document into consecutive ranges.
+
+    Args:
+        num_pages (int): Number of pages of the document.
+        pages_per_task (int): Maximum number of pages per range.
+
+    Returns:
+        list: (first_page, last_page) pairs, 1-based and inclusive.
+    """
+    return [(first, min(first + pages_per_task - 1, num_pages)) for first in range(1, num_pages + 1, pages_per_task)]
+
+def write_page_range(reader: PdfReader, first_page: int, last_page: int, directory: str) -> str:
+    """
+    Writes a range of pages of a PDF to a new file.
+
+    Args:
+        reader (PdfReader): The source document.
+        first_page (int): First page of the range (1-based).
+        last_page (int): Last page of the range (inclusive).
+        directory (str): Directory of the new file.
+
+    Returns:
+        str: Path to the new file.
+    """
+    writer = PdfWriter()
+    for index in range(first_page - 1, last_page):
+        writer.add_page(reader.pages[index])
+    path = os.path.join(directory, f"pages_{first_page}_{last_page}.pdf")
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+def partition_page_range(range_path: str, first_page: int, filename: str, params: dict) -> list:
+    """
+    Partitions a range of pages in a worker process. Page numbers are offset to the source
+    document and elements are returned as dicts, which are cheaper to send between processes.
+
+    Args:
+        range_path (str): Path to the PDF holding the page range.
+        first_page (int): Page number of the first page in the source document.
+        filename (str): Name of the source document, recorded in the element metadata.
+        params (dict): partition_pdf parameters.
+
+    Returns:
+        list: The partitioned elements as dicts.
+    """
+    from unstructured.partition.pdf import partition_pdf
+    from unstructured.staging.base import elements_to_dicts
+    elements = partition_pdf(filename=range_path, starting_page_number=first_page, metadata_filename=filename, **params)
+    return elements_to_dicts(elements)
+
+def partition_page_ranges(file_path: str, tasks: list, parallel: bool = True) -> list:
+    """
+    Partitions a PDF range by range, each with its own parameters, then merges the elements
+    back in page order. Chunking is left to the caller, so sections spanning two ranges are
+    chunked as if the document was partitioned at once.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        tasks (list): (first_page, last_page, params) of every range, in page order.
+        parallel (bool, optional): Partition the ranges across the process pool instead of in-process.
+
+    Returns:
+        list: The partitioned elements, in document order.
+    """
+    from unstructured.staging.base import elements_from_dicts
+    started = time.perf_counter()
+    reader = PdfReader(file_path)
+    filename = os.path.basename(file_path)
+
+    os.makedirs(Config.TEMP_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=Config.TEMP_DIR) as directory:
+        jobs = [(write_page_range(reader, first, last, directory), first, filename, params) for first, last, params in tasks]
+        elements = []
+        if parallel:
+            executor = get_executor()
+            futures = [executor.submit(partition_page_range, *job) for job in jobs]
+            try:
+                for future in futures: # In submission order, i.e. page order
+                    elements.extend(elements_from_dicts(future.result()))
+            except BrokenProcessPool:
+                reset_executor() # A worker died (e.g. out of memory), start a new pool next time
+                raise
+        else:
+            for job in jobs:
+                elements.extend(elements_from_dicts(partition_page_range(*job)))
+
+    logger.info(f"Partitioned {len(reader.pages)} pages in {len(tasks)} ranges in {time.perf_counter() - started:.1f}s: {len(elements)} elements")
+    return elements
+
+def partition_pdf_parallel(file_path: str, params: dict, pages_per_task: int = None) -> list:
+    """
+    Partitions a PDF by splitting it into page ranges partitioned across the process pool.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        params (dict): partition_pdf parameters.
+        pages_per_task (int, optional): Pages per range. Defaults to Config.PDF_PAGES_PER_TASK.
+
+    Returns:
+        list: The partitioned elements, in document order.
+    """
+    ranges = page_ranges(count_pages(file_path), pages_per_task or Config.PDF_PAGES_PER_TASK)
+    return partition_page_ranges(file_path, [(first, last, params) for first, last in ranges])
+
+def should_partition_in_parallel(file_path: str) -> bool:
+    """
+    Checks whether a PDF is large enough for page-parallel partitioning to pay off.
+
+    Args:
+        file_path (str): Path to the PDF file.
+
+    Returns:
+        bool: True if the PDF should be partitioned across the process pool.
+    """
+    if not Config.PDF_PARALLEL_ENABLED or Config.PDF_PARTITION_WORKERS < 2:
+        return False
+    try:
+        return count_pages(file_path) >= Config.PDF_PARALLEL_MIN_PAGES
+    except Exception as e:
+        logger.warning(f"Could not count pages of {file_path}, partitioning sequentially: {e}")
+        return False
@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+from pypdf import PdfReader
+from config import Config
+import os, re
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Partition parameters of pages with a text layer and nothing for layout detection to find
+FAST_PARTITION_PARAMS = {"strategy": "fast"}
+
+# Version of the planning rules, part of the partition cache key
+PLANNER_VERSION = 1
+
+# A line starting with a table caption, e.g. 'Table 2: Results' or 'TABLE IV.'
+TABLE_CAPTION = re.compile(r"^\s*table\s+[0-9ivx]+\s*[.:]", re.IGNORECASE | re.MULTILINE)
+NUMBER = re.compile(r"^[-+(]?\d[\d.,%)]*$")
+
+@dataclass
+class PageDecision:
+    """
+    How a page is partitioned and why.
+
+    Attributes:
+        page_number (int): Page number (1-based).
+        strategy (str): 'fast' or 'hi_res'.
+        text_chars (int): Characters in the text layer of the page.
+        images (int): Embedded images larger than PDF_MIN_IMAGE_PIXELS.
+        table_hint (bool): Whether the text suggests a table.
+        reason (str): Why the strategy was chosen.
+    """
+    page_number: int
+    strategy: str
+    text_chars: int
+    images: int
+    table_hint: bool
+    reason: str
+
+def count_page_images(resources, min_pixels: int, depth: int = 0) -> int:
+    """
+    Counts the images of a page from its resources, including images nested in form XObjects.
+    Images smaller than min_pixels (logos, bullets, rules) are ignored.
+
+    Args:
+        resources: The /Resources dictionary of the page or form.
+        min_pixels (int): Minimum width * height of a counted image.
+        depth (int): Nesting level of the forms, bounded to avoid cycles.
+
+    Returns:
+        int: The number of images.
+    """
+    if resources is None or depth > 3:
+        return 0
+    xobjects = resources.get_object().get("/XObject")
+    if xobjects is None:
+        return 0
+    count = 0
+    for xobject in xobjects.get_object().values():
+        xobject = xobject.get_object()
+        subtype = xobject.get("/Subtype")
+        if subtype == "/Image":
+            if int(xobject.get("/Width", 0)) * int(xobject.get("/Height", 0)) >= min_pixels:
+                count += 1
+        elif subtype == "/Form":
+            count += count_page_images(xobject.get("/Resources"), min_pixels, depth + 1)
+    return count
+
+def looks_like_table(text: str) -> bool:
+    """
+    Checks whether the text of a page suggests a table: a table caption, or several lines
+    made mostly of numbers.
+
+    Args:
+        text (str): Text layer of the page.
+
+    Returns:
+        bool: True if the page likely holds a table.
+    """
+    if TABLE_CAPTION.search(text):
+        return True
+    numeric_lines = 0
+    for line in text.splitlines():
+        tokens = line.split()
+        if len(tokens) >= 3 and sum(bool(NUMBER.match(token)) for token in tokens) >= len(tokens) / 2:
+            numeric_lines += 1
+    return numeric_lines >= Config.PDF_TABLE_NUMERIC_LINES
+
+def plan_page(page, page_number: int) -> PageDecision:
+    """
+    Chooses the partition strategy of a page from its text layer, images and table hints.
+    Pages without a text layer (scans), with images or with likely tables need hi_res layout
+    detection; the others are partitioned from their text layer.
+
+    Args:
+        page (PageObject): The pypdf page.
+        page_number (int): Page number (1-based).
+
+    Returns:
+        PageDecision: The decision for the page.
+    """
+    text = page.extract_text() or ""
+    text_chars = len(text.strip())
+    images = count_page_images(page.get("/Resources"), Config.PDF_MIN_IMAGE_PIXELS)
+    table_hint = looks_like_table(text)
+
+    if text_chars < Config.PDF_MIN_TEXT_CHARS:
+        strategy, reason = "hi_res", "no text layer"
+    elif images:
+        strategy, reason = "hi_res", f"{images} image(s)"
+    elif table_hint:
+        strategy, reason = "hi_res", "likely table"
+    else:
+        strategy, reason = "fast", "text only"
+    return PageDecision(page_number, strategy, text_chars, images, table_hint, reason)
+
+def plan_pdf(file_path: str) -> list:
+    """
+    Plans the partition strategy of every page of a PDF and logs the decisions.
+
+    Args:
+        file_path (str): Path to the PDF file.
+
+    Returns:
+        list: A PageDecision per page, None if the PDF cannot be inspected.
+    """
+    try:
+        reader = PdfReader(file_path)
+        decisions = [plan_page(page, number) for number, page in enumerate(reader.pages, start=1)]
+    except Exception as e:
+        logger.warning(f"Could not plan extraction of {file_path}, using hi_res for every page: {e}")
+        return None
+
+    for decision in decisions:
+        logger.debug(f"Page {decision.page_number}: {decision.strategy} ({decision.reason}, {decision.text_chars} chars)")
+    hi_res = [f"p{decision.page_number}: {decision.reason}" for decision in decisions if decision.strategy == "hi_res"]
+    logger.info(f"Extraction plan for {os.path.basename(file_path)}: {len(decisions) - len(hi_res)} fast, {len(hi_res)} hi_res"
+                + (f" ({', '.join(hi_res)})" if hi_res else ""))
+    return decisions
+
+def plan_runs(decisions: list, max_pages: int) -> list:
+    """
+    Groups consecutive pages with the same strategy into ranges of at most max_pages pages.
+
+    Args:
+        decisions (list): PageDecision of every page, in page order.
+        max_pages (int): Maximum number of pages per range.
+
+    Returns:
+        list: (strategy, first_page, last_page) tuples, in page order.
+    """
+    runs = []
+    for decision in decisions:
+        if runs:
+            strategy, first, last = runs[-1]
+            if strategy == decision.strategy and last - first + 1 < max_pages:
+                runs[-1] = (strategy, first, decision.page_number)
+                continue
+        runs.append((decision.strategy, decision.page_number, decision.page_number))
+    return runs
+
+def plan_partition_tasks(file_path: str, hi_res_params: dict, max_pages: int) -> list:
+    """
+    Plans a PDF into page ranges with their partition parameters.
+
+    Args:
+        file_path (str): Path to the PDF file.
+        hi_res_params (dict): partition_pdf parameters of hi_res pages.
+        max_pages (int): Maximum number of pages per range.
+
+    Returns:
+        list: (first_page, last_page, params) tuples in page order, None if every page
+        needs hi_res (or the PDF cannot be inspected) so the whole file is partitioned at once.
+    """
+    decisions = plan_pdf(file_path)
+    if not decisions or all(decision.strategy == "hi_res" for decision in decisions):
+        return None
+    return [
+        (first, last, FAST_PARTITION_PARAMS if strategy == "fast" else hi_res_params)
+        for strategy, first, last in plan_runs(decisions, max_pages)
+    ]
@@ -1,18 +1,37 @@
-from transformers import AutoModelForSequenceClassification, AutoTokenizer
 from rag_modules.conversational_bot import Conversational_Bot
 from rag_modules.rag_retriever import Retriever
-import torch
+from tracing import span
 import logging
 
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
 
+# Reranker used when none is given
+DEFAULT_RERANKER_MODEL = "BAAI/bge-reranker-base"
+
+def load_reranker(reranker_model_name: str):
+    """
+    Loads a Hugging Face cross-encoder reranker in evaluation mode.
+
+    Args:
+        reranker_model_name (str): Model name for sequence classification reranking.
+
+    Returns:
+        tuple: The model and its tokenizer.
+    """
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    logger.info(f"Loading reranker model: {reranker_model_name}")
+    model = AutoModelForSequenceClassification.from_pretrained(reranker_model_name)
+    model.eval()
+    return model, AutoTokenizer.from_pretrained(reranker_model_name)
+
 class RAG:
     """
     A RAG (Retrieval-Augmented Generation) system that retrieves relevant documents,
     reranks them based on relevance, and generates responses using a conversational bot.
     """
-    def __init__(self, retriever: Retriever, bot: Conversational_Bot, reranker_model_name="BAAI/bge-reranker-base", rerank_threshold = 0.7, top_k = 10):
+    def __init__(self, retriever: Retriever, bot: Conversational_Bot, reranker_model_name=DEFAULT_RERANKER_MODEL, rerank_threshold = 0.7, top_k = 10,
+                 reranker_model=None, reranker_tokenizer=None):
         """
         Initializes the RAG system.
         
@@ -22,6 +41,8 @@ class RAG:
             reranker_model_name (str): Model name for sequence classification reranking.
             rerank_threshold (float): Minimum score threshold for reranked documents.
             top_k (int): Number of top retrieved documents.
+            reranker_model (optional): An already loaded reranker model, used instead of loading reranker_model_name.
+            reranker_tokenizer (optional): The tokenizer of reranker_model.
         """
         self.llm = bot
         self.retriever = retriever
@@ -36,9 +57,11 @@ class RAG:
                                     Answer: """
                                     
         # Load reranker model and tokenizer
-        logger.info(f"Loading reranker model: {reranker_model_name}")
-        self.reranker_model = AutoModelForSequenceClassification.from_pretrained(reranker_model_name)
-        self.tokenizer = AutoTokenizer.from_pretrained(reranker_model_name)
+        if reranker_model is not None and reranker_tokenizer is not None:
+            self.reranker_model = reranker_model
+            self.tokenizer = reranker_tokenizer
+        else:
+            self.reranker_model, self.tokenizer = load_reranker(reranker_model_name)
         self.rerank_threshold = rerank_threshold
         self.top_k = top_k
     
@@ -53,12 +76,16 @@ class RAG:
         Returns:
             list: Filtered reranked documents above the threshold.
         """
-        logger.info("Performing reranking of retrieved documents.")
-        inputs = [f"Query: {query} Document: {doc['payload']['context']}" for doc in retrieved_docs]
-        tokenized = self.tokenizer(inputs, padding=True, truncation=True, return_tensors="pt")
-        
-        with torch.no_grad():
-            scores = self.reranker_model(**tokenized).logits.squeeze().tolist()
+        import torch
+        logger.debug("Performing reranking of retrieved documents.")
+        with span("rerank", documents=len(retrieved_docs)) as stage:
+            inputs = [f"Query: {query} Document: {doc['payload']['context']}" for doc in retrieved_docs]
+            tokenized = self.tokenizer(inputs, padding=True, truncation=True, return_tensors="pt")
+            if stage:
+                stage.attributes["tokens"] = int(tokenized["input_ids"].numel())
+            
+            with torch.no_grad():
+                scores = self.reranker_model(**tokenized).logits.squeeze().tolist()
             
         for i, doc in enumerate(retrieved_docs):
             doc["score"] = scores[i]
@@ -67,9 +94,28 @@ class RAG:
         
         reranked_filtered_docs = [doc for doc in reranked_docs if doc['score'] >= self.rerank_threshold]
         
-        logger.info(f"Reranked {len(reranked_filtered_docs)} documents above threshold {self.rerank_threshold}")
+        logger.debug(f"Reranked {len(reranked_filtered_docs)} documents above threshold {self.rerank_threshold}")
         return reranked_filtered_docs
         
+    def retrieve_figures(self, query):
+        """
+        Retrieves the figures embedded by the image encoder that a query describes, captioned
+        by the vision model the first time they are retrieved (the caption is cached in the
+        image store), so they are reranked alongside the text chunks.
+
+        Args:
+            query (str): User's query.
+
+        Returns:
+            list: The figures as retrieved documents, their caption as context.
+        """
+        figures = self.retriever.search_images(query)
+        if not figures:
+            return []
+        with span("caption_figures", figures=len(figures)):
+            return [{"id": ref, "score": score, "payload": {"context": f"[Image: {self.llm.caption_image(ref)}]", "image_ref": ref}}
+                    for ref, score in figures]
+
     def generate_context(self, query):
         """
         Retrieves and reranks documents to construct context for query response.
@@ -80,9 +126,11 @@ class RAG:
         Returns:
             str: Concatenated context from top reranked documents.
         """
-        logger.info(f"Retrieving and reranking context for query: {query}")
-        results = self.retriever.search(query, self.top_k).model_dump()
-        retrieved_docs = [dict(data) for data in results['points']]
+        logger.debug(f"Retrieving and reranking context for a query of {len(query)} chars.")
+        with span("retrieve", top_k=self.top_k):
+            results = self.retriever.search(query, self.top_k).model_dump()
+            retrieved_docs = [dict(data) for data in results['points']]
+        retrieved_docs.extend(self.retrieve_figures(query))
         reranked_docs = self.rerank(query, retrieved_docs)
         if len(reranked_docs): 
             combined_prompt = []
@@ -107,10 +155,11 @@ class RAG:
         Returns:
             str: Generated response from the conversational bot.
         """
-        logger.info(f"Generating response for query: {query}")
-        context = self.generate_context(query=query)
+        logger.debug(f"Generating response for a query of {len(query)} chars.")
+        with span("generate_context"):
+            context = self.generate_context(query=query)
         prompt = self.qa_prompt_tmpl_str.format(context=context, query=query)
-        response = self.llm.generate(prompt, image=img)
+        response = self.llm.generate(query, image=img, prompt=prompt)
         
-        logger.info("Response generated successfully.")
+        logger.debug("Response generated successfully.")
         return response
\ No newline at end of file
@@ -1,35 +1,42 @@
-from qdrant_client import models
-from rag_modules.vector_db import QdrantVDB
+from rag_modules.vector_db import VectorStore
 from rag_modules.embed_data import EmbedData
+from rag_modules.image_embed import ImageIndex
+from tracing import span
+from metrics import Histogram
 import time
 import logging
 
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
 
+qdrant_search_seconds = Histogram("qdrant_search_seconds", "Time taken by a Qdrant search", labels=("collection",))
+
 class Retriever:
     """
-    Retriever class that performs vector-based search using Qdrant.
+    Retriever class that performs vector-based search in a vector store.
     
     Attributes:
-        vector_db (QdrantVDB): The Qdrant vector database client.
+        vector_db (VectorStore): The vector store (remote or embedded Qdrant, NumPy).
         embeddata (EmbedData): The embedding model used for generating query embeddings.
+        image_index (ImageIndex): The figures of the collection embedded by the image encoder, None if they were captioned at ingest.
     """
-    def __init__(self, vector_db: QdrantVDB, embeddata: EmbedData):
+    def __init__(self, vector_db: VectorStore, embeddata: EmbedData, image_index: ImageIndex = None):
         """
         Initializes the Retriever with a vector database and an embedding model.
         
         Args:
-            vector_db (QdrantVDB): Instance of the Qdrant vector database.
+            vector_db (VectorStore): Instance of the vector store.
             embeddata (EmbedData): Instance of the embedding model.
+            image_index (ImageIndex, optional): Index of the figures of the current collection, set to its collection.
         """
         self.vector_db = vector_db
         self.embeddata = embeddata
-        logger.info("Retriever initialized with Qdrant vector database and embedding model.")
+        self.image_index = image_index
+        logger.info("Retriever initialized with vector store and embedding model.")
         
     def search(self, query: str, top_k: int=10):
         """
-        Searches for the most relevant vectors in the Qdrant database based on the query.
+        Searches for the most relevant vectors in the current collection based on the query.
         
         Args:
             query (str): The query text to be searched.
@@ -38,38 +45,46 @@ class Retriever:
         Returns:
             List[dict]: A list of retrieved results with context and source payloads.
         """
-        logger.info(f"Performing search for query: {query}")
+        logger.debug(f"Performing search for a query of {len(query)} chars.")
         
         # Generate embedding for the query
-        query_embedding = self.embeddata.embed_model.get_query_embedding(query)
-        logger.info("Query embedding generated successfully.")
+        with span("embed_query"):
+            query_embedding = self.embeddata.embed_model.get_query_embedding(query)
+        logger.debug("Query embedding generated successfully.")
         
         # Start timer to measure search execution time
         start_time = time.time()
         
         try:
-            result = self.vector_db.client.query_points(
-                collection_name=self.vector_db.collection_name,
-                
-                query=query_embedding,
-                
-                search_params=models.SearchParams(
-                    quantization=models.QuantizationSearchParams(
-                        ignore=True,
-                        rescore=True,
-                        oversampling=2.0,
-                    )
-                ),
-                limit=top_k,
-                timeout=1000,
-                with_payload=['context', 'source']
-            )
-            
+            with span("qdrant_search", collection=self.vector_db.collection_name, limit=top_k):
+                result = self.vector_db.search(query_embedding, limit=top_k)
+
             # Measure execution time
             elapsed_time = time.time() - start_time
-            logger.info(f"Search executed successfully in {elapsed_time:.4f} seconds.")
+            qdrant_search_seconds.observe(elapsed_time, self.vector_db.collection_name)
+            logger.debug(f"Search executed successfully in {elapsed_time:.4f} seconds.")
             
             return result
         except Exception as e:
             logger.error(f"Error occurred during search: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def search_images(self, query: str, top_k: int = None):
+        """
+        Searches the figures of the current collection a query describes, through the shared
+        text/image space of the image encoder.
+
+        Args:
+            query (str): The query text.
+            top_k (int, optional): The number of figures to retrieve. Defaults to Config.IMAGE_SEARCH_TOP_K.
+
+        Returns:
+            list: (image reference, score) of the figures, best first; empty without an image index or if the search fails.
+        """
+        if self.image_index is None:
+            return []
+        try:
+            return self.image_index.search(query, limit=top_k)
+        except Exception as e:
+            logger.error(f"Error occurred during figure search: {e}")
+            return []
@@ -0,0 +1,125 @@
+import math, re
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Boundaries a chunk is preferably split at: paragraph breaks and sentence ends
+SENTENCE_BOUNDARY = re.compile(r"\n{2,}|(?<=[.!?])\s+")
+
+class TokenChunker:
+    """
+    Splits texts into chunks that fit the context window of a tokenizer, so no part of a chunk
+    is silently truncated by the embedding or reranking model. Chunks are packed from whole
+    sentences (a sentence longer than the window is split between words), and consecutive
+    chunks share up to overlap_tokens tokens so a passage cut at a boundary stays retrievable.
+
+    Attributes:
+        tokenizer: A Hugging Face tokenizer, or None to estimate 4 characters per token.
+        max_tokens (int): Maximum number of tokens per chunk.
+        overlap_tokens (int): Tokens repeated from the end of a chunk at the start of the next.
+    """
+    def __init__(self, tokenizer=None, max_tokens: int = 512, overlap_tokens: int = 0):
+        """
+        Initializes the chunker.
+
+        Args:
+            tokenizer: A Hugging Face tokenizer, or None to estimate token counts.
+            max_tokens (int): Maximum number of tokens per chunk.
+            overlap_tokens (int): Tokens shared by consecutive chunks.
+
+        Raises:
+            ValueError: If the overlap is not smaller than the chunk size.
+        """
+        if max_tokens < 1 or not 0 <= overlap_tokens < max_tokens:
+            raise ValueError(f"Invalid chunk size {max_tokens} with overlap {overlap_tokens}")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Counts the tokens of a text, without special tokens.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            int: The number of tokens.
+        """
+        if self.tokenizer is None:
+            return math.ceil(len(text) / 4)
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def _units(self, text: str) -> list:
+        """
+        Splits a text into (piece, tokens) units no longer than max_tokens: sentences, or
+        runs of words for sentences longer than the window.
+        """
+        units = []
+        for sentence in SENTENCE_BOUNDARY.split(text):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            tokens = self.count_tokens(sentence)
+            if tokens <= self.max_tokens:
+                units.append((sentence, tokens))
+                continue
+            words, words_tokens = [], 0
+            for word in sentence.split():
+                word_tokens = self.count_tokens(" " + word)
+                if words and words_tokens + word_tokens > self.max_tokens:
+                    units.append((" ".join(words), words_tokens))
+                    words, words_tokens = [], 0
+                words.append(word)
+                words_tokens += word_tokens
+            if words:
+                units.append((" ".join(words), words_tokens))
+        return units
+
+    def split(self, text: str) -> list:
+        """
+        Splits a text into chunks of at most max_tokens tokens.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            list: The chunks, the text itself if it already fits.
+        """
+        if self.count_tokens(text) <= self.max_tokens:
+            return [text]
+
+        chunks, current, current_tokens = [], [], 0
+        for unit, tokens in self._units(text):
+            if current and current_tokens + tokens > self.max_tokens:
+                chunks.append(" ".join(piece for piece, _ in current))
+                # Carry the last units of the chunk over, within the overlap and leaving room for this unit
+                overlap, overlap_tokens = [], 0
+                for piece, piece_tokens in reversed(current):
+                    if overlap_tokens + piece_tokens > min(self.overlap_tokens, self.max_tokens - tokens):
+                        break
+                    overlap.insert(0, (piece, piece_tokens))
+                    overlap_tokens += piece_tokens
+                current, current_tokens = overlap, overlap_tokens
+            current.append((unit, tokens))
+            current_tokens += tokens
+        if current:
+            chunks.append(" ".join(piece for piece, _ in current))
+        return chunks
+
+    def split_all(self, texts):
+        """
+        Splits a stream of texts into chunks.
+
+        Args:
+            texts (Iterable[str]): The texts.
+
+        Yields:
+            str: The chunks, in order.
+        """
+        for text in texts:
+            chunks = self.split(text)
+            if len(chunks) > 1:
+                logger.debug(f"Split a text of {len(text)} characters into {len(chunks)} chunks of at most {self.max_tokens} tokens")
+            yield from chunks
@@ -1,6 +1,10 @@
-from qdrant_client import models, QdrantClient
 from utils import is_valid_url
+from abc import ABC, abstractmethod
+from threading import Lock, RLock
+from config import Config
 from tqdm import tqdm
+import numpy as np
+import json, os
 import logging
 from grpc import RpcError
 
@@ -8,11 +12,168 @@ from grpc import RpcError
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
 
-class QdrantVDB:
+# qdrant_client loads its REST and gRPC models: imported on first use by load_qdrant_client
+QdrantClient = models = None
+
+def load_qdrant_client():
+    """
+    Imports the Qdrant client and models used by this module.
+    """
+    global QdrantClient, models
+    if QdrantClient is None:
+        from qdrant_client import QdrantClient
+    if models is None:
+        from qdrant_client import models
+
+class VectorStore(ABC):
+    """
+    Interface of the vector stores the retriever and the upload services depend on; a backend
+    missing one of its abstract methods cannot be instantiated. A store holds several named
+    collections of (vector, payload) points; the payload of a point is its context and source, or the image store reference and source of a figure. Searches rank the points by dot product with the query vector
+    and return a Qdrant QueryResponse whatever the backend, so results are read the same way.
+
+    Attributes:
+        vector_dim (int): Dimensionality of the vectors.
+        batch_size (int): Batch size for ingestion.
+        collection_name (str): The current collection, set by create_or_set_collection.
+    """
+    def __init__(self, vector_dim=768, batch_size=512):
+        self.vector_dim = vector_dim
+        self.batch_size = batch_size
+        self.collection_name = None
+
+    @abstractmethod
+    def create_or_set_collection(self, collection_name):
+        """
+        Creates a new collection if it doesn't exist, or sets the current collection.
+
+        Args:
+            collection_name: Name of the collection.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add(self, contexts, embeddings, source):
+        """
+        Adds a batch of points to the current collection.
+
+        Args:
+            contexts: Texts of the points.
+            embeddings: Vectors of the points.
+            source: Source identifier of the points.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_images(self, refs, embeddings, source):
+        """
+        Adds a batch of figures to the current collection.
+
+        Args:
+            refs: Image store references of the figures.
+            embeddings: Vectors of the figures.
+            source: Source identifier of the figures.
+        """
+        raise NotImplementedError
+
+    def optimize(self):
+        """
+        Called once a file is ingested, e.g. to build the index of the collection.
+        """
+
+    @abstractmethod
+    def search(self, query_vector, limit=10):
+        """
+        Searches the current collection for the points closest to a query vector.
+
+        Args:
+            query_vector: The query embedding.
+            limit: Number of points to return.
+
+        Returns:
+            QueryResponse: The points, best first, with their context (or image_ref) and source payloads.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_source(self, source):
+        """
+        Deletes the points of a source from the current collection.
+
+        Args:
+            source: Source identifier of the points.
+        """
+        raise NotImplementedError
+
+    def batch_iterate(self, lst, batch_size):
+        """
+        Yields batches from a given list.
+        
+        Args:
+            lst: List to be batched.
+            batch_size: Size of each batch.
+        """
+        for i in range(0, len(lst), batch_size):
+            yield lst[i : i + batch_size]
+    
+    def ingest_data(self, embeddata, source):
+        """
+        Ingests data into the current collection in batches.
+        
+        Args:
+            embeddata: An instance of EmbedData containing contexts and embeddings.
+            source: Source identifier for the ingested data.
+        """
+        logger.info("Starting data ingestion for collection: %s", self.collection_name)
+        try:
+            for batch_context, batch_embeddings in tqdm(zip(self.batch_iterate(embeddata.contexts, self.batch_size), 
+                                                            self.batch_iterate(embeddata.embeddings, self.batch_size)), 
+                                                        total=len(embeddata.contexts)//self.batch_size, 
+                                                        desc="Ingesting in batches"):
+            
+                self.add(batch_context, batch_embeddings, source)
+                logger.info("Ingested a batch of %d items into collection %s", len(batch_context), self.collection_name)
+                
+            self.optimize()
+        except Exception as e:
+            logger.error("Error during data ingestion: %s", str(e), exc_info=True)
+            raise
+
+    def ingest_stream(self, batches, source):
+        """
+        Ingests a stream of embedded batches as they arrive, so the first chunks of a file are
+        searchable before it is fully extracted. If the stream fails, the points already
+        ingested for the source are deleted.
+
+        Args:
+            batches: Iterable of (contexts, embeddings) batches, e.g. from EmbedData.embed_stream.
+            source: Source identifier for the ingested data.
+
+        Returns:
+            int: Number of ingested points.
+        """
+        logger.info("Starting streamed data ingestion for collection: %s", self.collection_name)
+        count = 0
+        try:
+            for batch_context, batch_embeddings in batches:
+                self.add(batch_context, batch_embeddings, source)
+                count += len(batch_context)
+                logger.info("Ingested a batch of %d items into collection %s", len(batch_context), self.collection_name)
+        except Exception as e:
+            logger.error("Error during streamed data ingestion: %s", str(e), exc_info=True)
+            if count:
+                self.delete_source(source)
+            raise
+        if count:
+            self.optimize()
+        logger.info("Ingested %d items from %s into collection %s", count, source, self.collection_name)
+        return count
+
+class QdrantVDB(VectorStore):
     """
     A class to manage interactions with Qdrant vector database.
     """
-    def __init__(self, vector_dim=768, batch_size=512, url="http://localhost:6333"):
+    def __init__(self, vector_dim=768, batch_size=512, url="http://localhost:6333", client=None):
         """
         Initializes Qdrant vector database client.
 
@@ -20,9 +181,14 @@ class QdrantVDB:
             vector_dim: Dimensionality of the vectors.
             batch_size: Batch size for ingestion.
             url: Qdrant server URL, defaults to localhost.
+            client: An existing client (e.g. an embedded QdrantClient(":memory:")), used instead of connecting to url.
         """
-        self.batch_size = batch_size
-        self.vector_dim = vector_dim
+        super().__init__(vector_dim, batch_size)
+        load_qdrant_client()
+        if client is not None:
+            self.client = client
+            logger.info("QdrantVDB initialized with vector_dim=%d, batch_size=%d on a provided client", vector_dim, batch_size)
+            return
         try:
             if not is_valid_url(url):
                 logger.error(f"Invalid URL provided: {url}")
@@ -59,43 +225,279 @@ class QdrantVDB:
             logger.error(f"Error creating or setting collection: %s", str(e), exc_info=True)
             raise
             
-    def batch_iterate(self, lst, batch_size):
+    def add(self, contexts, embeddings, source):
+        self.client.upload_collection(collection_name=self.collection_name,
+                                    vectors=embeddings,
+                                    payload=[{"context": context, "source": source} for context in contexts]
+                                    )
+
+    def add_images(self, refs, embeddings, source):
+        self.client.upload_collection(collection_name=self.collection_name,
+                                    vectors=embeddings,
+                                    payload=[{"image_ref": ref, "source": source} for ref in refs]
+                                    )
+
+    def optimize(self):
+        # Index the collection once ingested (indexing is disabled while uploading)
+        self.client.update_collection(collection_name=self.collection_name,
+                                    optimizer_config=models.OptimizersConfigDiff(indexing_threshold=20000)
+                                    )
+        logger.info("Collection %s updated successfully with new optimizer settings", self.collection_name)
+
+    def search(self, query_vector, limit=10):
+        return self.client.query_points(
+            collection_name=self.collection_name,
+            query=query_vector,
+            search_params=models.SearchParams(
+                quantization=models.QuantizationSearchParams(
+                    ignore=True,
+                    rescore=True,
+                    oversampling=2.0,
+                )
+            ),
+            limit=limit,
+            timeout=1000,
+            with_payload=['context', 'image_ref', 'source']
+        )
+
+    def delete_source(self, source):
         """
-        Yields batches from a given list.
-        
+        Deletes the points of a source from the current collection.
+
         Args:
-            lst: List to be batched.
-            batch_size: Size of each batch.
+            source: Source identifier of the points.
         """
-        for i in range(0, len(lst), batch_size):
-            yield lst[i : i + batch_size]
-    
-    def ingest_data(self, embeddata, source):
+        try:
+            self.client.delete(collection_name=self.collection_name,
+                               points_selector=models.FilterSelector(filter=models.Filter(
+                                   must=[models.FieldCondition(key="source", match=models.MatchValue(value=source))]
+                               )))
+            logger.info("Deleted points of %s from collection %s", source, self.collection_name)
+        except Exception as e:
+            logger.error("Error deleting points of %s: %s", source, str(e), exc_info=True)
+
+# Embedded clients by storage path: local mode locks its directory, so a process opens it once
+_local_clients = {}
+_local_clients_lock = Lock()
+
+def get_local_client(path):
+    """
+    Returns the embedded (in-process) Qdrant client storing its collections at path.
+
+    Args:
+        path: Storage directory, or ":memory:" to keep the collections in memory.
+
+    Returns:
+        QdrantClient: The client, shared by every store using the same path.
+    """
+    load_qdrant_client()
+    with _local_clients_lock:
+        if path not in _local_clients:
+            if path == ":memory:":
+                _local_clients[path] = QdrantClient(":memory:")
+            else:
+                os.makedirs(path, exist_ok=True)
+                _local_clients[path] = QdrantClient(path=path)
+            logger.info("Opened embedded Qdrant storage at %s", path)
+        return _local_clients[path]
+
+class EmbeddedQdrantVDB(QdrantVDB):
+    """
+    Qdrant in local mode: the collections live in this process (in memory or in a directory)
+    and are searched exactly, with no server and no network hop. Suited to single-node
+    deployments, CI and benchmarks; the storage directory can only be opened by one process.
+    """
+    def __init__(self, vector_dim=768, batch_size=512, path=":memory:"):
         """
-        Ingests data into the Qdrant vector database in batches.
-        
+        Initializes the embedded Qdrant client.
+
         Args:
-            embeddata: An instance of EmbedData containing contexts and embeddings.
-            source: Source identifier for the ingested data.
+            vector_dim: Dimensionality of the vectors.
+            batch_size: Batch size for ingestion.
+            path: Storage directory, or ":memory:".
         """
-        logger.info("Starting data ingestion for collection: %s", self.collection_name)
+        super().__init__(vector_dim, batch_size, client=get_local_client(path))
+
+    def search(self, query_vector, limit=10):
+        # Local mode always searches exactly, the quantization parameters do not apply
+        return self.client.query_points(collection_name=self.collection_name, query=query_vector, limit=limit,
+                                        with_payload=['context', 'image_ref', 'source'])
+
+class NumpyCollection:
+    """
+    The points of a collection of the NumPy store: vectors appended to a float32 file read
+    through a memory map, and their payloads as JSON lines, in the same order.
+
+    Attributes:
+        path (str): Directory of the collection.
+        vector_dim (int): Dimensionality of the vectors.
+        payloads (list): Payload of every point, by row.
+    """
+    def __init__(self, path, vector_dim):
+        self.path = path
+        self.vector_dim = vector_dim
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.payloads_path = os.path.join(path, "payloads.jsonl")
+        self.lock = RLock()
+        self._matrix = None
+        os.makedirs(path, exist_ok=True)
+        self.payloads = []
+        if os.path.exists(self.payloads_path):
+            with open(self.payloads_path, encoding="utf-8") as f:
+                self.payloads = [json.loads(line) for line in f if line.strip()]
+        rows = os.path.getsize(self.vectors_path) // (4 * vector_dim) if os.path.exists(self.vectors_path) else 0
+        if rows != len(self.payloads): # An interrupted append, keep the complete points
+            logger.warning("Collection at %s has %d vectors and %d payloads, truncating to the smaller", path, rows, len(self.payloads))
+            count = min(rows, len(self.payloads))
+            vectors = np.fromfile(self.vectors_path, dtype=np.float32, count=count * vector_dim) if rows else np.empty(0, np.float32)
+            self._rewrite(vectors.reshape(-1, vector_dim), self.payloads[:count])
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def matrix(self):
+        """
+        Returns the vectors as a read-only memory-mapped (count, vector_dim) array.
+        """
+        with self.lock:
+            if self._matrix is None and self.payloads:
+                self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.payloads), self.vector_dim))
+            return self._matrix
+
+    def append(self, vectors, payloads):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.vector_dim:
+            raise ValueError(f"Expected vectors of dimension {self.vector_dim}, got shape {vectors.shape}")
+        with self.lock:
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.payloads_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(payload) + "\n" for payload in payloads)
+            self.payloads.extend(payloads)
+            self._matrix = None
+
+    def delete(self, keep):
+        """
+        Removes the points whose payload does not satisfy keep.
+
+        Returns:
+            int: Number of removed points.
+        """
+        with self.lock:
+            mask = np.array([bool(keep(payload)) for payload in self.payloads], dtype=bool)
+            removed = int(len(mask) - mask.sum())
+            if removed:
+                matrix = self.matrix()
+                self._rewrite(np.array(matrix[mask]) if matrix is not None else np.empty((0, self.vector_dim), np.float32),
+                              [payload for payload, kept in zip(self.payloads, mask) if kept])
+            return removed
+
+    def _rewrite(self, vectors, payloads):
+        # Write complete files next to the current ones, then swap them in
+        self._matrix = None
+        vectors.astype(np.float32).tofile(self.vectors_path + ".tmp")
+        with open(self.payloads_path + ".tmp", "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(payload) + "\n" for payload in payloads)
+        os.replace(self.vectors_path + ".tmp", self.vectors_path)
+        os.replace(self.payloads_path + ".tmp", self.payloads_path)
+        self.payloads = list(payloads)
+
+    def search(self, query_vector, limit):
+        """
+        Exact search by dot product.
+
+        Returns:
+            list: (row, score, payload) of the best points, best first.
+        """
+        with self.lock:
+            matrix = self.matrix()
+            if matrix is None or limit <= 0:
+                return []
+            scores = matrix @ np.asarray(query_vector, dtype=np.float32)
+            k = min(limit, len(scores))
+            rows = np.argpartition(-scores, k - 1)[:k]
+            rows = rows[np.argsort(-scores[rows], kind="stable")]
+            return [(int(row), float(scores[row]), self.payloads[row]) for row in rows]
+
+# Collections of the NumPy store by directory, shared by the store instances of a process
+_numpy_collections = {}
+_numpy_collections_lock = Lock()
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact-search vector store backed by NumPy memory-mapped files, one directory per
+    collection. A query scans the whole collection, which takes a few milliseconds for
+    tens of thousands of points: suited to small (e.g. per-user) collections, with no
+    server and no index to build.
+
+    Attributes:
+        directory (str): Directory holding the collections.
+    """
+    def __init__(self, vector_dim=768, batch_size=512, directory="vector_store/numpy"):
+        """
+        Initializes the store.
+
+        Args:
+            vector_dim: Dimensionality of the vectors.
+            batch_size: Batch size for ingestion.
+            directory: Directory holding the collections.
+        """
+        super().__init__(vector_dim, batch_size)
+        self.directory = directory
+        self.collection = None
+        logger.info("NumpyVectorStore initialized with vector_dim=%d, batch_size=%d, directory=%s", vector_dim, batch_size, directory)
+
+    def create_or_set_collection(self, collection_name):
+        if not collection_name or os.sep in collection_name or collection_name.startswith("."):
+            raise ValueError(f"Invalid collection name: {collection_name}")
+        path = os.path.abspath(os.path.join(self.directory, collection_name))
+        with _numpy_collections_lock:
+            if path not in _numpy_collections:
+                _numpy_collections[path] = NumpyCollection(path, self.vector_dim)
+                logger.info("Opened collection %s with %d points", collection_name, len(_numpy_collections[path]))
+        self.collection_name = collection_name
+        self.collection = _numpy_collections[path]
+
+    def add(self, contexts, embeddings, source):
+        self.collection.append(embeddings, [{"context": context, "source": source} for context in contexts])
+
+    def add_images(self, refs, embeddings, source):
+        self.collection.append(embeddings, [{"image_ref": ref, "source": source} for ref in refs])
+
+    def search(self, query_vector, limit=10):
+        from qdrant_client.http.models import QueryResponse, ScoredPoint
+        hits = self.collection.search(query_vector, limit)
+        return QueryResponse(points=[
+            ScoredPoint(id=row, version=0, score=score, payload=payload) for row, score, payload in hits
+        ])
+
+    def delete_source(self, source):
         try:
-            for batch_context, batch_embeddings in tqdm(zip(self.batch_iterate(embeddata.contexts, self.batch_size), 
-                                                            self.batch_iterate(embeddata.embeddings, self.batch_size)), 
-                                                        total=len(embeddata.contexts)//self.batch_size, 
-                                                        desc="Ingesting in batches"):
-            
-                self.client.upload_collection(collection_name=self.collection_name,
-                                            vectors=batch_embeddings,
-                                            payload=[{"context": context, "source": source} for context in batch_context]
-                                            )
-                logger.info("Ingested a batch of %d items into collection %s", len(batch_context), self.collection_name)
-                
-            # Update collection optimizer configuration after ingestion
-            self.client.update_collection(collection_name=self.collection_name,
-                                        optimizer_config=models.OptimizersConfigDiff(indexing_threshold=20000)
-                                        )
-            logger.info("Collection %s updated successfully with new optimizer settings", self.collection_name)
+            removed = self.collection.delete(lambda payload: payload.get("source") != source)
+            logger.info("Deleted %d points of %s from collection %s", removed, source, self.collection_name)
         except Exception as e:
-            logger.error("Error during data ingestion: %s", str(e), exc_info=True)
-            raise
\ No newline at end of file
+            logger.error("Error deleting points of %s: %s", source, str(e), exc_info=True)
+
+def create_vector_store(backend=None, vector_dim=768):
+    """
+    Creates the vector store selected by Config.VECTOR_STORE.
+
+    Args:
+        backend: "qdrant", "qdrant_local" or "numpy", defaults to Config.VECTOR_STORE.
+        vector_dim: Dimensionality of the vectors.
+
+    Returns:
+        VectorStore: The store.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    backend = backend or Config.VECTOR_STORE
+    if backend == "qdrant":
+        return QdrantVDB(vector_dim=vector_dim, url=Config.QDRANT_URL)
+    if backend == "qdrant_local":
+        return EmbeddedQdrantVDB(vector_dim=vector_dim, path=Config.QDRANT_LOCAL_PATH)
+    if backend == "numpy":
+        return NumpyVectorStore(vector_dim=vector_dim, directory=Config.NUMPY_STORE_DIR)
+    logger.error(f"Unknown vector store: {backend}")
+    raise ValueError(f"Unknown vector store: {backend}")
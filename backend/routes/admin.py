@@ -1,10 +1,12 @@
-from fastapi import Depends, APIRouter, File, UploadFile, Form
+from fastapi import Depends, APIRouter, File, UploadFile, Form, Query
 from sqlalchemy.orm import Session
 from services.rag_service import get_embed_data_obj, get_vector_db
-from models.mongo_db import get_files_collection
+from models.mongo_db import get_files_collection, connect_mongo
+from models.mongo_indexes import index_report
 from services.admin import create_admin, list_all_users, delete_user_from_db, upload_files, list_all_files
 from models.sql_db import get_db
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from models.user import User
 from auth.dependencies import admin_only
 from schemas.user import UserRegister, RegisterResponse
@@ -17,22 +19,30 @@ logger = logging.getLogger("Multimodal_rag_bot")
 router = APIRouter()
 
 @router.get("/users")
-def list_users(db: Session = Depends(get_db), current_user: User = Depends(admin_only)):
+async def list_users(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    is_admin: Optional[bool] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(admin_only)):
     """
-    Retrieve a list of all registered users. (Admin Only)
+    Retrieve a page of registered users, ordered by ID. (Admin Only)
     
     Args:
+        - limit: Maximum number of users to return
+        - cursor: Cursor returned by the previous page
+        - is_admin: Only admins (true) or only regular users (false)
         - db: Database session dependency
         - current_user: The currently authenticated admin user
 
     Returns:
-        - List of user details
+        - User details of the page and the next page cursor
     """
-    logger.info(f"Admin {current_user.username} requested the list of all users.")
-    return list_all_users(db)
+    logger.info(f"Admin {current_user.username} requested a page of users.")
+    return await list_all_users(db, limit, cursor, is_admin)
 
 @router.delete("/users/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(admin_only)):
+async def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(admin_only)):
     """
     Delete a user by user ID. (Admin Only)
     
@@ -45,10 +55,10 @@ def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User
         - Confirmation message upon successful deletion
     """
     logger.info(f"Admin {current_user.username} is deleting user with ID {user_id}.")
-    return delete_user_from_db(db, user_id)
+    return await delete_user_from_db(db, user_id)
 
 @router.post("/register_admin", response_model=RegisterResponse)
-def register(user: UserRegister, db: Session = Depends(get_db), current_user: User = Depends(admin_only)):
+async def register(user: UserRegister, db: Session = Depends(get_db), current_user: User = Depends(admin_only)):
     """
     Register a new admin user. (Admin Only)
     
@@ -61,7 +71,7 @@ def register(user: UserRegister, db: Session = Depends(get_db), current_user: Us
         - Confirmation message and username of the newly created admin
     """
     logger.info(f"Admin {current_user.username} is registering a new admin: {user.username}.")
-    new_user = create_admin(user, db)
+    new_user = await create_admin(user, db)
     return {"message": "New Admin registered successfully", "username": new_user.username}
 
 @router.post("/upload")
@@ -93,16 +103,46 @@ async def upload_file(
     return {"message": f"All Files uploaded successfully"}
 
 @router.get("/list_files")
-async def list_files(current_user: User = Depends(admin_only), files_collection = Depends(get_files_collection),):
+async def list_files(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    uploader: Optional[str] = None,
+    tag: Optional[str] = None,
+    collection_name: Optional[str] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    current_user: User = Depends(admin_only),
+    files_collection = Depends(get_files_collection)):
     """
-    Retrieve a list of all uploaded files. (Admin Only)
+    Retrieve a page of uploaded files, newest first. (Admin Only)
     
     Args:
+        - limit: Maximum number of files to return
+        - cursor: Cursor returned by the previous page
+        - uploader: Only files uploaded by this user
+        - tag: Only files carrying this tag
+        - collection_name: Only files ingested into this vector collection
+        - uploaded_after: Only files uploaded at or after this time
+        - uploaded_before: Only files uploaded before this time
         - current_user: The currently authenticated admin user
         - files_collection: MongoDB collection dependency
 
     Returns:
-        - List of all files in the system
+        - Files of the page and the next page cursor
     """
-    logger.info(f"Admin {current_user.username} requested the list of all files.")
-    return await list_all_files(files_collection)
\ No newline at end of file
+    logger.info(f"Admin {current_user.username} requested a page of files.")
+    return await list_all_files(files_collection, limit, cursor, uploader, tag, collection_name, uploaded_after, uploaded_before)
+
+@router.get("/indexes")
+async def list_index_report(current_user: User = Depends(admin_only)):
+    """
+    Report the missing, unused and unmanaged MongoDB indexes of each collection. (Admin Only)
+    
+    Args:
+        - current_user: The currently authenticated admin user
+
+    Returns:
+        - Index report by collection name
+    """
+    logger.info(f"Admin {current_user.username} requested the index report.")
+    return await index_report(connect_mongo())
\ No newline at end of file
@@ -12,7 +12,7 @@ logger = logging.getLogger("Multimodal_rag_bot")
 router = APIRouter()
 
 @router.post("/register", response_model=RegisterResponse)
-def register(user: UserRegister, db: Session = Depends(get_db)):
+async def register(user: UserRegister, db: Session = Depends(get_db)):
     """
     Registers a new user.
     
@@ -26,14 +26,14 @@ def register(user: UserRegister, db: Session = Depends(get_db)):
     logger.info(f"Registering new user: {user.username}")
     
     # Create a new user in the database
-    new_user = create_user(user, db)
+    new_user = await create_user(user, db)
     
     logger.info(f"User {new_user.username} registered successfully.")
     
     return {"message": "User registered successfully", "username": new_user.username}
 
 @router.post("/login", response_model=LoginResponse)
-def login(user: UserLogin, db: Session = Depends(get_db)):
+async def login(user: UserLogin, db: Session = Depends(get_db)):
     """
     Authenticates a user and returns an access token.
     
@@ -47,10 +47,10 @@ def login(user: UserLogin, db: Session = Depends(get_db)):
     logger.info(f"User {user.username} attempting to log in.")
     
     # Authenticate user credentials
-    db_user = authenticate_user(user, db)
+    db_user = await authenticate_user(user, db)
     
     # Generate access token for the authenticated user
-    access_token = create_access_token_for_user(user, db_user.is_admin)
+    access_token = create_access_token_for_user(user, db_user.is_admin, db_user.id)
     
     logger.info(f"User {user.username} logged in successfully. Admin: {db_user.is_admin}")
     
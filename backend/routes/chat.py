@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, Form, UploadFile
+from fastapi import APIRouter, Depends, Form, Query, UploadFile
 from auth.dependencies import verify_token
 from models.user import User
 from models.session import create_new_session
-from models.mongo_db import get_users_collection
-from services.chat_service import chat_bot, delete_session_data, get_user_sessions
+from models.mongo_db import get_sessions_collection, get_messages_collection
+from services.chat_service import chat_bot, delete_session_data, get_user_sessions, list_session_summaries, list_session_messages
+from typing import Optional
 import logging
 
 # Configure logger
@@ -27,42 +28,76 @@ def chat(user: User = Depends(verify_token)):
     return {"message": f"Welcome to the chat, {user.username}!"}
 
 @router.get("/sessions")
-async def list_sessions(user: dict = Depends(get_user_sessions)):
+async def list_sessions(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user: dict = Depends(get_user_sessions), 
+    sessions_collection = Depends(get_sessions_collection)):
     """
-    Retrieve a list of all chat sessions for the authenticated user.
+    Retrieve a page of chat session summaries for the authenticated user, newest first.
 
     Args:
-        user (dict): The authenticated user's session data.
+        limit (int): Maximum number of sessions to return.
+        cursor (str, optional): Cursor returned by the previous page.
+        user (dict): The authenticated user's data.
+        sessions_collection: MongoDB collection for chat session headers.
 
     Returns:
-        dict: List of chat sessions including session IDs and message counts.
+        dict: Session summaries (IDs, titles, message counts, last activity) and the next page cursor.
     """
     logger.info(f"Listing chat sessions for user: {user['username']}.")
-    return {"sessions": [{"session_id": s["session_id"], "messages_count": len(s["messages"]), "messages": s["messages"]} for s in user["chat_sessions"]]}
+    return await list_session_summaries(user["username"], sessions_collection, limit, cursor)
+
+@router.get("/sessions/{session_id}/messages")
+async def list_messages(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[int] = Query(None, ge=0),
+    user: dict = Depends(get_user_sessions),
+    messages_collection = Depends(get_messages_collection)):
+    """
+    Retrieve a page of messages of a chat session, going backwards from the latest message.
+
+    Args:
+        session_id (str): The ID of the chat session.
+        limit (int): Maximum number of messages to return.
+        before (int, optional): Only return messages older than this sequence number.
+        user (dict): The authenticated user's data.
+        messages_collection: MongoDB collection for chat messages.
+
+    Returns:
+        dict: The messages in chronological order and the cursor of the previous page.
+    """
+    logger.info(f"Listing messages of session {session_id} for user: {user['username']}.")
+    return await list_session_messages(user["username"], session_id, messages_collection, limit, before)
 
 @router.post("/create_session")
-async def create_session(user: dict = Depends(get_user_sessions), users_collection = Depends(get_users_collection)):
+async def create_session(user: dict = Depends(get_user_sessions), sessions_collection = Depends(get_sessions_collection)):
     """
     Create a new chat session for the authenticated user.
 
     Args:
-        user (dict): The authenticated user's session data.
-        users_collection: MongoDB collection for user data.
+        user (dict): The authenticated user's data.
+        sessions_collection: MongoDB collection for chat session headers.
 
     Returns:
         dict: The newly created session ID.
     """
     logger.info(f"Creating a new chat session for user: {user['username']}.")
     
-    new_session = create_new_session(user)
-    await users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$push": {"chat_sessions": new_session}}
-    )
+    new_session = await create_new_session(sessions_collection, user["username"], set_history=False)
     return {"session_id": new_session["session_id"]}
 
 @router.post("/chat_ai")
-async def chat(session_id: str = Form(...), message: str = Form(...), image: UploadFile = None, rag_mode: str = Form(...)):
+async def chat(
+    session_id: str = Form(...), 
+    message: str = Form(...), 
+    image: UploadFile = None, 
+    rag_mode: str = Form(...),
+    user: dict = Depends(get_user_sessions),
+    sessions_collection = Depends(get_sessions_collection),
+    messages_collection = Depends(get_messages_collection),
+    current_user: User = Depends(verify_token)):
     """
     Endpoint to chat with AI in different modes.
 
@@ -71,25 +106,36 @@ async def chat(session_id: str = Form(...), message: str = Form(...), image: Upl
         message (str): User's input message.
         image (UploadFile, optional): An image file uploaded by the user.
         rag_mode (str): Retrieval mode ('all', 'user', or 'no-rag').
+        user (dict): The authenticated user's data.
+        sessions_collection: MongoDB collection for chat session headers.
+        messages_collection: MongoDB collection for chat messages.
+        current_user (User): The authenticated user.
 
     Returns:
-        dict: AI-generated response message and session ID.
+        dict: AI-generated response message, session ID and token usage of the turn.
     """
-    response, session = await chat_bot(session_id, message, image, rag_mode)
+    response, session = await chat_bot(session_id, message, image, rag_mode, user, sessions_collection, messages_collection, current_user)
     
-    return {"message": response.message.content, "session_id": session["session_id"]}
+    return {"message": response.message.content, "session_id": session["session_id"], "usage": session["messages"][-1].get("usage")}
 
 @router.delete("/sessions/{session_id}")
-async def delete_session(session_id: str):
+async def delete_session(
+    session_id: str, 
+    user: dict = Depends(get_user_sessions),
+    sessions_collection = Depends(get_sessions_collection),
+    messages_collection = Depends(get_messages_collection)):
     """
     Delete a chat session by its session ID.
 
     Args:
         session_id (str): The ID of the session to delete.
+        user (dict): The authenticated user's data.
+        sessions_collection: MongoDB collection for chat session headers.
+        messages_collection: MongoDB collection for chat messages.
 
     Returns:
         dict: Confirmation message after deletion.
     """
-    await delete_session_data(session_id)
+    await delete_session_data(session_id, user, sessions_collection, messages_collection)
 
     return {"message": "Session deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.warmup import readiness
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Create a FastAPI router for the load balancer probes
+router = APIRouter()
+
+@router.get("/live")
+async def live():
+    """
+    Liveness probe: the worker is up and its event loop answers.
+
+    Returns:
+        dict: The status.
+    """
+    return {"status": "alive"}
+
+@router.get("/ready")
+def ready():
+    """
+    Readiness probe: answers 200 once every model is warm, 503 while warming up, so traffic
+    is only routed to warm workers.
+
+    Returns:
+        JSONResponse: The status and the warm-up state of every component.
+    """
+    is_ready = readiness.ready
+    return JSONResponse(status_code=200 if is_ready else 503,
+                        content={"status": "ready" if is_ready else "warming_up", "components": readiness.snapshot()})
@@ -1,13 +1,13 @@
-from fastapi import APIRouter, Depends, File, UploadFile, Form
+from fastapi import APIRouter, Depends, File, UploadFile, Form, Query
 from auth.dependencies import verify_token
 from models.mongo_db import get_files_collection
 from motor.motor_asyncio import AsyncIOMotorCollection
 from rag_modules.embed_data import EmbedData
-from rag_modules.vector_db import QdrantVDB
+from rag_modules.vector_db import VectorStore
 from models.user import User
-from services.rag_service import get_embed_data_obj, get_vector_db
+from services.rag_service import get_embed_data_obj, get_user_vector_db
 from services.user import list_all_files, upload_files
-from typing import List
+from typing import List, Optional
 import logging
 
 # Configure logger
@@ -23,7 +23,7 @@ async def upload_file(
     current_user: User = Depends(verify_token), 
     files_collection: AsyncIOMotorCollection = Depends(get_files_collection),
     embed_data: EmbedData = Depends(get_embed_data_obj),
-    vector_db: QdrantVDB = Depends(get_vector_db)
+    vector_db: VectorStore = Depends(get_user_vector_db)
     ):
     """
     Handles file uploads, stores metadata in the database, and processes embeddings and store in vector db.
@@ -50,22 +50,30 @@ async def upload_file(
     return {"message": f"All Files uploaded successfully"}
 
 @router.get("/list_files")
-async def list_files(current_user: User = Depends(verify_token), files_collection: AsyncIOMotorCollection = Depends(get_files_collection)):
+async def list_files(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    tag: Optional[str] = None,
+    current_user: User = Depends(verify_token),
+    files_collection: AsyncIOMotorCollection = Depends(get_files_collection)):
     """
-    Retrieves the list of files uploaded by the authenticated user.
+    Retrieves a page of the files uploaded by the authenticated user, newest first.
 
     Args:
+        limit (int): Maximum number of files to return.
+        cursor (str, optional): Cursor returned by the previous page.
+        tag (str, optional): Only files carrying this tag.
         current_user (User): The authenticated user making the request.
         files_collection: MongoDB collection for file metadata storage.
 
     Returns:
-        List[dict]: A list of file metadata stored in the database.
+        dict: File metadata of the page and the next page cursor.
     """
     
     logger.info(f"Fetching file list for user: {current_user.username}")
     
-    file_list = await list_all_files(current_user, files_collection)
+    page = await list_all_files(current_user, files_collection, limit, cursor, tag)
 
-    logger.info(f"Retrieved {len(file_list)} file(s) for user: {current_user.username}")
+    logger.info(f"Retrieved {len(page['files'])} file(s) for user: {current_user.username}")
 
-    return file_list
\ No newline at end of file
+    return page
\ No newline at end of file
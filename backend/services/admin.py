@@ -1,17 +1,22 @@
 from fastapi import HTTPException, UploadFile, status
-from rag_modules.vector_db import QdrantVDB
+from rag_modules.vector_db import VectorStore
+from rag_modules.image_embed import ImageIndex
 from rag_modules.embed_data import EmbedData
-from rag_modules.document_extract import extract_pdf_data, extract_txt_data, extract_image_data
-from services.rag_service import bot
+from rag_modules.document_extract import stream_file_data, ingest_queue_depth
+from file_types import detect_file_type
+from services.rag_service import bot, get_image_index
 from typing import List
-from utils import get_file_hash, get_unique_filename, is_image, is_pdf, is_txt
+from utils import get_file_hash, get_unique_filename, encode_cursor, decode_cursor
+from models.files import build_file_query, list_files_page, parse_tags
 from datetime import datetime
-from models.user import User
+from models.user import User, get_user_by_username, get_user_by_id, get_users_page, add_user, delete_user
+from models.sql_db import run_db
 from sqlalchemy.orm import Session
 from schemas.user import UserRegister
-from auth.security import hash_password
+from auth.security import hash_password_async
 from pathlib import Path
 from config import Config
+from cache import user_sessions_cache, auth_user_cache
 from motor.motor_asyncio import AsyncIOMotorCollection
 import os, logging
 
@@ -21,20 +26,34 @@ logger = logging.getLogger("Multimodal_rag_bot")
 # Define the upload folder path from configuration
 UPLOAD_FOLDER = Path(Config.ADMIN_UPLOAD_FILE_LOCATION)
 
-def list_all_users(db: Session):
+# Vector collection holding the files uploaded by admins
+ADMIN_COLLECTION_NAME = 'multimodal_rag_admin_collection'
+
+async def list_all_users(db: Session, limit: int = 50, cursor: str = None, is_admin: bool = None):
     """
-    Lists all users in the database.
+    Lists a page of users in the database, ordered by ID.
 
     Args:
         db: The database session object.
+        limit: Maximum number of users to return.
+        cursor: Cursor returned by the previous page.
+        is_admin: Only admins (True) or only regular users (False).
 
     Returns:
-        A list of dictionaries representing all users in the database.
+        A dictionary with the users of the page and the cursor of the next page (None on the last page).
     """
     try:
-        # Fetch all users from the database
-        users_list = db.query(User).all()
-        return [user.to_dict() for user in users_list]
+        after_id = decode_cursor(cursor)["id"] if cursor else 0
+        if not isinstance(after_id, int):
+            raise ValueError(f"Invalid cursor: {cursor}")
+    except (ValueError, KeyError):
+        logger.error(f"Invalid users cursor: {cursor}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    try:
+        # Fetch one user more than requested to know whether a next page exists
+        users_list = await run_db(db, get_users_page, after_id, limit + 1, is_admin)
+        next_cursor = encode_cursor({"id": users_list[limit - 1].id}) if len(users_list) > limit else None
+        return {"users": [user.to_dict() for user in users_list[:limit]], "next_cursor": next_cursor}
     except Exception as e:
         logger.error(f"Failed to list users: {str(e)}")
         raise HTTPException(
@@ -42,7 +61,7 @@ def list_all_users(db: Session):
             detail=f"Failed to list users: {str(e)}"
         )
 
-def delete_user_from_db(db: Session, user_id):
+async def delete_user_from_db(db: Session, user_id):
     """
     Deletes a user from the database by ID.
 
@@ -55,15 +74,18 @@ def delete_user_from_db(db: Session, user_id):
     """
     try:
         # Fetch user from the database
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await run_db(db, get_user_by_id, user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found",
             )
         # Delete the user and commit the transaction
-        db.delete(user)
-        db.commit()
+        await run_db(db, delete_user, user)
+        
+        # Drop the user's cached data so no worker keeps serving it
+        user_sessions_cache.delete(user.username)
+        auth_user_cache.delete(user.username)
         
         logger.info(f"User {user.username} deleted successfully.")
         return {"message": f"User {user.username} deleted successfully"}
@@ -74,7 +96,7 @@ def delete_user_from_db(db: Session, user_id):
             detail=f"Failed to delete user: {str(e)}"
         )
 
-def create_admin(user: UserRegister, db: Session) -> User:
+async def create_admin(user: UserRegister, db: Session) -> User:
     """
     Creates a new admin user and stores it in the database.
 
@@ -87,7 +109,7 @@ def create_admin(user: UserRegister, db: Session) -> User:
     """
     try:
         # Check if the user already exists
-        existing_user = db.query(User).filter(User.username == user.username).first()
+        existing_user = await run_db(db, get_user_by_username, user.username)
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -95,12 +117,11 @@ def create_admin(user: UserRegister, db: Session) -> User:
             )
             
         # Hash the password and create the new admin user
-        hashed_pw = hash_password(user.password)
+        hashed_pw = await hash_password_async(user.password)
         new_user = User(username=user.username, hashed_password=hashed_pw, is_admin=True)
         
         # Add the user and commit the transaction
-        db.add(new_user)
-        db.commit()
+        await run_db(db, add_user, new_user)
         
         logger.info(f"Admin user {new_user.username} created successfully.")
         return new_user
@@ -111,7 +132,8 @@ def create_admin(user: UserRegister, db: Session) -> User:
             detail=f"Failed to create admin user: {str(e)}"
         )
 
-async def upload_files(files: List[UploadFile], tags: str, files_collection: AsyncIOMotorCollection, current_user: User, embed_data: EmbedData, vector_db: QdrantVDB):
+async def upload_files(files: List[UploadFile], tags: str, files_collection: AsyncIOMotorCollection, current_user: User, embed_data: EmbedData, vector_db: VectorStore,
+                       image_index: ImageIndex = None):
     """
     Handles the file upload process, including checking for duplicates, extracting content, and embedding the data into a vector database.
 
@@ -122,18 +144,26 @@ async def upload_files(files: List[UploadFile], tags: str, files_collection: Asy
         current_user: The current authenticated user uploading the files.
         embed_data: The object used to embed the extracted data.
         vector_db: The vector database for storing embedded data.
+        image_index: Index of the figures embedded by the image encoder, created on demand when Config.IMAGE_INGEST_MODE is "embed".
 
     Returns:
         A message indicating success or failure.
     """
+    pending = len(files)
+    ingest_queue_depth.inc("admin", amount=pending)
     try:
+        image_index = image_index or get_image_index(Config.VECTOR_STORE)
         for file in files:
+            file_path = None
             try:
                 file_bytes = await file.read() # Read the file bytes
                 file_hash = get_file_hash(file_bytes) # Generate a hash for file uniqueness
+                file_type = detect_file_type(file_bytes, file.filename) # Sniff the file type once
+                if file_type is None:
+                    raise ValueError(f"Unsupported file type: {file.filename}")
                 
-                # Check if the file already exists in the database by hash
-                existing_file = await files_collection.find_one({"file_hash": file_hash})
+                # Check if the file already exists in the admin collection by hash
+                existing_file = await files_collection.find_one({"collection_name": ADMIN_COLLECTION_NAME, "file_hash": file_hash}, {"_id": 1})
                 if existing_file: 
                     logger.info(f"File {file.filename} already exists in the database, skipping upload.")
                     continue # Skip if file already exists
@@ -148,36 +178,22 @@ async def upload_files(files: List[UploadFile], tags: str, files_collection: Asy
                 with open(file_path, "wb") as buffer:
                     buffer.write(file_bytes)
                 
-                # Extract data based on file type and embed it
-                if await is_pdf(file_bytes):
-                    extracted_data = extract_pdf_data(file_path=file_path, bot=bot)
-                    if extracted_data:
-                        texts, image_summaries, table_summaries = extracted_data
-                        embed_data.embed(texts + image_summaries + table_summaries)
-                    else:
-                        logger.error("Failed to extract data from PDF.")
-                        raise Exception("Failed to fetch extract data.")
-                elif await is_txt(file_bytes):
-                    extracted_data = extract_txt_data(file_path=file_path)
-                    if extracted_data:
-                        texts = extracted_data
-                        embed_data.embed(texts)
-                    else:
-                        logger.error("Failed to extract data from TXT file.")
-                        raise Exception("Failed to fetch extract data.")
-                elif await is_image(file_bytes):
-                    extracted_data = extract_image_data(file_path=file_path, bot=bot)
-                    if extracted_data:
-                        image_summaries = extracted_data
-                        embed_data.embed(image_summaries)
-                    else:
-                        logger.error("Failed to extract data from image.")
-                        raise Exception("Failed to fetch extract data.")
-                
-                # Prepare collection name and ingest data into vector DB
-                collection_name = 'multimodal_rag_admin_collection'
+                # Stream the extracted data through embedding into the admin collection of the vector DB
+                collection_name = ADMIN_COLLECTION_NAME
                 vector_db.create_or_set_collection(collection_name)
-                vector_db.ingest_data(embed_data, source=file_path)
+                figures = [] if image_index else None # Figures kept for the image encoder instead of being summarized
+                texts = stream_file_data(file_type, file_path, bot=bot, figures=figures)
+                count = vector_db.ingest_stream(embed_data.embed_stream(texts), source=file_path)
+                if figures:
+                    image_index.set_collection(collection_name)
+                    try:
+                        count += image_index.ingest(figures, source=file_path)
+                    except Exception:
+                        vector_db.delete_source(file_path)
+                        raise
+                if not count:
+                    logger.error(f"Failed to extract data from {file_type.kind} file.")
+                    raise Exception("Failed to fetch extract data.")
                 
                 # Metadata for storing in database
                 metadata = {
@@ -189,7 +205,8 @@ async def upload_files(files: List[UploadFile], tags: str, files_collection: Asy
                     "upload_time": datetime.now(),
                     "file_path": str(file_path),
                     "collection_name": collection_name,
-                    "tags": tags
+                    "tags": tags,
+                    "tag_list": parse_tags(tags)
                 }
                 
                 # Insert file metadata into the database
@@ -197,10 +214,13 @@ async def upload_files(files: List[UploadFile], tags: str, files_collection: Asy
                 logger.info(f"File {file.filename} uploaded and processed successfully.")
             except Exception as e:
                 # Cleanup if any error occurs during processing
-                if os.path.exists(file_path):
+                if file_path and os.path.exists(file_path):
                     os.remove(file_path)
                 logger.error(f"Error processing file {file.filename}: {str(e)}")
                 raise
+            finally:
+                pending -= 1
+                ingest_queue_depth.dec("admin")
         return {"message": f"Files uploaded successfully"}
     except Exception as e:
         logger.error(f"File upload failed: {str(e)}")
@@ -208,31 +228,35 @@ async def upload_files(files: List[UploadFile], tags: str, files_collection: Asy
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"File upload failed: {str(e)}"
         )
+    finally:
+        ingest_queue_depth.dec("admin", amount=pending) # Files left over by a failed upload
 
-async def list_all_files(files_collection: AsyncIOMotorCollection):
+async def list_all_files(files_collection: AsyncIOMotorCollection, limit: int = 50, cursor: str = None, uploader: str = None, tag: str = None,
+                         collection_name: str = None, uploaded_after: datetime = None, uploaded_before: datetime = None):
     """
-    Lists all files uploaded by all users and admin.
+    Lists a page of the files uploaded by all users and admin, newest first.
 
     Args:
         files_collection: MongoDB collection containing file metadata.
+        limit: Maximum number of files to return.
+        cursor: Cursor returned by the previous page.
+        uploader: Only files uploaded by this user.
+        tag: Only files carrying this tag.
+        collection_name: Only files ingested into this vector collection.
+        uploaded_after: Only files uploaded at or after this time.
+        uploaded_before: Only files uploaded before this time.
 
     Returns:
-        A list of dictionaries containing file metadata for files uploaded by all users and admin.
+        A dictionary with the file metadata of the page and the cursor of the next page (None on the last page).
     """
+    query = build_file_query(uploader, tag, collection_name, uploaded_after, uploaded_before)
     try:
-        # Retrieve files from database and filter by all users and admin.
-        files_list = await files_collection.find().to_list()
-        return [{"id": str(file['_id']),
-                "filename": file['filename'],
-                "uploader": file['uploader'],
-                "role": file['uploader_role'],
-                "upload_time": file['upload_time'].strftime("%Y-%m-%d %H:%M:%S"),
-                "collection_name": file['collection_name'],
-                "tags": file['tags']} for file in files_list]
+        return await list_files_page(files_collection, query, limit, cursor)
+    except ValueError:
+        logger.error(f"Invalid files cursor: {cursor}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
     except Exception as e:
         logger.error(f"Failed to fetch files meta data: {str(e)}")
-        with open('error.txt', 'w') as f:
-            f.write(str(e))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch files info : {str(e)}"
@@ -1,34 +1,41 @@
 from sqlalchemy.orm import Session
 from schemas.user import UserRegister, UserLogin
-from auth.security import hash_password, verify_password, create_access_token
+from auth.security import hash_password_async, verify_and_rehash_async, create_access_token
 from datetime import timedelta
-from models.user import User
+from models.user import User, get_user_by_username, add_user, update_password_hash
+from models.sql_db import run_db
+from metrics import Counter, Histogram
 from fastapi import HTTPException, status
-import logging
+import time, logging
 
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
 
-def create_user(user: UserRegister, db: Session) -> User:
+# Login metrics
+login_attempts = Counter("login_attempts_total", "Login attempts by outcome", labels=("outcome",))
+login_seconds = Histogram("login_duration_seconds", "Time taken to authenticate a login attempt", labels=("outcome",))
+
+async def create_user(user: UserRegister, db: Session) -> User:
     """
     Checks if a user with the same username already exists in the database,
     hashes the password, and adds a new user to the database if the username is unique.
     
     Args:
         user (UserRegister): Contains user information such as username and password
-        db (Session): The database session.
+        db (Session | AsyncSession): The database session.
     Returns:
         The function `create_user` returns a newly created user object of type `User`.
     """
     try:
-        existing_user = db.query(User).filter(User.username == user.username).first()
+        existing_user = await run_db(db, get_user_by_username, user.username)
         if existing_user: raise
-        hashed_pw = hash_password(user.password)
+        hashed_pw = await hash_password_async(user.password)
         new_user = User(username=user.username, hashed_password=hashed_pw)
-        db.add(new_user)
-        db.commit()
+        await run_db(db, add_user, new_user)
         logger.info("User created successfully")
         return new_user
+    except HTTPException:
+        raise # e.g. 503 when the password hashing executor is saturated
     except Exception as e:
         if existing_user:
             logger.error(f"Username already exists: {e}")
@@ -43,13 +50,14 @@ def create_user(user: UserRegister, db: Session) -> User:
                 detail=f"Failed to create user"
             )
 
-def authenticate_user(user: UserLogin, db: Session):
+async def authenticate_user(user: UserLogin, db: Session):
     """
-    Authenticates a user by verifying their credentials.
+    Authenticates a user by verifying their credentials. Passwords hashed with an
+    outdated bcrypt cost are transparently rehashed.
 
     Args:
         user (UserLogin): The login data containing username and password.
-        db (Session): The database session.
+        db (Session | AsyncSession): The database session.
 
     Returns:
         User: The authenticated user object.
@@ -58,25 +66,41 @@ def authenticate_user(user: UserLogin, db: Session):
         HTTPException: If the username does not exist or the password is incorrect.
     """
     logger.info(f"Authenticating user: {user.username}")
+    started = time.perf_counter()
+    outcome = "failure"
     
-    # Fetch user from the database
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
-        logger.warning(f"Authentication failed for user: {user.username}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid username or password",
-        )
-    logger.info(f"User '{user.username}' successfully authenticated.")
-    return db_user
+    try:
+        # Fetch user from the database
+        db_user = await run_db(db, get_user_by_username, user.username)
+        is_valid, new_hash = await verify_and_rehash_async(user.password, db_user.hashed_password) if db_user else (False, None)
+        if not is_valid:
+            logger.warning(f"Authentication failed for user: {user.username}")
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid username or password",
+            )
+        if new_hash:
+            await run_db(db, update_password_hash, db_user, new_hash)
+            logger.info(f"Password hash of user '{user.username}' upgraded.")
+        outcome = "success"
+        logger.info(f"User '{user.username}' successfully authenticated.")
+        return db_user
+    except HTTPException as e:
+        if e.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            outcome = "rejected"
+        raise
+    finally:
+        login_attempts.inc(outcome)
+        login_seconds.observe(time.perf_counter() - started, outcome)
 
-def create_access_token_for_user(user: UserLogin, is_admin: bool) -> str:
+def create_access_token_for_user(user: UserLogin, is_admin: bool, user_id: int = None) -> str:
     """
     Generates an access token for the authenticated user.
 
     Args:
         user (UserLogin): The authenticated user object.
         is_admin (bool): Boolean flag indicating if the user is an admin.
+        user_id (int, optional): Database id of the user, lets verify_token serve the user from its cache.
 
     Returns:
         str: The generated JWT access token.
@@ -84,7 +108,10 @@ def create_access_token_for_user(user: UserLogin, is_admin: bool) -> str:
     expiration = timedelta(minutes=60) if is_admin else None
     logger.info(f"Creating access token for user: {user.username} (Admin: {is_admin})")
 
-    access_token = create_access_token(data={"sub": user.username}, expires_delta=expiration)
+    data = {"sub": user.username}
+    if user_id is not None:
+        data["uid"] = user_id
+    access_token = create_access_token(data=data, expires_delta=expiration)
     
     logger.info(f"Access token generated for user: {user.username}")
     return access_token
\ No newline at end of file
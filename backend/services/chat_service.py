@@ -2,35 +2,50 @@ from fastapi import Depends, UploadFile, HTTPException, status
 from models.user import User
 from auth.dependencies import verify_token
 from motor.motor_asyncio import AsyncIOMotorCollection
-from models.mongo_db import get_users_collection
-from services.rag_service import bot, get_embed_data_obj, get_vector_db
-from rag_modules.vector_db import QdrantVDB
-from models.session import create_new_session, find_session
+from models.mongo_db import get_users_collection, get_sessions_collection, get_messages_collection
+from pymongo import DESCENDING
+from pymongo.errors import DuplicateKeyError
+from services.rag_service import bot, get_embed_data_obj, get_reranker, get_vector_db, get_user_vector_db, get_image_index
+from rag_modules.vector_db import VectorStore
+from rag_modules.image_embed import ImageIndex
+from models.session import create_new_session, find_session, append_messages, delete_session, migrate_legacy_sessions
 from rag_modules.rag import RAG
 from rag_modules.rag_retriever import Retriever
 from cache import user_sessions_cache
+from utils import encode_cursor, decode_cursor
+from tracing import span
+from config import Config
+from datetime import datetime
 import logging
 
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
 
-async def get_user_sessions(current_user: User = Depends(verify_token), users_collection = Depends(get_users_collection)):
+async def get_user_sessions(
+    current_user: User = Depends(verify_token), 
+    users_collection = Depends(get_users_collection),
+    sessions_collection = Depends(get_sessions_collection),
+    messages_collection = Depends(get_messages_collection)):
     """
-    Retrieves or creates a user's chat session data from the database. If the user does not exist in the database, a new entry is created.
-    Updates the in-memory cache (`user_sessions_cache`) with the user's session data.
+    Retrieves or creates a user's entry in the database. If the user does not exist in the database, a new entry is created.
+    Sessions still embedded in a legacy user document are migrated to the sessions and messages collections.
+    Updates the in-memory cache (`user_sessions_cache`) with the user's data.
 
     Args:
         current_user (User): The authenticated user retrieved via token verification.
         users_collection: The MongoDB collection for storing user data.
+        sessions_collection: The MongoDB collection for chat session headers.
+        messages_collection: The MongoDB collection for chat messages.
 
     Returns:
-        dict: The user session data containing username and chat sessions.
+        dict: The user data containing the username.
     """
     username = current_user.username
     logger.info(f"Fetching session data for user: {username}")
     
-    # Check if user session exists in cache
-    if username not in user_sessions_cache or not isinstance(user_sessions_cache[username], dict) or 'chat_sessions' not in user_sessions_cache[username].keys():
+    # Check if user exists in cache
+    user = user_sessions_cache.get(username)
+    if not isinstance(user, dict) or 'username' not in user.keys():
         logger.debug(f"User {username} not found in cache. Fetching from database.")
         
         # Retrieve user from MongoDB
@@ -40,17 +55,98 @@ async def get_user_sessions(current_user: User = Depends(verify_token), users_co
             logger.info(f"User {username} does not exist in the database. Creating a new entry.")
             
             # Create a new user if they don't exist
-            user = {"username": username, "chat_sessions": []}
-            result = await users_collection.insert_one(user)
-            user["_id"] = result.inserted_id
-            
-            logger.info(f"New user {username} successfully created in the database.")
+            try:
+                user = {"username": username}
+                result = await users_collection.insert_one(user)
+                user["_id"] = result.inserted_id
+                logger.info(f"New user {username} successfully created in the database.")
+            except DuplicateKeyError:
+                # A concurrent first request created it in the meantime
+                logger.debug(f"User {username} was created by a concurrent request.")
+                user = await users_collection.find_one({"username": username})
+        elif "chat_sessions" in user:
+            # Move sessions embedded in the user document to their own collections
+            await migrate_legacy_sessions(user, users_collection, sessions_collection, messages_collection)
         
-        # Store user session in cache
-        user_sessions_cache[username] = user
+        # Store user in cache once the database is up to date
+        user_sessions_cache.set(username, user)
         logger.debug(f"User {username} session cached successfully.")
         
-    return user_sessions_cache[username]
+    return user
+
+async def list_session_summaries(username: str, sessions_collection: AsyncIOMotorCollection, limit: int = 20, cursor: str = None):
+    """
+    Lists a page of a user's chat session summaries, newest first, without loading any messages.
+
+    Args:
+        username (str): The owner of the sessions.
+        sessions_collection: The MongoDB collection for chat session headers.
+        limit (int, optional): Maximum number of sessions to return. Defaults to 20.
+        cursor (str, optional): Cursor returned by the previous page.
+
+    Returns:
+        dict: Session summaries and the cursor of the next page (None on the last page).
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+    """
+    query = {"username": username}
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+            created_at = datetime.fromisoformat(position["created_at"])
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "session_id": {"$lt": position["session_id"]}}
+            ]
+        except (ValueError, KeyError, TypeError):
+            logger.error(f"Invalid session cursor for user {username}: {cursor}")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    projection = {"_id": 0, "session_id": 1, "title": 1, "message_count": 1, "created_at": 1, "updated_at": 1}
+    sessions = await sessions_collection.find(query, projection).sort(
+        [("created_at", DESCENDING), ("session_id", DESCENDING)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        next_cursor = encode_cursor({"created_at": sessions[-1]["created_at"].isoformat(), "session_id": sessions[-1]["session_id"]})
+
+    summaries = [{"session_id": s["session_id"],
+                  "title": s.get("title"),
+                  "messages_count": s.get("message_count", 0),
+                  "created_at": s["created_at"],
+                  "last_activity": s.get("updated_at", s["created_at"])} for s in sessions]
+    logger.info(f"Listed {len(summaries)} session summaries for user {username}")
+    return {"sessions": summaries, "next_cursor": next_cursor}
+
+async def list_session_messages(username: str, session_id: str, messages_collection: AsyncIOMotorCollection, limit: int = 50, before: int = None):
+    """
+    Lists a page of messages of a chat session. Pages go backwards from the latest message,
+    each page being returned in chronological order.
+
+    Args:
+        username (str): The owner of the session.
+        session_id (str): The ID of the chat session.
+        messages_collection: The MongoDB collection for chat messages.
+        limit (int, optional): Maximum number of messages to return. Defaults to 50.
+        before (int, optional): Only return messages with a sequence number lower than this.
+
+    Returns:
+        dict: The messages and the sequence number to request the previous page with (None on the first page).
+    """
+    query = {"username": username, "session_id": session_id}
+    if before is not None:
+        query["seq"] = {"$lt": before}
+
+    projection = {"_id": 0, "seq": 1, "role": 1, "text": 1}
+    messages = await messages_collection.find(query, projection).sort("seq", DESCENDING).limit(limit).to_list(length=limit)
+    messages.reverse()
+
+    before_cursor = messages[0]["seq"] if messages and messages[0]["seq"] > 0 else None
+    logger.info(f"Listed {len(messages)} messages of session {session_id} for user {username}")
+    return {"session_id": session_id, "messages": messages, "before": before_cursor}
 
 async def chat_bot(
     session_id: str, 
@@ -58,10 +154,12 @@ async def chat_bot(
     image: UploadFile = None,  
     rag_mode: str = 'no-rag', 
     user: dict = Depends(get_user_sessions), 
-    users_collection = Depends(get_users_collection),
+    sessions_collection = Depends(get_sessions_collection),
+    messages_collection = Depends(get_messages_collection),
     current_user: User = Depends(verify_token),
-    embed_data = Depends(get_embed_data_obj),
-    vector_db: QdrantVDB = Depends(get_vector_db)):
+    embed_data = None,
+    vector_db: VectorStore = None,
+    image_index: ImageIndex = None):
     """
     Process user messages using AI and return responses.
 
@@ -70,59 +168,84 @@ async def chat_bot(
         message (str): User's input message.
         image (UploadFile, optional): An image file uploaded by the user.
         rag_mode (str): Retrieval mode ('all', 'user', or 'no-rag').
-        user (dict): The authenticated user's session data.
-        users_collection: MongoDB collection for user data.
+        user (dict): The authenticated user's data.
+        sessions_collection: MongoDB collection for chat session headers.
+        messages_collection: MongoDB collection for chat messages.
         current_user (User): The authenticated user.
-        embed_data: Embedding model instance.
-        vector_db (QdrantVDB): Vector database instance.
+        embed_data (optional): Embedding model instance, loaded on demand for RAG modes.
+        vector_db (VectorStore, optional): Vector store instance, created on demand for RAG modes.
+        image_index (ImageIndex, optional): Index of the embedded figures, created on demand for RAG modes when Config.IMAGE_INGEST_MODE is "embed".
 
     Returns:
         dict: AI-generated response message and session ID.
     """
     try:
         logger.info(f"User {current_user.username} sent a message in session {session_id}. RAG Mode: {rag_mode}")
+        username = user["username"]
         
         # Find or create a session
-        session = create_new_session(user) if (session_id == 'null' or session_id == None) else find_session(user, session_id)
+        with span("session_load", new=session_id in ('null', None)):
+            if session_id == 'null' or session_id == None:
+                session = await create_new_session(sessions_collection, username)
+            else:
+                session = await find_session(sessions_collection, messages_collection, username, session_id)
         
         # Process image input
         image_content = None
         if image:
-            image_content = await image.read()
-
-        # Add user message to the session history
-        session["messages"].extend([{'role': 'user', 'text': message}])
+            with span("image_read"):
+                image_content = await image.read()
+        history_len = len(bot.get_history())
+        
+        # Load the retrieval components only when a RAG mode needs them
+        if rag_mode in ("all", "user"):
+            with span("rag_load"):
+                embed_data = embed_data or get_embed_data_obj()
+                vector_db = vector_db or (get_user_vector_db() if rag_mode == "user" else get_vector_db())
+                image_index = image_index or get_image_index(Config.USER_VECTOR_STORE if rag_mode == "user" else Config.VECTOR_STORE)
+                reranker_model, reranker_tokenizer = get_reranker()
         
         # AI Response generation based on RAG mode
         if rag_mode == "all":
-            vector_db.create_or_set_collection(collection_name='multimodal_rag_admin_collection')
-            retriever = Retriever(vector_db=vector_db, embeddata=embed_data)
-            rag_client = RAG(retriever=retriever, bot=bot)
+            with span("rag_setup"):
+                vector_db.create_or_set_collection(collection_name='multimodal_rag_admin_collection')
+                if image_index:
+                    image_index.set_collection(vector_db.collection_name)
+                retriever = Retriever(vector_db=vector_db, embeddata=embed_data, image_index=image_index)
+                rag_client = RAG(retriever=retriever, bot=bot, reranker_model=reranker_model, reranker_tokenizer=reranker_tokenizer)
             response = rag_client.query(message, image_content)
         elif rag_mode == "user":
-            user_folder_name = current_user.username + '_' + str(current_user.id)
-            vector_db.create_or_set_collection(collection_name='multimodal_rag_' + user_folder_name)
-            retriever = Retriever(vector_db=vector_db, embeddata=embed_data)
-            rag_client = RAG(retriever=retriever, bot=bot)
+            with span("rag_setup"):
+                user_folder_name = current_user.username + '_' + str(current_user.id)
+                vector_db.create_or_set_collection(collection_name='multimodal_rag_' + user_folder_name)
+                if image_index:
+                    image_index.set_collection(vector_db.collection_name)
+                retriever = Retriever(vector_db=vector_db, embeddata=embed_data, image_index=image_index)
+                rag_client = RAG(retriever=retriever, bot=bot, reranker_model=reranker_model, reranker_tokenizer=reranker_tokenizer)
             response = rag_client.query(message, image_content)
         else:
             response = bot.generate(message, image_content)
         
-        # Add bot response to the session history
-        session["messages"].extend([{'role': 'bot', 'text': response.message.content}])
-        session["bot_chat_history"] = bot.get_history()
+        # Keep the image store references of the user turn alongside its text
+        user_turn = next((turn for turn in bot.get_history()[history_len:] if turn.get("role") == "user"), {})
+        user_msg = {'role': 'user', 'text': message}
+        if user_turn.get("image_refs"):
+            user_msg["image_refs"] = user_turn["image_refs"]
+        bot_msg = {'role': 'bot', 'text': response.message.content, 'usage': bot.last_usage}
         
-        # Cache update
-        user_sessions_cache[user["username"]] = user
+        # Persist the rolling summary when it moved forward during this turn
+        summary, summary_count = bot.get_summary()
+        session_updates = {"summary": summary, "summary_count": summary_count} if summary_count != session.get("summary_count", 0) else None
         
-        # Save session updates to MongoDB
-        await users_collection.update_one(
-            {"_id": user["_id"]},
-            {"$set": {"chat_sessions": user["chat_sessions"]}}
-        )
+        # Append the new messages to MongoDB
+        with span("session_save"):
+            await append_messages(sessions_collection, messages_collection, username, session["session_id"], [user_msg, bot_msg], session_updates)
+        session["messages"].extend([{'role': 'user', 'text': message}, bot_msg])
         
         logger.info(f"AI response sent to user {current_user.username} in session {session['session_id']}.")
         return response, session
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing user message in session {session_id}: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -130,32 +253,26 @@ async def chat_bot(
             detail=f"Error processing user message in session {session_id}: {str(e)}"
         )
     
-async def delete_session_data(session_id: str, user: dict = Depends(get_user_sessions), users_collection: AsyncIOMotorCollection = Depends(get_users_collection)):
+async def delete_session_data(
+    session_id: str, 
+    user: dict = Depends(get_user_sessions), 
+    sessions_collection: AsyncIOMotorCollection = Depends(get_sessions_collection),
+    messages_collection: AsyncIOMotorCollection = Depends(get_messages_collection)):
     """
     Delete a chat session by its session ID.
 
     Args:
         session_id (str): The ID of the session to delete.
-        user (dict): The authenticated user's session data.
-        users_collection (AsyncIOMotorCollection): MongoDB collection for user data.
+        user (dict): The authenticated user's data.
+        sessions_collection (AsyncIOMotorCollection): MongoDB collection for chat session headers.
+        messages_collection (AsyncIOMotorCollection): MongoDB collection for chat messages.
 
     Returns:
         dict: Confirmation message after deletion.
     """
     logger.info(f"Deleting session {session_id} for user {user['username']}.")
     
-    # Filter out the session to be deleted
-    user_sessions = user.get("chat_sessions", [])
-    updated_sessions = [session for session in user_sessions if session["session_id"] != session_id]
-
-    # Update the user document in MongoDB
-    await users_collection.update_one(
-        {"_id": user["_id"]},
-        {"$set": {"chat_sessions": updated_sessions}}
-    )
-
-    # Update the cache
-    user["chat_sessions"] = updated_sessions
-    user_sessions_cache[user["username"]] = user
+    # Remove the session header and its messages
+    await delete_session(sessions_collection, messages_collection, user["username"], session_id)
     
     logger.info(f"Session {session_id} deleted successfully for user {user['username']}.")
\ No newline at end of file
@@ -1,31 +1,104 @@
 from rag_modules.conversational_bot import Conversational_Bot
-from rag_modules.embed_data import EmbedData
-from rag_modules.vector_db import QdrantVDB
+from rag_modules.context_manager import ContextManager
+from rag_modules.embed_data import EmbedData, DEFAULT_EMBED_MODEL, load_embed_model
+from rag_modules.rag import DEFAULT_RERANKER_MODEL, load_reranker
+from rag_modules.vector_db import VectorStore, create_vector_store
+from rag_modules.image_embed import ImageEmbedder, ImageIndex, load_image_embed_model
+from threading import Lock
+from config import Config
 import logging
 
 # Configure logger
 logger = logging.getLogger("Multimodal_rag_bot")
 
-def get_vector_db():
+# Models loaded once per process and shared by every request
+_shared_models = {}
+_shared_models_lock = Lock()
+
+def get_shared_model(key: str, loader):
+    """
+    Returns a model shared by every request, loading it on first use.
+
+    Args:
+        key (str): Name of the model.
+        loader (callable): Loads the model.
+
+    Returns:
+        The loaded model.
+    """
+    with _shared_models_lock:
+        if key not in _shared_models:
+            _shared_models[key] = loader()
+        return _shared_models[key]
+
+def get_embed_model():
+    """
+    Returns the shared embedding model.
+    """
+    return get_shared_model(DEFAULT_EMBED_MODEL, lambda: load_embed_model(DEFAULT_EMBED_MODEL))
+
+def get_reranker():
+    """
+    Returns the shared reranker model and tokenizer.
+    """
+    return get_shared_model(DEFAULT_RERANKER_MODEL, lambda: load_reranker(DEFAULT_RERANKER_MODEL))
+
+def get_image_embedder() -> ImageEmbedder:
+    """
+    Returns the shared image encoder.
+    """
+    return get_shared_model(Config.IMAGE_EMBED_MODEL, lambda: ImageEmbedder(*load_image_embed_model(Config.IMAGE_EMBED_MODEL)))
+
+def get_image_index(backend: str = None):
+    """
+    Returns the index of the figures embedded by the image encoder, None unless
+    Config.IMAGE_INGEST_MODE is "embed".
+
+    Args:
+        backend (str, optional): Vector store backend of the image collections. Defaults to Config.VECTOR_STORE.
+
+    Returns:
+        ImageIndex: The index, or None.
+    """
+    if Config.IMAGE_INGEST_MODE != "embed":
+        return None
+    embedder = get_image_embedder()
+    return ImageIndex(create_vector_store(backend or Config.VECTOR_STORE, vector_dim=embedder.vector_dim), embedder)
+
+def get_vector_db() -> VectorStore:
+    """
+    Initializes and returns the vector store selected by Config.VECTOR_STORE.
+
+    Returns:
+        VectorStore: An instance of the vector store.
+    """
+    logger.info(f"Initializing {Config.VECTOR_STORE} vector store instance.")
+    return create_vector_store(Config.VECTOR_STORE)
+
+def get_user_vector_db() -> VectorStore:
     """
-    Initializes and returns an instance of QdrantVDB.
+    Initializes and returns the vector store of the per-user collections, selected by Config.USER_VECTOR_STORE.
 
     Returns:
-        QdrantVDB: An instance of the Qdrant vector database handler.
+        VectorStore: An instance of the vector store.
     """
-    logger.info("Initializing Qdrant vector database instance.")
-    return QdrantVDB()
+    logger.info(f"Initializing {Config.USER_VECTOR_STORE} vector store instance for user collections.")
+    return create_vector_store(Config.USER_VECTOR_STORE)
 
 def get_embed_data_obj():
     """
-    Initializes and returns an instance of EmbedData.
+    Initializes and returns an instance of EmbedData on the shared embedding model.
 
     Returns:
         EmbedData: An instance of the embedding data handler.
     """
     logger.info("Initializing EmbedData instance.")
-    return EmbedData()
+    return EmbedData(embed_model=get_embed_model())
 
 # Initialize the conversational bot instance
 logger.info("Initializing Conversational_Bot instance.")
-bot = Conversational_Bot()
\ No newline at end of file
+bot = Conversational_Bot(context_manager=ContextManager(
+    max_turns=Config.HISTORY_MAX_TURNS,
+    token_budget=Config.HISTORY_TOKEN_BUDGET,
+    summarize=Config.HISTORY_SUMMARIZE
+    ))
\ No newline at end of file
@@ -1,13 +1,16 @@
 from fastapi import HTTPException, UploadFile, status
-from rag_modules.document_extract import extract_image_data, extract_pdf_data, extract_txt_data
+from rag_modules.document_extract import stream_file_data, ingest_queue_depth
+from file_types import detect_file_type
 from rag_modules.embed_data import EmbedData
 from motor.motor_asyncio import AsyncIOMotorCollection
 from typing import List
-from rag_modules.vector_db import QdrantVDB
-from utils import get_file_hash, get_unique_filename, is_image, is_pdf, is_txt
-from services.rag_service import bot
+from rag_modules.vector_db import VectorStore
+from rag_modules.image_embed import ImageIndex
+from utils import get_file_hash, get_unique_filename
+from services.rag_service import bot, get_image_index
 from datetime import datetime
 from models.user import User
+from models.files import build_file_query, list_files_page, parse_tags
 from pathlib import Path
 from config import Config
 import os, logging
@@ -18,7 +21,8 @@ logger = logging.getLogger("Multimodal_rag_bot")
 # Define the upload folder path from configuration
 UPLOAD_FOLDER = Path(Config.USER_UPLOAD_FILE_LOCATION)
 
-async def upload_files(files: List[UploadFile], tags: str, files_collection: AsyncIOMotorCollection, current_user: User, embed_data: EmbedData, vector_db: QdrantVDB):
+async def upload_files(files: List[UploadFile], tags: str, files_collection: AsyncIOMotorCollection, current_user: User, embed_data: EmbedData, vector_db: VectorStore,
+                       image_index: ImageIndex = None):
     """
     Handles the file upload process, including checking for duplicates, extracting content, and embedding the data into a vector database.
 
@@ -28,26 +32,36 @@ async def upload_files(files: List[UploadFile], tags: str, files_collection: Asy
         files_collection: MongoDB collection for storing file metadata.
         current_user: User object representing the uploader.
         embed_data: EmbedData instance for embedding the extracted data.
-        vector_db: QdrantVDB instance for storing embeddings in a vector database.
+        vector_db: Vector store for storing embeddings.
+        image_index: Index of the figures embedded by the image encoder, created on demand when Config.IMAGE_INGEST_MODE is "embed".
 
     Returns:
         A message indicating success or failure.
     """
+    pending = len(files)
+    ingest_queue_depth.inc("user", amount=pending)
     try:
+        image_index = image_index or get_image_index(Config.USER_VECTOR_STORE)
         for file in files:
+            file_path = None
             try:
                 file_bytes = await file.read() # Read the file bytes
                 file_hash = get_file_hash(file_bytes) # Generate a hash for file uniqueness
+                file_type = detect_file_type(file_bytes, file.filename) # Sniff the file type once
+                if file_type is None:
+                    raise ValueError(f"Unsupported file type: {file.filename}")
                 
-                # Check if the file already exists in the database by hash
-                existing_file = await files_collection.find_one({"file_hash": file_hash})
+                user_folder_name = f"{current_user.username}_{current_user.id}"
+                collection_name = 'multimodal_rag_' + user_folder_name
+                
+                # Check if the file already exists in the user's collection by hash
+                existing_file = await files_collection.find_one({"collection_name": collection_name, "file_hash": file_hash}, {"_id": 1})
                 if existing_file: 
                     logger.info(f"File {file.filename} already exists in the database, skipping upload.")
                     continue # Skip if file already exists
                                 
                 # Generate a unique filename for the uploaded file
                 unique_filename = get_unique_filename(file.filename)
-                user_folder_name = f"{current_user.username}_{current_user.id}"
 
                 # Set up the folder structure                
                 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -60,36 +74,21 @@ async def upload_files(files: List[UploadFile], tags: str, files_collection: Asy
                 with open(file_path, "wb") as buffer:
                     buffer.write(file_bytes)
                 
-                # Extract data based on file type and embed it
-                if await is_pdf(file_bytes):
-                    extracted_data = extract_pdf_data(file_path=file_path, bot=bot)
-                    if extracted_data:
-                        texts, image_summaries, table_summaries = extracted_data
-                        embed_data.embed(texts + image_summaries + table_summaries)
-                    else:
-                        logger.error("Failed to extract data from PDF.")
-                        raise Exception("Failed to fetch extract data.")
-                elif await is_txt(file_bytes):
-                    extracted_data = extract_txt_data(file_path=file_path)
-                    if extracted_data:
-                        texts = extracted_data
-                        embed_data.embed(texts)
-                    else:
-                        logger.error("Failed to extract data from TXT file.")
-                        raise Exception("Failed to fetch extract data.")
-                elif await is_image(file_bytes):
-                    extracted_data = extract_image_data(file_path=file_path, bot=bot)
-                    if extracted_data:
-                        image_summaries = extracted_data
-                        embed_data.embed(image_summaries)
-                    else:
-                        logger.error("Failed to extract data from image.")
-                        raise Exception("Failed to fetch extract data.")
-                
-                # Prepare collection name and ingest data into vector DB
-                collection_name = 'multimodal_rag_' + user_folder_name
+                # Stream the extracted data through embedding into the vector DB
                 vector_db.create_or_set_collection(collection_name)
-                vector_db.ingest_data(embed_data, source=file_path)
+                figures = [] if image_index else None # Figures kept for the image encoder instead of being summarized
+                texts = stream_file_data(file_type, file_path, bot=bot, figures=figures)
+                count = vector_db.ingest_stream(embed_data.embed_stream(texts), source=file_path)
+                if figures:
+                    image_index.set_collection(collection_name)
+                    try:
+                        count += image_index.ingest(figures, source=file_path)
+                    except Exception:
+                        vector_db.delete_source(file_path)
+                        raise
+                if not count:
+                    logger.error(f"Failed to extract data from {file_type.kind} file.")
+                    raise Exception("Failed to fetch extract data.")
                 
                 # Metadata for storing in database
                 metadata = {
@@ -101,7 +100,8 @@ async def upload_files(files: List[UploadFile], tags: str, files_collection: Asy
                     "upload_time": datetime.now(),
                     "file_path": str(file_path),
                     "collection_name": collection_name,
-                    "tags": tags
+                    "tags": tags,
+                    "tag_list": parse_tags(tags)
                 }
                 
                 # Insert file metadata into the database
@@ -110,9 +110,12 @@ async def upload_files(files: List[UploadFile], tags: str, files_collection: Asy
             except Exception as e:
                 # Cleanup if any error occurs during processing
                 logger.error(f"Error processing file {file.filename}: {str(e)}", exc_info=True)
-                if os.path.exists(file_path):
+                if file_path and os.path.exists(file_path):
                     os.remove(file_path)
                 raise
+            finally:
+                pending -= 1
+                ingest_queue_depth.dec("user")
         return {"message": f"File uploaded successfully"}
     except Exception as e:
         logger.error(f"File upload failed: {str(e)}")
@@ -120,30 +123,35 @@ async def upload_files(files: List[UploadFile], tags: str, files_collection: Asy
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"File upload failed: {str(e)}"
         )
+    finally:
+        ingest_queue_depth.dec("user", amount=pending) # Files left over by a failed upload
         
-async def list_all_files(current_user: User, files_collection: AsyncIOMotorCollection):
+async def list_all_files(current_user: User, files_collection: AsyncIOMotorCollection, limit: int = 50, cursor: str = None, tag: str = None):
     """
-    Lists all files uploaded by the current user.
+    Lists a page of the files uploaded by the current user, newest first.
 
     Args:
         current_user: User object representing the logged-in user.
         files_collection: MongoDB collection containing file metadata.
+        limit: Maximum number of files to return.
+        cursor: Cursor returned by the previous page.
+        tag: Only files carrying this tag.
 
     Returns:
-        A list of dictionaries containing file metadata for files uploaded by the current user.
+        A dictionary with the file metadata of the page and the cursor of the next page (None on the last page).
     """
+    # Retrieve files from database and filter by current user
+    query = build_file_query(uploader=current_user.username, tag=tag)
     try:
-        # Retrieve files from database and filter by current user
-        files_list = await files_collection.find({"uploader": current_user.username}).to_list()
-        return [{"id": str(file['_id']),
-                "filename": file['filename'],
-                "upload_time": file['upload_time'].strftime("%Y-%m-%d %H:%M:%S"),
-                "tags": file['tags']} 
-                for file in files_list
-                ]
+        page = await list_files_page(files_collection, query, limit, cursor)
+    except ValueError:
+        logger.error(f"Invalid files cursor for user {current_user.username}: {cursor}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
     except Exception as e:
         logger.error(f"Failed to fetch files meta data for user {current_user.username}: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch files info : {str(e)}"
-        )
\ No newline at end of file
+        )
+    page["files"] = [{"id": file["id"], "filename": file["filename"], "upload_time": file["upload_time"], "tags": file["tags"]} for file in page["files"]]
+    return page
\ No newline at end of file
@@ -0,0 +1,127 @@
+from services.rag_service import get_embed_model, get_reranker, get_image_embedder
+from threading import Lock
+from config import Config
+import asyncio, time
+import ollama
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+class Readiness:
+    """
+    Warm-up state of the models the backend serves with. The worker is ready once the
+    warm-up has started and every component is warm.
+
+    Attributes:
+        started (bool): Whether the components to warm up are known.
+        components (dict): Component name -> {"status": "pending" | "ready" | "failed", "seconds", "error"}.
+    """
+    def __init__(self):
+        self.started = False
+        self.components = {}
+        self._lock = Lock()
+
+    def start(self, names=()):
+        """
+        Registers the components to warm up (none when warm-up is disabled).
+        """
+        with self._lock:
+            self.started = True
+            for name in names:
+                self.components.setdefault(name, {"status": "pending", "seconds": None, "error": None})
+
+    def update(self, name, status, seconds=None, error=None):
+        with self._lock:
+            self.components[name] = {"status": status, "seconds": seconds, "error": error}
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self.started and all(component["status"] == "ready" for component in self.components.values())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(component) for name, component in self.components.items()}
+
+# Warm-up state of this worker, reported by /ready
+readiness = Readiness()
+
+def warm_embed_model():
+    """
+    Loads the shared embedding model and embeds a dummy batch and query.
+    """
+    model = get_embed_model()
+    model.get_text_embedding_batch(["warm-up"])
+    model.get_query_embedding("warm-up")
+
+def warm_reranker():
+    """
+    Loads the shared reranker and scores a dummy query/document pair.
+    """
+    import torch
+    model, tokenizer = get_reranker()
+    with torch.no_grad():
+        model(**tokenizer(["Query: warm-up Document: warm-up"], padding=True, truncation=True, return_tensors="pt"))
+
+def warm_image_embed_model():
+    """
+    Loads the shared image encoder and embeds a dummy image and query.
+    """
+    import io
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (255, 255, 255)).save(buffer, format="PNG")
+    embedder = get_image_embedder()
+    embedder.embed_images([buffer.getvalue()])
+    embedder.embed_text("warm-up")
+
+def warm_ollama_model(model: str):
+    """
+    Loads an Ollama model with a one-token generation and pins it in memory for Config.OLLAMA_KEEP_ALIVE.
+
+    Args:
+        model (str): The Ollama model.
+    """
+    ollama.chat(model=model, messages=[{"role": "user", "content": "Hi"}], options={"num_predict": 1}, keep_alive=Config.OLLAMA_KEEP_ALIVE)
+
+def warm_up_components() -> dict:
+    """
+    Returns the warm-up function of every configured component.
+    """
+    components = {"embed_model": warm_embed_model, "reranker": warm_reranker}
+    if Config.IMAGE_INGEST_MODE == "embed":
+        components["image_embed_model"] = warm_image_embed_model
+    for model in filter(None, (model.strip() for model in Config.OLLAMA_MODELS.split(","))):
+        components[f"ollama:{model}"] = lambda model=model: warm_ollama_model(model)
+    return components
+
+async def warm_up(components: dict = None, retry_seconds: float = None):
+    """
+    Warms up every component in a worker thread, retrying the failed ones until all are
+    warm, so the event loop keeps answering the liveness probe meanwhile.
+
+    Args:
+        components (dict, optional): Component name -> warm-up function. Defaults to the configured components.
+        retry_seconds (float, optional): Delay before retrying the failed components. Defaults to Config.WARMUP_RETRY_SECONDS.
+    """
+    components = warm_up_components() if components is None else components
+    retry_seconds = Config.WARMUP_RETRY_SECONDS if retry_seconds is None else retry_seconds
+    readiness.start(components)
+    pending = dict(components)
+    while pending:
+        for name, warm in list(pending.items()):
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(warm)
+            except Exception as e:
+                logger.error(f"Warm-up of {name} failed, retrying in {retry_seconds:.0f}s: {e}")
+                readiness.update(name, "failed", error=str(e))
+                continue
+            seconds = round(time.perf_counter() - started, 3)
+            readiness.update(name, "ready", seconds=seconds)
+            logger.info(f"Warmed up {name} in {seconds:.2f}s.")
+            del pending[name]
+        if pending:
+            await asyncio.sleep(retry_seconds)
+    logger.info("All models are warm, the worker is ready.")
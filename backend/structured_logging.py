@@ -0,0 +1,239 @@
+from logging.handlers import QueueHandler, QueueListener
+from datetime import datetime, timezone
+from threading import Lock
+from config import Config, LOG_DIR, logFormat
+from metrics import Counter
+from tracing import get_request_id
+import os, re, json, queue
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+# Records dropped because the log queue was full
+log_records_dropped = Counter("log_records_dropped_total", "Log records dropped because the log queue was full")
+
+# Secrets and payloads that must not reach the logs
+REDACTIONS = (
+    (re.compile(r"eyJ[\w-]{8,}\.[\w-]{8,}\.[\w-]{8,}"), "[REDACTED_JWT]"),
+    (re.compile(r"(?i)(bearer\s+)[\w.~+/-]+=*"), r"\1[REDACTED]"),
+    (re.compile(r"(?i)((?:password|passwd|secret|api_key|access_token|hashed_password)['\"]?\s*[:=]\s*['\"]?)[^\s,'\"}]+"), r"\1[REDACTED]"),
+    (re.compile(r"[A-Za-z0-9+/]{256,}={0,2}"), lambda match: f"[BASE64 {len(match.group(0))} chars]"),
+)
+
+def redact(text: str) -> str:
+    """
+    Masks tokens, passwords and base64 payloads (e.g. images) in a log message.
+    """
+    for pattern, replacement in REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+def truncate(text: str, max_chars: int) -> str:
+    """
+    Cuts a log message to max_chars characters, noting how many were dropped.
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [truncated {len(text) - max_chars} chars]"
+
+def to_level(level, setting: str = "LOG_LEVEL") -> int:
+    """
+    Converts a level name (or number) to its number, raising a ValueError naming the setting it came from.
+    """
+    if isinstance(level, int):
+        return level
+    number = logging.getLevelName(level.strip().upper())
+    if not isinstance(number, int):
+        raise ValueError(f"Unknown log level '{level}' in {setting}")
+    return number
+
+def parse_mapping(value: str) -> dict:
+    """
+    Parses a 'key=value,key=value' setting.
+    """
+    mapping = {}
+    for item in filter(None, (item.strip() for item in value.split(","))):
+        key, _, setting = item.partition("=")
+        mapping[key.strip()] = setting.strip()
+    return mapping
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line, with the ID of the request it was logged in.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "func": record.funcName,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage() if getattr(record, "redacted", False) else redact(record.getMessage()),
+        }
+        if getattr(record, "sample_rate", None) is not None:
+            entry["sample_rate"] = record.sample_rate
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = redact(record.exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """
+    The human-readable log format, redacted.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    Applies a log level per module. Every module logs to the same logger, so the level is
+    looked up by the module the record was emitted from.
+
+    Attributes:
+        levels (dict): Module name -> minimum level.
+        default (int): Minimum level of the other modules.
+    """
+    def __init__(self, levels: dict, default: int = logging.INFO):
+        super().__init__()
+        self.levels = {module: to_level(level, f"LOG_MODULE_LEVELS ({module}={level})") for module, level in levels.items()}
+        self.default = default
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.levels.get(record.module, self.default)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps one in every 1/rate records of high-frequency events. Warnings and errors are
+    never sampled out; the kept records carry their sample_rate.
+
+    Attributes:
+        rates (dict): 'module' or 'module.function' -> fraction of the records kept.
+    """
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = {key: float(rate) for key, rate in rates.items()}
+        self._counts = {}
+        self._lock = Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        key = f"{record.module}.{record.funcName}"
+        rate = self.rates.get(key, self.rates.get(record.module))
+        if rate is None or rate >= 1:
+            return True
+        if rate <= 0:
+            return False
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        if count % max(1, round(1 / rate)):
+            return False
+        record.sample_rate = rate
+        return True
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Hands records to the logging thread without blocking the caller: the message is
+    rendered, redacted, truncated and tagged with the request ID here (redacted first, so a
+    secret cut by the truncation is still masked), formatting and I/O happen in
+    the listener thread, and records are dropped (and counted) when the queue is full.
+
+    Attributes:
+        max_chars (int): Maximum length of a message.
+    """
+    def __init__(self, log_queue: queue.Queue, max_chars: int = 2000):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Rendered in place rather than on a copy: copying costs as much as creating the record
+        record.msg = truncate(redact(record.getMessage()), self.max_chars)
+        record.args = None
+        record.redacted = True
+        record.request_id = get_request_id()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc()
+
+class DrainingQueueListener(QueueListener):
+    """
+    A QueueListener that waits for room in a full queue to stop, so stopping it always
+    writes the records already queued.
+    """
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+# Listener writing the queued records, running between setup_logging and shutdown_logging
+_listener = None
+_queue_handler = None
+
+def setup_logging(level: str = None, log_format: str = None, module_levels: str = None, sampling: str = None, stream=None) -> str:
+    """
+    Configures logging through a bounded queue drained by a background thread, so a log
+    call costs the caller a filter check and a queue put. Records go to the console and to
+    a new log file in LOG_DIR, as JSON lines or text. Called once at startup (app lifespan,
+    scripts) rather than on import; calling it again replaces the previous configuration.
+
+    Args:
+        level (str, optional): Default level. Defaults to Config.LOG_LEVEL.
+        log_format (str, optional): "json" or "text". Defaults to Config.LOG_FORMAT.
+        module_levels (str, optional): Per-module levels, e.g. "mongo_db=WARNING,rag=DEBUG". Defaults to Config.LOG_MODULE_LEVELS.
+        sampling (str, optional): Fraction of the records kept, e.g. "chat_service=0.1". Defaults to Config.LOG_SAMPLING.
+        stream (optional): Console stream. Defaults to sys.stderr.
+
+    Returns:
+        str: Path of the log file, None when logging to the console only.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+    default = to_level(level or Config.LOG_LEVEL)
+    level_filter = ModuleLevelFilter(parse_mapping(Config.LOG_MODULE_LEVELS if module_levels is None else module_levels), default)
+    formatter = JsonFormatter() if (log_format or Config.LOG_FORMAT) == "json" else TextFormatter(logFormat)
+
+    handlers = [logging.StreamHandler(stream)]
+    log_file = None
+    if Config.LOG_TO_FILE:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        log_file = os.path.join(LOG_DIR, f"Multimodal_rag_bot_{datetime.now().strftime('%y_%m_%d_%H_%M_%S_%f')}.log")
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = BoundedQueueHandler(queue.Queue(Config.LOG_QUEUE_SIZE), Config.LOG_MAX_MESSAGE_CHARS)
+    _queue_handler.addFilter(level_filter)
+    _queue_handler.addFilter(SamplingFilter(parse_mapping(Config.LOG_SAMPLING if sampling is None else sampling)))
+    _listener = DrainingQueueListener(_queue_handler.queue, *handlers)
+    _listener.start()
+
+    # The root level is the lowest configured level, so records below it are not even created
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(min([default, *level_filter.levels.values()]))
+    return log_file
+
+def shutdown_logging():
+    """
+    Flushes the queued records and stops the logging thread.
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = _queue_handler = None
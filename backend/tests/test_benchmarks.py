@@ -0,0 +1,33 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import ollama
+from benchmarks.pipeline import run_suite
+from benchmarks.stubs import StubOllamaServer
+
+STAGES = {"embed", "ingest_data", "search", "rerank", "chat_bot"}
+
+def test_stub_ollama_server_is_deterministic():
+    """Test if the stub server answers the chat API with the same response for the same prompt."""
+    server = StubOllamaServer(response_tokens=8).start()
+    try:
+        client = ollama.Client(host=server.url, trust_env=False)
+        first = client.chat(model="stub", messages=[{"role": "user", "content": "Hello"}])
+        second = client.chat(model="stub", messages=[{"role": "user", "content": "Hello"}])
+    finally:
+        server.stop()
+
+    assert first.message.content == second.message.content
+    assert len(first.message.content.split()) == 8
+    assert first.eval_count == 8
+
+def test_run_suite_reports_every_stage():
+    """Test if a small offline run reports throughput and latency percentiles of every stage."""
+    report = run_suite([20], query_count=3, top_k=5)
+
+    stages = report["results"]["20"]
+    assert set(stages) == STAGES
+    for stats in stages.values():
+        assert stats["calls"] > 0
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    assert stages["search"]["items"] == 3
+    assert stages["chat_bot"]["calls"] == 3
@@ -0,0 +1,97 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch
+from cache import CacheStats, TTLCache, RedisCache
+from bson import ObjectId
+
+def test_cache_get_set():
+    """Test if stored values are returned and lookups are counted."""
+    cache = TTLCache("test", maxsize=2, ttl=60)
+    cache.set("a", {"username": "a"})
+
+    assert cache.get("a") == {"username": "a"}
+    assert cache.get("missing") is None
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+def test_cache_evicts_least_recently_used():
+    """Test if the least recently used entry is evicted beyond maxsize."""
+    cache = TTLCache("test", maxsize=2, ttl=60)
+    cache["a"] = 1
+    cache["b"] = 2
+    cache.get("a")  # "b" becomes the least recently used entry
+    cache["c"] = 3
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get_stats()["size"] == 2
+
+def test_cache_expires_entries():
+    """Test if entries are dropped once their time to live has passed."""
+    cache = TTLCache("test", maxsize=2, ttl=10)
+    with patch("cache.time.monotonic", return_value=100.0):
+        cache["a"] = 1
+    with patch("cache.time.monotonic", return_value=109.0):
+        assert cache.get("a") == 1
+    with patch("cache.time.monotonic", return_value=111.0):
+        assert cache.get("a") is None
+        with pytest.raises(KeyError):
+            cache["a"]
+
+def test_cache_delete_and_clear():
+    """Test if entries can be invalidated one by one or all at once."""
+    cache = TTLCache("test", maxsize=4, ttl=60)
+    cache["a"] = 1
+    cache["b"] = 2
+    del cache["a"]
+
+    assert "a" not in cache
+    cache.clear()
+    assert cache.get_stats()["size"] == 0
+
+class DictRedis:
+    """A Redis client keeping the raw values in a dict, to check what the cache writes."""
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode() if isinstance(value, str) else value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def scan_iter(self, match=None):
+        raise AssertionError("The keyspace must not be scanned")
+
+@pytest.fixture
+def redis_cache():
+    cache = RedisCache.__new__(RedisCache)
+    cache.name, cache.ttl, cache.client = "test", 60, DictRedis()
+    cache.stats = CacheStats()
+    return cache
+
+def test_redis_cache_stores_json(redis_cache):
+    """Test if Redis entries are written as JSON (never pickled) and read back with their MongoDB types."""
+    user = {"_id": ObjectId(), "username": "a", "chat_sessions": [{"session_id": "s1"}]}
+    redis_cache.set("a", user)
+
+    raw = redis_cache.client.data["test:a"]
+    assert raw.startswith(b"{") and b"$oid" in raw
+    assert redis_cache.get("a") == user
+    redis_cache.client.data["test:b"] = b"\x80\x04K\x01."  # A pickled value is rejected
+    with pytest.raises(ValueError):
+        redis_cache.get("b")
+
+def test_redis_cache_stats_do_not_scan(redis_cache):
+    """Test if the statistics are read without scanning the Redis keyspace."""
+    redis_cache.get("missing")
+    stats = redis_cache.get_stats()
+    assert stats["misses"] == 1
+    assert "size" not in stats
@@ -0,0 +1,115 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch, MagicMock
+from rag_modules.context_manager import ContextManager
+
+def make_history(turns, text="x" * 40):
+    """Builds a history with a system prompt and the given number of user/assistant turns."""
+    history = [{"role": "system", "content": "System"}]
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Q{i} {text}"})
+        history.append({"role": "assistant", "content": f"A{i} {text}"})
+    return history
+
+def test_build_keeps_system_and_last_turns():
+    """Test if only the system prompt and the last max_turns turns are kept."""
+    manager = ContextManager(max_turns=2, token_budget=10000)
+    history = make_history(5) + [{"role": "user", "content": "Latest"}]
+
+    context = manager.build(history)
+
+    assert context[0]["role"] == "system"
+    assert [m["content"] for m in context[1:]] == ["Q4 " + "x" * 40, "A4 " + "x" * 40, "Latest"]
+
+def test_build_respects_token_budget():
+    """Test if older turns are dropped once the token budget is exhausted."""
+    manager = ContextManager(max_turns=10, token_budget=60)
+    history = make_history(5, text="x" * 80) + [{"role": "user", "content": "Latest"}]
+
+    context = manager.build(history)
+
+    assert context[0]["role"] == "system"
+    assert context[-1]["content"] == "Latest"
+    assert manager.count_tokens(context) <= 60
+    assert context[1]["role"] == "user"  # Window never starts with an assistant reply
+
+def test_build_counts_last_content_against_budget():
+    """Test if the content sent for the latest message (e.g. a RAG prompt) is budgeted, not its stored query."""
+    manager = ContextManager(max_turns=10, token_budget=300)
+    history = make_history(5, text="x" * 80) + [{"role": "user", "content": "Latest"}]
+    prompt = "Context " + "c" * 800 + " Query: Latest"
+
+    context = manager.build(history, last_content=prompt)
+
+    assert context[-1]["content"] == prompt
+    assert manager.count_tokens(context) <= 300
+    assert history[-1]["content"] == "Latest"  # The history keeps the query
+
+def test_build_always_keeps_latest_message():
+    """Test if the latest message is sent even when it alone exceeds the budget."""
+    manager = ContextManager(max_turns=10, token_budget=10)
+    history = make_history(1) + [{"role": "user", "content": "y" * 400}]
+
+    context = manager.build(history)
+
+    assert context[-1]["content"] == "y" * 400
+    assert len(context) == 2
+
+@patch("rag_modules.context_manager.ollama.chat")
+def test_build_summarizes_dropped_turns(mock_chat):
+    """Test if turns leaving the window are folded into the rolling summary."""
+    mock_chat.return_value = MagicMock(message=MagicMock(content="Earlier summary"))
+    manager = ContextManager(max_turns=1, token_budget=10000, summarize=True)
+    history = make_history(3) + [{"role": "user", "content": "Latest"}]
+
+    context = manager.build(history)
+
+    mock_chat.assert_called_once()
+    assert manager.summarized_count == 6
+    assert context[1] == {"role": "system", "content": "Summary of the earlier conversation: Earlier summary"}
+
+    # Nothing new left the window, so the summary is not rewritten
+    manager.build(history)
+    mock_chat.assert_called_once()
+
+@patch("rag_modules.context_manager.ollama.chat")
+def test_build_fits_first_summary_in_budget(mock_chat):
+    """Test if the window shrinks when the summary written on this turn would push the context over the budget."""
+    mock_chat.return_value = MagicMock(message=MagicMock(content="s" * 400))
+    manager = ContextManager(max_turns=10, token_budget=200, summarize=True)
+    history = make_history(10) + [{"role": "user", "content": "Latest"}]
+
+    context = manager.build(history)
+
+    assert manager.summary == "s" * 400
+    assert manager.count_tokens(context) <= 200
+    assert context[1]["content"].startswith("Summary of the earlier conversation")
+    assert context[2]["role"] == "user"
+    assert context[-1]["content"] == "Latest"
+
+def test_trim_drops_oldest_turns_over_budget():
+    """Test if a built context whose messages grew is trimmed back within the budget, keeping whole turns."""
+    manager = ContextManager(token_budget=100)
+    context = [{"role": "system", "content": "System"},
+               {"role": "user", "content": "Q0 " + "c" * 400}, {"role": "assistant", "content": "A0"},
+               {"role": "user", "content": "Q1"}, {"role": "assistant", "content": "A1"},
+               {"role": "user", "content": "Latest"}]
+
+    trimmed = manager.trim(context)
+
+    assert [m["content"] for m in trimmed] == ["System", "Q1", "A1", "Latest"]
+    assert manager.trim(trimmed) == trimmed
+
+@patch("rag_modules.context_manager.ollama.chat")
+def test_build_summary_count_after_history_offset(mock_chat):
+    """Test if the summary counts stored messages when the history was loaded after the summarized ones."""
+    mock_chat.return_value = MagicMock(message=MagicMock(content="Newer summary"))
+    manager = ContextManager(max_turns=1, token_budget=10000, summarize=True)
+    manager.set_summary("Earlier summary", summarized_count=20, history_offset=20)
+    history = make_history(3) + [{"role": "user", "content": "Latest"}]
+
+    manager.build(history)
+
+    transcript = mock_chat.call_args.kwargs["messages"][0]["content"]
+    assert "Q0" in transcript and "Latest" not in transcript
+    assert manager.summarized_count == 26
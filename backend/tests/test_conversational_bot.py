@@ -2,6 +2,8 @@ import pytest, sys, os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from unittest.mock import patch, MagicMock
 from rag_modules.conversational_bot import Conversational_Bot
+from rag_modules.image_store import ImageStore
+from rag_modules.context_manager import ContextManager
 
 @pytest.fixture
 def bot():
@@ -23,20 +25,133 @@ def test_generate_text(mock_chat, bot):
     assert bot.messages[-1]["content"] == "Mocked response."
     assert bot.messages[-2]["content"] == user_input
 
+@pytest.fixture
+def image_bot(tmp_path):
+    return Conversational_Bot(system="Test system instruction", image_store=ImageStore(str(tmp_path / "images")))
+
 @patch("rag_modules.conversational_bot.ollama.chat")
-def test_generate_with_image(mock_chat, bot):
+def test_generate_with_image(mock_chat, image_bot, tmp_path):
     # Mocking ollama.chat response
     mock_response = MagicMock()
     mock_response.message.content = "Mocked response with image."
     mock_chat.return_value = mock_response
     
     user_input = "Describe this image."
-    image_path = "path/to/image.jpg"
-    response = bot.generate(user_input, image=image_path)
+    image_path = tmp_path / "image.jpg"
+    image_path.write_bytes(b"jpeg bytes")
+    response = image_bot.generate(user_input, image=str(image_path))
     
     # Assertions
-    mock_chat.assert_called_once()
     assert response.message.content == "Mocked response with image."
-    assert bot.messages[-1]["content"] == "Mocked response with image."
-    assert bot.messages[-2]["content"] == user_input
-    assert bot.messages[-2]["images"] == [image_path]
+    assert image_bot.messages[-1]["content"] == "Mocked response with image."
+    assert image_bot.messages[-2]["content"] == user_input
+    ref = image_bot.messages[-2]["image_refs"][0]
+    assert image_bot.image_store.get(ref) == b"jpeg bytes"
+    assert mock_chat.call_args_list[0].kwargs["messages"][-1]["images"] == [b"jpeg bytes"]
+    image_bot.wait_for_captions()
+    assert mock_chat.call_count == 2  # The answer, then the caption written in the background
+    assert image_bot.image_store.get_caption(ref) == "Mocked response with image."
+
+@patch("rag_modules.conversational_bot.ollama.chat")
+def test_earlier_images_are_sent_as_cached_captions(mock_chat, image_bot):
+    """Test if only the current turn's image is sent and earlier images are captioned once, in the background."""
+    def chat(model, messages, **kwargs):
+        response = MagicMock()
+        response.message.content = "A cat on a sofa." if messages[-1]["content"] == "Summarize the image:" else "Answer."
+        return response
+    mock_chat.side_effect = chat
+
+    image_bot.generate("What is this?", image=b"cat image")
+    image_bot.wait_for_captions()
+    image_bot.generate("And this?", image=b"dog image")
+    image_bot.wait_for_captions()
+    image_bot.generate("Compare them.")
+
+    calls = [call.kwargs for call in mock_chat.call_args_list]
+    captions = [kwargs for kwargs in calls if kwargs["messages"][-1]["content"] == "Summarize the image:"]
+    assert len(captions) == 2
+    last = calls[-1]["messages"]
+    assert all("images" not in message for message in last)
+    assert last[1]["content"] == "[Image: A cat on a sofa.]\nWhat is this?"
+    second_turn = next(kwargs["messages"] for kwargs in calls if kwargs["messages"][-1]["content"] == "And this?")
+    assert second_turn[-1]["images"] == [b"dog image"]
+    assert "images" not in second_turn[1]
+
+@patch("rag_modules.conversational_bot.ollama.chat")
+def test_pending_caption_does_not_block_generate(mock_chat, image_bot):
+    """Test if an earlier image without a caption yet is sent as a placeholder rather than captioned in the request."""
+    mock_chat.return_value.message.content = "Answer."
+    image_bot.caption_in_background = MagicMock()
+
+    image_bot.generate("What is this?", image=b"cat image")
+    image_bot.generate("Anything else?")
+
+    assert mock_chat.call_count == 2
+    assert mock_chat.call_args.kwargs["messages"][1]["content"] == "[Image: not described yet]\nWhat is this?"
+    ref = image_bot.messages[1]["image_refs"][0]
+    image_bot.caption_in_background.assert_called_with([ref])
+
+@patch("rag_modules.conversational_bot.ollama.chat")
+def test_images_outside_window_are_not_resolved(mock_chat, tmp_path):
+    """Test if only the images of the kept turns have their captions read or scheduled."""
+    mock_chat.return_value.message.content = "Answer."
+    bot = Conversational_Bot(system="Sys", context_manager=ContextManager(max_turns=2), image_store=ImageStore(str(tmp_path / "images")))
+    refs = [bot.image_store.put(f"image {i}".encode()) for i in range(5)]
+    history = [{"role": "system", "content": "Sys"}]
+    for i, ref in enumerate(refs):
+        history += [{"role": "user", "content": f"Q{i}", "image_refs": [ref]}, {"role": "assistant", "content": f"A{i}"}]
+    bot.set_history(history)
+    bot.caption_in_background = MagicMock()
+    bot.image_store.get_caption = MagicMock(return_value="A caption.")
+
+    bot.generate("And now?")
+
+    bot.image_store.get_caption.assert_called_once_with(refs[-1])
+    bot.caption_in_background.assert_not_called()
+    assert mock_chat.call_args.kwargs["messages"][1]["content"] == "[Image: A caption.]\nQ4"
+
+@patch("rag_modules.conversational_bot.ollama.chat")
+def test_captions_count_against_budget(mock_chat, tmp_path):
+    """Test if the captions of earlier images are counted in the token budget."""
+    mock_chat.return_value.message.content = "Answer."
+    bot = Conversational_Bot(system="Sys", context_manager=ContextManager(token_budget=1000), image_store=ImageStore(str(tmp_path / "images")))
+    bot.caption_in_background = MagicMock()
+    bot.generate("What is this?", image=b"cat image")
+    bot.image_store.set_caption(bot.messages[1]["image_refs"][0], "A very detailed caption. " * 400)
+
+    bot.generate("Thanks.")
+
+    context = mock_chat.call_args.kwargs["messages"]
+    assert bot.context_manager.count_tokens(context) <= 1000
+    assert [message["content"] for message in context] == ["Sys", "Thanks."]
+
+@patch("rag_modules.conversational_bot.ollama.chat")
+def test_generate_with_prompt_keeps_query_in_history(mock_chat, bot):
+    # Mocking ollama.chat response
+    mock_response = MagicMock()
+    mock_response.message.content = "Answer."
+    mock_response.prompt_eval_count = 42
+    mock_chat.return_value = mock_response
+    
+    response = bot.generate("What is RAG?", prompt="Context: ... Query: What is RAG?")
+    
+    # Assertions
+    sent = mock_chat.call_args.kwargs["messages"]
+    assert sent[-1]["content"] == "Context: ... Query: What is RAG?"
+    assert bot.messages[-2]["content"] == "What is RAG?"
+    assert bot.last_usage["prompt_tokens"] == 42
+
+@patch("rag_modules.conversational_bot.ollama.chat")
+def test_generate_with_prompt_stays_within_budget(mock_chat):
+    """Test if the history window leaves room for the retrieved context of a RAG prompt."""
+    mock_chat.return_value = MagicMock(message=MagicMock(content="Answer."), prompt_eval_count=None, eval_count=None)
+    bot = Conversational_Bot(system="System", context_manager=ContextManager(max_turns=10, token_budget=6000))
+    for i in range(20):
+        bot.messages += [{"role": "user", "content": f"Q{i} " + "q" * 2000}, {"role": "assistant", "content": f"A{i} " + "a" * 2000}]
+
+    bot.generate("What is RAG?", prompt="Context: " + "c" * 20000 + " Query: What is RAG?")
+
+    sent = mock_chat.call_args.kwargs["messages"]
+    assert sent[-1]["content"].startswith("Context: ")
+    assert bot.context_manager.count_tokens(sent) <= 6000
+    assert bot.last_usage["estimated_prompt_tokens"] <= 6000
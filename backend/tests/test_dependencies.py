@@ -1,17 +1,33 @@
-import pytest, sys, os
+import pytest, sys, os, time, hashlib
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from unittest.mock import MagicMock, patch
+from contextlib import asynccontextmanager
 from fastapi import HTTPException, status
 from jose import JWTError
 from sqlalchemy.orm import Session
 from models.user import User
 from config import Config
+from cache import TTLCache, auth_token_cache, auth_user_cache
+from auth import dependencies
 from auth.dependencies import verify_token, admin_only
 
+@pytest.fixture(autouse=True)
+def clear_auth_cache():
+    """Fixture to clear the authentication caches before each test."""
+    auth_token_cache.clear()
+    auth_user_cache.clear()
+
 @pytest.fixture
-def mock_db_session():
-    """Fixture to create a mocked SQLAlchemy session."""
-    return MagicMock(spec=Session)
+def mock_db_session(monkeypatch):
+    """Fixture to create a mocked SQLAlchemy session, opened by verify_token on a cache miss."""
+    db = MagicMock(spec=Session)
+    
+    @asynccontextmanager
+    async def open_db():
+        yield db
+    
+    monkeypatch.setattr(dependencies, "open_db", MagicMock(side_effect=open_db))
+    return db
 
 @pytest.fixture
 def mock_user():
@@ -22,14 +38,15 @@ def mock_user():
     return user
 
 @patch("jose.jwt.decode")
-def test_verify_token_valid(mock_jwt_decode, mock_db_session, mock_user, caplog):
+@pytest.mark.asyncio
+async def test_verify_token_valid(mock_jwt_decode, mock_db_session, mock_user, caplog):
     """Test verify_token with a valid token."""
     token_payload = {"sub": "testuser"}
     mock_jwt_decode.return_value = token_payload
     mock_db_session.query().filter().first.return_value = mock_user
     
-    with caplog.at_level("INFO"):
-        user = verify_token(token="valid_token", db=mock_db_session)
+    with caplog.at_level("DEBUG"):
+        user = await verify_token(token="valid_token")
     
     assert user == mock_user
     mock_jwt_decode.assert_called_once_with("valid_token", Config.SECRET_KEY, algorithms=[Config.ALGORITHM])
@@ -41,56 +58,148 @@ def test_verify_token_valid(mock_jwt_decode, mock_db_session, mock_user, caplog)
     ({}, "Invalid token: Missing username"),
     ({"sub": "unknown_user"}, "Invalid token: User not found"),
 ])
-def test_verify_token_invalid_token(mock_jwt_decode, mock_db_session, token_payload, expected_detail):
+@pytest.mark.asyncio
+async def test_verify_token_invalid_token(mock_jwt_decode, mock_db_session, token_payload, expected_detail):
     """Test verify_token with an invalid payloads."""
     mock_jwt_decode.return_value = token_payload
     mock_db_session.query().filter().first.return_value = None if "unknown_user" in token_payload.values() else MagicMock()
     
     with pytest.raises(HTTPException) as exc:
-        verify_token(token="invalid_token", db=mock_db_session)
+        await verify_token(token="invalid_token")
     
     assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert expected_detail in exc.value.detail
     
 @patch("jose.jwt.decode")
-def test_verify_token_invalid_token(mock_jwt_decode, mock_db_session, caplog):
+@pytest.mark.asyncio
+async def test_verify_token_invalid_token(mock_jwt_decode, mock_db_session, caplog):
     """Test verify_token with an invalid token."""
     mock_jwt_decode.side_effect = JWTError("Invalid signature")
     
     with pytest.raises(HTTPException) as exc:
-        verify_token(token="invalid_token", db=mock_db_session)
+        await verify_token(token="invalid_token")
     
     assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert "Invalid token" in exc.value.detail
     assert "Invalid token: Invalid signature" in caplog.text
 
 @patch("jose.jwt.decode")
-def test_verify_token_missing_username(mock_jwt_decode, mock_db_session):
+@pytest.mark.asyncio
+async def test_verify_token_missing_username(mock_jwt_decode, mock_db_session):
     """Test verify_token with a token missing a username."""
     mock_jwt_decode.return_value = {}
     
     with pytest.raises(HTTPException) as exc:
-        verify_token(token="no_username_token", db=mock_db_session)
+        await verify_token(token="no_username_token")
     
     assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert "Missing username" in exc.value.detail
 
 @patch("jose.jwt.decode")
-def test_verify_token_user_not_found(mock_jwt_decode, mock_db_session):
+@pytest.mark.asyncio
+async def test_verify_token_user_not_found(mock_jwt_decode, mock_db_session):
     """Test verify_token when the user is not found in the database."""
     mock_jwt_decode.return_value = {"sub": "unknown_user"}
     mock_db_session.query().filter().first.return_value = None
     
     with pytest.raises(HTTPException) as exc:
-        verify_token(token="valid_token", db=mock_db_session)
+        await verify_token(token="valid_token")
+    
+    assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
+    assert "User not found" in exc.value.detail
+
+@patch("jose.jwt.decode")
+@pytest.mark.asyncio
+async def test_verify_token_cached(mock_jwt_decode, mock_db_session):
+    """Test verify_token serves a repeated token without decoding, opening a session or querying again."""
+    mock_jwt_decode.return_value = {"sub": "testuser", "uid": 1, "exp": time.time() + 600}
+    mock_db_session.query().filter().first.return_value = User(id=1, username="testuser", is_admin=False)
+    mock_db_session.query.reset_mock()
+    
+    await verify_token(token="valid_token")
+    user = await verify_token(token="valid_token")
+    
+    assert user.username == "testuser"
+    assert user.id == 1
+    mock_jwt_decode.assert_called_once()
+    mock_db_session.query.assert_called_once()
+    dependencies.open_db.assert_called_once()
+
+@patch("jose.jwt.decode")
+@pytest.mark.asyncio
+async def test_verify_token_token_without_uid_not_served_from_cache(mock_jwt_decode, mock_db_session):
+    """Test verify_token always checks the database for tokens issued without the user id."""
+    mock_jwt_decode.return_value = {"sub": "testuser"}
+    mock_db_session.query().filter().first.return_value = User(id=1, username="testuser", is_admin=False)
+    mock_db_session.query.reset_mock()
+    
+    await verify_token(token="valid_token")
+    await verify_token(token="valid_token")
+    
+    assert mock_db_session.query.call_count == 2
+
+@patch("jose.jwt.decode")
+@pytest.mark.asyncio
+async def test_verify_token_cached_expired(mock_jwt_decode, mock_db_session):
+    """Test verify_token rejects a cached token once it has expired."""
+    mock_jwt_decode.return_value = {"sub": "testuser", "exp": time.time() - 1}
+    auth_token_cache.set(hashlib.sha256(b"expired_token").hexdigest(), {"username": "testuser", "exp": time.time() - 1})
+    
+    with pytest.raises(HTTPException) as exc:
+        await verify_token(token="expired_token")
     
     assert exc.value.status_code == status.HTTP_401_UNAUTHORIZED
+    assert "expired" in exc.value.detail
+
+@patch("jose.jwt.decode")
+@pytest.mark.asyncio
+async def test_verify_token_user_invalidated(mock_jwt_decode, mock_db_session):
+    """Test verify_token queries the database again once the cached user is invalidated."""
+    mock_jwt_decode.return_value = {"sub": "testuser", "uid": 1}
+    mock_db_session.query().filter().first.return_value = User(id=1, username="testuser", is_admin=False)
+    await verify_token(token="valid_token")
+    
+    auth_user_cache.delete("testuser")  # As done when the user is deleted
+    mock_db_session.query().filter().first.return_value = None
+    
+    with pytest.raises(HTTPException) as exc:
+        await verify_token(token="valid_token")
+    
+    assert "User not found" in exc.value.detail
+
+@patch("jose.jwt.decode")
+@pytest.mark.asyncio
+async def test_verify_token_user_deleted_on_other_worker(mock_jwt_decode, mock_db_session, monkeypatch):
+    """Test a worker whose cache was not invalidated never serves a re-created user the old id, and drops the deleted one shortly."""
+    worker_a = TTLCache("auth_users_a", ttl=Config.AUTH_USER_LOCAL_TTL_SECONDS)
+    worker_b = TTLCache("auth_users_b", ttl=Config.AUTH_USER_LOCAL_TTL_SECONDS)
+    tokens = {"old_token": {"sub": "testuser", "uid": 1}, "new_token": {"sub": "testuser", "uid": 2}}
+    mock_jwt_decode.side_effect = lambda token, *args, **kwargs: tokens[token]
+    
+    # Both workers cache the admin user
+    mock_db_session.query().filter().first.return_value = User(id=1, username="testuser", is_admin=True)
+    for worker in (worker_a, worker_b):
+        monkeypatch.setattr(dependencies, "auth_user_cache", worker)
+        await verify_token(token="old_token")
+    
+    # Worker A deletes the user: worker B refuses its token once the short-lived entry expires
+    worker_a.delete("testuser")
+    mock_db_session.query().filter().first.return_value = None
+    expired = time.monotonic() + Config.AUTH_USER_LOCAL_TTL_SECONDS + 1
+    with patch("cache.time.monotonic", return_value=expired), pytest.raises(HTTPException) as exc:
+        await verify_token(token="old_token")
     assert "User not found" in exc.value.detail
+    
+    # Re-created as a regular user, it never gets the old id and role from worker B's cache
+    worker_b.set("testuser", {"id": 1, "username": "testuser", "is_admin": True})
+    mock_db_session.query().filter().first.return_value = User(id=2, username="testuser", is_admin=False)
+    user = await verify_token(token="new_token")
+    assert (user.id, user.is_admin) == (2, False)
 
 # Tests for admin_only function
 def test_admin_only_with_admin(mock_user, caplog):
     """Test admin_only function with an admin user."""
-    with caplog.at_level("INFO"):
+    with caplog.at_level("DEBUG"):
         assert admin_only(current_user=mock_user) == mock_user
         assert "Admin only verification success for user 'testuser'" in caplog.text
 
@@ -3,10 +3,17 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 from unittest.mock import MagicMock, patch
 from rag_modules.conversational_bot import Conversational_Bot
 from rag_modules.document_extract import (
-    extract_pdf_data, extract_txt_data, extract_image_data
+    extract_pdf_data, extract_txt_data, extract_image_data, extract_file_data, extract_html_data, stream_file_data, load_unstructured
 )
+from rag_modules.partition_cache import partition_cache
+from rag_modules.image_store import ImageStore
+import rag_modules.document_extract as document_extract
+from file_types import FileType
 import unstructured.documents.elements as elements
 
+# Import the partitioners before the tests patch os.path.exists and the partitioners themselves
+load_unstructured()
+
 @pytest.fixture
 def mock_bot():
     bot = Conversational_Bot()
@@ -17,21 +24,32 @@ def mock_bot():
 @pytest.fixture
 def mock_pdf_data():
     return [
-        elements.Table(text="Sample table", detection_origin="test"),
-        elements.CompositeElement(text="Sample text", metadata=elements.ElementMetadata(orig_elements=[elements.Image(text="Sample image", detection_origin="test")])),
+        elements.Title(text="Sample title"),
+        elements.NarrativeText(text="Sample text"),
+        elements.Image(text="Sample image", metadata=elements.ElementMetadata(image_base64="aW1n")),
+        elements.Table(text="Sample table", metadata=elements.ElementMetadata(text_as_html="<table></table>")),
         ]
 
+@pytest.fixture(autouse=True)
+def tmp_partition_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(partition_cache, "directory", str(tmp_path / "partitions"))
+    return partition_cache
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    file_path = tmp_path / "dummy.pdf"
+    file_path.write_bytes(b"%PDF-1.4 dummy")
+    return str(file_path)
+
 @pytest.fixture
 def mock_text_data():
     return [elements.CompositeElement(text="Sample text document")]
 
-@patch("os.path.exists")
 @patch("rag_modules.document_extract.partition_pdf")
-def test_extract_pdf_data(mock_partition_pdf, mock_path_exist, mock_pdf_data, mock_bot):
+def test_extract_pdf_data(mock_partition_pdf, mock_pdf_data, mock_bot, pdf_path):
     mock_partition_pdf.return_value = mock_pdf_data
-    mock_path_exist.return_value = True
-    texts, image_summaries, table_summaries = extract_pdf_data(file_path="dummy.pdf", bot=mock_bot)
-    assert len(texts) == 1
+    texts, image_summaries, table_summaries = extract_pdf_data(file_path=pdf_path, bot=mock_bot)
+    assert texts == ["Sample title\n\nSample text\n\nSample image"]
     assert len(image_summaries) == 1
     assert len(table_summaries) == 1
     mock_bot.summarize_image.assert_called()
@@ -53,4 +71,88 @@ def test_extract_image_data(mock_path_exist, mock_bot):
     image_summary = extract_image_data(file_path="dummy.jpg", bot=mock_bot)
     
     assert image_summary == "Mocked image summary"
-    mock_bot.summarize_image.assert_called()
\ No newline at end of file
+    mock_bot.summarize_image.assert_called()
+
+@patch("rag_modules.document_extract.partition_pdf")
+def test_extract_pdf_data_cached(mock_partition_pdf, mock_pdf_data, mock_bot, pdf_path, tmp_partition_cache):
+    mock_partition_pdf.return_value = mock_pdf_data
+    first = extract_pdf_data(file_path=pdf_path, bot=mock_bot)
+    second = extract_pdf_data(file_path=pdf_path, bot=mock_bot)
+
+    mock_partition_pdf.assert_called_once()  # Layout detection skipped on the second run
+    assert first == second
+    assert tmp_partition_cache.get_stats()["hits"] >= 1
+
+def test_partition_cache_key_depends_on_params(tmp_partition_cache, mock_pdf_data):
+    tmp_partition_cache.set("abc", {"strategy": "hi_res"}, mock_pdf_data)
+
+    assert tmp_partition_cache.get("abc", {"strategy": "fast"}) is None
+    cached = tmp_partition_cache.get("abc", {"strategy": "hi_res"})
+    assert [type(element).__name__ for element in cached] == ["Title", "NarrativeText", "Image", "Table"]
+    assert cached[2].metadata.image_base64 == "aW1n"
+
+def test_partition_cache_evicts_beyond_max_bytes(tmp_partition_cache, mock_pdf_data, monkeypatch):
+    monkeypatch.setattr(tmp_partition_cache, "max_bytes", 1)
+    tmp_partition_cache.set("abc", {}, mock_pdf_data)
+
+    assert tmp_partition_cache.get("abc", {}) is None
+
+@patch("rag_modules.document_extract.partition_pdf")
+def test_extract_file_data_pdf(mock_partition_pdf, mock_pdf_data, mock_bot, pdf_path):
+    mock_partition_pdf.return_value = mock_pdf_data
+    texts = extract_file_data(FileType("pdf", "application/pdf", ".pdf"), pdf_path, bot=mock_bot)
+    assert texts == ["Sample title\n\nSample text\n\nSample image", "Mocked image summary", "Mocked table summary"]
+
+@patch("os.path.exists")
+def test_extract_file_data_image(mock_path_exist, mock_bot):
+    mock_path_exist.return_value = True
+    texts = extract_file_data(FileType("image", "image/png", ".png"), "dummy.png", bot=mock_bot)
+    assert texts == ["Mocked image summary"]
+
+def test_extract_file_data_unknown_kind():
+    with pytest.raises(ValueError):
+        extract_file_data(FileType("csv", "text/csv", ".csv"), "dummy.csv")
+
+@patch("os.path.exists")
+@patch("unstructured.partition.html.partition_html")
+def test_extract_html_data(mock_partition_html, mock_path_exist, mock_text_data):
+    mock_partition_html.return_value = mock_text_data
+    mock_path_exist.return_value = True
+    texts = extract_html_data(file_path="dummy.html")
+    assert texts == ["Sample text document"]
+    assert mock_partition_html.call_args.kwargs["chunking_strategy"] == "by_title"
+
+@patch("rag_modules.document_extract.partition_pdf")
+def test_stream_file_data_pdf(mock_partition_pdf, mock_pdf_data, mock_bot, pdf_path):
+    mock_partition_pdf.return_value = mock_pdf_data
+    stream = stream_file_data(FileType("pdf", "application/pdf", ".pdf"), pdf_path, bot=mock_bot)
+
+    assert next(stream) == "Sample title\n\nSample text\n\nSample image"  # Text before any summary is awaited
+    assert sorted(stream) == ["Mocked image summary", "Mocked table summary"]
+
+@patch("rag_modules.document_extract.partition_pdf")
+def test_stream_file_data_pdf_stores_figures(mock_partition_pdf, mock_pdf_data, mock_bot, pdf_path, tmp_path, monkeypatch):
+    """Test if figures are stored for the image encoder instead of being summarized."""
+    store = ImageStore(str(tmp_path / "images"))
+    monkeypatch.setattr(document_extract, "image_store", store)
+    mock_partition_pdf.return_value = mock_pdf_data
+    figures = []
+    texts = list(stream_file_data(FileType("pdf", "application/pdf", ".pdf"), pdf_path, bot=mock_bot, figures=figures))
+
+    assert sorted(texts) == ["Mocked table summary", "Sample title\n\nSample text\n\nSample image"]
+    mock_bot.summarize_image.assert_not_called()
+    assert len(figures) == 1 and store.get(figures[0]) == b"img"
+
+@patch("os.path.exists", return_value=True)
+@patch("rag_modules.document_extract.partition_text")
+def test_stream_file_data_text(mock_partition_text, mock_path_exist, mock_text_data):
+    mock_partition_text.return_value = mock_text_data
+    texts = list(stream_file_data(FileType("text", "text/plain", ".txt"), "dummy.txt"))
+    assert texts == ["Sample text document"]
+
+@patch("os.path.exists", return_value=True)
+@patch("rag_modules.document_extract.partition_text", side_effect=RuntimeError("Mocked partition error"))
+def test_stream_file_data_failure(mock_partition_text, mock_path_exist):
+    with pytest.raises(ValueError):
+        list(stream_file_data(FileType("text", "text/plain", ".txt"), "dummy.txt"))
+
@@ -81,4 +81,16 @@ def test_embed_exception(mock_embed_model, caplog):
         embedder.embed(sample_texts)
         
     # Check if the error was logged
-    assert "Error during embedding: Mocked error" in caplog.text
\ No newline at end of file
+    assert "Error during embedding: Mocked error" in caplog.text
+
+@patch("rag_modules.embed_data.HuggingFaceEmbedding")
+def test_embed_stream(mock_huggingface_embedding):
+    """Test if a stream of texts is embedded batch by batch as batches fill up."""
+    embedder = EmbedData(batch_size=2)
+    embedder.generate_embedding = MagicMock(side_effect=lambda batch: [[0.1]] * len(batch))
+
+    batches = embedder.embed_stream(iter(["text1", "text2", "text3"]))
+    assert next(batches) == (["text1", "text2"], [[0.1], [0.1]])
+    embedder.generate_embedding.assert_called_once()  # The last batch is not embedded yet
+    assert list(batches) == [(["text3"], [[0.1]])]
+
@@ -0,0 +1,68 @@
+import pytest, sys, os, io, zipfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch
+from PIL import Image
+from config import Config
+from file_types import FILE_TYPES, FileTypeSpec, MagicPool, detect_file_type, magic_pool, register_file_type
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def docx_bytes():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("[Content_Types].xml", '<?xml version="1.0"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                         '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+        archive.writestr("word/document.xml", "<w:document/>")
+    return buffer.getvalue()
+
+@pytest.mark.parametrize("file_bytes, filename, kind", [
+    (b"%PDF-1.4\n%...", "paper.pdf", "pdf"),
+    (b"Plain notes about attention.\n", "notes.txt", "text"),
+    (b"# Title\n\nSome *markdown* text.\n", "README.md", "markdown"),
+    (b"<!DOCTYPE html><html><body><p>Hi</p></body></html>", "page.html", "html"),
+    (png_bytes(), "figure.png", "image"),
+    (docx_bytes(), "report.docx", "docx"),
+])
+def test_detect_file_type(file_bytes, filename, kind):
+    """Test if each supported format is detected as its extractor family."""
+    file_type = detect_file_type(file_bytes, filename)
+
+    assert file_type.kind == kind
+    assert file_type.extension == os.path.splitext(filename)[1]
+
+def test_detect_file_type_extension_does_not_override_mime():
+    """Test if a misleading extension does not turn a PDF into Markdown."""
+    assert detect_file_type(b"%PDF-1.4\n%...", "paper.md").kind == "pdf"
+
+def test_detect_file_type_unsupported():
+    """Test if unsupported formats are reported as None."""
+    assert detect_file_type(b"\x7fELF\x02\x01\x01" + b"\x00" * 64, "binary") is None
+
+def test_detect_file_type_sniffs_header_only():
+    """Test if only the first FILE_SNIFF_BYTES bytes are passed to libmagic, once."""
+    with patch.object(magic_pool, "from_buffer", return_value="application/pdf") as mock_sniff:
+        detect_file_type(b"%PDF" + b"x" * (Config.FILE_SNIFF_BYTES * 4), "paper.pdf")
+
+    mock_sniff.assert_called_once()
+    assert len(mock_sniff.call_args.args[0]) == Config.FILE_SNIFF_BYTES
+
+def test_magic_pool_reuses_handles():
+    """Test if libmagic handles are reused instead of created per sniff."""
+    pool = MagicPool(size=1)
+    with patch("file_types.magic.Magic", wraps=__import__("magic").Magic) as mock_magic:
+        pool.from_buffer(b"%PDF-1.4")
+        pool.from_buffer(b"%PDF-1.4")
+
+    mock_magic.assert_called_once()
+
+def test_register_file_type():
+    """Test if a registered kind takes precedence."""
+    spec = FileTypeSpec("csv", mimes=("text/csv",), extensions=(".csv",), generic_mimes=("text/plain",))
+    register_file_type(spec)
+    try:
+        assert detect_file_type(b"a,b\n1,2\n", "table.csv").kind == "csv"
+    finally:
+        FILE_TYPES.remove(spec)
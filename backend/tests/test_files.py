@@ -0,0 +1,62 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import AsyncMock, MagicMock
+from datetime import datetime
+from bson import ObjectId
+from models.files import build_file_query, list_files_page, parse_tags, FILE_LISTING_PROJECTION
+
+@pytest.fixture
+def mock_files_collection():
+    """Fixture for a mock files collection"""
+    return MagicMock()
+
+def make_file(i):
+    return {"_id": ObjectId(f"{i:024x}"), "filename": f"doc{i}.pdf", "uploader": "alice", "uploader_role": "user",
+            "upload_time": datetime(2025, 1, 10 - i), "collection_name": "multimodal_rag_alice", "tags": "a,b"}
+
+def test_parse_tags():
+    """Test if upload tags are normalized for filtering."""
+    assert parse_tags(" Papers, NLP ,,") == ["papers", "nlp"]
+    assert parse_tags("") == []
+
+def test_build_file_query():
+    """Test if every filter maps onto an indexed field."""
+    query = build_file_query(uploader="alice", tag="NLP", collection_name="c", uploaded_after=datetime(2025, 1, 1), uploaded_before=datetime(2025, 2, 1))
+
+    assert query == {"uploader": "alice", "tag_list": "nlp", "collection_name": "c",
+                     "upload_time": {"$gte": datetime(2025, 1, 1), "$lt": datetime(2025, 2, 1)}}
+    assert build_file_query() == {}
+
+@pytest.mark.asyncio
+async def test_list_files_page_paginates(mock_files_collection):
+    """Test if a page is capped to the limit and its cursor restricts the next query."""
+    mock_files_collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=[make_file(i) for i in range(3)])
+
+    page = await list_files_page(mock_files_collection, {"uploader": "alice"}, limit=2)
+
+    assert [f["filename"] for f in page["files"]] == ["doc0.pdf", "doc1.pdf"]
+    assert page["files"][0]["role"] == "user"
+    assert mock_files_collection.find.call_args.args == ({"uploader": "alice"}, FILE_LISTING_PROJECTION)
+    mock_files_collection.find.return_value.sort.return_value.limit.assert_called_with(3)
+
+    await list_files_page(mock_files_collection, {"uploader": "alice"}, limit=2, cursor=page["next_cursor"])
+    query = mock_files_collection.find.call_args.args[0]
+    assert query["uploader"] == "alice"
+    assert query["$or"][0] == {"upload_time": {"$lt": datetime(2025, 1, 9)}}
+    assert query["$or"][1] == {"upload_time": datetime(2025, 1, 9), "_id": {"$lt": ObjectId(f"{1:024x}")}}
+
+@pytest.mark.asyncio
+async def test_list_files_page_last_page(mock_files_collection):
+    """Test if the last page has no next cursor."""
+    mock_files_collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=[make_file(0)])
+
+    page = await list_files_page(mock_files_collection, {}, limit=2)
+
+    assert len(page["files"]) == 1
+    assert page["next_cursor"] is None
+
+@pytest.mark.asyncio
+async def test_list_files_page_invalid_cursor(mock_files_collection):
+    """Test if a malformed cursor is rejected."""
+    with pytest.raises(ValueError):
+        await list_files_page(mock_files_collection, {}, cursor="not-a-cursor")
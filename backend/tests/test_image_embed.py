@@ -0,0 +1,108 @@
+import pytest, sys, os, io
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import MagicMock
+from PIL import Image
+from rag_modules.conversational_bot import Conversational_Bot
+from rag_modules.image_embed import IMAGE_COLLECTION_SUFFIX, ImageEmbedder, ImageIndex
+from rag_modules.image_store import ImageStore
+from rag_modules.rag import RAG
+from rag_modules.rag_retriever import Retriever
+from rag_modules.vector_db import EmbeddedQdrantVDB, NumpyVectorStore
+import torch
+
+def make_image(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+RED, BLUE = make_image((255, 0, 0)), make_image((0, 0, 255))
+
+class ColorEmbedder:
+    """Embeds an image by its mean color and a query by the color it names."""
+    vector_dim = 3
+    COLORS = {"red": [1.0, 0.0, 0.0], "green": [0.0, 1.0, 0.0], "blue": [0.0, 0.0, 1.0]}
+
+    def embed_images(self, images):
+        vectors = []
+        for image in images:
+            mean = torch.tensor(Image.open(io.BytesIO(image)).convert("RGB").resize((1, 1)).getpixel((0, 0)), dtype=torch.float32)
+            vectors.append((mean / mean.norm()).tolist())
+        return vectors
+
+    def embed_text(self, text):
+        return next(vector for color, vector in self.COLORS.items() if color in text)
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(str(tmp_path / "images"))
+
+@pytest.fixture(params=["qdrant_local", "numpy"])
+def image_index(request, store, tmp_path):
+    if request.param == "qdrant_local":
+        vector_db = EmbeddedQdrantVDB(vector_dim=3, path=":memory:")
+    else:
+        vector_db = NumpyVectorStore(vector_dim=3, directory=str(tmp_path / "numpy"))
+    index = ImageIndex(vector_db, ColorEmbedder(), image_store=store)
+    index.set_collection(f"figures_{request.param}_{id(index)}")
+    return index
+
+def test_image_embedder_normalizes_embeddings():
+    """Test if images and queries are embedded into the same space as unit vectors."""
+    from transformers import CLIPConfig, CLIPImageProcessor, CLIPModel
+    torch.manual_seed(0)
+    config = CLIPConfig(text_config={"hidden_size": 32, "intermediate_size": 37, "num_hidden_layers": 2, "num_attention_heads": 4, "vocab_size": 99},
+                        vision_config={"hidden_size": 32, "intermediate_size": 37, "num_hidden_layers": 2, "num_attention_heads": 4,
+                                       "image_size": 32, "patch_size": 8},
+                        projection_dim=16)
+    image_processor = CLIPImageProcessor(size={"shortest_edge": 32}, crop_size={"height": 32, "width": 32})
+
+    def processor(images=None, text=None, **kwargs):
+        if images is not None:
+            return image_processor(images=images, return_tensors="pt")
+        return {"input_ids": torch.tensor([[0, 5, 7, 1]]), "attention_mask": torch.ones(1, 4, dtype=torch.long)}
+
+    embedder = ImageEmbedder(CLIPModel(config).eval(), processor)
+    images = embedder.embed_images([RED, BLUE])
+    query = embedder.embed_text("a red figure")
+    assert embedder.vector_dim == 16
+    assert len(images) == 2 and len(query) == 16
+    assert all(abs(sum(value ** 2 for value in vector) - 1) < 1e-5 for vector in images + [query])
+
+def test_set_collection_uses_sibling_collection(image_index):
+    """Test if the figures of a collection go to its image collection."""
+    image_index.set_collection("multimodal_rag_admin_collection")
+    assert image_index.vector_db.collection_name == "multimodal_rag_admin_collection" + IMAGE_COLLECTION_SUFFIX
+
+def test_ingest_and_search_figures(image_index, store):
+    """Test if stored figures are embedded and retrieved by a text query."""
+    red, blue = store.put(RED), store.put(BLUE)
+    assert image_index.ingest([red, blue], source="paper.pdf") == 2
+
+    assert [ref for ref, _ in image_index.search("the red chart", limit=1, min_score=0.5)] == [red]
+    assert [ref for ref, _ in image_index.search("the blue chart", limit=2, min_score=0.5)] == [blue]
+    assert image_index.search("the green chart", limit=2, min_score=0.5) == []
+
+def test_ingest_failure_deletes_source(image_index, store):
+    """Test if the figures of a source are removed when a later batch fails."""
+    red = store.put(RED)
+    with pytest.raises(FileNotFoundError):
+        image_index.ingest([red] * 16 + ["0" * 64], source="paper.pdf")
+    assert image_index.search("red", min_score=0.0) == []
+
+def test_rag_captions_retrieved_figures_once(image_index, store):
+    """Test if only the retrieved figures are captioned, once, at query time."""
+    red, blue = store.put(RED), store.put(BLUE)
+    image_index.ingest([red, blue], source="paper.pdf")
+    bot = Conversational_Bot(image_store=store)
+    bot.summarize_image = MagicMock(return_value="A red bar chart")
+    rag = RAG(retriever=Retriever(vector_db=MagicMock(), embeddata=MagicMock(), image_index=image_index), bot=bot,
+              reranker_model=MagicMock(), reranker_tokenizer=MagicMock())
+
+    for _ in range(2):
+        figures = rag.retrieve_figures("show the red results")
+        assert [figure["payload"] for figure in figures] == [{"context": "[Image: A red bar chart]", "image_ref": red}]
+    bot.summarize_image.assert_called_once_with(RED)
+
+def test_retriever_without_image_index():
+    """Test if no figures are searched when they were captioned at ingest."""
+    assert Retriever(vector_db=MagicMock(), embeddata=MagicMock()).search_images("query") == []
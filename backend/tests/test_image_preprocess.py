@@ -0,0 +1,72 @@
+import pytest, sys, os, io, base64
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import MagicMock
+from PIL import Image
+from config import Config
+from rag_modules.image_preprocess import preprocess_image, prepare_vision_image
+from rag_modules.document_extract import summarize_figure
+
+def encode(image, image_format="JPEG", **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **params)
+    return buffer.getvalue()
+
+def photo(width, height):
+    return Image.effect_noise((width, height), 64).convert("RGB")
+
+def test_large_photo_is_downscaled_without_metadata():
+    """Test if a phone-sized photo is resized to the vision model's resolution and its EXIF dropped."""
+    exif = Image.Exif()
+    exif[0x010F] = "PhoneMaker" # Make
+    original = encode(photo(3000, 2000), exif=exif, quality=95)
+
+    result = preprocess_image(original, max_side=1120)
+
+    with Image.open(io.BytesIO(result.data)) as sent:
+        assert sent.size == (1120, 747)
+        assert not sent.getexif()
+    assert (result.width, result.height) == (1120, 747)
+    assert result.bytes_saved > 0 and result.bytes_saved == len(original) - len(result.data)
+
+def test_exif_orientation_is_applied():
+    """Test if a rotated photo is sent upright once its orientation tag is dropped."""
+    exif = Image.Exif()
+    exif[0x0112] = 6 # Rotated 90 degrees
+    result = preprocess_image(encode(photo(400, 200), exif=exif))
+    assert (result.width, result.height) == (200, 400)
+
+def test_transparent_png_is_flattened():
+    """Test if a transparent image is flattened on white and re-encoded."""
+    image = Image.new("RGBA", (300, 300), (0, 0, 0, 0))
+    result = preprocess_image(encode(image, "PNG"))
+    with Image.open(io.BytesIO(result.data)) as sent:
+        assert sent.convert("RGB").getpixel((10, 10)) == (255, 255, 255)
+
+def test_tiny_images_are_skipped_unless_sent_by_the_user():
+    """Test if icons and thin rules are skipped, except when skipping is disabled."""
+    icon = encode(photo(40, 40))
+    rule = encode(photo(1000, 8))
+    assert preprocess_image(icon).skipped and preprocess_image(icon).data is None
+    assert preprocess_image(rule).skipped
+    assert preprocess_image(icon, skip_small=False).data is not None
+
+def test_undecodable_image_is_passed_through():
+    """Test if data that is not an image is sent unchanged."""
+    assert preprocess_image(b"not an image").data == b"not an image"
+
+def test_preprocessing_can_be_disabled(monkeypatch):
+    """Test if images are sent as given when preprocessing is disabled."""
+    monkeypatch.setattr(Config, "VISION_PREPROCESS", False)
+    icon = encode(photo(40, 40))
+    assert prepare_vision_image(icon) is icon
+
+def test_summarize_figure_skips_tiny_figures():
+    """Test if tiny figures are not sent to the vision model and large ones are sent downscaled."""
+    bot = MagicMock()
+    bot.summarize_image.return_value = "A chart."
+    assert summarize_figure(bot, base64.b64encode(encode(photo(40, 40))).decode()) is None
+    bot.summarize_image.assert_not_called()
+
+    assert summarize_figure(bot, base64.b64encode(encode(photo(2400, 1200))).decode()) == "A chart."
+    with Image.open(io.BytesIO(bot.summarize_image.call_args.args[0])) as sent:
+        assert max(sent.size) == Config.VISION_MAX_SIDE
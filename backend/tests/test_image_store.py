@@ -0,0 +1,32 @@
+import pytest, sys, os, base64, hashlib
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from rag_modules.image_store import ImageStore
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(str(tmp_path / "images"))
+
+def test_put_is_content_addressed(store, tmp_path):
+    """Test if an image is stored once under its SHA256, whether given as bytes, a path or base64."""
+    path = tmp_path / "photo.png"
+    path.write_bytes(b"png bytes")
+    ref = store.put(b"png bytes")
+
+    assert ref == hashlib.sha256(b"png bytes").hexdigest()
+    assert store.put(str(path)) == ref
+    assert store.put(base64.b64encode(b"png bytes").decode()) == ref
+    assert store.get(ref) == b"png bytes"
+    assert ImageStore.is_ref(ref) and not ImageStore.is_ref("path/to/image.jpg")
+    assert len(os.listdir(os.path.join(store.directory, ref[:2]))) == 1
+
+def test_captions(store):
+    """Test if a caption is cached next to its image."""
+    ref = store.put(b"png bytes")
+    assert store.get_caption(ref) is None
+    store.set_caption(ref, "A chart.")
+    assert store.get_caption(ref) == "A chart."
+
+def test_get_missing_image(store):
+    """Test if reading an unknown reference raises FileNotFoundError."""
+    with pytest.raises(FileNotFoundError):
+        store.get("0" * 64)
@@ -0,0 +1,24 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.import_time import DEFAULT_BUDGET_SECONDS, check, parse_importtime, profile_import
+
+def test_parse_importtime():
+    """Test if the -X importtime output is parsed into module, depth, self and cumulative times."""
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       100 |        100 |   json.decoder\n"
+              "import time:       400 |        500 | json\n")
+    assert parse_importtime(stderr) == [("json.decoder", 1, 0.0001, 0.0001), ("json", 0, 0.0004, 0.0005)]
+
+def test_check_reports_budget_and_heavy_modules():
+    """Test if a slow import and heavy modules are both reported as failures."""
+    profile = {"module": "main", "seconds": 3.0, "heavy_modules": ["torch"]}
+    failures = check(profile, budget=2.0)
+    assert len(failures) == 2
+    assert "torch" in failures[1]
+    assert check({"module": "main", "seconds": 1.0, "heavy_modules": []}, budget=2.0) == []
+
+def test_import_main_is_fast_and_side_effect_free():
+    """Test if importing the app stays under the cold-start budget without loading the heavy dependencies."""
+    profile = profile_import("main")
+    assert profile["heavy_modules"] == []
+    assert check(profile, DEFAULT_BUDGET_SECONDS) == []
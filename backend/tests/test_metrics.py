@@ -0,0 +1,101 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch, MagicMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from metrics import Counter, Gauge, Histogram, MetricsMiddleware, REGISTRY, http_requests, http_request_seconds, render_prometheus
+from cache import TTLCache, caches
+from rag_modules.conversational_bot import Conversational_Bot, ollama_in_flight, llm_tokens, llm_tokens_per_second
+
+@pytest.fixture
+def metrics():
+    created = [Counter("test_requests_total", "Requests", labels=("route",)),
+               Gauge("test_in_flight", "In flight"),
+               Histogram("test_seconds", "Latency", labels=("route",), buckets=(0.1, 1.0))]
+    yield created
+    for metric in created:
+        REGISTRY.remove(metric)
+
+def test_render_counters_and_gauges(metrics):
+    """Test if counters and gauges are rendered with their labels, help and type."""
+    counter, gauge, _ = metrics
+    counter.inc('/chat/{id}', amount=3)
+    gauge.set(2)
+
+    text = render_prometheus(metrics, include_caches=False)
+    assert "# HELP test_requests_total Requests\n# TYPE test_requests_total counter\n" in text
+    assert 'test_requests_total{route="/chat/{id}"} 3\n' in text
+    assert "# TYPE test_in_flight gauge\ntest_in_flight 2\n" in text
+
+def test_render_histogram_buckets_are_cumulative(metrics):
+    """Test if histogram buckets are rendered cumulatively with a +Inf bucket, sum and count."""
+    histogram = metrics[2]
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value, "/")
+
+    lines = render_prometheus([histogram], include_caches=False).splitlines()
+    assert 'test_seconds_bucket{route="/",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{route="/",le="+Inf"} 4' in lines
+    assert 'test_seconds_sum{route="/"} 6.25' in lines
+    assert 'test_seconds_count{route="/"} 4' in lines
+
+def test_render_escapes_label_values(metrics):
+    """Test if quotes and backslashes in label values are escaped."""
+    metrics[0].inc('a"b\\c')
+    assert 'test_requests_total{route="a\\"b\\\\c"} 1' in render_prometheus(metrics[:1], include_caches=False)
+
+def test_render_cache_hit_ratio():
+    """Test if the statistics of the registered caches are rendered by cache name."""
+    cache = TTLCache("test_metrics_cache", maxsize=10, ttl=60)
+    caches[cache.name] = cache
+    try:
+        cache.set("key", 1)
+        cache.get("key")
+        cache.get("missing")
+        text = render_prometheus([])
+    finally:
+        del caches[cache.name]
+    assert 'cache_hits_total{cache="test_metrics_cache"} 1' in text
+    assert 'cache_misses_total{cache="test_metrics_cache"} 1' in text
+    assert 'cache_hit_ratio{cache="test_metrics_cache"} 0.5' in text
+    assert 'cache_size{cache="test_metrics_cache"} 1' in text
+
+def test_middleware_labels_by_route_template():
+    """Test if requests are recorded under the route template, and unknown paths as 'unmatched'."""
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.get("/items/{item_id}")(lambda item_id: {"id": item_id})
+    client = TestClient(app)
+    before = http_requests.get("GET", "/items/{item_id}", "200")
+    unmatched = http_requests.get("GET", "unmatched", "404")
+
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/nowhere")
+
+    assert http_requests.get("GET", "/items/{item_id}", "200") == before + 2
+    assert http_requests.get("GET", "unmatched", "404") == unmatched + 1
+    assert http_request_seconds.get("GET", "/items/{item_id}")["count"] >= 2
+
+@patch("rag_modules.conversational_bot.ollama.chat")
+def test_ollama_call_metrics(mock_chat):
+    """Test if an Ollama call records its tokens and throughput and leaves no call in flight."""
+    seen_in_flight = []
+    response = MagicMock(prompt_eval_count=40, eval_count=20, eval_duration=2_000_000_000)
+    response.message.content = "Answer"
+
+    def chat(**kwargs):
+        seen_in_flight.append(ollama_in_flight.get("generate"))
+        return response
+    mock_chat.side_effect = chat
+    completion = llm_tokens.get("llama3.2-vision", "completion")
+    observed = llm_tokens_per_second.get("llama3.2-vision")
+
+    Conversational_Bot().generate("Question")
+
+    assert seen_in_flight == [1]
+    assert ollama_in_flight.get("generate") == 0
+    assert llm_tokens.get("llama3.2-vision", "completion") == completion + 20
+    assert llm_tokens_per_second.get("llama3.2-vision")["count"] == observed["count"] + 1
+    assert llm_tokens_per_second.get("llama3.2-vision")["sum"] == pytest.approx(observed["sum"] + 10)
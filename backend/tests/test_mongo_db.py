@@ -21,7 +21,7 @@ def mock_mongo_db():
 def test_get_users_collection(mock_mongo_db, mocker, caplog):
     """Test if get_users_collection fetches the 'users' collection."""
     mocker.patch("models.mongo_db.mongo_db_client", mock_mongo_db)
-    with caplog.at_level("INFO"):
+    with caplog.at_level("DEBUG"):
         users_collection = get_users_collection()
     
     assert users_collection.name == "users"    
@@ -30,7 +30,7 @@ def test_get_users_collection(mock_mongo_db, mocker, caplog):
 def test_get_files_collection(mock_mongo_db, mocker, caplog):
     """Test if get_files_collection fetches the 'files' collection."""
     mocker.patch("models.mongo_db.mongo_db_client", mock_mongo_db)
-    with caplog.at_level("INFO"):
+    with caplog.at_level("DEBUG"):
         files_collection = get_files_collection()
 
     assert files_collection.name == "files"    
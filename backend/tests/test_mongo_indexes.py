@@ -0,0 +1,69 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import OperationFailure
+from models.mongo_indexes import INDEXES, collection_index_report, ensure_collection_indexes, ensure_indexes, index_name
+
+def async_iter(items):
+    async def gen():
+        for item in items:
+            yield item
+    return gen()
+
+def mock_collection(name, existing=(), stats=()):
+    """Create a mock collection with the given existing indexes and usage statistics."""
+    collection = MagicMock()
+    collection.name = name
+    collection.create_index = AsyncMock()
+    collection.index_information = AsyncMock(return_value={name: {} for name in ("_id_",) + tuple(existing)})
+    collection.aggregate = MagicMock(side_effect=lambda pipeline: async_iter(stats))
+    return collection
+
+def test_index_name():
+    """Test if index names follow MongoDB's default naming."""
+    assert index_name([("collection_name", 1), ("file_hash", 1)]) == "collection_name_1_file_hash_1"
+    assert index_name([("uploader", 1), ("upload_time", -1), ("_id", -1)]) == "uploader_1_upload_time_-1__id_-1"
+
+def test_required_indexes():
+    """Test if the lookup fields are indexed, file hashes being unique per collection."""
+    files = {index_name(keys): options for keys, options in INDEXES["files"]}
+    assert files["collection_name_1_file_hash_1"] == {"unique": True}
+    assert any(name.startswith("uploader_1") for name in files)
+    assert INDEXES["users"] == [([("username", 1)], {"unique": True})]
+
+@pytest.mark.asyncio
+async def test_ensure_collection_indexes_reports_failures():
+    """Test if an index that cannot be built is reported instead of aborting startup."""
+    collection = mock_collection("files")
+    collection.create_index.side_effect = [OperationFailure("E11000 duplicate key"), None]
+
+    failed = await ensure_collection_indexes(collection, INDEXES["files"][:2])
+
+    assert failed == ["collection_name_1_file_hash_1"]
+    assert collection.create_index.await_count == 2
+
+@pytest.mark.asyncio
+async def test_collection_index_report():
+    """Test if missing, unused and unmanaged indexes are reported."""
+    collection = mock_collection("users", existing=["file_hash_1"], stats=[
+        {"name": "_id_", "accesses": {"ops": 0}},
+        {"name": "file_hash_1", "accesses": {"ops": 0}},
+    ])
+
+    report = await collection_index_report(collection, INDEXES["users"])
+
+    assert report == {"missing": ["username_1"], "unused": ["file_hash_1"], "unmanaged": ["file_hash_1"]}
+
+@pytest.mark.asyncio
+async def test_ensure_indexes(caplog):
+    """Test if every collection gets its indexes and a complete set produces no warning."""
+    collections = {name: mock_collection(name, existing=[index_name(keys) for keys, _ in specs], stats=[{"name": index_name(specs[0][0]), "accesses": {"ops": 3}}])
+                   for name, specs in INDEXES.items()}
+    database = MagicMock()
+    database.__getitem__.side_effect = collections.__getitem__
+
+    report = await ensure_indexes(database)
+
+    assert report["users"]["missing"] == []
+    assert collections["files"].create_index.await_count == len(INDEXES["files"])
+    assert "Missing indexes" not in caplog.text
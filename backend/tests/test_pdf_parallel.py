@@ -0,0 +1,96 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+from pypdf import PdfReader, PdfWriter
+from unstructured.staging.base import elements_to_dicts
+from config import Config
+from rag_modules import pdf_parallel
+from rag_modules.pdf_parallel import page_ranges, partition_pdf_parallel, should_partition_in_parallel
+from rag_modules.document_extract import partition_pdf_elements
+from rag_modules.partition_cache import partition_cache
+import unstructured.documents.elements as elements
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    writer = PdfWriter()
+    for _ in range(5):
+        writer.add_blank_page(width=200, height=200)
+    file_path = tmp_path / "paper.pdf"
+    with open(file_path, "wb") as f:
+        writer.write(f)
+    return str(file_path)
+
+@pytest.fixture(autouse=True)
+def thread_executor(tmp_path, monkeypatch):
+    # Threads instead of spawned processes, so partition_page_range can be mocked
+    executor = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(pdf_parallel, "get_executor", lambda: executor)
+    monkeypatch.setattr(partition_cache, "directory", str(tmp_path / "partitions"))
+    monkeypatch.setattr(Config, "TEMP_DIR", str(tmp_path / "temp"))
+    yield executor
+    executor.shutdown()
+
+def fake_partition_page_range(range_path, first_page, filename, params):
+    pages = len(PdfReader(range_path).pages)
+    return elements_to_dicts([
+        elements.NarrativeText(text=f"page {first_page + offset}", metadata=elements.ElementMetadata(page_number=first_page + offset, filename=filename))
+        for offset in range(pages)
+    ])
+
+def test_page_ranges():
+    """Test if pages are split into consecutive ranges covering the document."""
+    assert page_ranges(5, 2) == [(1, 2), (3, 4), (5, 5)]
+    assert page_ranges(4, 16) == [(1, 4)]
+
+@patch("rag_modules.pdf_parallel.partition_page_range", side_effect=fake_partition_page_range)
+def test_partition_pdf_parallel_merges_in_page_order(mock_partition, pdf_path):
+    """Test if the elements of every range are merged back in page order."""
+    result = partition_pdf_parallel(pdf_path, {"strategy": "hi_res"}, pages_per_task=2)
+
+    assert [element.text for element in result] == [f"page {page}" for page in range(1, 6)]
+    assert [call.args[1] for call in mock_partition.call_args_list] == [1, 3, 5]
+    assert all(element.metadata.filename == "paper.pdf" for element in result)
+
+def test_should_partition_in_parallel(pdf_path, monkeypatch):
+    """Test if only PDFs with at least PDF_PARALLEL_MIN_PAGES pages are partitioned in parallel."""
+    monkeypatch.setattr(Config, "PDF_PARTITION_WORKERS", 4)
+    monkeypatch.setattr(Config, "PDF_PARALLEL_MIN_PAGES", 5)
+    assert should_partition_in_parallel(pdf_path)
+
+    monkeypatch.setattr(Config, "PDF_PARALLEL_MIN_PAGES", 6)
+    assert not should_partition_in_parallel(pdf_path)
+
+    monkeypatch.setattr(Config, "PDF_PARALLEL_MIN_PAGES", 1)
+    monkeypatch.setattr(Config, "PDF_PARTITION_WORKERS", 1)
+    assert not should_partition_in_parallel(pdf_path)
+
+@patch("rag_modules.document_extract.partition_pdf")
+@patch("rag_modules.pdf_parallel.partition_page_range", side_effect=fake_partition_page_range)
+def test_partition_pdf_elements_uses_page_ranges(mock_partition, mock_partition_pdf, pdf_path, monkeypatch):
+    """Test if large PDFs are partitioned in page ranges and the merged elements are cached."""
+    monkeypatch.setattr(Config, "PDF_PARTITION_WORKERS", 2)
+    monkeypatch.setattr(Config, "PDF_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(Config, "PDF_PAGES_PER_TASK", 2)
+
+    first = partition_pdf_elements(file_path=pdf_path)
+    second = partition_pdf_elements(file_path=pdf_path)
+
+    mock_partition_pdf.assert_not_called()
+    assert mock_partition.call_count == 3
+    assert [element.text for element in second] == [element.text for element in first]
+
+@patch("rag_modules.document_extract.partition_pdf", return_value=[elements.Title(text="Sequential")])
+@patch("rag_modules.pdf_parallel.partition_page_range", side_effect=BrokenProcessPool("worker died"))
+def test_partition_pdf_elements_falls_back_when_pool_breaks(mock_partition, mock_partition_pdf, pdf_path, monkeypatch):
+    """Test if a broken pool falls back to partitioning the whole PDF in-process."""
+    monkeypatch.setattr(Config, "PDF_PARTITION_WORKERS", 2)
+    monkeypatch.setattr(Config, "PDF_PARALLEL_MIN_PAGES", 2)
+
+    with patch("rag_modules.pdf_parallel.reset_executor") as mock_reset:
+        result = partition_pdf_elements(file_path=pdf_path)
+
+    mock_reset.assert_called_once()
+    mock_partition_pdf.assert_called_once()
+    assert [element.text for element in result] == ["Sequential"]
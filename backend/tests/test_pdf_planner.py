@@ -0,0 +1,106 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch
+from pypdf import PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+from config import Config
+from rag_modules.pdf_planner import FAST_PARTITION_PARAMS, looks_like_table, plan_partition_tasks, plan_pdf, plan_runs, PageDecision
+from rag_modules.document_extract import PDF_PARTITION_PARAMS, load_unstructured, partition_pdf_elements
+from rag_modules.partition_cache import partition_cache
+import unstructured.documents.elements as elements
+
+# Import the partitioners so that unstructured.partition.pdf can be patched
+load_unstructured()
+
+PARAGRAPH = "Attention mechanisms let the model weigh every token of the input sequence when producing an output."
+
+def add_page(writer, lines=(), image_size=None):
+    """Adds a page with the given text lines and optionally an image of the given size."""
+    page = writer.add_blank_page(width=612, height=792)
+    font = DictionaryObject({NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"),
+                             NameObject("/BaseFont"): NameObject("/Helvetica")})
+    resources = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)})})
+    content = "BT /F1 10 Tf 12 TL 72 720 Td " + " ".join(f"({line}) Tj T*" for line in lines) + " ET"
+    if image_size:
+        image = DecodedStreamObject()
+        image.set_data(b"\x00" * (image_size[0] * image_size[1]))
+        image.update({NameObject("/Type"): NameObject("/XObject"), NameObject("/Subtype"): NameObject("/Image"),
+                      NameObject("/Width"): NumberObject(image_size[0]), NameObject("/Height"): NumberObject(image_size[1]),
+                      NameObject("/ColorSpace"): NameObject("/DeviceGray"), NameObject("/BitsPerComponent"): NumberObject(8)})
+        resources[NameObject("/XObject")] = DictionaryObject({NameObject("/Im1"): writer._add_object(image)})
+        content += f" q {image_size[0]} 0 0 {image_size[1]} 72 72 cm /Im1 Do Q"
+    stream = DecodedStreamObject()
+    stream.set_data(content.encode())
+    page[NameObject("/Contents")] = writer._add_object(stream)
+    page[NameObject("/Resources")] = resources
+
+@pytest.fixture
+def paper_path(tmp_path):
+    writer = PdfWriter()
+    add_page(writer, [PARAGRAPH, PARAGRAPH])                                   # 1: text only
+    add_page(writer, [PARAGRAPH, PARAGRAPH])                                   # 2: text only
+    add_page(writer, [PARAGRAPH], image_size=(400, 300))                       # 3: figure
+    add_page(writer, [PARAGRAPH, "Table 1: Results on the benchmark"])       # 4: table
+    add_page(writer, [])                                                       # 5: scan, no text layer
+    add_page(writer, [PARAGRAPH, PARAGRAPH], image_size=(16, 16))              # 6: text with a small logo
+    file_path = tmp_path / "paper.pdf"
+    with open(file_path, "wb") as f:
+        writer.write(f)
+    return str(file_path)
+
+@pytest.fixture(autouse=True)
+def tmp_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(partition_cache, "directory", str(tmp_path / "partitions"))
+    monkeypatch.setattr(Config, "TEMP_DIR", str(tmp_path / "temp"))
+    monkeypatch.setattr(Config, "PDF_PARALLEL_ENABLED", False)
+    monkeypatch.setattr(Config, "PDF_ADAPTIVE_STRATEGY", True)
+
+def test_plan_pdf(paper_path):
+    """Test if only pages with images, tables or no text layer are routed to hi_res."""
+    decisions = plan_pdf(paper_path)
+
+    assert [decision.strategy for decision in decisions] == ["fast", "fast", "hi_res", "hi_res", "hi_res", "fast"]
+    assert [decision.reason for decision in decisions[2:5]] == ["1 image(s)", "likely table", "no text layer"]
+
+def test_plan_pdf_unreadable(tmp_path):
+    """Test if a PDF that cannot be inspected is not planned."""
+    file_path = tmp_path / "broken.pdf"
+    file_path.write_bytes(b"%PDF-1.4 broken")
+    assert plan_pdf(str(file_path)) is None
+
+def test_looks_like_table():
+    """Test if numeric rows suggest a table but prose does not."""
+    rows = "\n".join(f"model-{i} 0.{i}1 0.{i}2 0.{i}3" for i in range(5))
+    assert looks_like_table(rows)
+    assert not looks_like_table(f"{PARAGRAPH}\nWe train for 3 epochs on 8 GPUs.")
+
+def test_plan_runs():
+    """Test if consecutive pages with the same strategy are grouped, up to max_pages."""
+    decisions = [PageDecision(number, strategy, 0, 0, False, "") for number, strategy in enumerate(["fast", "fast", "fast", "hi_res", "fast"], start=1)]
+    assert plan_runs(decisions, max_pages=2) == [("fast", 1, 2), ("fast", 3, 3), ("hi_res", 4, 4), ("fast", 5, 5)]
+
+def test_plan_partition_tasks(paper_path):
+    """Test if runs carry the parameters of their strategy."""
+    tasks = plan_partition_tasks(paper_path, PDF_PARTITION_PARAMS, max_pages=10)
+    assert tasks == [(1, 2, FAST_PARTITION_PARAMS), (3, 5, PDF_PARTITION_PARAMS), (6, 6, FAST_PARTITION_PARAMS)]
+
+def fake_partition_pdf(filename, starting_page_number=1, metadata_filename=None, strategy=None, **kwargs):
+    return [elements.NarrativeText(text=f"{strategy} from page {starting_page_number}")]
+
+@patch("unstructured.partition.pdf.partition_pdf", side_effect=fake_partition_pdf)
+def test_partition_pdf_elements_adaptive(mock_partition_pdf, paper_path):
+    """Test if each run is partitioned with its strategy and merged in page order."""
+    result = partition_pdf_elements(file_path=paper_path)
+
+    assert [element.text for element in result] == ["fast from page 1", "hi_res from page 3", "fast from page 6"]
+
+@patch("rag_modules.document_extract.partition_pdf", return_value=[elements.Title(text="Whole file")])
+@patch("unstructured.partition.pdf.partition_pdf", side_effect=fake_partition_pdf)
+def test_partition_pdf_elements_adaptive_disabled(mock_range_partition, mock_partition_pdf, paper_path, monkeypatch):
+    """Test if every page uses hi_res when the adaptive strategy is disabled."""
+    monkeypatch.setattr(Config, "PDF_ADAPTIVE_STRATEGY", False)
+    result = partition_pdf_elements(file_path=paper_path)
+
+    mock_range_partition.assert_not_called()
+    assert mock_partition_pdf.call_args.kwargs["strategy"] == "hi_res"
+    assert [element.text for element in result] == ["Whole file"]
@@ -5,7 +5,9 @@ from jose import jwt, JWTError
 from passlib.context import CryptContext
 from unittest.mock import patch
 from config import Config
-from auth.security import create_access_token, hash_password, verify_password
+from fastapi import HTTPException
+from threading import BoundedSemaphore
+from auth.security import create_access_token, hash_password, verify_password, verify_and_rehash, needs_rehash, hash_password_async, run_password_job
 
 SECRET_KEY = Config.SECRET_KEY
 ALGORITHM = Config.ALGORITHM
@@ -53,3 +55,35 @@ def test_verify_password():
     
     assert verify_password(password, hashed_pw) == True
     assert verify_password("wrongpassword", hashed_pw) == False
+
+def test_verify_and_rehash_outdated_cost():
+    hashed_pw = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("securepassword")
+
+    is_valid, new_hash = verify_and_rehash("securepassword", hashed_pw)
+
+    assert is_valid
+    assert needs_rehash(hashed_pw)
+    assert not needs_rehash(new_hash)
+    assert verify_password("securepassword", new_hash)
+
+def test_verify_and_rehash_current_cost():
+    is_valid, new_hash = verify_and_rehash("securepassword", hash_password("securepassword"))
+
+    assert is_valid
+    assert new_hash is None
+
+@pytest.mark.asyncio
+async def test_hash_password_async():
+    hashed_pw = await hash_password_async("securepassword")
+
+    assert verify_password("securepassword", hashed_pw)
+
+@pytest.mark.asyncio
+async def test_run_password_job_rejects_when_saturated():
+    with patch("auth.security.password_slots", BoundedSemaphore(1)) as slots:
+        slots.acquire()
+        with pytest.raises(HTTPException) as exc:
+            await run_password_job("hash", hash_password, "securepassword")
+
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "1"
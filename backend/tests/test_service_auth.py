@@ -3,10 +3,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 from unittest.mock import MagicMock, patch
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
+from passlib.hash import bcrypt
 from schemas.user import UserRegister, UserLogin
-from auth.security import hash_password
+from auth.security import hash_password, BCRYPT_ROUNDS
 from models.user import User
-from services.auth import create_user, authenticate_user, create_access_token_for_user
+from services.auth import create_user, authenticate_user, create_access_token_for_user, login_attempts
 
 @pytest.fixture
 def mock_db_session():
@@ -19,8 +20,9 @@ def mock_user():
     user.hashed_password = hash_password("password123")
     return user
 
+@pytest.mark.asyncio
 @patch("auth.security.hash_password")
-def test_create_user_success(mock_hash_password, mock_db_session, caplog):
+async def test_create_user_success(mock_hash_password, mock_db_session, caplog):
     mock_hash_password.return_value = "hashed_password"
     mock_db_session.query().filter().first.return_value = None
     mock_db_session.add = MagicMock()
@@ -28,65 +30,103 @@ def test_create_user_success(mock_hash_password, mock_db_session, caplog):
     
     user_data = UserRegister(username="newuser", password="securepassword")
     with caplog.at_level("INFO"):
-        new_user = create_user(user_data, mock_db_session)
+        new_user = await create_user(user_data, mock_db_session)
     
     assert new_user.username == "newuser"
     mock_db_session.add.assert_called_once()
     mock_db_session.commit.assert_called_once()
     assert "User created successfully" in caplog.text
 
+@pytest.mark.asyncio
 @patch("auth.security.hash_password")
-def test_create_user_existing_username(mock_hash_password, mock_db_session, caplog):
+async def test_create_user_existing_username(mock_hash_password, mock_db_session, caplog):
     mock_hash_password.return_value = "hashed_password"
     mock_db_session.query().filter().first.return_value = MagicMock()
     
     user_data = UserRegister(username="existinguser", password="password")
     with pytest.raises(HTTPException) as exc:
-        create_user(user_data, mock_db_session)
+        await create_user(user_data, mock_db_session)
     
     assert exc.value.status_code == 400
     assert "Username already exists" in exc.value.detail
     assert "Username already exists: " in caplog.text
     
+@pytest.mark.asyncio
 @patch("auth.security.hash_password")
-def test_create_user_error(mock_hash_password, mock_db_session, caplog):
+async def test_create_user_error(mock_hash_password, mock_db_session, caplog):
     mock_hash_password.return_value = "hashed_password"
     mock_db_session.query().filter().first.return_value = None
     mock_db_session.commit = Exception()
     
     user_data = UserRegister(username="existinguser", password="password")
     with pytest.raises(HTTPException) as exc:
-        create_user(user_data, mock_db_session)
+        await create_user(user_data, mock_db_session)
     
     assert exc.value.status_code == 500
     assert "Failed to create user" in exc.value.detail
     assert "Error creating user: " in caplog.text
 
+@pytest.mark.asyncio
+@patch("services.auth.hash_password_async")
+async def test_create_user_hashing_saturated(mock_hash_password, mock_db_session):
+    mock_hash_password.side_effect = HTTPException(status_code=503, detail="Password hashing is saturated")
+    mock_db_session.query().filter().first.return_value = None
+    
+    user_data = UserRegister(username="newuser", password="password")
+    with pytest.raises(HTTPException) as exc:
+        await create_user(user_data, mock_db_session)
+    
+    assert exc.value.status_code == 503
+
+@pytest.mark.asyncio
 @patch("auth.security.verify_password")
-def test_authenticate_user_success(mock_verify_password, mock_db_session, mock_user, caplog):
+async def test_authenticate_user_success(mock_verify_password, mock_db_session, mock_user, caplog):
     mock_verify_password.return_value = True
     mock_db_session.query().filter().first.return_value = mock_user
     user_data = UserLogin(username="testuser", password="password123")
     
     with caplog.at_level("INFO"):
-        user = authenticate_user(user_data, mock_db_session)
+        user = await authenticate_user(user_data, mock_db_session)
         
     assert user == mock_user
     assert "User 'testuser' successfully authenticated." in caplog.text
 
+@pytest.mark.asyncio
 @patch("auth.security.verify_password")
-def test_authenticate_user_invalid_credentials(mock_verify_password, mock_db_session, caplog):
+async def test_authenticate_user_invalid_credentials(mock_verify_password, mock_db_session, caplog):
     mock_verify_password.return_value = False
     mock_db_session.query().filter().first.return_value = None
     user_data = UserLogin(username="invaliduser", password="wrongpass")
     
     with pytest.raises(HTTPException) as exc:
-        authenticate_user(user_data, mock_db_session)
+        await authenticate_user(user_data, mock_db_session)
     
     assert exc.value.status_code == 401
     assert "Invalid username or password" in exc.value.detail
     assert "Authentication failed for user: invaliduser" in caplog.text
 
+@pytest.mark.asyncio
+async def test_authenticate_user_rehashes_outdated_cost(mock_db_session, mock_user):
+    mock_user.hashed_password = bcrypt.using(rounds=4).hash("password123")
+    mock_db_session.query().filter().first.return_value = mock_user
+
+    user = await authenticate_user(UserLogin(username="testuser", password="password123"), mock_db_session)
+
+    assert user.hashed_password.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+    mock_db_session.commit.assert_called_once()
+
+@pytest.mark.asyncio
+@patch("auth.security.verify_password")
+async def test_authenticate_user_records_outcome(mock_verify_password, mock_db_session, mock_user):
+    mock_verify_password.return_value = False
+    mock_db_session.query().filter().first.return_value = mock_user
+    failures = login_attempts.get("failure")
+
+    with pytest.raises(HTTPException):
+        await authenticate_user(UserLogin(username="testuser", password="wrongpass"), mock_db_session)
+
+    assert login_attempts.get("failure") == failures + 1
+
 @patch("auth.security.jwt.encode")
 def test_create_access_token_for_user(mock_jwt_encode, caplog):
     mock_jwt_encode.return_value = "mocked_token"
@@ -98,3 +138,13 @@ def test_create_access_token_for_user(mock_jwt_encode, caplog):
     mock_jwt_encode.assert_called_once()
     assert token == "mocked_token"
     assert "Access token generated for user: testuser" in caplog.text
+
+@patch("auth.security.jwt.encode")
+def test_create_access_token_for_user_with_id(mock_jwt_encode):
+    mock_jwt_encode.return_value = "mocked_token"
+    user_data = UserLogin(username="testuser", password="password123")
+    
+    create_access_token_for_user(user_data, is_admin=False, user_id=7)
+    
+    claims = mock_jwt_encode.call_args[0][0]
+    assert (claims["sub"], claims["uid"]) == ("testuser", 7)
@@ -5,7 +5,12 @@ from rag_modules.rag import RAG
 from fastapi import UploadFile
 from models.user import User
 from cache import user_sessions_cache
-from services.chat_service import get_user_sessions, delete_session_data, chat_bot
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime
+from services.chat_service import get_user_sessions, delete_session_data, chat_bot, list_session_summaries, list_session_messages
+from services.rag_service import bot
+from rag_modules.image_store import ImageStore
 
 @pytest.fixture
 def mock_user():
@@ -17,9 +22,7 @@ def mock_user_session(mock_user):
     """Fixture for a mock user session"""
     return {
         "_id": "1",
-        "username": mock_user.username,
-        "chat_sessions": [{"session_id": "abc123", "messages": [], "bot_chat_history": ['System Instructions']},
-                        {"session_id": "xyz456", "messages": [], "bot_chat_history": ['System Instructions']}]
+        "username": mock_user.username
     }
 
 @pytest.fixture
@@ -30,6 +33,26 @@ def mock_users_collection(mock_user):
     mock_collection.insert_one = AsyncMock(return_value=AsyncMock(inserted_id="mock_id"))
     return mock_collection
 
+@pytest.fixture
+def mock_sessions_collection(mock_user):
+    """Fixture for a mock chat sessions collection"""
+    mock_collection = MagicMock()
+    mock_collection.find_one = AsyncMock(return_value={"session_id": "abc123", "username": mock_user.username, "system": "System Instructions", "message_count": 0})
+    mock_collection.find_one_and_update = AsyncMock(return_value={"message_count": 2})
+    mock_collection.update_one = AsyncMock()
+    mock_collection.insert_one = AsyncMock()
+    mock_collection.delete_one = AsyncMock()
+    return mock_collection
+
+@pytest.fixture
+def mock_messages_collection():
+    """Fixture for a mock chat messages collection"""
+    mock_collection = MagicMock()
+    mock_collection.find.return_value.sort.return_value.to_list = AsyncMock(return_value=[])
+    mock_collection.insert_many = AsyncMock()
+    mock_collection.delete_many = AsyncMock()
+    return mock_collection
+
 @pytest.fixture
 def clear_cache():
     """Fixture to clear the user session cache before each test"""
@@ -45,36 +68,75 @@ async def test_get_user_sessions_new_user(mock_user, mock_users_collection, clea
     )
 
     assert user_session["username"] == mock_user.username
-    assert user_session["chat_sessions"] == []
+    assert "chat_sessions" not in user_session
     mock_users_collection.find_one.assert_called_once_with({"username": "test_user"})
     mock_users_collection.insert_one.assert_awaited_once()
 
+@pytest.mark.asyncio
+async def test_get_user_sessions_concurrent_new_user(mock_user, mock_users_collection, clear_cache):
+    """Test case where a concurrent first request creates the user between the lookup and the insert."""
+    mock_users_collection.find_one.side_effect = [None, {"_id": "1", "username": mock_user.username}]
+    mock_users_collection.insert_one.side_effect = DuplicateKeyError("E11000 duplicate key error")
+
+    user_session = await get_user_sessions(
+        current_user=mock_user, users_collection=mock_users_collection
+    )
+
+    assert user_session == {"_id": "1", "username": mock_user.username}
+    assert mock_users_collection.find_one.await_count == 2
+
 @pytest.mark.asyncio
 async def test_get_user_sessions_existing_user(mock_user, mock_users_collection, clear_cache):
     """Test case where the user already exists in the cache, so database query is skipped."""
     # Simulate existing session in cache
-    user_sessions_cache[mock_user.username] = {"username": mock_user.username, "chat_sessions": ["session1"]}
+    user_sessions_cache[mock_user.username] = {"_id": "1", "username": mock_user.username}
 
     user_session = await get_user_sessions(
         current_user=mock_user, users_collection=mock_users_collection
     )
     
     assert user_session["username"] == mock_user.username
-    assert user_session["chat_sessions"] == ["session1"]
+    assert user_session["_id"] == "1"
     mock_users_collection.find_one.assert_not_called() 
 
 @pytest.mark.asyncio
 async def test_get_user_sessions_existing_user_in_db(mock_user, mock_users_collection, clear_cache):
     """Test case where the user exists in the database but not in the cache."""
-    mock_users_collection.find_one.return_value = {"username": mock_user.username, "chat_sessions": ["session2"]}
+    mock_users_collection.find_one.return_value = {"_id": "2", "username": mock_user.username}
 
     user_session = await get_user_sessions(
         current_user=mock_user, users_collection=mock_users_collection
     )
 
     assert user_session["username"] == mock_user.username
-    assert user_session["chat_sessions"] == ["session2"]
+    assert user_session["_id"] == "2"
     mock_users_collection.find_one.assert_called_once_with({"username": "test_user"})
+    mock_users_collection.update_one.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_user_sessions_migrates_legacy_sessions(mock_user, mock_users_collection, mock_sessions_collection, mock_messages_collection, clear_cache):
+    """Test case where the user document still embeds its chat sessions."""
+    mock_users_collection.find_one.return_value = {
+        "_id": "3", 
+        "username": mock_user.username, 
+        "chat_sessions": [{"session_id": "old1", 
+                           "messages": [{"role": "user", "text": "Hi"}, {"role": "bot", "text": "Hello"}], 
+                           "bot_chat_history": [{"role": "system", "content": "Sys"}, {"role": "user", "content": "Context... Hi"}, {"role": "assistant", "content": "Hello"}]}]
+    }
+    mock_sessions_collection.find_one.return_value = None  # Not migrated yet
+
+    user_session = await get_user_sessions(
+        current_user=mock_user, users_collection=mock_users_collection, 
+        sessions_collection=mock_sessions_collection, messages_collection=mock_messages_collection
+    )
+
+    assert "chat_sessions" not in user_session
+    docs = mock_messages_collection.insert_many.call_args.args[0]
+    assert [d["seq"] for d in docs] == [0, 1]
+    assert "content" not in docs[0]  # Only the displayed text is stored
+    assert "content" not in docs[1]
+    assert mock_sessions_collection.insert_one.call_args.args[0]["system"] == "Sys"
+    mock_users_collection.update_one.assert_awaited_once_with({"_id": "3"}, {"$unset": {"chat_sessions": ""}})
 
 @pytest.mark.asyncio
 async def test_get_user_sessions_cache_corrupted(mock_user, mock_users_collection, clear_cache):
@@ -95,20 +157,61 @@ async def test_get_user_sessions_mongo_insert_failure(mock_user, mock_users_coll
         await get_user_sessions(current_user=mock_user, users_collection=mock_users_collection)
         
 @pytest.mark.asyncio
-async def test_delete_session(mock_user, mock_user_session, mock_users_collection, clear_cache):
+async def test_delete_session(mock_user, mock_user_session, mock_sessions_collection, mock_messages_collection, clear_cache):
     """Test case for successfully deleting a session."""
     user_sessions_cache[mock_user.username] = mock_user_session
 
-    await delete_session_data(session_id="abc123", user=mock_user_session, users_collection=mock_users_collection)
+    await delete_session_data(session_id="abc123", user=mock_user_session, sessions_collection=mock_sessions_collection, messages_collection=mock_messages_collection)
 
-    updated_sessions = user_sessions_cache[mock_user.username]["chat_sessions"]
-    assert len(updated_sessions) == 1
-    assert updated_sessions[0]["session_id"] == "xyz456"
-    mock_users_collection.update_one.assert_awaited_once()
+    mock_sessions_collection.delete_one.assert_awaited_once_with({"username": "test_user", "session_id": "abc123"})
+    mock_messages_collection.delete_many.assert_awaited_once_with({"username": "test_user", "session_id": "abc123"})
     
+@pytest.mark.asyncio
+async def test_list_session_summaries_paginates(mock_sessions_collection):
+    """Test case for listing session summaries with a next page cursor."""
+    headers = [{"session_id": f"s{i}", "title": f"Title {i}", "message_count": i, "created_at": datetime(2025, 1, 10 - i), "updated_at": datetime(2025, 2, 1)} for i in range(3)]
+    mock_sessions_collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=headers)
+
+    page = await list_session_summaries("test_user", mock_sessions_collection, limit=2)
+
+    assert [s["session_id"] for s in page["sessions"]] == ["s0", "s1"]
+    assert page["sessions"][1]["title"] == "Title 1"
+    assert page["sessions"][1]["messages_count"] == 1
+    assert page["sessions"][1]["last_activity"] == datetime(2025, 2, 1)
+    assert page["next_cursor"] is not None
+    projection = mock_sessions_collection.find.call_args.args[1]
+    assert "messages" not in projection
+
+    # The cursor restricts the next query to older sessions
+    await list_session_summaries("test_user", mock_sessions_collection, limit=2, cursor=page["next_cursor"])
+    query = mock_sessions_collection.find.call_args.args[0]
+    assert query["$or"][0] == {"created_at": {"$lt": datetime(2025, 1, 9)}}
+    assert query["$or"][1] == {"created_at": datetime(2025, 1, 9), "session_id": {"$lt": "s1"}}
+
+@pytest.mark.asyncio
+async def test_list_session_summaries_invalid_cursor(mock_sessions_collection):
+    """Test case for a malformed session cursor."""
+    with pytest.raises(HTTPException) as exc:
+        await list_session_summaries("test_user", mock_sessions_collection, cursor="not-a-cursor")
+
+    assert exc.value.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_session_messages(mock_messages_collection):
+    """Test case for listing the latest page of a session's messages."""
+    mock_messages_collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(
+        return_value=[{"seq": 5, "role": "bot", "text": "B"}, {"seq": 4, "role": "user", "text": "A"}])
+
+    page = await list_session_messages("test_user", "abc123", mock_messages_collection, limit=2, before=6)
+
+    assert [m["seq"] for m in page["messages"]] == [4, 5]
+    assert page["before"] == 4
+    mock_messages_collection.find.assert_called_once_with(
+        {"username": "test_user", "session_id": "abc123", "seq": {"$lt": 6}}, {"_id": 0, "seq": 1, "role": 1, "text": 1})
+
 @patch('ollama.chat')
 @pytest.mark.asyncio
-async def test_chat_bot_no_rag(mock_bot, mock_user, mock_user_session, mock_users_collection, clear_cache):
+async def test_chat_bot_no_rag(mock_bot, mock_user, mock_user_session, mock_sessions_collection, mock_messages_collection, clear_cache):
     """Test case for chatbot response in 'no-rag' mode."""
     mock_bot.return_value = MagicMock(message=MagicMock(content="Test AI response"))
     
@@ -119,7 +222,8 @@ async def test_chat_bot_no_rag(mock_bot, mock_user, mock_user_session, mock_user
         message="Hello, AI!", 
         rag_mode="no-rag", 
         user=mock_user_session, 
-        users_collection=mock_users_collection, 
+        sessions_collection=mock_sessions_collection,
+        messages_collection=mock_messages_collection, 
         current_user=mock_user, 
         embed_data=MagicMock(), 
         vector_db=MagicMock()
@@ -131,9 +235,11 @@ async def test_chat_bot_no_rag(mock_bot, mock_user, mock_user_session, mock_user
     
 @patch('ollama.chat')
 @pytest.mark.asyncio
-async def test_chat_bot_with_image(mock_bot, mock_user, mock_user_session, mock_users_collection, clear_cache):
+async def test_chat_bot_with_image(mock_bot, mock_user, mock_user_session, mock_sessions_collection, mock_messages_collection, clear_cache, tmp_path, monkeypatch):
     """Test case for chatbot response when an image is uploaded."""
     mock_bot.return_value = MagicMock(message=MagicMock(content="Image processed."))
+    store = ImageStore(str(tmp_path))
+    monkeypatch.setattr(bot, "image_store", store)
     
     user_sessions_cache[mock_user.username] = mock_user_session
 
@@ -145,7 +251,8 @@ async def test_chat_bot_with_image(mock_bot, mock_user, mock_user_session, mock_
         image=image_mock,
         rag_mode="no-rag",
         user=mock_user_session,
-        users_collection=mock_users_collection,
+        sessions_collection=mock_sessions_collection,
+        messages_collection=mock_messages_collection,
         current_user=mock_user,
         embed_data=MagicMock(),
         vector_db=MagicMock()
@@ -154,9 +261,14 @@ async def test_chat_bot_with_image(mock_bot, mock_user, mock_user_session, mock_
     assert response.message.content == "Image processed."
     assert session["messages"][-1]["role"] == "bot"
     assert session["messages"][-1]["text"] == "Image processed."
+    stored_user_msg = mock_messages_collection.insert_many.call_args.args[0][0]
+    assert "images" not in stored_user_msg
+    assert store.get(stored_user_msg["image_refs"][0]) == b"fake_image_data"
+    bot.wait_for_captions()  # The image is captioned in the background once the turn is answered
+    assert store.get_caption(stored_user_msg["image_refs"][0]) == "Image processed."
 
 @pytest.mark.asyncio
-async def test_chat_bot_rag_mode_all(mock_user, mock_user_session, mock_users_collection, clear_cache):
+async def test_chat_bot_rag_mode_all(mock_user, mock_user_session, mock_sessions_collection, mock_messages_collection, clear_cache):
     """Test case for chatbot response in 'all' RAG mode."""
     mock_rag_output = MagicMock()
     mock_rag_output.message.content = "RAG response"
@@ -169,7 +281,8 @@ async def test_chat_bot_rag_mode_all(mock_user, mock_user_session, mock_users_co
             message="Retrieve relevant data",
             rag_mode="all",
             user=mock_user_session,
-            users_collection=mock_users_collection,
+            sessions_collection=mock_sessions_collection,
+            messages_collection=mock_messages_collection,
             current_user=mock_user,
             embed_data=MagicMock(),
             vector_db=MagicMock(),
@@ -180,7 +293,7 @@ async def test_chat_bot_rag_mode_all(mock_user, mock_user_session, mock_users_co
     assert session["messages"][-1]["text"] == "RAG response"
     
 @pytest.mark.asyncio
-async def test_chat_bot_rag_mode_user(mock_user, mock_user_session, mock_users_collection, clear_cache):
+async def test_chat_bot_rag_mode_user(mock_user, mock_user_session, mock_sessions_collection, mock_messages_collection, clear_cache):
     """Test case for chatbot response in 'user' RAG mode."""
     mock_rag_output = MagicMock()
     mock_rag_output.message.content = "User RAG response"
@@ -193,7 +306,8 @@ async def test_chat_bot_rag_mode_user(mock_user, mock_user_session, mock_users_c
             message="Retrieve relevant data",
             rag_mode="all",
             user=mock_user_session,
-            users_collection=mock_users_collection,
+            sessions_collection=mock_sessions_collection,
+            messages_collection=mock_messages_collection,
             current_user=mock_user,
             embed_data=MagicMock(),
             vector_db=MagicMock(),
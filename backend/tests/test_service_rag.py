@@ -2,18 +2,19 @@ import sys, os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import pytest
 from unittest.mock import patch
-from services.rag_service import get_vector_db, get_embed_data_obj
+from services.rag_service import get_vector_db, get_user_vector_db, get_embed_data_obj, get_embed_model, get_reranker
 
 @pytest.fixture
 def mock_qdrant_vdb():
-    """Fixture to patch QdrantVDB where it's used."""
-    with patch("services.rag_service.QdrantVDB") as MockQdrantVDB:
-        yield MockQdrantVDB.return_value  # Returns the mock instance
+    """Fixture to patch the vector store factory where it's used."""
+    with patch("services.rag_service.create_vector_store") as mock_create:
+        yield mock_create
 
 @pytest.fixture
 def mock_embed_data():
-    """Fixture to patch EmbedData where it's used."""
-    with patch("services.rag_service.EmbedData") as MockEmbedData:
+    """Fixture to patch EmbedData and the shared model loader where they're used."""
+    with patch("services.rag_service.EmbedData") as MockEmbedData, patch("services.rag_service.load_embed_model"), \
+         patch.dict("services.rag_service._shared_models", clear=True):
         yield MockEmbedData.return_value
 
 @pytest.fixture
@@ -23,13 +24,32 @@ def mock_conversational_bot():
         yield MockConversationalBot.return_value
 
 def test_get_vector_db(mock_qdrant_vdb):
-    result = get_vector_db()
-    assert result is mock_qdrant_vdb  # Ensures mock is returned
+    with patch("services.rag_service.Config.VECTOR_STORE", "qdrant"):
+        result = get_vector_db()
+    assert result is mock_qdrant_vdb.return_value  # Ensures mock is returned
+    mock_qdrant_vdb.assert_called_once_with("qdrant")
+
+def test_get_user_vector_db(mock_qdrant_vdb):
+    """Test if the per-user collections use their own backend."""
+    with patch("services.rag_service.Config.USER_VECTOR_STORE", "numpy"):
+        result = get_user_vector_db()
+    assert result is mock_qdrant_vdb.return_value
+    mock_qdrant_vdb.assert_called_once_with("numpy")
 
 def test_get_embed_data_obj(mock_embed_data):
     result = get_embed_data_obj()
     assert result is mock_embed_data  # Ensures mock is returned
 
+def test_shared_models_load_once():
+    """Test if the models are loaded on first use only and then shared."""
+    with patch("services.rag_service.load_embed_model") as mock_load, patch("services.rag_service.load_reranker") as mock_reranker, \
+         patch.dict("services.rag_service._shared_models", clear=True):
+        mock_reranker.return_value = ("model", "tokenizer")
+        assert get_embed_model() is get_embed_model()
+        assert get_reranker() == get_reranker() == ("model", "tokenizer")
+    mock_load.assert_called_once()
+    mock_reranker.assert_called_once()
+
 def test_conversational_bot_initialization(mock_conversational_bot):
     from services.rag_service import Conversational_Bot  # Import after patching
 
@@ -0,0 +1,153 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException
+from datetime import datetime
+from rag_modules.image_store import ImageStore
+from rag_modules.context_manager import ContextManager
+from models.session import append_messages, build_bot_history, find_session, make_session_title, migrate_legacy_sessions, SESSION_TITLE_LENGTH
+
+@pytest.fixture
+def mock_sessions_collection():
+    """Fixture for a mock chat sessions collection"""
+    mock_collection = MagicMock()
+    mock_collection.find_one = AsyncMock(return_value=None)
+    mock_collection.find_one_and_update = AsyncMock(return_value={"message_count": 6})
+    mock_collection.update_one = AsyncMock()
+    return mock_collection
+
+@pytest.fixture
+def mock_messages_collection():
+    """Fixture for a mock chat messages collection"""
+    mock_collection = MagicMock()
+    mock_collection.find.return_value.sort.return_value.to_list = AsyncMock(return_value=[])
+    mock_collection.insert_many = AsyncMock()
+    return mock_collection
+
+def test_build_bot_history(tmp_path, monkeypatch):
+    """Test if the bot history is rebuilt from the stored messages, moving raw images to the image store."""
+    store = ImageStore(str(tmp_path))
+    monkeypatch.setattr("models.session.image_store", store)
+    ref = store.put(b"stored")
+    session = {"system": "Sys"}
+    messages = [
+        {"role": "user", "text": "Hi", "content": "Context... Hi", "images": [b"img"]},
+        {"role": "bot", "text": "Hello"},
+        {"role": "user", "text": "Again", "image_refs": [ref]}
+    ]
+    history = build_bot_history(session, messages)
+
+    assert history[0] == {"role": "system", "content": "Sys"}
+    assert history[1] == {"role": "user", "content": "Hi", "image_refs": [store.put(b"img")]}
+    assert history[2] == {"role": "assistant", "content": "Hello"}
+    assert history[3] == {"role": "user", "content": "Again", "image_refs": [ref]}
+
+@pytest.mark.asyncio
+async def test_append_messages(mock_sessions_collection, mock_messages_collection):
+    """Test if appended messages get consecutive sequence numbers after the existing ones."""
+    docs = await append_messages(mock_sessions_collection, mock_messages_collection, "test_user", "abc123",
+                                 [{"role": "user", "text": "Hi"}, {"role": "bot", "text": "Hello"}])
+
+    assert [doc["seq"] for doc in docs] == [4, 5]
+    assert all(doc["session_id"] == "abc123" for doc in docs)
+    update = mock_sessions_collection.find_one_and_update.call_args.args[1]
+    assert update["$inc"] == {"message_count": 2}
+    mock_messages_collection.insert_many.assert_awaited_once()
+    mock_sessions_collection.update_one.assert_not_called()  # Not the first message, title already set
+
+@pytest.mark.asyncio
+async def test_append_first_messages_sets_title(mock_sessions_collection, mock_messages_collection):
+    """Test if the first user message of a session becomes its title."""
+    mock_sessions_collection.find_one_and_update.return_value = {"message_count": 2}
+
+    await append_messages(mock_sessions_collection, mock_messages_collection, "test_user", "abc123",
+                          [{"role": "user", "text": "What is   attention?"}, {"role": "bot", "text": "Hello"}])
+
+    mock_sessions_collection.update_one.assert_awaited_once_with(
+        {"username": "test_user", "session_id": "abc123"}, {"$set": {"title": "What is attention?"}})
+
+def test_make_session_title_truncates():
+    """Test if long first messages are truncated to the title length."""
+    title = make_session_title("word " * 40)
+
+    assert len(title) <= SESSION_TITLE_LENGTH
+    assert title.endswith("...")
+
+@pytest.mark.asyncio
+async def test_append_messages_invalid_session(mock_sessions_collection, mock_messages_collection):
+    """Test if appending to an unknown session raises a 404."""
+    mock_sessions_collection.find_one_and_update.return_value = None
+
+    with pytest.raises(HTTPException) as exc:
+        await append_messages(mock_sessions_collection, mock_messages_collection, "test_user", "missing", [{"role": "user", "text": "Hi"}])
+
+    assert exc.value.status_code == 404
+    mock_messages_collection.insert_many.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_find_session_invalid_session(mock_sessions_collection, mock_messages_collection):
+    """Test if looking up an unknown session raises a 404."""
+    with pytest.raises(HTTPException) as exc:
+        await find_session(mock_sessions_collection, mock_messages_collection, "test_user", "missing")
+
+    assert exc.value.status_code == 404
+
+@pytest.mark.asyncio
+async def test_find_session_loads_only_usable_messages(mock_sessions_collection, mock_messages_collection, monkeypatch):
+    """Test if only the messages the context window can still use are loaded for the bot history."""
+    bot = MagicMock()
+    bot.context_manager = ContextManager(max_turns=2)
+    monkeypatch.setattr("models.session.bot", bot)
+    mock_sessions_collection.find_one.return_value = {"session_id": "abc123", "message_count": 40, "summary": "", "summary_count": 0}
+    recent = [{"role": "user" if seq % 2 == 0 else "bot", "text": f"m{seq}", "seq": seq} for seq in range(36, 40)]
+    mock_messages_collection.find.return_value.sort.return_value.to_list.return_value = recent
+
+    session = await find_session(mock_sessions_collection, mock_messages_collection, "test_user", "abc123")
+
+    query = mock_messages_collection.find.call_args.args[0]
+    assert query == {"username": "test_user", "session_id": "abc123", "seq": {"$gte": 36}}
+    assert session["messages"] == recent
+    bot.set_summary.assert_called_once_with("", 0, 36)
+
+def test_history_start_after_summary():
+    """Test if a summarizing window loads the history from the first message not yet summarized."""
+    assert ContextManager(max_turns=2, summarize=True).history_start(40, 30) == 30
+    assert ContextManager(max_turns=2).history_start(40, 30) == 36
+    assert ContextManager(max_turns=10).history_start(6) == 0
+
+@pytest.mark.asyncio
+async def test_migrate_legacy_sessions_stores_text_only(mock_sessions_collection, mock_messages_collection):
+    """Test if migrated messages keep their displayed text, not the RAG prompt of the legacy bot history."""
+    users_collection = MagicMock()
+    users_collection.update_one = AsyncMock()
+    mock_sessions_collection.insert_one = AsyncMock()
+    mock_messages_collection.delete_many = AsyncMock()
+    user = {"_id": 1, "username": "test_user", "chat_sessions": [{
+        "session_id": "abc123",
+        "messages": [{"role": "user", "text": "Hi"}, {"role": "bot", "text": "Hello"}],
+        "bot_chat_history": [{"role": "system", "content": "Sys"}, {"role": "user", "content": "Context... Hi"}, {"role": "assistant", "content": "Hello"}],
+        }]}
+
+    assert await migrate_legacy_sessions(user, users_collection, mock_sessions_collection, mock_messages_collection) == 1
+    docs = mock_messages_collection.insert_many.call_args.args[0]
+    assert [doc["text"] for doc in docs] == ["Hi", "Hello"]
+    assert all("content" not in doc for doc in docs)
+    assert mock_sessions_collection.insert_one.call_args.args[0]["system"] == "Sys"
+    assert "chat_sessions" not in user
+
+@pytest.mark.asyncio
+async def test_migrate_legacy_sessions_keeps_order(mock_sessions_collection, mock_messages_collection):
+    """Test if migrated sessions are created in the order of the legacy array, before any newer session."""
+    users_collection = MagicMock()
+    users_collection.update_one = AsyncMock()
+    mock_sessions_collection.insert_one = AsyncMock()
+    mock_messages_collection.delete_many = AsyncMock()
+    session_ids = ["f0", "1a", "c7"]  # Their UUID order differs from the legacy order
+    user = {"_id": 1, "username": "test_user", "chat_sessions": [{"session_id": session_id, "messages": []} for session_id in session_ids]}
+    started = datetime.now()
+
+    assert await migrate_legacy_sessions(user, users_collection, mock_sessions_collection, mock_messages_collection) == 3
+    sessions = [call.args[0] for call in mock_sessions_collection.insert_one.call_args_list]
+    assert [session["session_id"] for session in sorted(sessions, key=lambda s: s["created_at"])] == session_ids
+    assert all(session["created_at"] < session["updated_at"] for session in sessions)
+    assert all(session["updated_at"] >= started for session in sessions)
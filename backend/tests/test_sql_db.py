@@ -0,0 +1,54 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from models.sql_db import Base, TimedQueuePool, TimedAsyncQueuePool, get_async_uri, pool_options, run_db, pool_checkout_seconds
+from models.user import User, add_user, get_user_by_username
+
+def test_get_async_uri():
+    """Test if the async driver is derived from the sync URI."""
+    assert get_async_uri("sqlite:////tmp/app.db") == "sqlite+aiosqlite:////tmp/app.db"
+    assert get_async_uri("postgresql://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+
+def test_pool_options():
+    """Test if pool sizing applies to file databases but not to in-memory SQLite."""
+    options = pool_options("sqlite:////tmp/app.db", TimedQueuePool)
+    assert options["poolclass"] is TimedQueuePool
+    assert {"pool_size", "max_overflow", "pool_timeout", "pool_recycle", "pool_pre_ping"} <= options.keys()
+
+    assert "pool_size" not in pool_options("sqlite://", TimedQueuePool)
+
+@pytest.mark.asyncio
+async def test_run_db_sync_session(tmp_path):
+    """Test if run_db runs queries of a sync session and records the checkout wait."""
+    uri = f"sqlite:///{tmp_path / 'sync.db'}"
+    engine = create_engine(uri, **pool_options(uri, TimedQueuePool))
+    Base.metadata.create_all(bind=engine)
+    checkouts = pool_checkout_seconds.get("sync")["count"]
+
+    with sessionmaker(bind=engine)() as db:
+        await run_db(db, add_user, User(username="alice", hashed_password="x"))
+        user = await run_db(db, get_user_by_username, "alice")
+
+    assert user.username == "alice"
+    assert pool_checkout_seconds.get("sync")["count"] > checkouts
+    engine.dispose()
+
+@pytest.mark.asyncio
+async def test_run_db_async_session(tmp_path):
+    """Test if run_db runs the same queries on an async session."""
+    uri = f"sqlite+aiosqlite:///{tmp_path / 'async.db'}"
+    engine = create_async_engine(uri, **pool_options(uri, TimedAsyncQueuePool))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    checkouts = pool_checkout_seconds.get("async")["count"]
+
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        await run_db(db, add_user, User(username="bob", hashed_password="x", is_admin=True))
+        user = await run_db(db, get_user_by_username, "bob")
+
+    assert user.username == "bob"
+    assert user.is_admin
+    assert pool_checkout_seconds.get("async")["count"] > checkouts
+    await engine.dispose()
@@ -0,0 +1,69 @@
+import pytest, sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import MagicMock, patch
+from config import Config
+from rag_modules.token_chunker import TokenChunker
+from rag_modules.embed_data import EmbedData
+
+class WordTokenizer:
+    """A tokenizer with one token per word."""
+    def encode(self, text, add_special_tokens=True):
+        return text.split()
+
+def sentences(count, words=5):
+    return " ".join(" ".join([f"s{i}w{j}" for j in range(words - 1)] + [f"s{i}end."]) for i in range(count))
+
+def test_split_short_text_unchanged():
+    """Test if a text within the window is kept as is."""
+    chunker = TokenChunker(WordTokenizer(), max_tokens=20)
+    assert chunker.split("A short text.") == ["A short text."]
+
+def test_split_respects_max_tokens_and_sentences():
+    """Test if chunks fit the window and are made of whole sentences."""
+    chunker = TokenChunker(WordTokenizer(), max_tokens=12)
+    chunks = chunker.split(sentences(6))
+
+    assert len(chunks) == 3
+    assert all(len(chunk.split()) <= 12 for chunk in chunks)
+    assert all(chunk.endswith("end.") for chunk in chunks)
+    assert " ".join(chunks) == sentences(6)
+
+def test_split_overlap():
+    """Test if consecutive chunks share their boundary sentence."""
+    chunker = TokenChunker(WordTokenizer(), max_tokens=12, overlap_tokens=5)
+    chunks = chunker.split(sentences(6))
+
+    assert all(len(chunk.split()) <= 12 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split()[:5] == previous.split()[-5:]
+
+def test_split_long_sentence_between_words():
+    """Test if a sentence longer than the window is split between words."""
+    chunker = TokenChunker(WordTokenizer(), max_tokens=4)
+    chunks = chunker.split(" ".join(f"w{i}" for i in range(10)) + ".")
+
+    assert [len(chunk.split()) for chunk in chunks] == [4, 4, 2]
+
+def test_invalid_overlap():
+    """Test if an overlap as large as the window is rejected."""
+    with pytest.raises(ValueError):
+        TokenChunker(WordTokenizer(), max_tokens=8, overlap_tokens=8)
+
+def test_estimated_token_count():
+    """Test if token counts are estimated without a tokenizer."""
+    assert TokenChunker(None).count_tokens("x" * 40) == 10
+
+@patch("rag_modules.embed_data.HuggingFaceEmbedding")
+def test_embed_data_chunks_to_model_window(mock_huggingface_embedding, monkeypatch):
+    """Test if EmbedData splits contexts to the model's window before embedding them."""
+    monkeypatch.setattr(Config, "EMBED_TOKEN_RESERVE", 2)
+    monkeypatch.setattr(Config, "EMBED_CHUNK_OVERLAP", 0)
+    mock_huggingface_embedding.return_value = MagicMock(max_length=12, _model=MagicMock(tokenizer=WordTokenizer()))
+
+    embedder = EmbedData(batch_size=8)
+    embedder.generate_embedding = MagicMock(side_effect=lambda batch: [[0.1]] * len(batch))
+    embedder.embed([sentences(4)])
+
+    assert embedder.chunker.max_tokens == 10
+    assert len(embedder.contexts) == 2
+    assert len(embedder.embeddings) == 2
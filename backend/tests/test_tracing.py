@@ -0,0 +1,92 @@
+import pytest, sys, os, json
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock
+from tracing import FileSpanExporter, Span, Trace, TracingMiddleware, current_trace, get_request_id, server_timing, span, traces_dropped
+
+@pytest.fixture
+def trace():
+    trace = Trace("req-1", "GET /test")
+    token = current_trace.set(trace)
+    yield trace
+    current_trace.reset(token)
+
+def test_span_outside_request_records_nothing():
+    """Test if spans are no-ops outside a traced request."""
+    with span("idle") as record:
+        assert record is None
+    assert get_request_id() is None
+
+def test_nested_spans(trace):
+    """Test if a span opened inside another becomes its child."""
+    with span("generate_context"):
+        with span("qdrant_search", collection="c") as child:
+            pass
+
+    spans = {record.name: record for record in trace.spans}
+    assert spans["qdrant_search"].parent_id == spans["generate_context"].span_id
+    assert spans["generate_context"].parent_id is None
+    assert child.attributes == {"collection": "c"}
+    assert server_timing(trace).startswith("generate_context;dur=")
+    assert "qdrant_search" not in server_timing(trace)  # Only top-level stages in the header
+
+def test_span_records_errors(trace):
+    """Test if a failing stage is recorded with its exception type."""
+    with pytest.raises(ValueError):
+        with span("llm_generate"):
+            raise ValueError("boom")
+    assert trace.spans[0].error == "ValueError"
+
+def test_middleware_headers_and_file_export(tmp_path):
+    """Test if the middleware returns the request ID and Server-Timing and exports the spans."""
+    exporter = FileSpanExporter(str(tmp_path / "traces.jsonl"))
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, exporters=[exporter])
+
+    @app.get("/work")
+    async def work():
+        with span("session_load"):
+            pass
+        with span("llm_generate"):
+            pass
+        return {"request_id": get_request_id()}
+
+    response = TestClient(app).get("/work", headers={"X-Request-ID": "abc123"})
+
+    assert response.headers["x-request-id"] == "abc123"
+    assert response.json() == {"request_id": "abc123"}
+    timing = response.headers["server-timing"]
+    assert timing.index("session_load;dur=") < timing.index("llm_generate;dur=") < timing.index("total;dur=")
+
+    exporter.flush()
+    exported = json.loads((tmp_path / "traces.jsonl").read_text().splitlines()[0])
+    assert exported["request_id"] == "abc123"
+    assert exported["name"] == "GET /work"
+    assert [record["name"] for record in exported["spans"]] == ["session_load", "llm_generate"]
+
+def test_file_exporter_writes_in_background(tmp_path):
+    """Test if traces are written by the exporter thread, all of them by shutdown, and dropped once the queue is full."""
+    exporter = FileSpanExporter(str(tmp_path / "traces.jsonl"), queue_size=100)
+    for i in range(50):
+        exporter.export(Trace(f"req{i}", "GET /", spans=[Span("stage", f"req{i}", "s1")]))
+    exporter.shutdown()
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    assert [json.loads(line)["request_id"] for line in lines] == [f"req{i}" for i in range(50)]
+
+    full = FileSpanExporter(str(tmp_path / "full.jsonl"), queue_size=1)
+    full._thread = MagicMock()  # No writer draining the queue
+    dropped = traces_dropped.get()
+    full.export(Trace("a"))
+    full.export(Trace("b"))
+    assert traces_dropped.get() == dropped + 1
+
+def test_middleware_generates_request_id():
+    """Test if a request without X-Request-ID gets a generated one."""
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, exporters=[])
+    app.get("/")(lambda: {})
+
+    response = TestClient(app).get("/")
+    assert len(response.headers["x-request-id"]) == 32
+    assert response.headers["server-timing"].startswith("total;dur=")
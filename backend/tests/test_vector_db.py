@@ -3,7 +3,8 @@ import pytest, sys, os, grpc
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from unittest.mock import MagicMock, patch
 from qdrant_client import QdrantClient
-from rag_modules.vector_db import QdrantVDB
+from rag_modules.vector_db import VectorStore, QdrantVDB, EmbeddedQdrantVDB, NumpyVectorStore, create_vector_store
+import numpy as np
 
 
 @pytest.fixture
@@ -114,3 +115,105 @@ def test_ingest_data_handles_exceptions(qdrant_vdb, mock_qdrant_client, caplog):
 
     # Check if the error was logged
     assert "Error during data ingestion: Mocked upload error" in caplog.text
+
+def test_ingest_stream(qdrant_vdb, mock_qdrant_client):
+    """Test if each streamed batch is uploaded as it arrives."""
+    batches = iter([(["Context A", "Context B"], [[0.1, 0.2], [0.3, 0.4]]), (["Context C"], [[0.5, 0.6]])])
+
+    qdrant_vdb.collection_name = "test_collection"
+    count = qdrant_vdb.ingest_stream(batches, source="test_source")
+
+    assert count == 3
+    assert mock_qdrant_client.upload_collection.call_count == 2
+    assert mock_qdrant_client.upload_collection.call_args.kwargs["payload"] == [{"context": "Context C", "source": "test_source"}]
+    mock_qdrant_client.update_collection.assert_called_once()
+
+def test_ingest_stream_failure_deletes_source(qdrant_vdb, mock_qdrant_client):
+    """Test if the points of a source are deleted when its stream fails midway."""
+    def batches():
+        yield ["Context A"], [[0.1, 0.2]]
+        raise RuntimeError("Mocked extraction error")
+
+    qdrant_vdb.collection_name = "test_collection"
+    with pytest.raises(RuntimeError, match="Mocked extraction error"):
+        qdrant_vdb.ingest_stream(batches(), source="test_source")
+
+    mock_qdrant_client.delete.assert_called_once()
+    mock_qdrant_client.update_collection.assert_not_called()
+
+
+def test_search_queries_current_collection(qdrant_vdb, mock_qdrant_client):
+    """Test if search queries the current collection with the context and source payloads."""
+    qdrant_vdb.collection_name = "test_collection"
+    qdrant_vdb.search([0.1, 0.2], limit=3)
+
+    kwargs = mock_qdrant_client.query_points.call_args.kwargs
+    assert kwargs["collection_name"] == "test_collection"
+    assert kwargs["limit"] == 3
+    assert kwargs["with_payload"] == ["context", "image_ref", "source"]
+
+@pytest.fixture(params=["qdrant_local", "numpy"])
+def embedded_store(request, tmp_path):
+    """Fixture creating each in-process backend with a fresh collection."""
+    if request.param == "numpy":
+        store = NumpyVectorStore(vector_dim=3, batch_size=2, directory=str(tmp_path))
+    else:
+        store = EmbeddedQdrantVDB(vector_dim=3, batch_size=2, path=str(tmp_path / "qdrant"))
+    store.create_or_set_collection("test_collection")
+    return store
+
+def test_embedded_store_ingest_search_delete(embedded_store):
+    """Test if the in-process backends rank by dot product and delete the points of a source."""
+    embedded_store.ingest_stream(iter([(["x", "y"], [[1, 0, 0], [0, 1, 0]]), (["z"], [[0, 0, 1]])]), source="a")
+    embedded_store.ingest_stream(iter([(["xy"], [[0.7, 0.7, 0]])]), source="b")
+
+    points = [dict(point) for point in embedded_store.search([1, 0.2, 0], limit=2).model_dump()["points"]]
+    assert [point["payload"] for point in points] == [{"context": "x", "source": "a"}, {"context": "xy", "source": "b"}]
+    assert points[0]["score"] == pytest.approx(1.0)
+
+    embedded_store.delete_source("a")
+    points = embedded_store.search([1, 0.2, 0], limit=5).model_dump()["points"]
+    assert [point["payload"]["context"] for point in points] == ["xy"]
+
+def test_numpy_store_persists_collections(tmp_path):
+    """Test if a NumPy collection is reloaded from its files, and keeps only complete points after a torn write."""
+    store = NumpyVectorStore(vector_dim=2, directory=str(tmp_path))
+    store.create_or_set_collection("persisted")
+    store.ingest_stream(iter([(["p", "q"], [[1, 0], [0, 1]])]), source="s")
+    with open(tmp_path / "persisted" / "vectors.f32", "ab") as f:
+        f.write(np.zeros(2, np.float32).tobytes()) # A vector without its payload
+
+    with patch.dict("rag_modules.vector_db._numpy_collections", clear=True):
+        reloaded = NumpyVectorStore(vector_dim=2, directory=str(tmp_path))
+        reloaded.create_or_set_collection("persisted")
+        points = reloaded.search([0, 1], limit=5).model_dump()["points"]
+
+    assert [point["payload"]["context"] for point in points] == ["q", "p"]
+    assert os.path.getsize(tmp_path / "persisted" / "vectors.f32") == 2 * 2 * 4
+
+def test_numpy_store_rejects_wrong_dimension(tmp_path):
+    """Test if vectors of the wrong dimension are rejected."""
+    store = NumpyVectorStore(vector_dim=3, directory=str(tmp_path))
+    store.create_or_set_collection("dims")
+    with pytest.raises(ValueError, match="dimension 3"):
+        store.add(["x"], [[1, 0]], source="s")
+
+def test_create_vector_store(tmp_path):
+    """Test if the backend is selected by name and unknown names are rejected."""
+    with patch("rag_modules.vector_db.Config.NUMPY_STORE_DIR", str(tmp_path)):
+        assert isinstance(create_vector_store("numpy"), NumpyVectorStore)
+    with patch("rag_modules.vector_db.Config.QDRANT_LOCAL_PATH", ":memory:"):
+        assert isinstance(create_vector_store("qdrant_local"), EmbeddedQdrantVDB)
+    with pytest.raises(ValueError, match="Unknown vector store"):
+        create_vector_store("faiss")
+
+def test_vector_store_requires_every_method():
+    """Test if a backend missing an interface method fails when created rather than when called."""
+    class PartialStore(VectorStore):
+        def create_or_set_collection(self, collection_name): pass
+        def add(self, contexts, embeddings, source): pass
+        def search(self, query_vector, limit=10): pass
+        def delete_source(self, source): pass
+
+    with pytest.raises(TypeError, match="add_images"):
+        PartialStore()
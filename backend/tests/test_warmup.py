@@ -0,0 +1,72 @@
+import pytest, sys, os, asyncio
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routes import health
+from services import warmup
+from services.warmup import Readiness, warm_up, warm_up_components
+
+@pytest.fixture
+def readiness():
+    """Fixture giving every test a fresh warm-up state."""
+    state = Readiness()
+    with patch.object(warmup, "readiness", state), patch.object(health, "readiness", state):
+        yield state
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(health.router)
+    return TestClient(app)
+
+def test_not_ready_before_warm_up(readiness, client):
+    """Test if /ready stays red until the warm-up starts, while /live is always green."""
+    assert client.get("/live").json() == {"status": "alive"}
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming_up"
+
+def test_live_runs_on_event_loop():
+    """Test if /live is served by the event loop rather than the threadpool, so it probes the loop."""
+    assert asyncio.iscoroutinefunction(health.live)
+
+def test_warm_up_retries_failed_components(readiness, client):
+    """Test if a failing component keeps the worker unready and is retried until it is warm."""
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("ollama not running")
+
+    seen = {}
+
+    def embed():
+        seen["ready_while_warming"] = client.get("/ready").status_code
+
+    asyncio.run(warm_up({"embed_model": embed, "ollama:llama3.2:1b": flaky}, retry_seconds=0))
+
+    assert seen["ready_while_warming"] == 503
+    assert len(attempts) == 2
+    response = client.get("/ready")
+    assert response.status_code == 200
+    components = response.json()["components"]
+    assert components["ollama:llama3.2:1b"]["status"] == "ready"
+    assert components["embed_model"]["seconds"] is not None
+
+def test_ready_without_warm_up(readiness, client):
+    """Test if a worker with warm-up disabled is ready as soon as it starts."""
+    readiness.start()
+    assert client.get("/ready").status_code == 200
+
+def test_ollama_models_are_pinned():
+    """Test if every configured Ollama model is warmed with the keep_alive setting."""
+    with patch.object(warmup.Config, "OLLAMA_MODELS", "llama3.2-vision, llama3.2:1b"), \
+         patch.object(warmup.Config, "OLLAMA_KEEP_ALIVE", -1), patch("services.warmup.ollama.chat") as mock_chat:
+        components = warm_up_components()
+        components["ollama:llama3.2:1b"]()
+
+    assert set(components) == {"embed_model", "reranker", "ollama:llama3.2-vision", "ollama:llama3.2:1b"}
+    assert mock_chat.call_args.kwargs["model"] == "llama3.2:1b"
+    assert mock_chat.call_args.kwargs["keep_alive"] == -1
@@ -0,0 +1,285 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+from threading import Lock, Thread
+from config import Config
+from metrics import Counter
+import os, re, json, time, uuid, queue, atexit
+import logging
+
+# Configure logger
+logger = logging.getLogger("Multimodal_rag_bot")
+
+traces_dropped = Counter("traces_dropped_total", "Traces dropped because the trace file queue was full")
+
+@dataclass
+class Span:
+    """
+    A timed stage of a request.
+
+    Attributes:
+        name (str): Name of the stage, e.g. 'qdrant_search'.
+        trace_id (str): ID of the trace (the request ID).
+        span_id (str): ID of the span.
+        parent_id (str): ID of the enclosing span, None for a top-level span.
+        start_ns (int): Start time, nanoseconds since the epoch.
+        duration_ns (int): Duration in nanoseconds.
+        attributes (dict): Details of the stage (collection, token counts, ...).
+        error (str): The exception raised by the stage, if any.
+    """
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str = None
+    start_ns: int = 0
+    duration_ns: int = 0
+    attributes: dict = field(default_factory=dict)
+    error: str = None
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1e6
+
+@dataclass
+class Trace:
+    """
+    The spans recorded while serving a request.
+
+    Attributes:
+        request_id (str): ID of the request, returned in the X-Request-ID header.
+        name (str): Name of the request, e.g. 'POST /chat/chat_ai'.
+        spans (list): Finished spans, in completion order.
+    """
+    request_id: str
+    name: str = ""
+    spans: list = field(default_factory=list)
+
+# Trace of the current request and innermost open span, per task / thread context
+current_trace: ContextVar = ContextVar("current_trace", default=None)
+current_span: ContextVar = ContextVar("current_span", default=None)
+
+def get_request_id() -> str:
+    """
+    Returns the ID of the request being served, None outside a request.
+    """
+    trace = current_trace.get()
+    return trace.request_id if trace else None
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Records a stage of the current request. Spans nest: a span opened inside another one
+    becomes its child. Outside a traced request, nothing is recorded.
+
+    Args:
+        name (str): Name of the stage.
+        **attributes: Details of the stage.
+
+    Yields:
+        Span: The span (attributes can be added while it runs), None outside a request.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = current_span.get()
+    record = Span(name, trace.request_id, uuid.uuid4().hex[:16], parent.span_id if parent else None, time.time_ns(), attributes=attributes)
+    token = current_span.set(record)
+    started = time.perf_counter_ns()
+    try:
+        yield record
+    except Exception as e:
+        record.error = type(e).__name__
+        raise
+    finally:
+        record.duration_ns = time.perf_counter_ns() - started
+        current_span.reset(token)
+        trace.spans.append(record)
+
+def server_timing(trace: Trace) -> str:
+    """
+    Formats the top-level spans of a trace as a Server-Timing header value.
+
+    Args:
+        trace (Trace): The trace.
+
+    Returns:
+        str: e.g. 'session_load;dur=3.1, llm_generate;dur=812.4'.
+    """
+    entries = []
+    for record in sorted(trace.spans, key=lambda s: s.start_ns):
+        if record.parent_id is None:
+            entries.append(f"{re.sub(r'[^A-Za-z0-9_.-]', '_', record.name)};dur={record.duration_ms:.1f}")
+    return ", ".join(entries)
+
+class FileSpanExporter:
+    """
+    Appends every trace as a JSON line to a local file, for offline analysis. Traces are
+    handed to a background thread through a bounded queue, so the request never waits on
+    the file; they are dropped (and counted) when the queue is full.
+
+    Attributes:
+        path (str): Path to the file.
+    """
+    def __init__(self, path: str, queue_size: int = None):
+        self.path = path
+        self.queue = queue.Queue(Config.TRACE_QUEUE_SIZE if queue_size is None else queue_size)
+        self._thread = None
+        self._lock = Lock()
+
+    def export(self, trace: Trace):
+        if self._thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            traces_dropped.inc()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._write, name="trace-file-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        while True:
+            traces = [self.queue.get()]
+            while not self.queue.empty() and traces[-1] is not None: # Write what is queued at once
+                traces.append(self.queue.get_nowait())
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for trace in traces:
+                        if trace is not None:
+                            f.write(json.dumps({"request_id": trace.request_id, "name": trace.name,
+                                                "spans": [asdict(record) for record in trace.spans]}) + "\n")
+            except Exception as e:
+                logger.error(f"Failed to write {len(traces)} traces to {self.path}: {e}")
+            finally:
+                for _ in traces:
+                    self.queue.task_done()
+            if traces[-1] is None:
+                return
+
+    def flush(self):
+        """
+        Waits until the queued traces are written.
+        """
+        if self._thread is not None:
+            self.queue.join()
+
+    def shutdown(self):
+        """
+        Writes the queued traces and stops the background thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+            atexit.unregister(self.shutdown)
+
+class OTLPSpanExporter:
+    """
+    Sends every trace to an OpenTelemetry collector (requires the 'opentelemetry-sdk' and
+    'opentelemetry-exporter-otlp-proto-http' packages). Spans are replayed with their
+    recorded times through a batching span processor, so export stays off the request path.
+
+    Attributes:
+        endpoint (str): OTLP/HTTP traces endpoint of the collector.
+    """
+    def __init__(self, endpoint: str, service_name: str):
+        try:
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter as OTLPHTTPExporter
+        except ImportError as e:
+            logger.error("The 'opentelemetry-sdk' and 'opentelemetry-exporter-otlp-proto-http' packages are required for TRACE_EXPORTERS=otlp")
+            raise ImportError("The 'opentelemetry-sdk' and 'opentelemetry-exporter-otlp-proto-http' packages are required for TRACE_EXPORTERS=otlp") from e
+        self.endpoint = endpoint
+        self.provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        self.provider.add_span_processor(BatchSpanProcessor(OTLPHTTPExporter(endpoint=endpoint)))
+        self.tracer = self.provider.get_tracer("paperlens")
+
+    def export(self, trace: Trace):
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.trace import Status, StatusCode
+        root_end = max((s.start_ns + s.duration_ns for s in trace.spans), default=time.time_ns())
+        root_start = min((s.start_ns for s in trace.spans), default=root_end)
+        root = self.tracer.start_span(trace.name or "request", start_time=root_start, attributes={"request.id": trace.request_id})
+        opened = {}
+        for record in sorted(trace.spans, key=lambda s: s.start_ns): # Parents start before their children
+            parent = opened.get(record.parent_id, root)
+            otel_span = self.tracer.start_span(record.name, context=otel_trace.set_span_in_context(parent), start_time=record.start_ns,
+                                               attributes={key: value for key, value in record.attributes.items() if value is not None})
+            if record.error:
+                otel_span.set_status(Status(StatusCode.ERROR, record.error))
+            opened[record.span_id] = otel_span
+        for record in trace.spans:
+            opened[record.span_id].end(end_time=record.start_ns + record.duration_ns)
+        root.end(end_time=root_end)
+
+def create_exporters() -> list:
+    """
+    Creates the exporters listed in Config.TRACE_EXPORTERS ('file', 'otlp').
+
+    Returns:
+        list: The exporters.
+    """
+    exporters = []
+    for name in filter(None, (name.strip() for name in Config.TRACE_EXPORTERS.split(","))):
+        if name == "file":
+            exporters.append(FileSpanExporter(Config.TRACE_FILE))
+        elif name == "otlp":
+            exporters.append(OTLPSpanExporter(Config.OTEL_EXPORTER_OTLP_ENDPOINT, Config.TRACE_SERVICE_NAME))
+        else:
+            logger.warning(f"Unknown trace exporter: {name}")
+    return exporters
+
+class TracingMiddleware:
+    """
+    ASGI middleware tracing every HTTP request: it assigns a request ID (or keeps the
+    X-Request-ID sent by the client), collects the spans recorded while serving the request,
+    returns them in the Server-Timing header and hands the trace to the exporters.
+
+    Attributes:
+        exporters (list): Exporters receiving every finished trace.
+    """
+    def __init__(self, app, exporters: list = None):
+        self.app = app
+        self.exporters = create_exporters() if exporters is None else exporters
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        trace = Trace(request_id, f"{scope['method']} {scope['path']}")
+        token = current_trace.set(trace)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timing = server_timing(trace)
+                total = f"total;dur={(time.perf_counter() - started) * 1000:.1f}"
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-request-id", request_id.encode("latin-1")),
+                    (b"server-timing", f"{timing}, {total}".encode("latin-1") if timing else total.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_trace.reset(token)
+            if trace.spans:
+                for exporter in self.exporters:
+                    try:
+                        exporter.export(trace)
+                    except Exception as e:
+                        logger.error(f"Failed to export trace {request_id}: {e}")
@@ -1,4 +1,4 @@
-import time, os, hashlib, magic
+import time, os, hashlib, base64, json
 from urllib.parse import urlparse
 import logging
 
@@ -16,28 +16,24 @@ def get_file_hash(file_bytes: bytes) -> str:
     """Generate SHA256 hash for file content."""
     return hashlib.sha256(file_bytes).hexdigest()
 
-async def is_image(file_bytes: bytes) -> bool:
-    """Check if the file is an image using MIME type."""
-    mime = magic.Magic(mime=True)
-    file_type = mime.from_buffer(file_bytes)
-    return file_type.startswith("image/")
-
-async def is_txt(file_bytes: bytes) -> bool:
-    """Check if the file is an image using MIME type."""
-    mime = magic.Magic(mime=True)
-    file_type = mime.from_buffer(file_bytes)
-    return file_type == "text/plain"
-
-async def is_pdf(file_bytes: bytes) -> bool:
-    """Check if the file is an image using MIME type."""
-    mime = magic.Magic(mime=True)
-    file_type = mime.from_buffer(file_bytes)
-    return file_type == "application/pdf"
-
 def is_valid_url(url):
     """Check if the url is a valid url."""
     try:
         parsed = urlparse(url)
         return all([parsed.scheme, parsed.netloc])  # Ensures scheme (http, https) and netloc exist
     except ValueError:
-        return False
\ No newline at end of file
+        return False
+
+def encode_cursor(position: dict) -> str:
+    """Encode a pagination position into an opaque cursor string."""
+    return base64.urlsafe_b64encode(json.dumps(position, default=str).encode()).decode()
+
+def decode_cursor(cursor: str) -> dict:
+    """Decode a cursor string produced by encode_cursor, raising ValueError if it is malformed."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(position, dict):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return position
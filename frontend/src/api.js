@@ -25,16 +25,24 @@ export const registerUser = (formData) => API.post("/auth/register", formData);
 export const loginUser = (userData) => API.post("/auth/login", userData);
 export const fetchChat = () => API.get("/chat");
 export const fetchChatBotResponse = (formData) => API.post("/chat/chat_ai", formData);
-export const fetchChatSessions = () => API.get("/chat/sessions");
+export const fetchChatSessions = (cursor = null) => API.get("/chat/sessions", { params: cursor ? { cursor } : {} });
+export const fetchSessionMessages = (sessionId, before = null) => API.get(`/chat/sessions/${sessionId}/messages`, { params: before !== null ? { before } : {} });
+export const toChatMessages = (sessionMessages) => (sessionMessages || [])
+    .filter((msg) => msg.role !== "system") // Remove 'system' messages
+    .map((msg) => ({
+        role: msg.role === "assistant" ? "bot" : msg.role, // Map roles
+        text: msg.content || msg.text, // Map 'content' to 'text'
+        image: msg.image || null,
+    }));
 export const createChatSession = () => API.post("/chat/create_session");
 export const deleteSession = async (sessionId) => API.delete(`/chat/sessions/${sessionId}`)
-export const listUsers = () => API.get("/admin/users");
-export const listFiles = (is_admin) => {
-    console.log("is_admin", is_admin);
+export const listUsers = (cursor = null) => API.get("/admin/users", { params: cursor ? { cursor } : {} });
+export const listFiles = (is_admin, cursor = null, filters = {}) => {
+    const params = { ...filters, ...(cursor ? { cursor } : {}) };
     if (is_admin) {
-        return API.get("/admin/list_files");
+        return API.get("/admin/list_files", { params });
     } else {
-        return API.get("/user/list_files");
+        return API.get("/user/list_files", { params });
     }
 }
 
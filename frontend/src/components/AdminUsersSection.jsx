@@ -41,21 +41,36 @@ const Td = styled.td`
     text-align: left;
 `;
 
+const LoadMoreButton = styled.button`
+    margin-top: 15px;
+    padding: 8px 16px;
+    background: #007bff;
+    color: white;
+    border: none;
+    border-radius: 5px;
+    cursor: pointer;
+
+    &:hover {
+        background: #0056b3;
+    }
+`;
+
 const AdminUsersSection = () => {
     const [usersList, setUsersList] = useState([]);
+    const [usersCursor, setUsersCursor] = useState(null);
 
-    useEffect(() => {
-        // Fetching users from API
-        const fetchUsers = async () => {
-            try {
-                const response = await listUsers();
-                console.log(response.data);  // Assuming the data is in response.data
-                setUsersList(response.data);  // Assuming the data is in response.data
-            } catch (error) {
-                console.error("Error fetching users:", error);
-            }
-        };
+    // Fetching a page of users from API, appended after the pages already loaded
+    const fetchUsers = async (cursor = null) => {
+        try {
+            const response = await listUsers(cursor);
+            setUsersList((prev) => (cursor ? [...prev, ...response.data.users] : response.data.users));
+            setUsersCursor(response.data.next_cursor);
+        } catch (error) {
+            console.error("Error fetching users:", error);
+        }
+    };
 
+    useEffect(() => {
         fetchUsers();
     }, []);
 
@@ -88,6 +103,7 @@ const AdminUsersSection = () => {
                     ))}
                 </tbody>
             </Table>
+            {usersCursor && <LoadMoreButton onClick={() => fetchUsers(usersCursor)}>Load More Users</LoadMoreButton>}
         </Container>
     );
 };
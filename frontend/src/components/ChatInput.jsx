@@ -28,7 +28,7 @@ const ChatInput = ({ loading, setLoading, setMessages, activeSessionId, setActiv
             // setStatMessage({ text: "Please select or create a session first.", type: "error" });
             // return;
             const { data } = await createChatSession();
-            setSessions((prev) => [...prev, { session_id: data.session_id, messages_count: 0, messages: [] }]);
+            setSessions((prev) => [{ session_id: data.session_id, title: null, messages_count: 0 }, ...prev]);
             setActiveSessionId(data.session_id);
             session_id = data.session_id;
         }
@@ -1,15 +1,38 @@
 import ChatWindow from "../components/ChatWindow";
 import ChatInput from "../components/ChatInput";
 import { ChatContainer } from "./StyleComponents";
+import { fetchSessionMessages, toChatMessages } from "../api";
 import React, { useState } from "react";
 
 
-const ChatInterface = ({ messages, setMessages, chatLoading, activeSessionId, setActiveSessionId, setSessions, handleError }) => {
+const ChatInterface = ({ messages, setMessages, messagesBefore, setMessagesBefore, chatLoading, activeSessionId, setActiveSessionId, setSessions, handleError }) => {
     const [loading, setLoading] = useState(false);
+    const [olderLoading, setOlderLoading] = useState(false);
+
+    const handleLoadOlderMessages = async () => {
+        setOlderLoading(true);
+        try {
+            const { data } = await fetchSessionMessages(activeSessionId, messagesBefore);
+            if (data.session_id === activeSessionId) {
+                setMessages((prev) => [...toChatMessages(data.messages), ...prev]);
+                setMessagesBefore(data.before);
+            }
+        } catch (error) {
+            handleError(error);
+        }
+        setOlderLoading(false);
+    };
     
     return (
         <ChatContainer>
-            <ChatWindow chatLoading={chatLoading} loading={loading} messages={messages} />
+            <ChatWindow
+                chatLoading={chatLoading}
+                loading={loading}
+                messages={messages}
+                hasOlderMessages={messagesBefore !== null && messagesBefore !== undefined}
+                olderLoading={olderLoading}
+                onLoadOlderMessages={handleLoadOlderMessages}
+            />
             <ChatInput 
                 loading={loading}
                 setLoading={setLoading}
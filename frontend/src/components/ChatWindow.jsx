@@ -1,17 +1,30 @@
-import { ChatWindowContainer, SpinLoaderContainer, SpinLoader, Message, EmptyChat, TypingLoaderContainer, TypingIndicator, Image } from "../components/StyleComponents";
+import { ChatWindowContainer, SpinLoaderContainer, SpinLoader, Message, EmptyChat, TypingLoaderContainer, TypingIndicator, Image, LoadOlderButton } from "../components/StyleComponents";
 import React, { useEffect, useRef } from "react";
 import ReactMarkdown from "react-markdown";
 
-const ChatWindow = ({ chatLoading, loading, messages }) => {
+const ChatWindow = ({ chatLoading, loading, messages, hasOlderMessages, olderLoading, onLoadOlderMessages }) => {
     const chatWindowRef = useRef(null);
     const chatEndRef = useRef(null);
+    const scrollAnchorRef = useRef(null);
 
     useEffect(() => {
         if (chatEndRef.current && chatWindowRef.current) {
-            chatWindowRef.current.scrollTop = chatWindowRef.current.scrollHeight;
+            const anchor = scrollAnchorRef.current;
+            if (anchor) {
+                // Older messages were prepended: keep the messages being read in place
+                chatWindowRef.current.scrollTop = chatWindowRef.current.scrollHeight - anchor.scrollHeight + anchor.scrollTop;
+                scrollAnchorRef.current = null;
+            } else {
+                chatWindowRef.current.scrollTop = chatWindowRef.current.scrollHeight;
+            }
         }
     }, [messages]);
 
+    const handleLoadOlder = () => {
+        scrollAnchorRef.current = { scrollHeight: chatWindowRef.current.scrollHeight, scrollTop: chatWindowRef.current.scrollTop };
+        onLoadOlderMessages();
+    };
+
     return (
         <ChatWindowContainer ref={chatWindowRef}>
             {chatLoading ? (
@@ -20,12 +33,19 @@ const ChatWindow = ({ chatLoading, loading, messages }) => {
                     <br />
                     Loading messages...
                 </SpinLoaderContainer>
-            ) : messages.length > 0 ? (messages.map((msg, index) => (
-                <Message key={index} role={msg.role}>
-                    {msg.image && <Image src={msg.image} alt="Attachment" />}
-                    <ReactMarkdown>{msg.text}</ReactMarkdown>
-                </Message>
-            ))) : <EmptyChat>No messages in this session yet. Start the conversation!</EmptyChat>
+            ) : messages.length > 0 ? (<>
+                {hasOlderMessages && (
+                    <LoadOlderButton onClick={handleLoadOlder} disabled={olderLoading}>
+                        {olderLoading ? "Loading..." : "Load older messages"}
+                    </LoadOlderButton>
+                )}
+                {messages.map((msg, index) => (
+                    <Message key={index} role={msg.role}>
+                        {msg.image && <Image src={msg.image} alt="Attachment" />}
+                        <ReactMarkdown>{msg.text}</ReactMarkdown>
+                    </Message>
+                ))}
+            </>) : <EmptyChat>No messages in this session yet. Start the conversation!</EmptyChat>
             }
             {loading && (
                 <TypingLoaderContainer>
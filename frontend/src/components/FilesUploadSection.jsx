@@ -189,6 +189,7 @@ const FilesUploadSection = ({ is_admin }) => {
     const [tags, setTags] = useState([]);
     const [loading, setLoading] = useState(false);
     const [filesList, setFilesList] = useState([]);
+    const [filesCursor, setFilesCursor] = useState(null);
     const [statMessage, setStatMessage] = useState({ text: "", type: "" });
     const [inputValue, setInputValue] = useState("");
     const navigate = useNavigate();
@@ -225,10 +226,12 @@ const FilesUploadSection = ({ is_admin }) => {
 
     };
 
-    const fetchFilesList = async () => {
+    // Fetches a page of files, appended after the pages already loaded when a cursor is given
+    const fetchFilesList = async (cursor = null) => {
         try {
-            const response = await listFiles(is_admin);
-            setFilesList(response.data);
+            const response = await listFiles(is_admin, cursor);
+            setFilesList((prev) => (cursor ? [...prev, ...response.data.files] : response.data.files));
+            setFilesCursor(response.data.next_cursor);
         } catch (error) {
             handleError(error);
         }
@@ -279,6 +282,9 @@ const FilesUploadSection = ({ is_admin }) => {
             'application/pdf': ['.pdf'],
             'image/*': ['.png', '.jpg', '.jpeg', '.gif'],
             'text/plain': ['.txt'],
+            'text/markdown': ['.md'],
+            'text/html': ['.html', '.htm'],
+            'application/vnd.openxmlformats-officedocument.wordprocessingml.document': ['.docx'],
         },
     });
 
@@ -359,6 +365,7 @@ const FilesUploadSection = ({ is_admin }) => {
                     ))}
                 </tbody>
             </FileTable>
+            {filesCursor && <UploadButton onClick={() => fetchFilesList(filesCursor)}>Load More Files</UploadButton>}
         </FileUploadContainer >
     );
 };
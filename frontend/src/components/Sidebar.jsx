@@ -1,8 +1,8 @@
 import { SidebarToggleButton, SidebarContainer, NewSessionButton, SidebarList, SidebarItem, SessionName, DeleteSessionBtn, SideBarGoToBtn } from "./StyleComponents";
-import { createChatSession, deleteSession, fetchChatSessions } from "../api";
+import { createChatSession, deleteSession, fetchChatSessions, fetchSessionMessages, toChatMessages } from "../api";
 import React, { useState } from "react";
 
-const Sidebar = ({ sessions, setSessions, activeSessionId, setActiveSessionId, setMessages, setChatLoading, setStatMessage, handleDashboard, handleError }) => {
+const Sidebar = ({ sessions, setSessions, sessionsCursor, setSessionsCursor, activeSessionId, setActiveSessionId, setMessages, setMessagesBefore, setChatLoading, setStatMessage, handleDashboard, handleError }) => {
     const [isSidebarCollapsed, setIsSidebarCollapsed] = useState(false);
 
     const toggleSidebar = () => setIsSidebarCollapsed(!isSidebarCollapsed);
@@ -11,9 +11,10 @@ const Sidebar = ({ sessions, setSessions, activeSessionId, setActiveSessionId, s
         try {
             const { data } = await createChatSession();
             console.log("data", data.session_id);
-            setSessions((prev) => [...prev, { session_id: data.session_id, messages_count: 0, messages: [] }]);
+            setSessions((prev) => [{ session_id: data.session_id, title: null, messages_count: 0 }, ...prev]);
             setActiveSessionId(data.session_id);
             setMessages([]); // Clear chat for the new session
+            setMessagesBefore(null);
             console.log("session_id", activeSessionId);
         } catch (error) {
             handleError(error);
@@ -24,31 +25,25 @@ const Sidebar = ({ sessions, setSessions, activeSessionId, setActiveSessionId, s
         setChatLoading(true);
         setActiveSessionId(sessionId);
         try {
-            const { data } = await fetchChatSessions();
-            setSessions(data.sessions);
+            // Only the latest page of messages is loaded, older pages are loaded from the chat window
+            const { data } = await fetchSessionMessages(sessionId);
+            setMessages(toChatMessages(data.messages));
+            setMessagesBefore(data.before);
         } catch (error) {
             handleError(error);
         }
-        const selectedSession = sessions.find((s) => s.session_id === sessionId);
-        console.log("selectedSession:", selectedSession);
-
-        postProcessMessages(selectedSession);
-
         setChatLoading(false);
     };
 
-    const postProcessMessages = (selectedSession) => {
-        console.log("postProcessMessages:", selectedSession?.messages)
-        const transformedMessages = (selectedSession?.messages || [])
-            .filter((msg) => msg.role !== "system") // Remove 'system' messages
-            .map((msg) => ({
-                role: msg.role === "assistant" ? "bot" : msg.role, // Map roles
-                text: msg.content || msg.text, // Map 'content' to 'text'
-                image: msg.image || null,
-            }));
-        console.log("transformedMessages:", transformedMessages);
-        setMessages(transformedMessages || []);
-    }
+    const handleLoadMoreSessions = async () => {
+        try {
+            const { data } = await fetchChatSessions(sessionsCursor);
+            setSessions((prev) => [...prev, ...data.sessions]);
+            setSessionsCursor(data.next_cursor);
+        } catch (error) {
+            handleError(error);
+        }
+    };
 
     const handleDeleteSession = async (sessionId) => {
         try {
@@ -56,6 +51,7 @@ const Sidebar = ({ sessions, setSessions, activeSessionId, setActiveSessionId, s
             if (response.status === 200) {
                 setSessions((prev) => prev.filter((session) => session.session_id !== sessionId));
                 setMessages([]); // Clear messages if the deleted session was active
+                setMessagesBefore(null);
                 setActiveSessionId(null); // Clear the selected session
                 setStatMessage({ text: "Session deleted successfully!", type: "success" })
             }
@@ -80,7 +76,7 @@ const Sidebar = ({ sessions, setSessions, activeSessionId, setActiveSessionId, s
                             isActive={session.session_id === activeSessionId}
                             onClick={() => handleSessionChange(session.session_id)}
                         >
-                            <SessionName>{session.session_id}</SessionName>
+                            <SessionName>{session.title || session.session_id}</SessionName>
                             <DeleteSessionBtn
                                 onClick={(e) => {
                                     e.stopPropagation(); // Prevent triggering session selection
@@ -94,6 +90,9 @@ const Sidebar = ({ sessions, setSessions, activeSessionId, setActiveSessionId, s
                             </DeleteSessionBtn>
                         </SidebarItem>)))
                     }
+                    {sessionsCursor && (
+                        <NewSessionButton onClick={handleLoadMoreSessions}>Load More Sessions</NewSessionButton>
+                    )}
                 </SidebarList>
                 <SideBarGoToBtn onClick={handleDashboard}>Dashboard</SideBarGoToBtn>
             </SidebarContainer>
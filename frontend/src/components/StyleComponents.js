@@ -192,6 +192,27 @@ export const Message = styled.div`
     word-wrap: break-word;
     `;
 
+export const LoadOlderButton = styled.button`
+    align-self: center;
+    padding: 6px 12px;
+    background-color: transparent;
+    color: #3b82f6; /* Blue */
+    font-size: 13px;
+    border: 1px solid #3b82f6;
+    border-radius: 8px;
+    cursor: pointer;
+
+    &:hover:enabled {
+        background-color: #eff6ff;
+    }
+
+    &:disabled {
+        color: #999;
+        border-color: #ccc;
+        cursor: default;
+    }
+    `;
+
 export const Image = styled.img`
     max-width: 100%;
     height: auto;
@@ -9,8 +9,10 @@ import NavigationBar from "../components/NavigationBar";
 
 const Chat = () => {
     const [sessions, setSessions] = useState([]);
+    const [sessionsCursor, setSessionsCursor] = useState(null);
     const [activeSessionId, setActiveSessionId] = useState(null);
     const [messages, setMessages] = useState([]);
+    const [messagesBefore, setMessagesBefore] = useState(null);
     const [username, setUsername] = useState("");
     const [userAdmin, setUserAdmin] = useState(false);
     const [statMessage, setStatMessage] = useState({ text: "", type: "" });
@@ -27,6 +29,7 @@ const Chat = () => {
             try {
                 const { data } = await fetchChatSessions();
                 setSessions(data.sessions);
+                setSessionsCursor(data.next_cursor);
             } catch (error) {
                 handleError(error);
             }
@@ -68,9 +71,12 @@ const Chat = () => {
                 <Sidebar
                     sessions={sessions}
                     setSessions={setSessions}
+                    sessionsCursor={sessionsCursor}
+                    setSessionsCursor={setSessionsCursor}
                     activeSessionId={activeSessionId}
                     setActiveSessionId={setActiveSessionId}
                     setMessages={setMessages}
+                    setMessagesBefore={setMessagesBefore}
                     setChatLoading={setChatLoading}
                     setStatMessage={setStatMessage}
                     handleDashboard={handleDashboard}
@@ -79,6 +85,8 @@ const Chat = () => {
                 <ChatInterface
                     messages={messages}
                     setMessages={setMessages}
+                    messagesBefore={messagesBefore}
+                    setMessagesBefore={setMessagesBefore}
                     chatLoading={chatLoading}
                     activeSessionId={activeSessionId}
                     setActiveSessionId={setActiveSessionId}